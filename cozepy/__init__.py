@@ -24,6 +24,7 @@ from .auth import (
     WebOAuthApp,
     load_oauth_app_from_config,
 )
+from .auth.store import FileTokenStore, MemoryTokenStore, SharedMemoryTokenStore, TokenStore
 from .bots import (
     Bot,
     BotKnowledge,
@@ -57,6 +58,8 @@ from .chat import (
     MessageType,
     ToolOutput,
 )
+from .chat.batch import ChatBatchReport, ChatBatchRequest, ChatBatchResult
+from .chat.tools import ChatToolRegistry
 from .config import (
     COZE_CN_BASE_URL,
     COZE_COM_BASE_URL,
@@ -64,6 +67,7 @@ from .config import (
     DEFAULT_TIMEOUT,
 )
 from .conversations import Conversation, Section
+from .conversations.cache import ConversationCache
 from .coze import AsyncCoze, Coze
 from .datasets import CreateDatasetResp, Dataset, DatasetStatus, DocumentProgress
 from .datasets.documents import (
@@ -78,8 +82,18 @@ from .datasets.documents import (
     DocumentUpdateType,
 )
 from .datasets.images import Photo
-from .exception import CozeAPIError, CozeError, CozeInvalidEventError, CozePKCEAuthError, CozePKCEAuthErrorType
+from .deadline import Deadline
+from .exception import (
+    CozeAPIError,
+    CozeDeadlineExceededError,
+    CozeError,
+    CozeEventBufferOverflowError,
+    CozeInvalidEventError,
+    CozePKCEAuthError,
+    CozePKCEAuthErrorType,
+)
 from .files import File
+from .fork import reset_after_fork
 from .log import setup_logging
 from .model import (
     AsyncLastIDPaged,
@@ -98,6 +112,10 @@ from .request import AsyncHTTPClient, SyncHTTPClient
 from .templates import TemplateDuplicateResp, TemplateEntityType
 from .users import User
 from .version import VERSION
+from .websockets.audio.feeder import AsyncWebsocketsAudioFeeder, AudioFeedMode, WebsocketsAudioFeeder
+from .websockets.audio.jitter import AudioJitterBuffer
+from .websockets.audio.pcm import PCMConverter, PCMFormat
+from .websockets.audio.pipeline import AsyncWebsocketsSpeechPipeline, SpeechTextSplitter, WebsocketsSpeechPipeline
 from .websockets.audio.speech import (
     AsyncWebsocketsAudioSpeechClient,
     AsyncWebsocketsAudioSpeechEventHandler,
@@ -122,6 +140,8 @@ from .websockets.audio.transcriptions import (
     WebsocketsAudioTranscriptionsClient,
     WebsocketsAudioTranscriptionsEventHandler,
 )
+from .websockets.audio.uplink import AsyncAudioUplinkBuffer, AudioUplinkBuffer
+from .websockets.audio.vad import AudioVoiceActivityDetector
 from .websockets.chat import (
     AsyncWebsocketsChatClient,
     AsyncWebsocketsChatEventHandler,
@@ -138,6 +158,11 @@ from .websockets.chat import (
     WebsocketsChatClient,
     WebsocketsChatEventHandler,
 )
+from .websockets.dispatch import AsyncWebsocketsEventDispatcher, WebsocketsDispatchMetrics, WebsocketsEventDispatcher
+from .websockets.loop import WebsocketsEventLoopPool
+from .websockets.metrics import WebsocketsLatencyHistogram, WebsocketsSessionMetrics
+from .websockets.pool import AsyncWebsocketsChatPool
+from .websockets.reconnect import WebsocketsReconnectMetrics, WebsocketsReconnectPolicy
 from .websockets.ws import (
     InputAudio,
     OpusConfig,
@@ -145,7 +170,9 @@ from .websockets.ws import (
     PCMConfig,
     WebsocketsErrorEvent,
     WebsocketsEvent,
+    WebsocketsEventsOverflow,
     WebsocketsEventType,
+    WebsocketsSendOverflow,
 )
 from .workflows.runs import (
     WorkflowEvent,
@@ -189,6 +216,11 @@ __all__ = [
     "Scope",
     "TokenAuth",
     "WebOAuthApp",
+    # auth.store
+    "TokenStore",
+    "MemoryTokenStore",
+    "FileTokenStore",
+    "SharedMemoryTokenStore",
     # bots
     "BotPromptInfo",
     "BotOnboardingInfo",
@@ -220,9 +252,16 @@ __all__ = [
     "ChatEventType",
     "ChatEvent",
     "ToolOutput",
+    # chat.batch
+    "ChatBatchRequest",
+    "ChatBatchResult",
+    "ChatBatchReport",
+    # chat.tools
+    "ChatToolRegistry",
     # conversations
     "Conversation",
     "Section",
+    "ConversationCache",
     # files
     "File",
     # datasets
@@ -253,6 +292,19 @@ __all__ = [
     "WebsocketsAudioSpeechClient",
     "AsyncWebsocketsAudioSpeechEventHandler",
     "AsyncWebsocketsAudioSpeechClient",
+    # websockets.audio.feeder
+    "AudioFeedMode",
+    "WebsocketsAudioFeeder",
+    "AsyncWebsocketsAudioFeeder",
+    # websockets.audio.jitter
+    "AudioJitterBuffer",
+    # websockets.audio.pcm
+    "PCMFormat",
+    "PCMConverter",
+    # websockets.audio.pipeline
+    "SpeechTextSplitter",
+    "WebsocketsSpeechPipeline",
+    "AsyncWebsocketsSpeechPipeline",
     # websockets.audio.transcriptions
     "InputAudioBufferAppendEvent",
     "InputAudioBufferCompleteEvent",
@@ -264,6 +316,11 @@ __all__ = [
     "WebsocketsAudioTranscriptionsClient",
     "AsyncWebsocketsAudioTranscriptionsEventHandler",
     "AsyncWebsocketsAudioTranscriptionsClient",
+    # websockets.audio.uplink
+    "AudioUplinkBuffer",
+    "AsyncAudioUplinkBuffer",
+    # websockets.audio.vad
+    "AudioVoiceActivityDetector",
     # websockets.chat
     "ChatUpdateEvent",
     "ConversationChatSubmitToolOutputsEvent",
@@ -279,10 +336,26 @@ __all__ = [
     "WebsocketsChatClient",
     "AsyncWebsocketsChatEventHandler",
     "AsyncWebsocketsChatClient",
+    # websockets.dispatch
+    "WebsocketsDispatchMetrics",
+    "WebsocketsEventDispatcher",
+    "AsyncWebsocketsEventDispatcher",
+    # websockets.loop
+    "WebsocketsEventLoopPool",
+    # websockets.metrics
+    "WebsocketsSessionMetrics",
+    "WebsocketsLatencyHistogram",
+    # websockets.pool
+    "AsyncWebsocketsChatPool",
+    # websockets.reconnect
+    "WebsocketsReconnectPolicy",
+    "WebsocketsReconnectMetrics",
     # websockets
     "WebsocketsEventType",
     "WebsocketsEvent",
     "WebsocketsErrorEvent",
+    "WebsocketsEventsOverflow",
+    "WebsocketsSendOverflow",
     "InputAudio",
     "OpusConfig",
     "PCMConfig",
@@ -318,12 +391,18 @@ __all__ = [
     # coze
     "AsyncCoze",
     "Coze",
+    # deadline
+    "Deadline",
     # exception
     "CozeError",
     "CozeAPIError",
+    "CozeDeadlineExceededError",
+    "CozeEventBufferOverflowError",
     "CozeInvalidEventError",
     "CozePKCEAuthError",
     "CozePKCEAuthErrorType",
+    # fork
+    "reset_after_fork",
     # model
     "ListResponse",
     "AsyncLastIDPaged",
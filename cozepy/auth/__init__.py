@@ -1,17 +1,28 @@
 import abc
+import asyncio
+import threading
 import time
-from typing import List, Optional, Union
+from typing import TYPE_CHECKING, List, Optional, Union
 from urllib.parse import quote_plus, urlparse
 
 from authlib.jose import jwt  # type: ignore
 from typing_extensions import Literal
 
 from cozepy.config import COZE_CN_BASE_URL, COZE_COM_BASE_URL
-from cozepy.exception import CozePKCEAuthError, CozePKCEAuthErrorType
+from cozepy.deadline import Deadline
+from cozepy.exception import CozeDeadlineExceededError, CozePKCEAuthError, CozePKCEAuthErrorType
+from cozepy.fork import check_fork, register_after_fork
+from cozepy.log import log_warning
 from cozepy.model import CozeModel
 from cozepy.request import Requester
 from cozepy.util import gen_s256_code_challenge, random_hex, remove_url_trailing_slash
 
+if TYPE_CHECKING:
+    from cozepy.auth.store import TokenStore
+
+# seconds before the background refresh of a jwt token is retried
+_JWT_REFRESH_RETRY_INTERVAL = 1
+
 
 class OAuthToken(CozeModel):
     # The requested access token. The app can use this token to authenticate to the Coze resource.
@@ -125,6 +136,22 @@ class OAuthApp(object):
         s = jwt.encode(header, payload, private_key)
         return s.decode("utf-8")
 
+    def _token_store_key(self, public_key_id: str, scope: Optional[Scope], session_name: Optional[str]) -> str:
+        return ":".join(
+            [
+                "jwt",
+                self._base_url,
+                self._client_id,
+                public_key_id,
+                session_name or "",
+                scope.model_dump_json() if scope else "",
+            ]
+        )
+
+    def _should_refresh_stored(self, token: OAuthToken, ttl: int, refresh_ahead: float) -> bool:
+        # at most half of the ttl, so a token is not refreshed on every request
+        return time.time() >= token.expires_in - min(refresh_ahead, ttl / 2)
+
     async def _arefresh_access_token(self, refresh_token: str, secret: str = "") -> OAuthToken:
         url = f"{self._base_url}/api/permission/oauth2/token"
         headers = {"Authorization": f"Bearer {secret}"} if secret else {}
@@ -273,13 +300,26 @@ class JWTOAuthApp(OAuthApp):
     JWT OAuth App.
     """
 
-    def __init__(self, client_id: str, private_key: str, public_key_id: str, base_url: str = COZE_COM_BASE_URL):
+    def __init__(
+        self,
+        client_id: str,
+        private_key: str,
+        public_key_id: str,
+        base_url: str = COZE_COM_BASE_URL,
+        token_store: Optional["TokenStore"] = None,
+        refresh_ahead: int = 60,
+    ):
         """
         :param client_id:
         :param private_key:
         :param public_key_id:
         :param base_url:
+        :param token_store: share the access tokens with the other processes using the store, a stored token
+        is reused until refresh_ahead seconds before it expires
+        :param refresh_ahead:
         """
+        self._token_store = token_store
+        self._refresh_ahead = refresh_ahead
         self._client_id = client_id
         self._base_url = remove_url_trailing_slash(base_url)
         self._api_endpoint = urlparse(base_url).netloc
@@ -289,7 +329,11 @@ class JWTOAuthApp(OAuthApp):
         super().__init__(client_id, base_url, www_base_url="")
 
     def get_access_token(
-        self, ttl: int = 900, scope: Optional[Scope] = None, session_name: Optional[str] = None
+        self,
+        ttl: int = 900,
+        scope: Optional[Scope] = None,
+        session_name: Optional[str] = None,
+        refresh_ahead: Optional[float] = None,
     ) -> OAuthToken:
         """
         Get the token by jwt with jwt auth flow.
@@ -299,7 +343,24 @@ class JWTOAuthApp(OAuthApp):
         which is 24 hours.
         :param scope:
         :param session_name: Isolate different sub-resources under the same jwt account
+        :param refresh_ahead: the refresh_ahead of the stored token, defaults to the one of the app
         """
+        if self._token_store is None:
+            return self._fetch_access_token(ttl, scope, session_name)
+        ahead = self._refresh_ahead if refresh_ahead is None else refresh_ahead
+        key = self._token_store_key(self._public_key_id, scope, session_name)
+        token = self._token_store.get(key)
+        if token is not None and not self._should_refresh_stored(token, ttl, ahead):
+            return token
+        with self._token_store.lock(key):
+            # refreshed by another process meanwhile
+            token = self._token_store.get(key)
+            if token is None or self._should_refresh_stored(token, ttl, ahead):
+                token = self._fetch_access_token(ttl, scope, session_name)
+                self._token_store.set(key, token)
+        return token
+
+    def _fetch_access_token(self, ttl: int, scope: Optional[Scope], session_name: Optional[str]) -> OAuthToken:
         jwt_token = self._gen_jwt(self._public_key_id, self._private_key, 3600, session_name)
         url = f"{self._base_url}/api/permission/oauth2/token"
         headers = {"Authorization": f"Bearer {jwt_token}"}
@@ -316,13 +377,26 @@ class AsyncJWTOAuthApp(OAuthApp):
     JWT OAuth App.
     """
 
-    def __init__(self, client_id: str, private_key: str, public_key_id: str, base_url: str = COZE_COM_BASE_URL):
+    def __init__(
+        self,
+        client_id: str,
+        private_key: str,
+        public_key_id: str,
+        base_url: str = COZE_COM_BASE_URL,
+        token_store: Optional["TokenStore"] = None,
+        refresh_ahead: int = 60,
+    ):
         """
         :param client_id:
         :param private_key:
         :param public_key_id:
         :param base_url:
+        :param token_store: share the access tokens with the other processes using the store, a stored token
+        is reused until refresh_ahead seconds before it expires
+        :param refresh_ahead:
         """
+        self._token_store = token_store
+        self._refresh_ahead = refresh_ahead
         self._client_id = client_id
         self._base_url = remove_url_trailing_slash(base_url)
         self._api_endpoint = urlparse(base_url).netloc
@@ -332,14 +406,38 @@ class AsyncJWTOAuthApp(OAuthApp):
         super().__init__(client_id, base_url, www_base_url="")
 
     async def get_access_token(
-        self, ttl: int, scope: Optional[Scope] = None, session_name: Optional[str] = None
+        self,
+        ttl: int,
+        scope: Optional[Scope] = None,
+        session_name: Optional[str] = None,
+        refresh_ahead: Optional[float] = None,
     ) -> OAuthToken:
         """
         Get the token by jwt with jwt auth flow.
         :param ttl:
         :param scope:
         :param session_name: Isolate different sub-resources under the same jwt account
+        :param refresh_ahead: the refresh_ahead of the stored token, defaults to the one of the app
         """
+        if self._token_store is None:
+            return await self._fetch_access_token(ttl, scope, session_name)
+        ahead = self._refresh_ahead if refresh_ahead is None else refresh_ahead
+        key = self._token_store_key(self._public_key_id, scope, session_name)
+        token = self._token_store.get(key)
+        if token is not None and not self._should_refresh_stored(token, ttl, ahead):
+            return token
+
+        from cozepy.auth.store import _AsyncTokenLock
+
+        async with _AsyncTokenLock(self._token_store, key):
+            # refreshed by another process meanwhile
+            token = self._token_store.get(key)
+            if token is None or self._should_refresh_stored(token, ttl, ahead):
+                token = await self._fetch_access_token(ttl, scope, session_name)
+                self._token_store.set(key, token)
+        return token
+
+    async def _fetch_access_token(self, ttl: int, scope: Optional[Scope], session_name: Optional[str]) -> OAuthToken:
         jwt_token = self._gen_jwt(self._public_key_id, self._private_key, 3600, session_name)
         url = f"{self._base_url}/api/permission/oauth2/token"
         headers = {"Authorization": f"Bearer {jwt_token}"}
@@ -535,20 +633,21 @@ class DeviceOAuthApp(OAuthApp):
             return self._get_access_token(device_code)
 
         interval = 5
+        deadline = Deadline.current()
         while True:
             try:
                 return self._get_access_token(device_code)
             except CozePKCEAuthError as e:
                 if e.error == CozePKCEAuthErrorType.AUTHORIZATION_PENDING:
-                    time.sleep(interval)
-                    continue
+                    pass
                 elif e.error == CozePKCEAuthErrorType.SLOW_DOWN:
                     if interval < 30:
                         interval += 5
-                    time.sleep(interval)
-                    continue
                 else:
                     raise
+                if deadline is not None and deadline.remaining < interval:
+                    raise CozeDeadlineExceededError(deadline.timeout) from e
+                time.sleep(interval)
 
     def _get_access_token(self, device_code: str, poll: bool = False) -> OAuthToken:
         """
@@ -617,20 +716,21 @@ class AsyncDeviceOAuthApp(OAuthApp):
             return await self._get_access_token(device_code)
 
         interval = 5
+        deadline = Deadline.current()
         while True:
             try:
                 return await self._get_access_token(device_code)
             except CozePKCEAuthError as e:
                 if e.error == CozePKCEAuthErrorType.AUTHORIZATION_PENDING:
-                    time.sleep(interval)
-                    continue
+                    pass
                 elif e.error == CozePKCEAuthErrorType.SLOW_DOWN:
                     if interval < 30:
                         interval += 5
-                    time.sleep(interval)
-                    continue
                 else:
                     raise
+                if deadline is not None and deadline.remaining < interval:
+                    raise CozeDeadlineExceededError(deadline.timeout) from e
+                await asyncio.sleep(interval)
 
     async def _get_access_token(self, device_code: str, poll: bool = False) -> OAuthToken:
         """
@@ -785,6 +885,15 @@ class TokenAuth(SyncAuth):
 class JWTAuth(SyncAuth):
     """
     The JWT auth flow.
+
+    The token is refreshed refresh_ahead seconds before it expires: one thread fetches the new token, the
+    others keep using the current one meanwhile, and wait for the new one only once the current one expired.
+    With background_refresh a daemon thread refreshes it ahead of time, so the requests never wait for it.
+
+    :param refresh_ahead: seconds before the expiry the token is refreshed, at most half of the ttl
+    :param background_refresh: refresh the token in the background, stopped by close()
+    :param token_store: share the token with the other processes using the store, see TokenStore, pass it to
+    the oauth_app instead when there is one
     """
 
     def __init__(
@@ -795,12 +904,25 @@ class JWTAuth(SyncAuth):
         ttl: int = 7200,
         base_url: str = COZE_COM_BASE_URL,
         oauth_app: Optional[JWTOAuthApp] = None,
+        refresh_ahead: int = 60,
+        background_refresh: bool = False,
+        token_store: Optional["TokenStore"] = None,
     ):
         assert ttl > 0
+        assert refresh_ahead >= 0
         self._ttl = ttl
-        self._token = None
+        # so a token is not refreshed on every request
+        self._refresh_ahead = min(refresh_ahead, ttl / 2)
+        self._background_refresh = background_refresh
+        self._token: Optional[OAuthToken] = None
+        self._lock = threading.Lock()
+        self._refresher: Optional[threading.Thread] = None
+        self._closed = threading.Event()
+        register_after_fork(self)
 
         if oauth_app:
+            if token_store is not None:
+                raise ValueError("pass the token_store to the oauth_app")
             self._oauth_cli = oauth_app
         else:
             assert isinstance(client_id, str)
@@ -809,7 +931,12 @@ class JWTAuth(SyncAuth):
             assert isinstance(ttl, int)
             assert isinstance(base_url, str)
             self._oauth_cli = JWTOAuthApp(
-                client_id, private_key, public_key_id, base_url=remove_url_trailing_slash(base_url)
+                client_id,
+                private_key,
+                public_key_id,
+                base_url=remove_url_trailing_slash(base_url),
+                token_store=token_store,
+                refresh_ahead=refresh_ahead,
             )
 
     @property
@@ -821,12 +948,73 @@ class JWTAuth(SyncAuth):
         token = self._generate_token()
         return token.access_token
 
-    def _generate_token(self):
-        if self._token is not None and int(time.time()) < self._token.expires_in:
-            return self._token
-        self._token = self._oauth_cli.get_access_token(self._ttl)
+    def close(self) -> None:
+        """
+        Stop the background refresh.
+        """
+        self._closed.set()
+
+    def _generate_token(self) -> OAuthToken:
+        check_fork()
+        token = self._token
+        if token is not None and not self._should_refresh(token):
+            return token
+        if token is not None and time.time() < token.expires_in:
+            # about to expire: one thread refreshes it, the others use it meanwhile
+            if not self._lock.acquire(blocking=False):
+                return token
+        else:
+            self._lock.acquire()
+        try:
+            return self._refresh()
+        finally:
+            self._lock.release()
+
+    def _should_refresh(self, token: OAuthToken) -> bool:
+        return time.time() >= token.expires_in - self._refresh_ahead
+
+    def _refresh(self) -> OAuthToken:
+        # called with the lock held
+        token = self._token
+        if token is not None and not self._should_refresh(token):
+            # refreshed by another thread
+            return token
+        try:
+            # the stored token is refreshed in the same window, or it is read again on every request
+            self._token = self._oauth_cli.get_access_token(self._ttl, refresh_ahead=self._refresh_ahead)
+        except Exception as e:
+            if token is None or time.time() >= token.expires_in:
+                raise
+            log_warning("refresh jwt token failed, use the current token until it expires: %s", e)
+            return token
+        if self._background_refresh and self._refresher is None and not self._closed.is_set():
+            self._refresher = threading.Thread(target=self._refresh_loop, name="cozepy-jwt-refresh", daemon=True)
+            self._refresher.start()
         return self._token
 
+    def _refresh_loop(self) -> None:
+        delay = 0.0
+        while not self._closed.wait(delay):
+            token = self._token
+            if token is None or self._should_refresh(token):
+                try:
+                    with self._lock:
+                        token = self._refresh()
+                except Exception as e:
+                    log_warning("refresh jwt token failed: %s", e)
+            if token is None or self._should_refresh(token):
+                delay = _JWT_REFRESH_RETRY_INTERVAL
+            else:
+                delay = token.expires_in - self._refresh_ahead - time.time()
+
+    def _reset_after_fork(self) -> None:
+        self._token = None
+        self._lock = threading.Lock()
+        self._refresher = None
+        closed, self._closed = self._closed.is_set(), threading.Event()
+        if closed:
+            self._closed.set()
+
 
 class AsyncTokenAuth(AsyncAuth):
     """
@@ -850,6 +1038,15 @@ class AsyncTokenAuth(AsyncAuth):
 class AsyncJWTAuth(AsyncAuth):
     """
     The JWT auth flow.
+
+    The token is refreshed refresh_ahead seconds before it expires: one task fetches the new token, the others
+    keep using the current one meanwhile, and wait for the new one only once the current one expired. With
+    background_refresh a task on the event loop refreshes it ahead of time, so the requests never wait for it.
+
+    :param refresh_ahead: seconds before the expiry the token is refreshed, at most half of the ttl
+    :param background_refresh: refresh the token in the background, stopped by close()
+    :param token_store: share the token with the other processes using the store, see TokenStore, pass it to
+    the oauth_app instead when there is one
     """
 
     def __init__(
@@ -860,12 +1057,27 @@ class AsyncJWTAuth(AsyncAuth):
         ttl: int = 7200,
         base_url: str = COZE_COM_BASE_URL,
         oauth_app: Optional[AsyncJWTOAuthApp] = None,
+        refresh_ahead: int = 60,
+        background_refresh: bool = False,
+        token_store: Optional["TokenStore"] = None,
     ):
         assert ttl > 0
+        assert refresh_ahead >= 0
         self._ttl = ttl
-        self._token = None
+        # so a token is not refreshed on every request
+        self._refresh_ahead = min(refresh_ahead, ttl / 2)
+        self._background_refresh = background_refresh
+        self._token: Optional[OAuthToken] = None
+        # bound to the event loop it is created on, see _get_lock
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._refresher: Optional[asyncio.Future] = None
+        self._closed = False
+        register_after_fork(self)
 
         if oauth_app:
+            if token_store is not None:
+                raise ValueError("pass the token_store to the oauth_app")
             self._oauth_cli = oauth_app
         else:
             assert isinstance(client_id, str)
@@ -874,7 +1086,12 @@ class AsyncJWTAuth(AsyncAuth):
             assert isinstance(ttl, int)
             assert isinstance(base_url, str)
             self._oauth_cli = AsyncJWTOAuthApp(
-                client_id, private_key, public_key_id, base_url=remove_url_trailing_slash(base_url)
+                client_id,
+                private_key,
+                public_key_id,
+                base_url=remove_url_trailing_slash(base_url),
+                token_store=token_store,
+                refresh_ahead=refresh_ahead,
             )
 
     @property
@@ -886,8 +1103,75 @@ class AsyncJWTAuth(AsyncAuth):
         token = await self._generate_token()
         return token.access_token
 
-    async def _generate_token(self):
-        if self._token is not None and int(time.time()) < self._token.expires_in:
-            return self._token
-        self._token = await self._oauth_cli.get_access_token(self._ttl)
+    def close(self) -> None:
+        """
+        Stop the background refresh.
+        """
+        self._closed = True
+        if self._refresher is not None:
+            self._refresher.cancel()
+            self._refresher = None
+
+    async def _generate_token(self) -> OAuthToken:
+        check_fork()
+        token = self._token
+        if token is not None and not self._should_refresh(token):
+            return token
+        lock = self._get_lock()
+        if token is not None and time.time() < token.expires_in and lock.locked():
+            # about to expire and refreshed by another task, which is not waited for
+            return token
+        async with lock:
+            return await self._refresh()
+
+    def _should_refresh(self, token: OAuthToken) -> bool:
+        return time.time() >= token.expires_in - self._refresh_ahead
+
+    def _get_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_event_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock, self._lock_loop = asyncio.Lock(), loop
+        return self._lock
+
+    async def _refresh(self) -> OAuthToken:
+        # called with the lock held
+        token = self._token
+        if token is not None and not self._should_refresh(token):
+            # refreshed by another task
+            return token
+        try:
+            # the stored token is refreshed in the same window, or it is read again on every request
+            self._token = await self._oauth_cli.get_access_token(self._ttl, refresh_ahead=self._refresh_ahead)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if token is None or time.time() >= token.expires_in:
+                raise
+            log_warning("refresh jwt token failed, use the current token until it expires: %s", e)
+            return token
+        if self._background_refresh and not self._closed and (self._refresher is None or self._refresher.done()):
+            self._refresher = asyncio.ensure_future(self._refresh_loop())
         return self._token
+
+    async def _refresh_loop(self) -> None:
+        delay = 0.0
+        while True:
+            await asyncio.sleep(delay)
+            token = self._token
+            if token is None or self._should_refresh(token):
+                try:
+                    async with self._get_lock():
+                        token = await self._refresh()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    log_warning("refresh jwt token failed: %s", e)
+            if token is None or self._should_refresh(token):
+                delay = _JWT_REFRESH_RETRY_INTERVAL
+            else:
+                delay = token.expires_in - self._refresh_ahead - time.time()
+
+    def _reset_after_fork(self) -> None:
+        self._token = None
+        self._lock, self._lock_loop = None, None
+        self._refresher = None
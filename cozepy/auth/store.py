@@ -0,0 +1,272 @@
+import abc
+import asyncio
+import contextlib
+import json
+import mmap
+import multiprocessing
+import os
+import stat
+import struct
+import tempfile
+import threading
+import time
+from typing import Any, ContextManager, Dict, Iterator, Optional
+
+from cozepy.auth import OAuthToken
+from cozepy.fork import register_after_fork
+from cozepy.log import log_warning
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None  # type: ignore
+
+# the sequence and the length of the tokens json at the start of the shared memory, the sequence is odd while
+# the tokens are written
+_HEADER = struct.Struct("<QI")
+# seconds between two reads of the shared memory while it is written, doubled up to the max
+_READ_BACKOFF_MIN = 0.0001
+_READ_BACKOFF_MAX = 0.01
+
+
+class TokenStore(abc.ABC):
+    """
+    Where the JWT OAuth apps keep their access tokens, so the processes sharing a store mint one token
+    instead of one each: the process which finds the token about to expire refreshes it under lock(), the
+    others wait for it and reuse it.
+
+    Implement it to keep the tokens in a custom backend, e.g. redis:
+
+        class RedisTokenStore(TokenStore):
+            def get(self, key):
+                data = redis.get(key)
+                return OAuthToken.model_validate_json(data) if data else None
+
+            def set(self, key, token):
+                redis.set(key, token.model_dump_json(), exat=token.expires_in)
+
+            def lock(self, key):
+                return redis.lock(f"{key}:lock", timeout=30)
+    """
+
+    @abc.abstractmethod
+    def get(self, key: str) -> Optional[OAuthToken]:
+        """
+        The stored token, which may have expired, None if there is none.
+        """
+
+    @abc.abstractmethod
+    def set(self, key: str, token: OAuthToken) -> None:
+        """
+        Store the token, called with the lock of the key held.
+        """
+
+    @abc.abstractmethod
+    def lock(self, key: str) -> ContextManager[Any]:
+        """
+        A lock of the key held by one process and thread at a time, while it refreshes the token.
+        """
+
+
+class MemoryTokenStore(TokenStore):
+    """
+    The tokens of one process, shared by its JWTAuth / JWTOAuthApp instances. After a fork the child starts
+    with the tokens of the parent.
+    """
+
+    def __init__(self) -> None:
+        self._tokens: Dict[str, OAuthToken] = {}
+        self._lock = threading.Lock()
+        register_after_fork(self)
+
+    def get(self, key: str) -> Optional[OAuthToken]:
+        return self._tokens.get(key)
+
+    def set(self, key: str, token: OAuthToken) -> None:
+        self._tokens[key] = token
+
+    def lock(self, key: str) -> ContextManager[Any]:
+        return self._lock
+
+    def _reset_after_fork(self) -> None:
+        # a lock held by another thread of the parent is never released in the child
+        self._lock = threading.Lock()
+
+
+class FileTokenStore(TokenStore):
+    """
+    The tokens in a json file readable only by its owner, shared by the processes of the user. The file is
+    replaced atomically, and the refresh is serialized with an flock on path.lock, which is released when the
+    process holding it dies. A file owned by another user is ignored.
+
+    :param path: of the json file, tokens.json in $XDG_CACHE_HOME/cozepy (~/.cache/cozepy) by default, the
+    directory is created readable only by the user
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        if fcntl is None:
+            raise OSError("FileTokenStore requires fcntl, which is not available on this platform")
+        self._path = path or os.path.join(_user_cache_dir(), "tokens.json")
+        self._lock_path = self._path + ".lock"
+
+    def get(self, key: str) -> Optional[OAuthToken]:
+        token = self._read().get(key)
+        return OAuthToken.model_validate(token) if token else None
+
+    def set(self, key: str, token: OAuthToken) -> None:
+        tokens = self._read()
+        tokens[key] = token.model_dump()
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self._path)), prefix=".cozepy-tokens-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(tokens, f)
+            os.replace(tmp, self._path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    @contextlib.contextmanager
+    def lock(self, key: str) -> Iterator[None]:
+        # opened on each lock, an flock does not exclude the processes sharing an inherited descriptor
+        fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            with open(self._path) as f:
+                if os.fstat(f.fileno()).st_uid != os.getuid():
+                    log_warning("token store file %s is not owned by the user, ignore it", self._path)
+                    return {}
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            log_warning("invalid token store file %s: %s", self._path, e)
+            return {}
+
+
+def _user_cache_dir() -> str:
+    """
+    The cozepy dir in the cache dir of the user, created with mode 0700, which must not be accessible to others.
+    """
+    path = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "cozepy")
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or stat.S_IMODE(st.st_mode) & 0o077:
+        raise PermissionError(f"{path} must be a directory owned by the user and accessible only to them")
+    return path
+
+
+class SharedMemoryTokenStore(TokenStore):
+    """
+    The tokens in an anonymous shared memory, for the workers forked from the process which created the
+    store: create it before the fork, e.g. in the gunicorn config with preload_app, or before starting a
+    multiprocessing pool.
+
+    :param size: bytes of the shared memory
+    :param lock_timeout: seconds to wait for the lock, after which the token is refreshed without it, and for a
+    write to finish, after which the store is emptied, in case the process holding it died
+    """
+
+    def __init__(self, size: int = 64 * 1024, lock_timeout: float = 30):
+        if size <= _HEADER.size:
+            raise ValueError(f"size must be greater than {_HEADER.size}")
+        self._memory = mmap.mmap(-1, size)
+        self._lock = multiprocessing.Lock()
+        self._lock_timeout = lock_timeout
+
+    def get(self, key: str) -> Optional[OAuthToken]:
+        token = self._read().get(key)
+        return OAuthToken.model_validate(token) if token else None
+
+    def set(self, key: str, token: OAuthToken) -> None:
+        tokens = self._read()
+        tokens[key] = token.model_dump()
+        data = json.dumps(tokens).encode("utf-8")
+        if _HEADER.size + len(data) > len(self._memory):
+            raise ValueError(f"tokens of {len(data)} bytes do not fit in the shared memory of {len(self._memory)}")
+        # a seqlock: the readers retry while the sequence is odd, or changed while they read, it stays odd if a
+        # writer died in the middle
+        seq, size = _HEADER.unpack_from(self._memory, 0)
+        seq |= 1
+        _HEADER.pack_into(self._memory, 0, seq, size)
+        self._memory[_HEADER.size : _HEADER.size + len(data)] = data
+        _HEADER.pack_into(self._memory, 0, seq + 1, len(data))
+
+    @contextlib.contextmanager
+    def lock(self, key: str) -> Iterator[None]:
+        acquired = self._lock.acquire(timeout=self._lock_timeout)
+        if not acquired:
+            log_warning("token store lock not acquired in %ss, refresh the token without it", self._lock_timeout)
+        try:
+            yield
+        finally:
+            if acquired:
+                self._lock.release()
+
+    def _read(self) -> Dict[str, Any]:
+        deadline = time.monotonic() + self._lock_timeout
+        delay = _READ_BACKOFF_MIN
+        while True:
+            seq, size = _HEADER.unpack_from(self._memory, 0)
+            if seq % 2:
+                if time.monotonic() > deadline:
+                    self._reset(seq)
+                    return {}
+                time.sleep(delay)
+                delay = min(delay * 2, _READ_BACKOFF_MAX)
+                continue
+            data = self._memory[_HEADER.size : _HEADER.size + size]
+            if _HEADER.unpack_from(self._memory, 0)[0] == seq:
+                return json.loads(data) if size else {}
+
+    def _reset(self, seq: int) -> None:
+        """
+        Empty the store after a writer died in the middle, so only the first read waits for it. The lock is
+        likely still held by the dead writer, it is taken only if it is free.
+        """
+        acquired = self._lock.acquire(block=False)
+        try:
+            if _HEADER.unpack_from(self._memory, 0)[0] == seq:
+                log_warning("token store writer did not finish in %ss, empty the store", self._lock_timeout)
+                _HEADER.pack_into(self._memory, 0, seq + 1, 0)
+        finally:
+            if acquired:
+                self._lock.release()
+
+
+class _AsyncTokenLock(object):
+    """
+    Holds the lock of a token store key in a coroutine, the blocking acquire runs in the default executor.
+    """
+
+    def __init__(self, store: TokenStore, key: str):
+        self._lock = store.lock(key)
+        self._guard = threading.Lock()
+        self._acquired = False
+        self._abandoned = False
+
+    async def __aenter__(self) -> None:
+        try:
+            await asyncio.get_event_loop().run_in_executor(None, self._acquire)
+        except asyncio.CancelledError:
+            # the executor still acquires it, it is released right away
+            with self._guard:
+                self._abandoned = True
+                if self._acquired:
+                    self._lock.__exit__(None, None, None)
+            raise
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        self._lock.__exit__(exc_type, exc_val, exc_tb)
+
+    def _acquire(self) -> None:
+        self._lock.__enter__()
+        with self._guard:
+            if self._abandoned:
+                self._lock.__exit__(None, None, None)
+            self._acquired = True
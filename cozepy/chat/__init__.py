@@ -1,18 +1,38 @@
+import asyncio
 import base64
 import json
 import time
 from enum import Enum
-from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional, Union, overload
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Union,
+    overload,
+)
 
 import httpx
 from typing_extensions import Literal
 
+from cozepy.deadline import Deadline, _NoDeadline, remaining_timeout
+from cozepy.exception import CozeDeadlineExceededError, CozeError
 from cozepy.model import AsyncIteratorHTTPResponse, AsyncStream, CozeModel, IteratorHTTPResponse, ListResponse, Stream
 from cozepy.request import Requester
 from cozepy.util import remove_url_trailing_slash
 
 if TYPE_CHECKING:
+    from cozepy.conversations.cache import ConversationCache
+
+    from .batch import AsyncChatBatch, ChatBatch, ChatBatchRequest, ChatBatchResult
     from .message import AsyncChatMessagesClient, ChatMessagesClient
+    from .tools import ChatToolRegistry
 
 
 class MessageRole(str, Enum):
@@ -426,10 +446,35 @@ class ToolOutput(CozeModel):
     output: str
 
 
+def _required_tool_calls(event: ChatEvent) -> Optional[List[ChatToolCall]]:
+    if event.event != ChatEventType.CONVERSATION_CHAT_REQUIRES_ACTION or not event.chat:
+        return None
+    if not event.chat.required_action or not event.chat.required_action.submit_tool_outputs:
+        return None
+    return event.chat.required_action.submit_tool_outputs.tool_calls
+
+
+def _new_tool_calls(
+    event: ChatEvent, required: Optional[ChatEvent], tool_outputs: List[ToolOutput]
+) -> Optional[List[ChatToolCall]]:
+    """
+    The tool calls of a requires_action event not run yet in the current stream, whose outputs are submitted
+    together once the stream ends.
+    """
+    tool_calls = _required_tool_calls(event)
+    if tool_calls is None:
+        return None
+    if required is not None and required.chat.id != event.chat.id:  # type: ignore
+        raise CozeError(f"chats {required.chat.id} and {event.chat.id} require action in one stream")  # type: ignore
+    done = {tool_output.tool_call_id for tool_output in tool_outputs}
+    return [tool_call for tool_call in tool_calls if tool_call.id not in done]
+
+
 class ChatClient(object):
-    def __init__(self, base_url: str, requester: Requester):
+    def __init__(self, base_url: str, requester: Requester, conversation_cache: Optional["ConversationCache"] = None):
         self._base_url = remove_url_trailing_slash(base_url)
         self._requester = requester
+        self._conversation_cache = conversation_cache
         self._messages: Optional[ChatMessagesClient] = None
 
     def create(
@@ -526,7 +571,8 @@ class ChatClient(object):
     ) -> ChatPoll:
         """
         Call the Chat API with non-streaming to send messages to a published Coze bot and
-        fetch chat status & message.
+        fetch chat status & message. With a conversation cache, the messages of a chat already cached are not
+        fetched again.
 
         docs en: https://www.coze.com/docs/developer_guides/chat_v3
         docs zh: https://www.coze.cn/docs/developer_guides/chat_v3
@@ -555,18 +601,150 @@ class ChatClient(object):
 
         start = int(time.time())
         interval = 1
+        deadline = Deadline.current()
         while chat.status == ChatStatus.IN_PROGRESS:
             if poll_timeout is not None and int(time.time()) - start > poll_timeout:
                 # too long, cancel chat
                 self.cancel(conversation_id=chat.conversation_id, chat_id=chat.id)
                 return ChatPoll(chat=chat)
 
-            time.sleep(interval)
-            chat = self.retrieve(conversation_id=chat.conversation_id, chat_id=chat.id)
-
+            try:
+                if deadline is not None and deadline.remaining < interval:
+                    # the next poll would overrun the deadline
+                    raise CozeDeadlineExceededError(deadline.timeout)
+                time.sleep(interval)
+                chat = self.retrieve(conversation_id=chat.conversation_id, chat_id=chat.id)
+            except CozeDeadlineExceededError:
+                with _NoDeadline():
+                    self.cancel(conversation_id=chat.conversation_id, chat_id=chat.id)
+                raise
+
+        cache = self._conversation_cache if auto_save_history else None
+        cached = cache.chat_messages(chat.conversation_id, chat.id) if cache is not None else None
+        if cached is not None:
+            return ChatPoll(chat=chat, messages=ListResponse(chat._raw_response, cached))  # type: ignore
         messages = self.messages.list(conversation_id=chat.conversation_id, chat_id=chat.id)
+        if cache is not None:
+            cache._on_messages(chat.conversation_id, messages)
         return ChatPoll(chat=chat, messages=messages)
 
+    def stream_with_tools(
+        self,
+        *,
+        bot_id: str,
+        user_id: str,
+        tools: "ChatToolRegistry",
+        additional_messages: Optional[List[Message]] = None,
+        custom_variables: Optional[Dict[str, str]] = None,
+        auto_save_history: bool = True,
+        meta_data: Optional[Dict[str, str]] = None,
+        conversation_id: Optional[str] = None,
+        tool_timeout: Optional[float] = None,
+        max_tool_workers: Optional[int] = None,
+        max_rounds: int = 10,
+    ) -> Iterator[ChatEvent]:
+        """
+        Stream a chat and run the local tools whenever the bot requires action, until the chat ends.
+
+        All tool calls of one requires_action event run concurrently on a thread pool, the outputs of the
+        requires_action events of one stream are submitted together with streaming once it ends, and the events of
+        the submitted stream are yielded in turn.
+
+        :param bot_id: The ID of the bot that the API interacts with.
+        :param user_id: The user who calls the API to chat with the bot.
+        :param tools: The registry of local tools the bot may call.
+        :param additional_messages: Additional information for the conversation.
+        :param custom_variables: The customized variable in a key-value pair.
+        :param auto_save_history: Whether to automatically save the history of conversation records.
+        :param meta_data: Additional information, typically used to encapsulate some business-related fields.
+        :param conversation_id: Indicate which conversation the chat is taking place in.
+        :param tool_timeout: The max seconds to wait for all tools of one step, one limit for the tools running
+        concurrently, not one per tool. A tool that does not finish in time gets an error output.
+        :param max_tool_workers: The size of the tool thread pool.
+        :param max_rounds: The max number of tool submissions in one chat.
+        :return: iterator of ChatEvent
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        executor = ThreadPoolExecutor(max_workers=max_tool_workers)
+        try:
+            stream: Optional[Iterator[ChatEvent]] = self.stream(
+                bot_id=bot_id,
+                user_id=user_id,
+                additional_messages=additional_messages,
+                custom_variables=custom_variables,
+                auto_save_history=auto_save_history,
+                meta_data=meta_data,
+                conversation_id=conversation_id,
+            )
+            rounds = 0
+            while stream is not None:
+                required: Optional[ChatEvent] = None
+                tool_outputs: List[ToolOutput] = []
+                for event in stream:
+                    yield event
+                    tool_calls = _new_tool_calls(event, required, tool_outputs)
+                    if tool_calls is None:
+                        continue
+                    if required is None:
+                        rounds += 1
+                        if rounds > max_rounds:
+                            raise CozeError(f"chat {event.chat.id} exceeds max tool rounds: {max_rounds}")  # type: ignore
+                    required = event
+                    tool_outputs += tools.run(tool_calls, timeout=remaining_timeout(tool_timeout), executor=executor)
+                stream = None
+                if required is not None:
+                    stream = self.submit_tool_outputs(
+                        conversation_id=required.chat.conversation_id,  # type: ignore
+                        chat_id=required.chat.id,  # type: ignore
+                        tool_outputs=tool_outputs,
+                        stream=True,
+                    )
+        finally:
+            executor.shutdown(wait=False)
+
+    def batch(
+        self,
+        requests: Iterable[Union["ChatBatchRequest", Dict]],
+        *,
+        concurrency: int = 10,
+        max_retries: int = 2,
+        retry_interval: float = 1,
+        ordered: bool = True,
+        poll_timeout: Optional[int] = None,
+        on_result: Optional[Callable[["ChatBatchResult"], None]] = None,
+        output: Optional[Union[str, IO[str]]] = None,
+    ) -> "ChatBatch":
+        """
+        Run many chats through create_and_poll with bounded concurrency and per-item retry.
+
+        The returned batch is lazy: iterate it to get ChatBatchResult objects, or call run() to drain it
+        and get the ChatBatchReport with throughput and latency percentiles.
+
+        :param requests: iterable of ChatBatchRequest (or dicts with the same fields), consumed lazily.
+        :param concurrency: max number of chats in flight.
+        :param max_retries: how many times a failed request is retried, with exponential backoff.
+        :param retry_interval: the first backoff interval in seconds.
+        :param ordered: yield results in input order if True, else as they complete.
+        :param poll_timeout: poll timeout in seconds of each chat.
+        :param on_result: callback called with every result.
+        :param output: path or text file object, every result is written to it as one json line.
+        :return: chat batch
+        """
+        from .batch import ChatBatch
+
+        return ChatBatch(
+            self,
+            requests,
+            concurrency=concurrency,
+            max_retries=max_retries,
+            retry_interval=retry_interval,
+            ordered=ordered,
+            poll_timeout=poll_timeout,
+            on_result=on_result,
+            output=output,
+        )
+
     @overload
     def _create(
         self,
@@ -626,8 +804,9 @@ class ChatClient(object):
             "meta_data": meta_data,
         }
         headers: Optional[dict] = kwargs.get("headers")
+        cache = self._conversation_cache if auto_save_history else None
         if not stream:
-            return self._requester.request(
+            chat: Chat = self._requester.request(
                 "post",
                 url,
                 False,
@@ -636,6 +815,9 @@ class ChatClient(object):
                 headers=headers,
                 body=body,
             )
+            if cache is not None:
+                cache._on_chat(chat, additional_messages, new_conversation=not conversation_id)
+            return chat
 
         response: IteratorHTTPResponse[str] = self._requester.request(
             "post",
@@ -646,11 +828,16 @@ class ChatClient(object):
             headers=headers,
             body=body,
         )
+        handler: Callable[[Dict, httpx.Response], ChatEvent] = _sync_chat_stream_handler
+        if cache is not None:
+            handler = cache._wrap_chat_stream_handler(
+                handler, additional_messages, new_conversation=not conversation_id
+            )
         return Stream(
             response._raw_response,
             response.data,
             fields=["event", "data"],
-            handler=_sync_chat_stream_handler,
+            handler=handler,
         )
 
     def retrieve(
@@ -723,7 +910,10 @@ class ChatClient(object):
             params=params,
             body=body,
         )
-        return Stream(resp._raw_response, resp.data, fields=["event", "data"], handler=_sync_chat_stream_handler)
+        handler: Callable[[Dict, httpx.Response], ChatEvent] = _sync_chat_stream_handler
+        if self._conversation_cache is not None:
+            handler = self._conversation_cache._wrap_chat_stream_handler(handler)
+        return Stream(resp._raw_response, resp.data, fields=["event", "data"], handler=handler)
 
     def cancel(
         self,
@@ -762,9 +952,10 @@ class ChatClient(object):
 
 
 class AsyncChatClient(object):
-    def __init__(self, base_url: str, requester: Requester):
+    def __init__(self, base_url: str, requester: Requester, conversation_cache: Optional["ConversationCache"] = None):
         self._base_url = remove_url_trailing_slash(base_url)
         self._requester = requester
+        self._conversation_cache = conversation_cache
         self._messages: Optional[AsyncChatMessagesClient] = None
 
     async def create(
@@ -846,6 +1037,185 @@ class AsyncChatClient(object):
         ):
             yield item
 
+    async def create_and_poll(
+        self,
+        *,
+        bot_id: str,
+        user_id: str,
+        conversation_id: Optional[str] = None,
+        additional_messages: Optional[List[Message]] = None,
+        custom_variables: Optional[Dict[str, str]] = None,
+        auto_save_history: bool = True,
+        meta_data: Optional[Dict[str, str]] = None,
+        poll_timeout: Optional[int] = None,
+    ) -> ChatPoll:
+        """
+        Call the Chat API with non-streaming to send messages to a published Coze bot and
+        fetch chat status & message. With a conversation cache, the messages of a chat already cached are not
+        fetched again.
+
+        docs en: https://www.coze.com/docs/developer_guides/chat_v3
+        docs zh: https://www.coze.cn/docs/developer_guides/chat_v3
+
+        :param bot_id: The ID of the bot that the API interacts with.
+        :param user_id: The user who calls the API to chat with the bot.
+        This parameter is defined, generated, and maintained by the user within their business system.
+        :param conversation_id: Indicate which conversation the chat is taking place in.
+        :param additional_messages: Additional information for the conversation. You can pass the user's query for this
+        conversation through this field. The array length is limited to 100, meaning up to 100 messages can be input.
+        :param custom_variables: The customized variable in a key-value pair.
+        :param auto_save_history: Whether to automatically save the history of conversation records.
+        :param meta_data: Additional information, typically used to encapsulate some business-related fields.
+        :param poll_timeout: poll timeout in seconds
+        :return: chat object
+        """
+        chat = await self.create(
+            bot_id=bot_id,
+            user_id=user_id,
+            conversation_id=conversation_id,
+            additional_messages=additional_messages,
+            custom_variables=custom_variables,
+            auto_save_history=auto_save_history,
+            meta_data=meta_data,
+        )
+
+        start = int(time.time())
+        interval = 1
+        deadline = Deadline.current()
+        while chat.status == ChatStatus.IN_PROGRESS:
+            if poll_timeout is not None and int(time.time()) - start > poll_timeout:
+                # too long, cancel chat
+                await self.cancel(conversation_id=chat.conversation_id, chat_id=chat.id)
+                return ChatPoll(chat=chat)
+
+            try:
+                if deadline is not None and deadline.remaining < interval:
+                    # the next poll would overrun the deadline
+                    raise CozeDeadlineExceededError(deadline.timeout)
+                await asyncio.sleep(interval)
+                chat = await self.retrieve(conversation_id=chat.conversation_id, chat_id=chat.id)
+            except CozeDeadlineExceededError:
+                with _NoDeadline():
+                    await self.cancel(conversation_id=chat.conversation_id, chat_id=chat.id)
+                raise
+
+        cache = self._conversation_cache if auto_save_history else None
+        cached = cache.chat_messages(chat.conversation_id, chat.id) if cache is not None else None
+        if cached is not None:
+            return ChatPoll(chat=chat, messages=ListResponse(chat._raw_response, cached))  # type: ignore
+        messages = await self.messages.list(conversation_id=chat.conversation_id, chat_id=chat.id)
+        if cache is not None:
+            cache._on_messages(chat.conversation_id, messages)
+        return ChatPoll(chat=chat, messages=messages)
+
+    async def stream_with_tools(
+        self,
+        *,
+        bot_id: str,
+        user_id: str,
+        tools: "ChatToolRegistry",
+        additional_messages: Optional[List[Message]] = None,
+        custom_variables: Optional[Dict[str, str]] = None,
+        auto_save_history: bool = True,
+        meta_data: Optional[Dict[str, str]] = None,
+        conversation_id: Optional[str] = None,
+        tool_timeout: Optional[float] = None,
+        max_rounds: int = 10,
+    ) -> AsyncIterator[ChatEvent]:
+        """
+        Stream a chat and run the local tools whenever the bot requires action, until the chat ends.
+
+        All tool calls of one requires_action event run concurrently as asyncio tasks, the outputs of the
+        requires_action events of one stream are submitted together with streaming once it ends, and the events of
+        the submitted stream are yielded in turn.
+
+        :param bot_id: The ID of the bot that the API interacts with.
+        :param user_id: The user who calls the API to chat with the bot.
+        :param tools: The registry of local tools the bot may call.
+        :param additional_messages: Additional information for the conversation.
+        :param custom_variables: The customized variable in a key-value pair.
+        :param auto_save_history: Whether to automatically save the history of conversation records.
+        :param meta_data: Additional information, typically used to encapsulate some business-related fields.
+        :param conversation_id: Indicate which conversation the chat is taking place in.
+        :param tool_timeout: The max seconds to wait for all tools of one step, one limit for the tools running
+        concurrently, not one per tool. A tool that does not finish in time gets an error output.
+        :param max_rounds: The max number of tool submissions in one chat.
+        :return: iterator of ChatEvent
+        """
+        stream: Optional[AsyncIterator[ChatEvent]] = self.stream(
+            bot_id=bot_id,
+            user_id=user_id,
+            additional_messages=additional_messages,
+            custom_variables=custom_variables,
+            auto_save_history=auto_save_history,
+            meta_data=meta_data,
+            conversation_id=conversation_id,
+        )
+        rounds = 0
+        while stream is not None:
+            required: Optional[ChatEvent] = None
+            tool_outputs: List[ToolOutput] = []
+            async for event in stream:
+                yield event
+                tool_calls = _new_tool_calls(event, required, tool_outputs)
+                if tool_calls is None:
+                    continue
+                if required is None:
+                    rounds += 1
+                    if rounds > max_rounds:
+                        raise CozeError(f"chat {event.chat.id} exceeds max tool rounds: {max_rounds}")  # type: ignore
+                required = event
+                tool_outputs += await tools.arun(tool_calls, timeout=remaining_timeout(tool_timeout))
+            stream = None
+            if required is not None:
+                stream = self.submit_tool_outputs_stream(
+                    conversation_id=required.chat.conversation_id,  # type: ignore
+                    chat_id=required.chat.id,  # type: ignore
+                    tool_outputs=tool_outputs,
+                )
+
+    def batch(
+        self,
+        requests: Union[Iterable[Union["ChatBatchRequest", Dict]], AsyncIterable[Union["ChatBatchRequest", Dict]]],
+        *,
+        concurrency: int = 10,
+        max_retries: int = 2,
+        retry_interval: float = 1,
+        ordered: bool = True,
+        poll_timeout: Optional[int] = None,
+        on_result: Optional[Callable] = None,
+        output: Optional[Union[str, IO[str]]] = None,
+    ) -> "AsyncChatBatch":
+        """
+        Run many chats through create_and_poll with bounded concurrency and per-item retry.
+
+        The returned batch is lazy: iterate it with `async for` to get ChatBatchResult objects, or await run()
+        to drain it and get the ChatBatchReport with throughput and latency percentiles.
+
+        :param requests: iterable or async iterable of ChatBatchRequest (or dicts with the same fields).
+        :param concurrency: max number of chats in flight.
+        :param max_retries: how many times a failed request is retried, with exponential backoff.
+        :param retry_interval: the first backoff interval in seconds.
+        :param ordered: yield results in input order if True, else as they complete.
+        :param poll_timeout: poll timeout in seconds of each chat.
+        :param on_result: callback or coroutine function called with every result.
+        :param output: path or text file object, every result is written to it as one json line.
+        :return: async chat batch
+        """
+        from .batch import AsyncChatBatch
+
+        return AsyncChatBatch(
+            self,
+            requests,
+            concurrency=concurrency,
+            max_retries=max_retries,
+            retry_interval=retry_interval,
+            ordered=ordered,
+            poll_timeout=poll_timeout,
+            on_result=on_result,
+            output=output,
+        )
+
     @overload
     async def _create(
         self,
@@ -903,8 +1273,9 @@ class AsyncChatClient(object):
             "auto_save_history": auto_save_history,
             "meta_data": meta_data,
         }
+        cache = self._conversation_cache if auto_save_history else None
         if not stream:
-            return await self._requester.arequest(
+            chat: Chat = await self._requester.arequest(
                 "post",
                 url,
                 False,
@@ -912,6 +1283,9 @@ class AsyncChatClient(object):
                 params=params,
                 body=body,
             )
+            if cache is not None:
+                cache._on_chat(chat, additional_messages, new_conversation=not conversation_id)
+            return chat
 
         resp: AsyncIteratorHTTPResponse[str] = await self._requester.arequest(
             "post",
@@ -922,9 +1296,12 @@ class AsyncChatClient(object):
             body=body,
         )
 
-        return AsyncStream(
-            resp.data, fields=["event", "data"], handler=_async_chat_stream_handler, raw_response=resp._raw_response
-        )
+        handler: Callable[[Dict, httpx.Response], ChatEvent] = _async_chat_stream_handler
+        if cache is not None:
+            handler = cache._wrap_chat_stream_handler(
+                handler, additional_messages, new_conversation=not conversation_id
+            )
+        return AsyncStream(resp.data, fields=["event", "data"], handler=handler, raw_response=resp._raw_response)
 
     async def retrieve(
         self,
@@ -1027,9 +1404,10 @@ class AsyncChatClient(object):
         resp: AsyncIteratorHTTPResponse[str] = await self._requester.arequest(
             "post", url, True, None, params=params, body=body
         )
-        return AsyncStream(
-            resp.data, fields=["event", "data"], handler=_async_chat_stream_handler, raw_response=resp._raw_response
-        )
+        handler: Callable[[Dict, httpx.Response], ChatEvent] = _async_chat_stream_handler
+        if self._conversation_cache is not None:
+            handler = self._conversation_cache._wrap_chat_stream_handler(handler)
+        return AsyncStream(resp.data, fields=["event", "data"], handler=handler, raw_response=resp._raw_response)
 
     async def cancel(
         self,
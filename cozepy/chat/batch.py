@@ -0,0 +1,481 @@
+import asyncio
+import collections
+import contextvars
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import httpx
+from pydantic import ValidationError
+
+from cozepy.chat import Chat, ChatPoll, ChatStatus, Message
+from cozepy.exception import CozeAPIError
+from cozepy.log import log_warning
+from cozepy.model import CozeModel
+from cozepy.util import percentile
+
+if TYPE_CHECKING:
+    from cozepy.chat import AsyncChatClient, ChatClient
+
+# latencies kept for the percentiles of the report, sampled uniformly beyond it
+_LATENCY_SAMPLES = 4096
+
+
+class ChatBatchRequest(CozeModel):
+    # The ID of the bot that the API interacts with.
+    bot_id: str
+    # The user who calls the API to chat with the bot.
+    user_id: str
+    # Indicate which conversation the chat is taking place in.
+    conversation_id: Optional[str] = None
+    # Additional information for the conversation, usually the user's query.
+    additional_messages: Optional[List[Message]] = None
+    # The customized variable in a key-value pair.
+    custom_variables: Optional[Dict[str, str]] = None
+    # Whether to automatically save the history of conversation records.
+    auto_save_history: bool = True
+    # Additional information, typically used to encapsulate some business-related fields.
+    meta_data: Optional[Dict[str, str]] = None
+
+
+class ChatBatchResult(CozeModel):
+    # The position of the request in the input iterable.
+    index: int
+    # The request, None if it was not a valid ChatBatchRequest.
+    request: Optional[ChatBatchRequest] = None
+    # The final chat object, None if all attempts failed.
+    chat: Optional[Chat] = None
+    # The messages of the chat, None if all attempts failed.
+    messages: Optional[List[Message]] = None
+    # The error of the last attempt, None if the request succeeded.
+    error: Optional[str] = None
+    # How many times the request was sent.
+    attempts: int = 0
+    # Wall time from the first attempt to the result, in seconds.
+    latency: float = 0
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+
+class ChatBatchReport(CozeModel):
+    total: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    # Wall time of the whole batch, in seconds.
+    elapsed: float = 0
+    # Finished requests per second.
+    throughput: float = 0
+    # Request latency statistics, in seconds.
+    latency_avg: float = 0
+    latency_p50: float = 0
+    latency_p90: float = 0
+    latency_p99: float = 0
+
+
+ChatBatchRequestLike = Union[ChatBatchRequest, Dict]
+
+
+def _to_request(request: ChatBatchRequestLike) -> ChatBatchRequest:
+    if isinstance(request, ChatBatchRequest):
+        return request
+    return ChatBatchRequest.model_validate(request)
+
+
+def _invalid_result(index: int, e: ValidationError) -> ChatBatchResult:
+    # a malformed request fails alone, it does not abort the batch
+    log_warning("chat batch request %s is invalid: %s", index, e)
+    return ChatBatchResult(index=index, error=f"invalid request: {e}")
+
+
+def _to_result(
+    index: int, request: ChatBatchRequest, poll: ChatPoll, attempts: int, started: float, error: Optional[str]
+) -> ChatBatchResult:
+    return ChatBatchResult(
+        index=index,
+        request=request,
+        chat=poll.chat,
+        messages=poll.messages.data if poll.messages is not None else None,
+        error=error,
+        attempts=attempts,
+        latency=time.monotonic() - started,
+    )
+
+
+def _poll_error(poll: ChatPoll) -> Tuple[Optional[str], bool]:
+    """
+    The error of a chat which did not complete, and whether it is worth retrying.
+    """
+    chat = poll.chat
+    if poll.messages is None:
+        # canceled by poll_timeout
+        return f"chat {chat.id} did not complete within poll_timeout", True
+    if chat.status == ChatStatus.COMPLETED:
+        return None, False
+    if chat.status == ChatStatus.FAILED:
+        last_error = chat.last_error
+        detail = f": code: {last_error.code}, msg: {last_error.msg}" if last_error else ""
+        return f"chat {chat.id} failed{detail}", True
+    # requires_action needs tool outputs, canceled was asked for, they end the same way on a retry
+    return f"chat {chat.id} ended with status {chat.status.value}", False
+
+
+def _retryable(e: Exception) -> bool:
+    # transport errors, and the throttled or server side failures
+    if isinstance(e, httpx.TransportError):
+        return True
+    if isinstance(e, CozeAPIError):
+        return e.status_code is not None and (e.status_code == 429 or e.status_code >= 500)
+    return False
+
+
+class _ChatBatchCollector(object):
+    """
+    Accumulates counters and latencies, and writes every result to the jsonl sink.
+    """
+
+    def __init__(self, output: Optional[Union[str, IO[str]]]):
+        self._output = output
+        self._file: Optional[IO[str]] = None
+        self._own_file = False
+        self._started_at = 0.0
+        self._succeeded = 0
+        self._failed = 0
+        self._latency_sum = 0.0
+        # a uniform sample of the latencies, so the memory stays flat on any number of requests
+        self._latencies: List[float] = []
+        self._random = random.Random()
+        self.report: Optional[ChatBatchReport] = None
+
+    def open(self) -> None:
+        self._started_at = time.monotonic()
+        if isinstance(self._output, str):
+            self._file = open(self._output, mode="w", encoding="utf-8")
+            self._own_file = True
+        else:
+            self._file = self._output
+
+    def add(self, result: ChatBatchResult) -> None:
+        if result.succeeded:
+            self._succeeded += 1
+        else:
+            self._failed += 1
+        self._latency_sum += result.latency
+        total = self._succeeded + self._failed
+        if len(self._latencies) < _LATENCY_SAMPLES:
+            self._latencies.append(result.latency)
+        else:
+            # reservoir sampling, every latency is kept with the same probability
+            slot = self._random.randrange(total)
+            if slot < _LATENCY_SAMPLES:
+                self._latencies[slot] = result.latency
+        if self._file is not None:
+            self._file.write(result.model_dump_json() + "\n")
+
+    def close(self) -> ChatBatchReport:
+        if self._file is not None and self._own_file:
+            self._file.close()
+        self._file = None
+
+        elapsed = time.monotonic() - self._started_at
+        latencies = sorted(self._latencies)
+        total = self._succeeded + self._failed
+        self.report = ChatBatchReport(
+            total=total,
+            succeeded=self._succeeded,
+            failed=self._failed,
+            elapsed=elapsed,
+            throughput=total / elapsed if elapsed > 0 else 0,
+            latency_avg=self._latency_sum / total if total else 0,
+            latency_p50=percentile(latencies, 50),
+            latency_p90=percentile(latencies, 90),
+            latency_p99=percentile(latencies, 99),
+        )
+        return self.report
+
+
+class ChatBatch(object):
+    """
+    Runs many chats through create_and_poll with bounded concurrency.
+
+    Iterate it to get the results, or call run() to drain it into the callback and the jsonl sink.
+    At most `concurrency` requests are in flight or buffered at any time, so memory stays flat no
+    matter how many requests the iterable yields.
+    """
+
+    def __init__(
+        self,
+        client: "ChatClient",
+        requests: Iterable[ChatBatchRequestLike],
+        *,
+        concurrency: int = 10,
+        max_retries: int = 2,
+        retry_interval: float = 1,
+        ordered: bool = True,
+        poll_timeout: Optional[int] = None,
+        on_result: Optional[Callable[[ChatBatchResult], None]] = None,
+        output: Optional[Union[str, IO[str]]] = None,
+    ):
+        if concurrency <= 0:
+            raise ValueError("concurrency must be greater than 0")
+        if max_retries < 0:
+            raise ValueError("max_retries must not be negative")
+        self._client = client
+        self._requests = requests
+        self._concurrency = concurrency
+        self._max_retries = max_retries
+        self._retry_interval = retry_interval
+        self._ordered = ordered
+        self._poll_timeout = poll_timeout
+        self._on_result = on_result
+        self._collector = _ChatBatchCollector(output)
+        self._started = False
+
+    @property
+    def report(self) -> Optional[ChatBatchReport]:
+        """
+        The summary of the batch, available after all results are consumed.
+        """
+        return self._collector.report
+
+    def run(self) -> ChatBatchReport:
+        for _ in self:
+            pass
+        return self._collector.report  # type: ignore
+
+    def __iter__(self) -> Iterator[ChatBatchResult]:
+        if self._started:
+            raise ValueError("chat batch can only be iterated once")
+        self._started = True
+
+        requests = enumerate(self._requests)
+        pending: Deque[Future] = collections.deque()
+        executor = ThreadPoolExecutor(max_workers=self._concurrency)
+
+        def submit_next() -> None:
+            item = next(requests, None)
+            if item is not None:
+                # run in a copy of the caller's context, so a surrounding Deadline applies to the workers
+                context = contextvars.copy_context()
+                pending.append(executor.submit(context.run, self._run_one, item[0], item[1]))
+
+        self._collector.open()
+        try:
+            for _ in range(self._concurrency):
+                submit_next()
+            while pending:
+                if self._ordered:
+                    done = [pending.popleft()]
+                else:
+                    done = list(wait(pending, return_when=FIRST_COMPLETED)[0])
+                    for future in done:
+                        pending.remove(future)
+                for future in done:
+                    submit_next()
+                    result = future.result()
+                    self._collector.add(result)
+                    if self._on_result:
+                        self._on_result(result)
+                    yield result
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+            self._collector.close()
+
+    def _run_one(self, index: int, item: ChatBatchRequestLike) -> ChatBatchResult:
+        try:
+            request = _to_request(item)
+        except ValidationError as e:
+            return _invalid_result(index, e)
+        started = time.monotonic()
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                poll = self._client.create_and_poll(
+                    bot_id=request.bot_id,
+                    user_id=request.user_id,
+                    conversation_id=request.conversation_id,
+                    additional_messages=request.additional_messages,
+                    custom_variables=request.custom_variables,
+                    auto_save_history=request.auto_save_history,
+                    meta_data=request.meta_data,
+                    poll_timeout=self._poll_timeout,
+                )
+            except Exception as e:
+                if attempts > self._max_retries or not _retryable(e):
+                    log_warning("chat batch request %s failed after %s attempts: %s", index, attempts, e)
+                    return ChatBatchResult(
+                        index=index,
+                        request=request,
+                        error=str(e),
+                        attempts=attempts,
+                        latency=time.monotonic() - started,
+                    )
+            else:
+                error, retryable = _poll_error(poll)
+                if error is None or attempts > self._max_retries or not retryable:
+                    if error is not None:
+                        log_warning("chat batch request %s failed after %s attempts: %s", index, attempts, error)
+                    return _to_result(index, request, poll, attempts, started, error)
+            time.sleep(self._retry_interval * 2 ** (attempts - 1))
+
+
+class AsyncChatBatch(object):
+    """
+    Runs many chats through create_and_poll with bounded concurrency on the running event loop.
+
+    Iterate it with `async for` to get the results, or await run() to drain it into the callback and
+    the jsonl sink. The callback may be a plain function or a coroutine function.
+    """
+
+    def __init__(
+        self,
+        client: "AsyncChatClient",
+        requests: Union[Iterable[ChatBatchRequestLike], AsyncIterable[ChatBatchRequestLike]],
+        *,
+        concurrency: int = 10,
+        max_retries: int = 2,
+        retry_interval: float = 1,
+        ordered: bool = True,
+        poll_timeout: Optional[int] = None,
+        on_result: Optional[Callable] = None,
+        output: Optional[Union[str, IO[str]]] = None,
+    ):
+        if concurrency <= 0:
+            raise ValueError("concurrency must be greater than 0")
+        if max_retries < 0:
+            raise ValueError("max_retries must not be negative")
+        self._client = client
+        self._requests = requests
+        self._concurrency = concurrency
+        self._max_retries = max_retries
+        self._retry_interval = retry_interval
+        self._ordered = ordered
+        self._poll_timeout = poll_timeout
+        self._on_result = on_result
+        self._collector = _ChatBatchCollector(output)
+        self._started = False
+
+    @property
+    def report(self) -> Optional[ChatBatchReport]:
+        """
+        The summary of the batch, available after all results are consumed.
+        """
+        return self._collector.report
+
+    async def run(self) -> ChatBatchReport:
+        async for _ in self:
+            pass
+        return self._collector.report  # type: ignore
+
+    def __aiter__(self) -> AsyncIterator[ChatBatchResult]:
+        return self._iter()
+
+    async def _iter(self) -> AsyncIterator[ChatBatchResult]:
+        if self._started:
+            raise ValueError("chat batch can only be iterated once")
+        self._started = True
+
+        requests = self._enumerate_requests()
+        pending: Deque[asyncio.Task] = collections.deque()
+
+        async def submit_next() -> None:
+            try:
+                index, request = await requests.__anext__()
+            except StopAsyncIteration:
+                return
+            pending.append(asyncio.ensure_future(self._run_one(index, request)))
+
+        self._collector.open()
+        try:
+            for _ in range(self._concurrency):
+                await submit_next()
+            while pending:
+                if self._ordered:
+                    done = [pending.popleft()]
+                else:
+                    finished, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    done = list(finished)
+                    for task in done:
+                        pending.remove(task)
+                for task in done:
+                    await submit_next()
+                    result = await task
+                    self._collector.add(result)
+                    if self._on_result:
+                        res = self._on_result(result)
+                        if asyncio.iscoroutine(res):
+                            await res
+                    yield result
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            self._collector.close()
+
+    async def _enumerate_requests(self) -> AsyncIterator:
+        index = 0
+        if hasattr(self._requests, "__aiter__"):
+            async for request in self._requests:  # type: ignore
+                yield index, request
+                index += 1
+        else:
+            for request in self._requests:  # type: ignore
+                yield index, request
+                index += 1
+
+    async def _run_one(self, index: int, item: ChatBatchRequestLike) -> ChatBatchResult:
+        try:
+            request = _to_request(item)
+        except ValidationError as e:
+            return _invalid_result(index, e)
+        started = time.monotonic()
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                poll = await self._client.create_and_poll(
+                    bot_id=request.bot_id,
+                    user_id=request.user_id,
+                    conversation_id=request.conversation_id,
+                    additional_messages=request.additional_messages,
+                    custom_variables=request.custom_variables,
+                    auto_save_history=request.auto_save_history,
+                    meta_data=request.meta_data,
+                    poll_timeout=self._poll_timeout,
+                )
+            except Exception as e:
+                if attempts > self._max_retries or not _retryable(e):
+                    log_warning("chat batch request %s failed after %s attempts: %s", index, attempts, e)
+                    return ChatBatchResult(
+                        index=index,
+                        request=request,
+                        error=str(e),
+                        attempts=attempts,
+                        latency=time.monotonic() - started,
+                    )
+            else:
+                error, retryable = _poll_error(poll)
+                if error is None or attempts > self._max_retries or not retryable:
+                    if error is not None:
+                        log_warning("chat batch request %s failed after %s attempts: %s", index, attempts, error)
+                    return _to_result(index, request, poll, attempts, started, error)
+            await asyncio.sleep(self._retry_interval * 2 ** (attempts - 1))
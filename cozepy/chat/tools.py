@@ -0,0 +1,177 @@
+import asyncio
+import functools
+import inspect
+import json
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+from cozepy.chat import ChatToolCall, ToolOutput
+from cozepy.log import log_warning
+
+
+def _format_output(result: Any) -> str:
+    if isinstance(result, str):
+        return result
+    return json.dumps(result, ensure_ascii=False)
+
+
+def _error_output(error: str) -> str:
+    return json.dumps({"error": error}, ensure_ascii=False)
+
+
+def _exception_output(e: BaseException) -> str:
+    return _error_output(str(e) or e.__class__.__name__)
+
+
+def _call(func: Callable, kwargs: Dict[str, Any]) -> Any:
+    """
+    Call a tool on a worker thread of the sync driver, an async tool runs to completion on its own event loop.
+    """
+    result = func(**kwargs)
+    if inspect.isawaitable(result):
+
+        async def wait_result():
+            return await result
+
+        result = asyncio.run(wait_result())
+    return result
+
+
+class ChatToolRegistry(object):
+    """
+    Maps the function names the bot calls to local python functions.
+
+    Functions are called with the json arguments of the tool call as keyword arguments. A str return value
+    is submitted as is, anything else is json encoded. Async functions are awaited by the async driver, and run
+    on an event loop of their own in the worker thread by the sync one.
+    """
+
+    def __init__(self, tools: Optional[Dict[str, Callable]] = None):
+        self._tools: Dict[str, Callable] = dict(tools or {})
+
+    def register(self, func: Optional[Callable] = None, *, name: Optional[str] = None):
+        """
+        Register a tool, usable as a plain call or as a decorator, with or without arguments.
+
+        :param func: the tool function.
+        :param name: the function name the bot calls, defaults to func.__name__.
+        """
+
+        def decorator(f: Callable) -> Callable:
+            self._tools[name or f.__name__] = f
+            return f
+
+        if func is None:
+            return decorator
+        return decorator(func)
+
+    def get(self, name: str) -> Optional[Callable]:
+        return self._tools.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tools
+
+    def __len__(self) -> int:
+        return len(self._tools)
+
+    def _resolve(self, tool_call: ChatToolCall):
+        """
+        Return (func, kwargs) of the tool call, or (None, error output) if it can not be called.
+        """
+        if not tool_call.function:
+            return None, _error_output(f"unsupported tool call type: {tool_call.type}")
+        func = self._tools.get(tool_call.function.name)
+        if func is None:
+            return None, _error_output(f"unknown tool: {tool_call.function.name}")
+        try:
+            kwargs = json.loads(tool_call.function.arguments) if tool_call.function.arguments else {}
+        except ValueError as e:
+            return None, _error_output(f"invalid arguments: {e}")
+        if not isinstance(kwargs, dict):
+            return None, _error_output("invalid arguments: not a json object")
+        return func, kwargs
+
+    def run(
+        self,
+        tool_calls: List[ChatToolCall],
+        *,
+        timeout: Optional[float] = None,
+        executor: Optional[ThreadPoolExecutor] = None,
+    ) -> List[ToolOutput]:
+        """
+        Run all tool calls concurrently on a thread pool and return their outputs in the same order.
+
+        A tool that raises, or does not finish within timeout, gets an error output so the chat can go on.
+
+        :param tool_calls: the tool calls of the requires_action chat.
+        :param timeout: the max seconds to wait for all tools of this step, one limit for the tools running
+        concurrently, not one per tool. None means no limit.
+        :param executor: the thread pool to run tools on, a temporary one is used if not set.
+        """
+        own_executor = executor is None
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=max(len(tool_calls), 1))
+
+        outputs: List[str] = [""] * len(tool_calls)
+        futures = {}
+        try:
+            for i, tool_call in enumerate(tool_calls):
+                func, arg = self._resolve(tool_call)
+                if func is None:
+                    outputs[i] = arg
+                else:
+                    futures[executor.submit(_call, func, arg)] = i
+
+            wait(futures, timeout=timeout)
+            for future, i in futures.items():
+                outputs[i] = self._future_output(tool_calls[i], future)
+        finally:
+            if own_executor:
+                # do not block on tools that timed out, they finish in the background
+                executor.shutdown(wait=False)
+
+        return [ToolOutput(tool_call_id=tool_call.id, output=outputs[i]) for i, tool_call in enumerate(tool_calls)]
+
+    async def arun(self, tool_calls: List[ChatToolCall], *, timeout: Optional[float] = None) -> List[ToolOutput]:
+        """
+        Run all tool calls concurrently as asyncio tasks and return their outputs in the same order.
+
+        Sync functions run in the default executor of the loop. A tool that raises, or does not finish within
+        timeout, gets an error output so the chat can go on.
+
+        :param tool_calls: the tool calls of the requires_action chat.
+        :param timeout: the max seconds to wait for all tools of this step, one limit for the tools running
+        concurrently, not one per tool. None means no limit.
+        """
+        outputs = await asyncio.gather(*[self._arun_one(tool_call, timeout) for tool_call in tool_calls])
+        return [ToolOutput(tool_call_id=tool_call.id, output=output) for tool_call, output in zip(tool_calls, outputs)]
+
+    async def _arun_one(self, tool_call: ChatToolCall, timeout: Optional[float]) -> str:
+        func, arg = self._resolve(tool_call)
+        if func is None:
+            return arg
+        if asyncio.iscoroutinefunction(func):
+            coro = func(**arg)
+        else:
+            coro = asyncio.get_event_loop().run_in_executor(None, functools.partial(func, **arg))
+        try:
+            return _format_output(await asyncio.wait_for(coro, timeout=timeout))
+        except asyncio.TimeoutError:
+            log_warning("tool %s timed out after %ss", tool_call.function.name, timeout)  # type: ignore
+            return _error_output("timeout")
+        except Exception as e:
+            log_warning("tool %s failed: %r", tool_call.function.name, e)  # type: ignore
+            return _exception_output(e)
+
+    @staticmethod
+    def _future_output(tool_call: ChatToolCall, future) -> str:
+        if not future.done():
+            future.cancel()
+            log_warning("tool %s timed out", tool_call.function.name)  # type: ignore
+            return _error_output("timeout")
+        try:
+            return _format_output(future.result())
+        except Exception as e:
+            # raised by the tool, or its result is not json serializable
+            log_warning("tool %s failed: %r", tool_call.function.name, e)  # type: ignore
+            return _exception_output(e)
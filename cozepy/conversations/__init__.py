@@ -1,10 +1,14 @@
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
 from cozepy.chat import Message
 from cozepy.model import AsyncNumberPaged, CozeModel, HTTPRequest, NumberPaged
 from cozepy.request import Requester
 from cozepy.util import remove_url_trailing_slash
 
+if TYPE_CHECKING:
+    from .cache import ConversationCache
+    from .pool import AsyncConversationPool, ConversationPool
+
 
 class Conversation(CozeModel):
     id: str
@@ -34,9 +38,10 @@ class _PrivateListConversationResp(CozeModel):
 
 
 class ConversationsClient(object):
-    def __init__(self, base_url: str, requester: Requester):
+    def __init__(self, base_url: str, requester: Requester, conversation_cache: Optional["ConversationCache"] = None):
         self._base_url = remove_url_trailing_slash(base_url)
         self._requester = requester
+        self._conversation_cache = conversation_cache
         self._messages = None
 
     def create(
@@ -117,19 +122,42 @@ class ConversationsClient(object):
         url = f"{self._base_url}/v1/conversations/{conversation_id}/clear"
         return self._requester.request("post", url, False, Section)
 
+    def pool(
+        self,
+        *,
+        size: int = 4,
+        ttl: Optional[float] = 3600,
+        meta_data: Optional[Dict[str, str]] = None,
+        retry_interval: float = 1,
+    ) -> "ConversationPool":
+        """
+        Create a pool that keeps empty conversations of bots created ahead of time, acquire from it instead of
+        calling create on the critical path of a new session.
+
+        :param size: The number of idle conversations kept per bot.
+        :param ttl: Seconds after which an idle conversation is retired and replaced, None means never.
+        :param meta_data: The meta_data of the created conversations.
+        :param retry_interval: Seconds to wait before retrying a failed background create.
+        :return: conversation pool
+        """
+        from .pool import ConversationPool
+
+        return ConversationPool(self, size=size, ttl=ttl, meta_data=meta_data, retry_interval=retry_interval)
+
     @property
     def messages(self):
         if not self._messages:
             from .message import MessagesClient
 
-            self._messages = MessagesClient(self._base_url, self._requester)
+            self._messages = MessagesClient(self._base_url, self._requester, self._conversation_cache)
         return self._messages
 
 
 class AsyncConversationsClient(object):
-    def __init__(self, base_url: str, requester: Requester):
+    def __init__(self, base_url: str, requester: Requester, conversation_cache: Optional["ConversationCache"] = None):
         self._base_url = remove_url_trailing_slash(base_url)
         self._requester = requester
+        self._conversation_cache = conversation_cache
         self._messages = None
 
     async def create(
@@ -210,10 +238,32 @@ class AsyncConversationsClient(object):
         url = f"{self._base_url}/v1/conversations/{conversation_id}/clear"
         return await self._requester.arequest("post", url, False, Section)
 
+    def pool(
+        self,
+        *,
+        size: int = 4,
+        ttl: Optional[float] = 3600,
+        meta_data: Optional[Dict[str, str]] = None,
+        retry_interval: float = 1,
+    ) -> "AsyncConversationPool":
+        """
+        Create a pool that keeps empty conversations of bots created ahead of time, acquire from it instead of
+        calling create on the critical path of a new session.
+
+        :param size: The number of idle conversations kept per bot.
+        :param ttl: Seconds after which an idle conversation is retired and replaced, None means never.
+        :param meta_data: The meta_data of the created conversations.
+        :param retry_interval: Seconds to wait before retrying a failed background create.
+        :return: conversation pool
+        """
+        from .pool import AsyncConversationPool
+
+        return AsyncConversationPool(self, size=size, ttl=ttl, meta_data=meta_data, retry_interval=retry_interval)
+
     @property
     def messages(self):
         if not self._messages:
             from .message import AsyncMessagesClient
 
-            self._messages = AsyncMessagesClient(self._base_url, self._requester)
+            self._messages = AsyncMessagesClient(self._base_url, self._requester, self._conversation_cache)
         return self._messages
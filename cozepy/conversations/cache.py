@@ -0,0 +1,203 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional
+
+import httpx
+
+from cozepy.chat import Chat, ChatEvent, ChatEventType, Message, MessageRole, MessageType
+
+
+def _cacheable(message: Message) -> bool:
+    # the verbose messages are the progress of a chat, not part of its history
+    return message.type != MessageType.VERBOSE
+
+
+class _ConversationEntry(object):
+    def __init__(self, loaded: bool):
+        # message id -> message, oldest first
+        self.messages: "OrderedDict[str, Message]" = OrderedDict()
+        # whether the messages are the full recent history, or only the ones written through this client
+        self.loaded = loaded
+
+
+class ConversationCache(object):
+    """
+    A thread-safe, bounded, write-through cache of the recent messages of conversations.
+
+    Pass it to Coze/AsyncCoze to keep it fed by chat and message calls, and read the history with
+    coze.conversations.messages.history(), which only fetches the messages after the newest cached one.
+    The least recently used conversations are evicted beyond max_conversations, and only the newest
+    max_messages are kept per conversation.
+    """
+
+    def __init__(self, max_conversations: int = 1024, max_messages: int = 200):
+        if max_conversations <= 0 or max_messages <= 0:
+            raise ValueError("max_conversations and max_messages must be greater than 0")
+        self._max_conversations = max_conversations
+        self._max_messages = max_messages
+        self._lock = threading.Lock()
+        self._conversations: "OrderedDict[str, _ConversationEntry]" = OrderedDict()
+
+    @property
+    def max_messages(self) -> int:
+        return self._max_messages
+
+    def get(self, conversation_id: str) -> Optional[List[Message]]:
+        """
+        Return the cached messages of the conversation, oldest first, or None if it is not cached.
+        """
+        with self._lock:
+            entry = self._touch(conversation_id)
+            if entry is None:
+                return None
+            return list(entry.messages.values())
+
+    def last_id(self, conversation_id: str) -> Optional[str]:
+        """
+        Return the id of the newest cached message of the conversation.
+        """
+        with self._lock:
+            entry = self._conversations.get(conversation_id)
+            if entry is None or not entry.messages:
+                return None
+            return next(reversed(entry.messages))
+
+    def is_loaded(self, conversation_id: str) -> bool:
+        """
+        Whether the cache holds the full recent history of the conversation, not only the written-through messages.
+        """
+        with self._lock:
+            entry = self._conversations.get(conversation_id)
+            return entry is not None and entry.loaded
+
+    def put(self, conversation_id: str, messages: Iterable[Message]) -> None:
+        """
+        Replace the cached history of the conversation, messages must be oldest first.
+        """
+        with self._lock:
+            entry = _ConversationEntry(loaded=True)
+            self._conversations[conversation_id] = entry
+            self._conversations.move_to_end(conversation_id)
+            self._extend(entry, messages)
+            self._evict()
+
+    def extend(self, conversation_id: str, messages: Iterable[Message], loaded: bool = False) -> None:
+        """
+        Add or update messages of the conversation, new messages must be oldest first.
+        """
+        with self._lock:
+            entry = self._touch(conversation_id)
+            if entry is None:
+                entry = _ConversationEntry(loaded=loaded)
+                self._conversations[conversation_id] = entry
+                self._evict()
+            self._extend(entry, messages)
+
+    def add(self, message: Message, conversation_id: Optional[str] = None) -> None:
+        """
+        Add or update one message, conversation_id defaults to message.conversation_id.
+        """
+        conversation_id = conversation_id or message.conversation_id
+        if conversation_id:
+            self.extend(conversation_id, [message])
+
+    def chat_messages(self, conversation_id: str, chat_id: str) -> Optional[List[Message]]:
+        """
+        Return the cached messages of the chat besides the query, oldest first, or None if the conversation is not
+        loaded or the answer of the chat is not cached. The verbose messages are never cached.
+        """
+        with self._lock:
+            entry = self._touch(conversation_id)
+            if entry is None or not entry.loaded:
+                return None
+            messages = [
+                message
+                for message in entry.messages.values()
+                if message.chat_id == chat_id and message.role != MessageRole.USER
+            ]
+        if not any(message.type == MessageType.ANSWER for message in messages):
+            return None
+        return messages
+
+    def remove(self, conversation_id: str, message_id: str) -> None:
+        with self._lock:
+            entry = self._conversations.get(conversation_id)
+            if entry is not None:
+                entry.messages.pop(message_id, None)
+
+    def clear(self, conversation_id: Optional[str] = None) -> None:
+        """
+        Drop one conversation, or all of them if conversation_id is None.
+        """
+        with self._lock:
+            if conversation_id is None:
+                self._conversations.clear()
+            else:
+                self._conversations.pop(conversation_id, None)
+
+    def __contains__(self, conversation_id: str) -> bool:
+        with self._lock:
+            return conversation_id in self._conversations
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._conversations)
+
+    def _on_chat(self, chat: Chat, additional_messages: Optional[List[Message]], new_conversation: bool) -> None:
+        # the request messages carry no ids, take them from the inserted messages of the chat
+        inserted = chat.inserted_additional_messages or []
+        messages = []
+        if additional_messages and len(inserted) == len(additional_messages):
+            for message, inserted_message in zip(additional_messages, inserted):
+                messages.append(
+                    message.model_copy(
+                        update={
+                            "id": inserted_message.id,
+                            "conversation_id": chat.conversation_id,
+                            "chat_id": chat.id,
+                            "bot_id": chat.bot_id,
+                        }
+                    )
+                )
+        self.extend(chat.conversation_id, messages, loaded=new_conversation)
+
+    def _on_message(self, message: Message) -> None:
+        if _cacheable(message):
+            self.add(message)
+
+    def _on_messages(self, conversation_id: str, messages: Iterable[Message]) -> None:
+        self.extend(conversation_id, [message for message in messages if _cacheable(message)])
+
+    def _wrap_chat_stream_handler(
+        self,
+        handler: Callable[[Dict, httpx.Response], ChatEvent],
+        additional_messages: Optional[List[Message]] = None,
+        new_conversation: bool = False,
+    ) -> Callable[[Dict, httpx.Response], ChatEvent]:
+        def wrapped(data: Dict, raw_response: httpx.Response) -> ChatEvent:
+            event = handler(data, raw_response)
+            if event.event == ChatEventType.CONVERSATION_CHAT_CREATED and event.chat:
+                self._on_chat(event.chat, additional_messages, new_conversation)
+            elif event.event == ChatEventType.CONVERSATION_MESSAGE_COMPLETED and event.message:
+                self._on_message(event.message)
+            return event
+
+        return wrapped
+
+    def _touch(self, conversation_id: str) -> Optional[_ConversationEntry]:
+        entry = self._conversations.get(conversation_id)
+        if entry is not None:
+            self._conversations.move_to_end(conversation_id)
+        return entry
+
+    def _extend(self, entry: _ConversationEntry, messages: Iterable[Message]) -> None:
+        for message in messages:
+            if not message.id:
+                continue
+            entry.messages[message.id] = message
+        while len(entry.messages) > self._max_messages:
+            entry.messages.popitem(last=False)
+
+    def _evict(self) -> None:
+        while len(self._conversations) > self._max_conversations:
+            self._conversations.popitem(last=False)
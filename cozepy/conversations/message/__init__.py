@@ -1,10 +1,14 @@
-from typing import Dict, List, Optional
+import itertools
+from typing import TYPE_CHECKING, Dict, List, Optional
 
 from cozepy.chat import Message, MessageContentType, MessageRole
 from cozepy.model import AsyncLastIDPaged, CozeModel, HTTPRequest, LastIDPaged, LastIDPagedResponse
 from cozepy.request import Requester
 from cozepy.util import remove_url_trailing_slash
 
+if TYPE_CHECKING:
+    from cozepy.conversations.cache import ConversationCache
+
 
 class _PrivateListMessageResp(CozeModel, LastIDPagedResponse[Message]):
     first_id: str
@@ -30,9 +34,10 @@ class MessagesClient(object):
     Message class.
     """
 
-    def __init__(self, base_url: str, requester: Requester):
+    def __init__(self, base_url: str, requester: Requester, conversation_cache: Optional["ConversationCache"] = None):
         self._base_url = remove_url_trailing_slash(base_url)
         self._requester = requester
+        self._conversation_cache = conversation_cache
 
     def create(
         self,
@@ -69,7 +74,10 @@ class MessagesClient(object):
             "meta_data": meta_data,
         }
 
-        return self._requester.request("post", url, False, Message, params=params, body=body)
+        message: Message = self._requester.request("post", url, False, Message, params=params, body=body)
+        if self._conversation_cache is not None:
+            self._conversation_cache.add(message, conversation_id)
+        return message
 
     def list(
         self,
@@ -181,7 +189,12 @@ class MessagesClient(object):
             "meta_data": meta_data,
         }
 
-        return self._requester.request("post", url, False, Message, params=params, body=body, data_field="message")
+        message: Message = self._requester.request(
+            "post", url, False, Message, params=params, body=body, data_field="message"
+        )
+        if self._conversation_cache is not None:
+            self._conversation_cache.add(message, conversation_id)
+        return message
 
     def delete(
         self,
@@ -205,7 +218,39 @@ class MessagesClient(object):
             "message_id": message_id,
         }
 
-        return self._requester.request("post", url, False, Message, params=params)
+        message: Message = self._requester.request("post", url, False, Message, params=params)
+        if self._conversation_cache is not None:
+            self._conversation_cache.remove(conversation_id, message_id)
+        return message
+
+    def history(self, *, conversation_id: str, refresh: bool = True) -> List[Message]:
+        """
+        Get the recent messages of the conversation, oldest first, from the conversation cache.
+
+        The first call of a conversation loads up to the cache's max_messages newest messages. Later calls only
+        fetch the messages after the newest cached one if refresh is True, or none at all if refresh is False.
+        Without a conversation cache, the recent messages are always listed from the server.
+
+        :param conversation_id: The ID of the conversation.
+        :param refresh: Whether to fetch the messages newer than the cached ones.
+        :return: The recent messages of the conversation.
+        """
+        cache = self._conversation_cache
+        limit = cache.max_messages if cache is not None else 50
+        if cache is not None and cache.is_loaded(conversation_id):
+            if refresh:
+                after_id = cache.last_id(conversation_id)
+                cache.extend(
+                    conversation_id, self.list(conversation_id=conversation_id, order="asc", after_id=after_id)
+                )
+            return cache.get(conversation_id) or []
+
+        messages = list(itertools.islice(self.list(conversation_id=conversation_id), limit))
+        messages.reverse()
+        if cache is None:
+            return messages
+        cache.put(conversation_id, messages)
+        return cache.get(conversation_id) or []
 
 
 class AsyncMessagesClient(object):
@@ -213,9 +258,10 @@ class AsyncMessagesClient(object):
     Message class.
     """
 
-    def __init__(self, base_url: str, requester: Requester):
+    def __init__(self, base_url: str, requester: Requester, conversation_cache: Optional["ConversationCache"] = None):
         self._base_url = remove_url_trailing_slash(base_url)
         self._requester = requester
+        self._conversation_cache = conversation_cache
 
     async def create(
         self,
@@ -252,7 +298,10 @@ class AsyncMessagesClient(object):
             "meta_data": meta_data,
         }
 
-        return await self._requester.arequest("post", url, False, Message, params=params, body=body)
+        message: Message = await self._requester.arequest("post", url, False, Message, params=params, body=body)
+        if self._conversation_cache is not None:
+            self._conversation_cache.add(message, conversation_id)
+        return message
 
     async def list(
         self,
@@ -364,9 +413,12 @@ class AsyncMessagesClient(object):
             "meta_data": meta_data,
         }
 
-        return await self._requester.arequest(
+        message: Message = await self._requester.arequest(
             "post", url, False, Message, params=params, body=body, data_field="message"
         )
+        if self._conversation_cache is not None:
+            self._conversation_cache.add(message, conversation_id)
+        return message
 
     async def delete(
         self,
@@ -390,4 +442,39 @@ class AsyncMessagesClient(object):
             "message_id": message_id,
         }
 
-        return await self._requester.arequest("post", url, False, Message, params=params)
+        message: Message = await self._requester.arequest("post", url, False, Message, params=params)
+        if self._conversation_cache is not None:
+            self._conversation_cache.remove(conversation_id, message_id)
+        return message
+
+    async def history(self, *, conversation_id: str, refresh: bool = True) -> List[Message]:
+        """
+        Get the recent messages of the conversation, oldest first, from the conversation cache.
+
+        The first call of a conversation loads up to the cache's max_messages newest messages. Later calls only
+        fetch the messages after the newest cached one if refresh is True, or none at all if refresh is False.
+        Without a conversation cache, the recent messages are always listed from the server.
+
+        :param conversation_id: The ID of the conversation.
+        :param refresh: Whether to fetch the messages newer than the cached ones.
+        :return: The recent messages of the conversation.
+        """
+        cache = self._conversation_cache
+        limit = cache.max_messages if cache is not None else 50
+        if cache is not None and cache.is_loaded(conversation_id):
+            if refresh:
+                after_id = cache.last_id(conversation_id)
+                page = await self.list(conversation_id=conversation_id, order="asc", after_id=after_id)
+                cache.extend(conversation_id, [message async for message in page])
+            return cache.get(conversation_id) or []
+
+        messages: List[Message] = []
+        async for message in await self.list(conversation_id=conversation_id):
+            messages.append(message)
+            if len(messages) >= limit:
+                break
+        messages.reverse()
+        if cache is None:
+            return messages
+        cache.put(conversation_id, messages)
+        return cache.get(conversation_id) or []
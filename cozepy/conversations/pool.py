@@ -0,0 +1,292 @@
+import asyncio
+import collections
+import threading
+import time
+from typing import TYPE_CHECKING, Deque, Dict, List, Optional, Tuple
+
+from cozepy.conversations import Conversation
+from cozepy.fork import register_after_fork
+from cozepy.log import log_warning
+
+if TYPE_CHECKING:
+    from cozepy.conversations import AsyncConversationsClient, ConversationsClient
+
+# (conversation, monotonic time it was created at)
+_PooledConversation = Tuple[Conversation, float]
+
+
+class _PoolState(object):
+    """
+    The bookkeeping shared by the sync and async pools, callers hold the pool lock.
+    """
+
+    def __init__(self, size: int, ttl: Optional[float]):
+        if size <= 0:
+            raise ValueError("size must be greater than 0")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be greater than 0")
+        self.size = size
+        self.ttl = ttl
+        self.idle: Dict[str, Deque[_PooledConversation]] = {}
+        self.closed = False
+
+    def track(self, bot_id: str) -> Deque[_PooledConversation]:
+        if bot_id not in self.idle:
+            self.idle[bot_id] = collections.deque()
+        return self.idle[bot_id]
+
+    def pop(self, bot_id: str) -> Optional[Conversation]:
+        self.prune()
+        idle = self.track(bot_id)
+        return idle.popleft()[0] if idle else None
+
+    def push(self, bot_id: str, conversation: Conversation) -> None:
+        self.track(bot_id).append((conversation, time.monotonic()))
+
+    def next_bot(self) -> Optional[str]:
+        self.prune()
+        for bot_id, idle in self.idle.items():
+            if len(idle) < self.size:
+                return bot_id
+        return None
+
+    def prune(self) -> None:
+        if self.ttl is None:
+            return
+        deadline = time.monotonic() - self.ttl
+        for idle in self.idle.values():
+            while idle and idle[0][1] <= deadline:
+                idle.popleft()
+
+    def next_expiry(self) -> Optional[float]:
+        """
+        Seconds until the oldest idle conversation expires, None if nothing expires.
+        """
+        if self.ttl is None:
+            return None
+        oldest = [idle[0][1] for idle in self.idle.values() if idle]
+        if not oldest:
+            return None
+        return max(min(oldest) + self.ttl - time.monotonic(), 0)
+
+
+class ConversationPool(object):
+    """
+    Keeps `size` empty conversations per bot created ahead of time, so a new session does not wait for
+    conversations.create.
+
+    A daemon thread refills the pool after every acquire. Idle conversations older than ttl seconds are
+    retired and replaced. When the pool of a bot is empty, acquire creates a conversation on the calling thread.
+    """
+
+    def __init__(
+        self,
+        client: "ConversationsClient",
+        *,
+        size: int = 4,
+        ttl: Optional[float] = 3600,
+        meta_data: Optional[Dict[str, str]] = None,
+        retry_interval: float = 1,
+    ):
+        self._client = client
+        self._state = _PoolState(size, ttl)
+        self._meta_data = meta_data
+        self._retry_interval = retry_interval
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        register_after_fork(self)
+
+    def warm(self, bot_ids: List[str]) -> None:
+        """
+        Start keeping conversations of the bots warm in the background.
+        """
+        with self._cond:
+            self._check_closed()
+            for bot_id in bot_ids:
+                self._state.track(bot_id)
+            self._start()
+            self._cond.notify()
+
+    def acquire(self, bot_id: str) -> Conversation:
+        """
+        Take a warm conversation of the bot, or create one if there is none. The conversation is not
+        returned to the pool.
+        """
+        with self._cond:
+            self._check_closed()
+            conversation = self._state.pop(bot_id)
+            self._start()
+            self._cond.notify()
+        if conversation is not None:
+            return conversation
+        return self._create(bot_id)
+
+    def idle_count(self, bot_id: str) -> int:
+        with self._cond:
+            self._state.prune()
+            return len(self._state.idle.get(bot_id) or [])
+
+    def close(self) -> None:
+        """
+        Stop refilling and drop the idle conversations.
+        """
+        with self._cond:
+            self._state.closed = True
+            self._state.idle.clear()
+            self._cond.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def __enter__(self) -> "ConversationPool":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def _create(self, bot_id: str) -> Conversation:
+        return self._client.create(bot_id=bot_id, meta_data=self._meta_data)
+
+    def _check_closed(self) -> None:
+        if self._state.closed:
+            raise ValueError("conversation pool is closed")
+
+    def _reset_after_fork(self) -> None:
+        # the idle conversations are handed out by the parent too, and the refill thread is not running
+        self._cond = threading.Condition()
+        self._state.idle.clear()
+        self._thread = None
+
+    def _start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._refill_loop, name="cozepy-conversation-pool", daemon=True)
+            self._thread.start()
+
+    def _refill_loop(self) -> None:
+        while True:
+            with self._cond:
+                bot_id = self._state.next_bot()
+                while not self._state.closed and bot_id is None:
+                    self._cond.wait(timeout=self._state.next_expiry())
+                    bot_id = self._state.next_bot()
+                if self._state.closed:
+                    return
+
+            try:
+                conversation = self._create(bot_id)  # type: ignore
+            except Exception as e:
+                log_warning("conversation pool failed to create conversation for bot %s: %s", bot_id, e)
+                with self._cond:
+                    self._cond.wait(timeout=self._retry_interval)
+                continue
+
+            with self._cond:
+                if not self._state.closed:
+                    self._state.push(bot_id, conversation)  # type: ignore
+
+
+class AsyncConversationPool(object):
+    """
+    Keeps `size` empty conversations per bot created ahead of time, so a new session does not wait for
+    conversations.create.
+
+    A task on the running event loop refills the pool after every acquire. Idle conversations older than ttl
+    seconds are retired and replaced. When the pool of a bot is empty, acquire creates a conversation itself.
+    """
+
+    def __init__(
+        self,
+        client: "AsyncConversationsClient",
+        *,
+        size: int = 4,
+        ttl: Optional[float] = 3600,
+        meta_data: Optional[Dict[str, str]] = None,
+        retry_interval: float = 1,
+    ):
+        self._client = client
+        self._state = _PoolState(size, ttl)
+        self._meta_data = meta_data
+        self._retry_interval = retry_interval
+        self._task: Optional[asyncio.Task] = None
+        # created lazily, so the pool can be built outside of the event loop
+        self._wakeup: Optional[asyncio.Event] = None
+
+    async def warm(self, bot_ids: List[str]) -> None:
+        """
+        Start keeping conversations of the bots warm in the background.
+        """
+        self._check_closed()
+        for bot_id in bot_ids:
+            self._state.track(bot_id)
+        self._notify()
+
+    async def acquire(self, bot_id: str) -> Conversation:
+        """
+        Take a warm conversation of the bot, or create one if there is none. The conversation is not
+        returned to the pool.
+        """
+        self._check_closed()
+        conversation = self._state.pop(bot_id)
+        self._notify()
+        if conversation is not None:
+            return conversation
+        return await self._create(bot_id)
+
+    def idle_count(self, bot_id: str) -> int:
+        self._state.prune()
+        return len(self._state.idle.get(bot_id) or [])
+
+    async def close(self) -> None:
+        """
+        Stop refilling and drop the idle conversations.
+        """
+        self._state.closed = True
+        self._state.idle.clear()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def __aenter__(self) -> "AsyncConversationPool":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
+
+    async def _create(self, bot_id: str) -> Conversation:
+        return await self._client.create(bot_id=bot_id, meta_data=self._meta_data)
+
+    def _check_closed(self) -> None:
+        if self._state.closed:
+            raise ValueError("conversation pool is closed")
+
+    def _notify(self) -> None:
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._refill_loop())
+        self._wakeup.set()
+
+    async def _refill_loop(self) -> None:
+        wakeup: asyncio.Event = self._wakeup  # type: ignore
+        while not self._state.closed:
+            bot_id = self._state.next_bot()
+            if bot_id is None:
+                wakeup.clear()
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=self._state.next_expiry())
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                conversation = await self._create(bot_id)
+            except Exception as e:
+                log_warning("conversation pool failed to create conversation for bot %s: %s", bot_id, e)
+                await asyncio.sleep(self._retry_interval)
+                continue
+
+            if not self._state.closed:
+                self._state.push(bot_id, conversation)
@@ -11,6 +11,7 @@ if TYPE_CHECKING:
     from .bots import AsyncBotsClient, BotsClient
     from .chat import AsyncChatClient, ChatClient
     from .conversations import AsyncConversationsClient, ConversationsClient
+    from .conversations.cache import ConversationCache
     from .datasets import AsyncDatasetsClient, DatasetsClient
     from .files import AsyncFilesClient, FilesClient
     from .knowledge import AsyncKnowledgeClient, KnowledgeClient  # deprecated
@@ -27,10 +28,12 @@ class Coze(object):
         auth: Auth,
         base_url: str = COZE_COM_BASE_URL,
         http_client: Optional[SyncHTTPClient] = None,
+        conversation_cache: Optional["ConversationCache"] = None,
     ):
         self._auth = auth
         self._base_url = remove_url_trailing_slash(base_url)
         self._requester = Requester(auth=auth, sync_client=http_client)
+        self._conversation_cache = conversation_cache
 
         # service client
         self._bots: Optional[BotsClient] = None
@@ -66,7 +69,7 @@ class Coze(object):
         if not self._conversations:
             from .conversations import ConversationsClient
 
-            self._conversations = ConversationsClient(self._base_url, self._requester)
+            self._conversations = ConversationsClient(self._base_url, self._requester, self._conversation_cache)
         return self._conversations
 
     @property
@@ -74,7 +77,7 @@ class Coze(object):
         if not self._chat:
             from cozepy.chat import ChatClient
 
-            self._chat = ChatClient(self._base_url, self._requester)
+            self._chat = ChatClient(self._base_url, self._requester, self._conversation_cache)
         return self._chat
 
     @property
@@ -146,6 +149,7 @@ class AsyncCoze(object):
         auth: Auth,
         base_url: str = COZE_COM_BASE_URL,
         http_client: Optional[AsyncHTTPClient] = None,
+        conversation_cache: Optional["ConversationCache"] = None,
     ):
         self._auth = auth
         self._base_url = remove_url_trailing_slash(base_url)
@@ -158,6 +162,7 @@ class AsyncCoze(object):
             )
 
         self._requester = Requester(auth=auth, async_client=http_client)
+        self._conversation_cache = conversation_cache
 
         # service client
         self._bots: Optional[AsyncBotsClient] = None
@@ -186,7 +191,7 @@ class AsyncCoze(object):
         if not self._chat:
             from cozepy.chat import AsyncChatClient
 
-            self._chat = AsyncChatClient(self._base_url, self._requester)
+            self._chat = AsyncChatClient(self._base_url, self._requester, self._conversation_cache)
         return self._chat
 
     @property
@@ -194,7 +199,7 @@ class AsyncCoze(object):
         if not self._conversations:
             from .conversations import AsyncConversationsClient
 
-            self._conversations = AsyncConversationsClient(self._base_url, self._requester)
+            self._conversations = AsyncConversationsClient(self._base_url, self._requester, self._conversation_cache)
         return self._conversations
 
     @property
@@ -0,0 +1,146 @@
+import time
+from contextvars import ContextVar
+from typing import AsyncIterator, Iterator, Optional
+
+import httpx
+
+from cozepy.exception import CozeDeadlineExceededError
+
+_current: ContextVar[Optional["Deadline"]] = ContextVar("cozepy_deadline", default=None)
+
+
+class Deadline(object):
+    """
+    An end-to-end time budget for every SDK call made inside the block.
+
+    Each HTTP request made in the block gets its timeouts shrunk to the remaining budget, and raises
+    CozeDeadlineExceededError once the budget is spent, also while its body or event stream is read. Composite
+    operations like create_and_poll stop polling (and cancel the chat) when the deadline is hit. Nested deadlines
+    never extend an outer one. The budget starts when the block is entered, not when the deadline is created.
+    The deadline follows the context: it flows into asyncio tasks, and into the worker threads of the SDK.
+
+        with Deadline(10):
+            coze.chat.create_and_poll(bot_id=bot_id, user_id=user_id)
+    """
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self._expires_at = time.monotonic() + timeout
+        self._token = None
+
+    @staticmethod
+    def current() -> Optional["Deadline"]:
+        """
+        The deadline of the current context, None if there is none.
+        """
+        return _current.get()
+
+    @property
+    def remaining(self) -> float:
+        return max(self._expires_at - time.monotonic(), 0)
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self._expires_at
+
+    def check(self) -> None:
+        if self.expired:
+            raise CozeDeadlineExceededError(self.timeout)
+
+    def shrink(self, timeout: httpx.Timeout) -> httpx.Timeout:
+        """
+        Limit every phase of the timeout to the remaining budget.
+        """
+        remaining = self.remaining
+
+        def limit(value: Optional[float]) -> float:
+            return remaining if value is None else min(value, remaining)
+
+        return httpx.Timeout(
+            connect=limit(timeout.connect),
+            read=limit(timeout.read),
+            write=limit(timeout.write),
+            pool=limit(timeout.pool),
+        )
+
+    def __enter__(self) -> "Deadline":
+        self._expires_at = time.monotonic() + self.timeout
+        outer = _current.get()
+        if outer is not None and outer._expires_at < self._expires_at:
+            self._expires_at = outer._expires_at
+        self._token = _current.set(self)  # type: ignore
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        _current.reset(self._token)  # type: ignore
+        self._token = None
+
+    async def __aenter__(self) -> "Deadline":
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.__exit__(exc_type, exc_val, exc_tb)
+
+
+class _DeadlineSyncByteStream(httpx.SyncByteStream):
+    """
+    The body of a response read within a deadline, the per-phase timeouts do not stop a body which trickles in.
+    """
+
+    def __init__(self, stream: httpx.SyncByteStream, deadline: Deadline):
+        self._stream = stream
+        self._deadline = deadline
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self._stream:
+            if self._deadline.expired:
+                self._stream.close()
+                self._deadline.check()
+            yield chunk
+
+    def close(self) -> None:
+        self._stream.close()
+
+
+class _DeadlineAsyncByteStream(httpx.AsyncByteStream):
+    """
+    The async version of _DeadlineSyncByteStream.
+    """
+
+    def __init__(self, stream: httpx.AsyncByteStream, deadline: Deadline):
+        self._stream = stream
+        self._deadline = deadline
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            if self._deadline.expired:
+                await self._stream.aclose()
+                self._deadline.check()
+            yield chunk
+
+    async def aclose(self) -> None:
+        await self._stream.aclose()
+
+
+class _NoDeadline(object):
+    """
+    Run the block without the current deadline, used for cleanup calls made after it expired.
+    """
+
+    def __enter__(self) -> None:
+        self._token = _current.set(None)
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        _current.reset(self._token)
+
+
+def remaining_timeout(timeout: Optional[float] = None) -> Optional[float]:
+    """
+    Limit timeout to the remaining budget of the current deadline, None means no limit.
+    """
+    deadline = _current.get()
+    if deadline is None:
+        return timeout
+    if timeout is None:
+        return deadline.remaining
+    return min(timeout, deadline.remaining)
@@ -11,10 +11,14 @@ class CozeError(Exception):
 
 
 class CozeAPIError(CozeError):
-    def __init__(self, code: Optional[int] = None, msg: str = "", logid: Optional[str] = None):
+    def __init__(
+        self, code: Optional[int] = None, msg: str = "", logid: Optional[str] = None, status_code: Optional[int] = None
+    ):
         self.code = code
         self.msg = msg
         self.logid = logid
+        # the http status of the response, None if the error was not raised by an http response
+        self.status_code = status_code
         if code and code > 0:
             super().__init__(f"code: {code}, msg: {msg}, logid: {logid}")
         else:
@@ -47,3 +51,15 @@ class CozeInvalidEventError(CozeError):
             super().__init__(f"invalid event, field: {field}, data: {data}, logid: {logid}")
         else:
             super().__init__(f"invalid event, data: {data}, logid: {logid}")
+
+
+class CozeDeadlineExceededError(CozeError):
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        super().__init__(f"deadline exceeded, timeout: {timeout}s")
+
+
+class CozeEventBufferOverflowError(CozeError):
+    def __init__(self, buffer_size: int):
+        self.buffer_size = buffer_size
+        super().__init__(f"event buffer overflow, buffer_size: {buffer_size}")
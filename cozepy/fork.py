@@ -0,0 +1,48 @@
+import os
+import weakref
+from typing import Any
+
+# the objects holding process state: connection pools, token caches, threads
+_objects: "weakref.WeakSet[Any]" = weakref.WeakSet()
+_pid = os.getpid()
+
+
+def register_after_fork(obj: Any) -> None:
+    """
+    Call obj._reset_after_fork() in the child process of a fork.
+    """
+    _objects.add(obj)
+
+
+def check_fork() -> None:
+    """
+    Reset the clients if the process was forked without running the os.register_at_fork hooks, like the
+    workers of uwsgi without lazy-apps.
+    """
+    if os.getpid() != _pid:
+        reset_after_fork()
+
+
+def reset_after_fork() -> None:
+    """
+    Make the clients created before a fork usable in the child process, e.g. a Coze created at import time
+    in a gunicorn, uwsgi or multiprocessing worker: the http connection pools are rebuilt on next use, the
+    cached JWT tokens are dropped, and the background threads are restarted when they are needed.
+
+    It runs on its own after os.fork, call it in the post-fork hook of a server which forks in C, like uwsgi:
+
+        from uwsgidecorators import postfork
+
+        postfork(cozepy.reset_after_fork)
+
+    The connections of the parent are dropped, not closed, they are still used by the parent. The websockets
+    clients connected in the parent are not usable in the child.
+    """
+    global _pid
+    _pid = os.getpid()
+    for obj in list(_objects):
+        obj._reset_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_after_fork)
@@ -16,7 +16,15 @@ from pydantic import BaseModel
 from typing_extensions import Literal, get_args
 
 from cozepy.config import DEFAULT_CONNECTION_LIMITS, DEFAULT_TIMEOUT
-from cozepy.exception import COZE_PKCE_AUTH_ERROR_TYPE_ENUMS, CozeAPIError, CozePKCEAuthError, CozePKCEAuthErrorType
+from cozepy.deadline import Deadline, _DeadlineAsyncByteStream, _DeadlineSyncByteStream
+from cozepy.exception import (
+    COZE_PKCE_AUTH_ERROR_TYPE_ENUMS,
+    CozeAPIError,
+    CozeError,
+    CozePKCEAuthError,
+    CozePKCEAuthErrorType,
+)
+from cozepy.fork import check_fork, register_after_fork
 from cozepy.log import log_debug, log_warning
 from cozepy.model import (
     AsyncIteratorHTTPResponse,
@@ -35,6 +43,8 @@ T = TypeVar("T", bound=BaseModel)
 
 class SyncHTTPClient(httpx.Client):
     def __init__(self, **kwargs):
+        # to build the same client in the child of a fork
+        self._init_kwargs = dict(kwargs)
         kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
         kwargs.setdefault("limits", DEFAULT_CONNECTION_LIMITS)
         kwargs.setdefault("follow_redirects", True)
@@ -43,12 +53,21 @@ class SyncHTTPClient(httpx.Client):
 
 class AsyncHTTPClient(httpx.AsyncClient):
     def __init__(self, **kwargs):
+        # to build the same client in the child of a fork
+        self._init_kwargs = dict(kwargs)
         kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
         kwargs.setdefault("limits", DEFAULT_CONNECTION_LIMITS)
         kwargs.setdefault("follow_redirects", True)
         super().__init__(**kwargs)
 
 
+def _fork_client_error(coze: str, client: str) -> str:
+    return (
+        f"the http client of {coze} was created before a fork and can not be rebuilt in the child process: pass "
+        f"a {client} created with options only, without transport or mounts, or create the {coze} after the fork"
+    )
+
+
 class Requester(object):
     """
     http request helper class.
@@ -63,6 +82,11 @@ class Requester(object):
         self._auth = auth
         self._sync_client = sync_client
         self._async_client = async_client
+        # the options of the clients dropped after a fork, they are rebuilt with them on next use, None if they
+        # can not be rebuilt
+        self._sync_kwargs: Optional[dict] = {}
+        self._async_kwargs: Optional[dict] = {}
+        register_after_fork(self)
 
     def auth_header(self, headers: dict):
         if self._auth:
@@ -279,11 +303,28 @@ class Requester(object):
         """
         Send a request to the server.
         """
+        deadline = Deadline.current()
+        try:
+            # within a deadline the body is read in chunks, to stop once it is spent
+            response = self.sync_client.send(
+                self._build_request(request, self.sync_client, deadline), stream=request.stream or deadline is not None
+            )
+            if deadline is not None:
+                response.stream = _DeadlineSyncByteStream(response.stream, deadline)  # type: ignore
+                if not request.stream:
+                    try:
+                        response.read()
+                    finally:
+                        response.close()
+        except httpx.TimeoutException:
+            if deadline is not None:
+                deadline.check()
+            raise
         return self._parse_response(
             method=request.method,
             url=request.url,
             is_async=False,
-            response=self.sync_client.send(request.as_httpx, stream=request.stream),
+            response=response,
             cast=request.cast,
             stream=request.stream,
             data_field=request.data_field,
@@ -390,40 +431,98 @@ class Requester(object):
         """
         method = method.upper()
         request = await self.amake_request(
-            method, url, params=params, headers=headers, json=body, files=files, stream=stream
+            method,
+            url,
+            params=params,
+            headers=headers,
+            json=body,
+            files=files,
+            cast=cast,
+            data_field=data_field,
+            stream=stream,
         )
 
-        response = await self.async_client.send(request.as_httpx, stream=stream)
-        return self._parse_response(
-            method, url, True, response=response, cast=cast, stream=stream, data_field=data_field
-        )
+        return await self.asend(request)
 
     async def asend(
         self,
         request: HTTPRequest,
     ) -> Union[T, List[T], ListResponse[T], AsyncIteratorHTTPResponse[str], FileHTTPResponse, None]:
+        deadline = Deadline.current()
+        try:
+            # within a deadline the body is read in chunks, to stop once it is spent
+            response = await self.async_client.send(
+                self._build_request(request, self.async_client, deadline),
+                stream=request.stream or deadline is not None,
+            )
+            if deadline is not None:
+                response.stream = _DeadlineAsyncByteStream(response.stream, deadline)  # type: ignore
+                if not request.stream:
+                    try:
+                        await response.aread()
+                    finally:
+                        await response.aclose()
+        except httpx.TimeoutException:
+            if deadline is not None:
+                deadline.check()
+            raise
         return self._parse_response(
             method=request.method,
             url=request.url,
             is_async=True,
-            response=await self.async_client.send(request.as_httpx, stream=request.stream),
+            response=response,
             cast=request.cast,
             stream=request.stream,
             data_field=request.data_field,
         )
 
+    @staticmethod
+    def _build_request(
+        request: HTTPRequest, client: Union[httpx.Client, httpx.AsyncClient], deadline: Optional[Deadline]
+    ) -> httpx.Request:
+        httpx_request = request.as_httpx
+        if deadline is not None:
+            deadline.check()
+            # shrink the timeout of this request to the remaining budget
+            httpx_request.extensions["timeout"] = deadline.shrink(client.timeout).as_dict()
+        return httpx_request
+
     @property
     def sync_client(self) -> "SyncHTTPClient":
+        check_fork()
         if self._sync_client is None:
-            self._sync_client = SyncHTTPClient()
+            if self._sync_kwargs is None:
+                raise CozeError(_fork_client_error("Coze", "SyncHTTPClient"))
+            self._sync_client = SyncHTTPClient(**self._sync_kwargs)
         return self._sync_client
 
     @property
     def async_client(self) -> "AsyncHTTPClient":
+        check_fork()
         if self._async_client is None:
-            self._async_client = AsyncHTTPClient()
+            if self._async_kwargs is None:
+                raise CozeError(_fork_client_error("AsyncCoze", "AsyncHTTPClient"))
+            self._async_client = AsyncHTTPClient(**self._async_kwargs)
         return self._async_client
 
+    def _reset_after_fork(self) -> None:
+        # the pooled connections are shared with the parent process, the clients are dropped without closing them
+        if self._sync_client is not None:
+            self._sync_kwargs = self._fork_kwargs(self._sync_client)
+            self._sync_client = None
+        if self._async_client is not None:
+            self._async_kwargs = self._fork_kwargs(self._async_client)
+            self._async_client = None
+
+    @staticmethod
+    def _fork_kwargs(client: Union[httpx.Client, httpx.AsyncClient]) -> Optional[dict]:
+        kwargs = getattr(client, "_init_kwargs", None)
+        # the options of a plain httpx client are not known, and a transport holds the connections of the parent
+        if kwargs is None or "transport" in kwargs or "mounts" in kwargs:
+            log_warning("%s can not be rebuilt after fork", type(client).__name__)
+            return None
+        return kwargs
+
     @overload
     def _parse_response(
         self,
@@ -479,12 +578,12 @@ class Requester(object):
 
         if code is not None and code > 0:
             log_warning("request %s#%s failed, logid=%s, code=%s, msg=%s", method, url, logid, code, msg)
-            raise CozeAPIError(code, msg, logid)
+            raise CozeAPIError(code, msg, logid, status_code=response.status_code)
         elif code is None and msg != "":
             log_warning("request %s#%s failed, logid=%s, msg=%s", method, url, logid, msg)
             if msg in COZE_PKCE_AUTH_ERROR_TYPE_ENUMS:
                 raise CozePKCEAuthError(CozePKCEAuthErrorType(msg), logid)
-            raise CozeAPIError(code, msg, logid)
+            raise CozeAPIError(code, msg, logid, status_code=response.status_code)
         if isinstance(cast, List):
             item_cast = cast[0]
             return [item_cast.model_validate(item) for item in data]
@@ -513,6 +612,7 @@ class Requester(object):
                 response.status_code,
                 response.text,
                 response.headers.get("x-tt-logid"),
+                status_code=response.status_code,
             ) from e
 
         if "code" in body and "msg" in body and int(body["code"]) > 0:
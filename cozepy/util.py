@@ -1,8 +1,14 @@
+import asyncio
 import base64
 import hashlib
 import random
 import sys
 import wave
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, List, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    from cozepy.websockets.audio.pcm import PCMConverter
 
 if sys.version_info < (3, 10):
 
@@ -60,15 +66,48 @@ def remove_none_values(d: dict) -> dict:
     return {k: v for k, v in d.items() if v is not None}
 
 
+def percentile(sorted_values: List[float], p: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted list, 0 for an empty list.
+
+    :param sorted_values: values in ascending order
+    :param p: percentile in the range [0, 100]
+    """
+    if not sorted_values:
+        return 0
+    index = round(len(sorted_values) * p / 100) - 1
+    index = min(max(index, 0), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def _wav_params(
+    channels: int, sample_width: int, frame_rate: int, converter: Optional["PCMConverter"]
+) -> Tuple[int, int, int]:
+    if converter is None:
+        return channels, sample_width, frame_rate
+    if converter.target.encoding != "int16":
+        raise ValueError("WAV files are written as int16 PCM, the converter target must be int16")
+    return converter.target.channels, converter.target.sample_width, converter.target.sample_rate
+
+
 def write_pcm_to_wav_file(
-    pcm_data: bytes, filepath: str, channels: int = 1, sample_width: int = 2, frame_rate: int = 24000
+    pcm_data: bytes,
+    filepath: str,
+    channels: int = 1,
+    sample_width: int = 2,
+    frame_rate: int = 24000,
+    converter: Optional["PCMConverter"] = None,
 ):
     """
     Save PCM binary data to WAV file
 
     :param pcm_data: PCM binary data (24kHz, 16-bit, 1 channel, little-endian)
     :param filepath: Output WAV filename
+    :param converter: converts pcm_data first, the WAV file has its target format instead of the parameters
     """
+    channels, sample_width, frame_rate = _wav_params(channels, sample_width, frame_rate, converter)
+    if converter is not None:
+        pcm_data = converter.convert(pcm_data)  # type: ignore
 
     with wave.open(filepath, "wb") as wav_file:
         # Set WAV file parameters
@@ -78,3 +117,124 @@ def write_pcm_to_wav_file(
 
         # Write PCM data
         wav_file.writeframes(pcm_data)
+
+
+class WavFileWriter(object):
+    """
+    Save PCM to a WAV file chunk by chunk, e.g. the audio deltas of a chat, instead of joining them in memory
+    for write_pcm_to_wav_file. The chunks are written as they come, the RIFF header gets the final length on
+    close.
+
+        with WavFileWriter("output.wav") as wav:
+            for event in coze.chat.stream(...):
+                if event.event == ChatEventType.CONVERSATION_AUDIO_DELTA:
+                    wav.write(event.message.get_audio())
+
+    :param filepath: Output WAV filename
+    :param converter: converts each chunk first, the WAV file has its target format instead of the parameters
+    """
+
+    def __init__(
+        self,
+        filepath: str,
+        channels: int = 1,
+        sample_width: int = 2,
+        frame_rate: int = 24000,
+        converter: Optional["PCMConverter"] = None,
+    ):
+        channels, sample_width, frame_rate = _wav_params(channels, sample_width, frame_rate, converter)
+        self._converter = converter
+        self._wav_file: Any = wave.open(filepath, "wb")
+        self._wav_file.setnchannels(channels)
+        self._wav_file.setsampwidth(sample_width)
+        self._wav_file.setframerate(frame_rate)
+        self._closed = False
+        self.bytes_written = 0
+
+    def write(self, pcm_data: Union[bytes, bytearray, memoryview]) -> None:
+        if self._closed:
+            raise ValueError("write to a closed WavFileWriter")
+        if self._converter is not None:
+            pcm_data = self._converter.convert(pcm_data)
+        # writeframes would seek back and patch the header after every chunk
+        self._wav_file.writeframesraw(pcm_data)
+        self.bytes_written += len(pcm_data)
+
+    def close(self) -> None:
+        """
+        Patch the header with the final length and close the file, the later calls do nothing.
+        """
+        self._closed = True
+        self._wav_file.close()
+
+    def __enter__(self) -> "WavFileWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+class AsyncWavFileWriter(object):
+    """
+    Save PCM to a WAV file chunk by chunk, see WavFileWriter. The file is opened and written on a thread of
+    its own, in the order of the writes, so the event loop is not blocked by the disk.
+
+        async with AsyncWavFileWriter("output.wav") as wav:
+            async for pcm in pipeline.stream(...):
+                await wav.write(pcm)
+
+    :param filepath: Output WAV filename
+    :param converter: converts each chunk first, the WAV file has its target format instead of the parameters
+    """
+
+    def __init__(
+        self,
+        filepath: str,
+        channels: int = 1,
+        sample_width: int = 2,
+        frame_rate: int = 24000,
+        converter: Optional["PCMConverter"] = None,
+    ):
+        # checked now, the file is opened on the first write
+        _wav_params(channels, sample_width, frame_rate, converter)
+        self._args = (filepath, channels, sample_width, frame_rate, converter)
+        self._writer: Optional[WavFileWriter] = None
+        # one worker, so the chunks are written in order
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cozepy-wav")
+        self._close_future: Optional[Future] = None
+
+    @property
+    def bytes_written(self) -> int:
+        return self._writer.bytes_written if self._writer else 0
+
+    async def write(self, pcm_data: Union[bytes, bytearray, memoryview]) -> None:
+        if self._close_future is not None:
+            raise ValueError("write to a closed AsyncWavFileWriter")
+        await asyncio.wrap_future(self._executor.submit(self._write, pcm_data))
+
+    async def close(self) -> None:
+        """
+        Patch the header with the final length and close the file, after the pending writes. The later calls
+        wait for the same close.
+        """
+        if self._close_future is None:
+            self._close_future = self._executor.submit(self._close)
+            self._executor.shutdown(wait=False)
+        await asyncio.wrap_future(self._close_future)
+
+    async def __aenter__(self) -> "AsyncWavFileWriter":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
+
+    def _open(self) -> WavFileWriter:
+        if self._writer is None:
+            self._writer = WavFileWriter(*self._args)  # type: ignore
+        return self._writer
+
+    def _write(self, pcm_data: Union[bytes, bytearray, memoryview]) -> None:
+        self._open().write(pcm_data)
+
+    def _close(self) -> None:
+        self._open().close()
@@ -1,8 +1,11 @@
+from typing import Optional
+
 from cozepy.request import Requester
 from cozepy.util import http_base_url_to_ws, remove_url_trailing_slash
 
 from .audio import AsyncWebsocketsAudioClient, WebsocketsAudioClient
 from .chat import AsyncWebsocketsChatBuildClient, WebsocketsChatBuildClient
+from .pool import AsyncWebsocketsChatPool
 
 
 class WebsocketsClient(object):
@@ -29,6 +32,17 @@ class AsyncWebsocketsClient(object):
     def __init__(self, base_url: str, requester: Requester):
         self._base_url = http_base_url_to_ws(remove_url_trailing_slash(base_url))
         self._requester = requester
+        self._pool: Optional[AsyncWebsocketsChatPool] = None
+
+    @property
+    def pool(self) -> AsyncWebsocketsChatPool:
+        """
+        The warm connection pool of the chat sessions, created on first use. Once it exists, the chat clients
+        created by this client lease their connection from it.
+        """
+        if self._pool is None:
+            self._pool = AsyncWebsocketsChatPool(self._base_url, self._requester)
+        return self._pool
 
     @property
     def audio(self) -> AsyncWebsocketsAudioClient:
@@ -42,4 +56,5 @@ class AsyncWebsocketsClient(object):
         return AsyncWebsocketsChatBuildClient(
             base_url=self._base_url,
             requester=self._requester,
+            pool=self._pool,
         )
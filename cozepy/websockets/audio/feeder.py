@@ -0,0 +1,414 @@
+import asyncio
+import mmap
+import os
+import threading
+import time
+import wave
+from enum import Enum
+from typing import IO, Any, Callable, Dict, Optional, Union
+
+from cozepy.websockets.audio.transcriptions import (
+    AsyncWebsocketsAudioTranscriptionsBuildClient,
+    AsyncWebsocketsAudioTranscriptionsClient,
+    InputAudioBufferAppendEvent,
+    TranscriptionsUpdateEvent,
+    WebsocketsAudioTranscriptionsBuildClient,
+    WebsocketsAudioTranscriptionsClient,
+)
+from cozepy.websockets.ws import InputAudio, WebsocketsErrorEvent, WebsocketsEventType
+
+# events waiting in the send queue of the client, the feeder blocks beyond it
+_SEND_QUEUE_SIZE = 32
+
+
+class AudioFeedMode(str, Enum):
+    # one frame per frame duration, like a live microphone
+    REALTIME = "realtime"
+    # as fast as the send queue of the client takes them, for the backfill of recorded audio
+    MAX_THROUGHPUT = "max_throughput"
+
+
+class _AudioReader(object):
+    """
+    The pcm frames of a wav or raw pcm source, read incrementally: a wav through the wave module, a raw pcm
+    file memory-mapped, a file object with read().
+    """
+
+    def __init__(
+        self,
+        source: Union[str, "os.PathLike", IO[bytes]],
+        frame_ms: float,
+        sample_rate: int,
+        channels: int,
+        sample_width: int,
+    ):
+        self._file = open(source, "rb") if isinstance(source, (str, os.PathLike)) else source
+        self._own_file = self._file is not source
+        self._start = self._file.tell() if self._file.seekable() else 0
+        self._wav: Optional[Any] = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._offset = 0
+        if self._is_wav():
+            self._wav = wave.open(self._file, "rb")
+            sample_rate, channels = self._wav.getframerate(), self._wav.getnchannels()
+            sample_width = self._wav.getsampwidth()
+        elif self._own_file and os.fstat(self._file.fileno()).st_size > 0:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        # whole samples of all the channels
+        self.frame_bytes = max(int(sample_rate * frame_ms / 1000), 1) * channels * sample_width
+
+    @property
+    def input_audio(self) -> InputAudio:
+        return InputAudio(
+            format="pcm",
+            codec="pcm",
+            sample_rate=self.sample_rate,
+            channel=self.channels,
+            bit_depth=self.sample_width * 8,
+        )
+
+    def duration(self, frame: bytes) -> float:
+        """
+        Seconds of audio in the frame.
+        """
+        return len(frame) / (self.sample_rate * self.channels * self.sample_width)
+
+    def read(self) -> bytes:
+        """
+        The next frame, empty at the end of the source.
+        """
+        if self._wav is not None:
+            return self._wav.readframes(self.frame_bytes // (self.channels * self.sample_width))
+        if self._mmap is not None:
+            frame = self._mmap[self._offset : self._offset + self.frame_bytes]
+            self._offset += len(frame)
+            return frame
+        return self._file.read(self.frame_bytes)
+
+    def close(self, rewind: bool = False) -> None:
+        """
+        :param rewind: seek a file object back to where the reader started
+        """
+        if self._mmap is not None:
+            self._mmap.close()
+        if self._own_file:
+            self._file.close()
+        elif rewind and self._file.seekable():
+            self._file.seek(self._start)
+
+    def _is_wav(self) -> bool:
+        if not self._file.seekable():
+            return False
+        header = self._file.read(12)
+        self._file.seek(self._start)
+        return header[:4] == b"RIFF" and header[8:12] == b"WAVE"
+
+
+class _Transcript(object):
+    """
+    The transcript of one feed, the content of the last transcriptions.message.update.
+    """
+
+    def __init__(self) -> None:
+        self.content = ""
+        self.error: Optional[Exception] = None
+
+    def on_update(self, event: Any) -> None:
+        self.content = event.data.content
+
+    def on_error(self, e: Any) -> None:
+        if self.error is None:
+            self.error = e.data if isinstance(e, WebsocketsErrorEvent) else e
+
+    def result(self) -> str:
+        if self.error is not None:
+            raise self.error
+        return self.content
+
+
+def _add_handlers(client: Any, handlers: Dict[WebsocketsEventType, Callable]) -> None:
+    # after the handlers of the caller's on_event, which still run
+    for event_type, handler in handlers.items():
+        caller = client._on_event.get(event_type)
+        if caller is None:
+            client.on(event_type, handler)
+            continue
+
+        def chained(*args: Any, caller: Callable = caller, handler: Callable = handler) -> None:
+            caller(*args)
+            handler(*args)
+
+        client.on(event_type, chained)
+
+
+def _add_async_handlers(client: Any, handlers: Dict[WebsocketsEventType, Callable]) -> None:
+    # after the handlers of the caller's on_event, which still run
+    for event_type, handler in handlers.items():
+        caller = client._on_event.get(event_type)
+        if caller is None:
+            client.on(event_type, handler)
+            continue
+
+        async def chained(*args: Any, caller: Callable = caller, handler: Callable = handler) -> None:
+            await caller(*args)
+            await handler(*args)
+
+        client.on(event_type, chained)
+
+
+class WebsocketsAudioFeeder(object):
+    """
+    Streams a recorded wav or raw pcm file into a transcriptions websocket, read frame by frame instead of
+    loaded at once.
+
+    In both modes the feeder blocks while the send queue of the client is full, so a slow connection holds back
+    the file reads instead of piling up frames in memory. transcribe() creates its client with send_queue_size=32
+    unless set, create the client given to feed() with a send_queue_size for the same, its queue is unbounded
+    by default.
+
+        feeder = WebsocketsAudioFeeder("call.wav", mode=AudioFeedMode.MAX_THROUGHPUT)
+        text = feeder.transcribe(coze.websockets.audio.transcriptions)
+
+    :param source: path of a wav or raw pcm file, or a binary file object
+    :param mode: realtime paces the frames like a live microphone, max_throughput sends them at once
+    :param frame_ms: audio per input_audio_buffer.append
+    :param sample_rate: of a raw pcm source, a wav source has it in its header
+    :param channels: of a raw pcm source
+    :param sample_width: bytes per sample of a raw pcm source
+    """
+
+    def __init__(
+        self,
+        source: Union[str, "os.PathLike", IO[bytes]],
+        *,
+        mode: AudioFeedMode = AudioFeedMode.REALTIME,
+        frame_ms: float = 100,
+        sample_rate: int = 24000,
+        channels: int = 1,
+        sample_width: int = 2,
+    ):
+        if frame_ms <= 0:
+            raise ValueError("frame_ms must be greater than 0")
+        self._source = source
+        self._mode = mode
+        self._frame_ms = frame_ms
+        self._sample_rate = sample_rate
+        self._channels = channels
+        self._sample_width = sample_width
+        self.frames = 0
+
+    @property
+    def input_audio(self) -> InputAudio:
+        """
+        The format of the source, for transcriptions.update.
+        """
+        reader = self._open()
+        reader.close(rewind=True)
+        return reader.input_audio
+
+    def _open(self) -> _AudioReader:
+        return _AudioReader(self._source, self._frame_ms, self._sample_rate, self._channels, self._sample_width)
+
+    def feed(self, client: WebsocketsAudioTranscriptionsClient) -> None:
+        """
+        Append every frame of the source to the connected client, then complete the input audio buffer. It only
+        blocks on a full send queue if the client was created with a send_queue_size.
+        """
+        self._feed(client, self._open())
+
+    def _feed(self, client: WebsocketsAudioTranscriptionsClient, reader: _AudioReader) -> None:
+        start, elapsed = time.monotonic(), 0.0
+        try:
+            while True:
+                frame = reader.read()
+                if not frame:
+                    break
+                if self._mode == AudioFeedMode.REALTIME:
+                    # paced from the start, so the sleep overshoots do not add up
+                    delay = start + elapsed - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    elapsed += reader.duration(frame)
+                client.input_audio_buffer_append(InputAudioBufferAppendEvent.Data(delta=frame))
+                self.frames += 1
+        finally:
+            reader.close()
+        client.input_audio_buffer_complete()
+
+    def transcribe(
+        self, transcriptions: WebsocketsAudioTranscriptionsBuildClient, *, timeout: Optional[float] = None, **kwargs
+    ) -> str:
+        """
+        Feed the source into a new transcriptions client, and wait for the final transcript.
+
+        :param transcriptions: coze.websockets.audio.transcriptions
+        :param timeout: max seconds to wait for the final transcript after the source is fed, None means no limit,
+        TimeoutError is raised beyond it
+        :param kwargs: passed to the transcriptions client, the handlers of an on_event run before the ones of
+        the feeder
+        """
+        transcript, done = _Transcript(), threading.Event()
+
+        def on_error(cli, e):
+            transcript.on_error(e)
+            done.set()
+
+        kwargs.setdefault("send_queue_size", _SEND_QUEUE_SIZE)
+        client = transcriptions.create(on_event=kwargs.pop("on_event", None) or {}, **kwargs)
+        _add_handlers(
+            client,
+            {
+                WebsocketsEventType.TRANSCRIPTIONS_MESSAGE_UPDATE: lambda cli, event: transcript.on_update(event),
+                WebsocketsEventType.TRANSCRIPTIONS_MESSAGE_COMPLETED: lambda cli, event: done.set(),
+                WebsocketsEventType.ERROR: on_error,
+                WebsocketsEventType.CLOSED: lambda cli: done.set(),
+            },
+        )
+        reader = self._open()
+        try:
+            with client():
+                client.transcriptions_update(TranscriptionsUpdateEvent.Data(input_audio=reader.input_audio))
+                self._feed(client, reader)
+                if not done.wait(timeout):
+                    raise TimeoutError(f"no final transcript within {timeout}s")
+        finally:
+            # closed by _feed, unless connecting or the update failed
+            reader.close(rewind=True)
+        return transcript.result()
+
+
+class AsyncWebsocketsAudioFeeder(object):
+    """
+    Streams a recorded wav or raw pcm file into a transcriptions websocket, read frame by frame instead of
+    loaded at once. The frames are small reads of a local file, which are done on the event loop.
+
+    In both modes the feeder waits while the send queue of the client is full, so a slow connection holds back
+    the file reads instead of piling up frames in memory. transcribe() creates its client with send_queue_size=32
+    unless set, create the client given to feed() with a send_queue_size for the same, its queue is unbounded
+    by default.
+
+        feeder = AsyncWebsocketsAudioFeeder("call.wav", mode=AudioFeedMode.MAX_THROUGHPUT)
+        text = await feeder.transcribe(coze.websockets.audio.transcriptions)
+
+    :param source: path of a wav or raw pcm file, or a binary file object
+    :param mode: realtime paces the frames like a live microphone, max_throughput sends them at once
+    :param frame_ms: audio per input_audio_buffer.append
+    :param sample_rate: of a raw pcm source, a wav source has it in its header
+    :param channels: of a raw pcm source
+    :param sample_width: bytes per sample of a raw pcm source
+    """
+
+    def __init__(
+        self,
+        source: Union[str, "os.PathLike", IO[bytes]],
+        *,
+        mode: AudioFeedMode = AudioFeedMode.REALTIME,
+        frame_ms: float = 100,
+        sample_rate: int = 24000,
+        channels: int = 1,
+        sample_width: int = 2,
+    ):
+        if frame_ms <= 0:
+            raise ValueError("frame_ms must be greater than 0")
+        self._source = source
+        self._mode = mode
+        self._frame_ms = frame_ms
+        self._sample_rate = sample_rate
+        self._channels = channels
+        self._sample_width = sample_width
+        self.frames = 0
+
+    @property
+    def input_audio(self) -> InputAudio:
+        """
+        The format of the source, for transcriptions.update.
+        """
+        reader = self._open()
+        reader.close(rewind=True)
+        return reader.input_audio
+
+    def _open(self) -> _AudioReader:
+        return _AudioReader(self._source, self._frame_ms, self._sample_rate, self._channels, self._sample_width)
+
+    async def feed(self, client: AsyncWebsocketsAudioTranscriptionsClient) -> None:
+        """
+        Append every frame of the source to the connected client, then complete the input audio buffer. It only
+        waits on a full send queue if the client was created with a send_queue_size.
+        """
+        await self._feed(client, self._open())
+
+    async def _feed(self, client: AsyncWebsocketsAudioTranscriptionsClient, reader: _AudioReader) -> None:
+        loop = asyncio.get_event_loop()
+        start, elapsed = loop.time(), 0.0
+        try:
+            while True:
+                frame = reader.read()
+                if not frame:
+                    break
+                if self._mode == AudioFeedMode.REALTIME:
+                    # paced from the start, so the sleep overshoots do not add up
+                    delay = start + elapsed - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    elapsed += reader.duration(frame)
+                await client.input_audio_buffer_append(InputAudioBufferAppendEvent.Data(delta=frame))
+                self.frames += 1
+        finally:
+            reader.close()
+        await client.input_audio_buffer_complete()
+
+    async def transcribe(
+        self,
+        transcriptions: AsyncWebsocketsAudioTranscriptionsBuildClient,
+        *,
+        timeout: Optional[float] = None,
+        **kwargs,
+    ) -> str:
+        """
+        Feed the source into a new transcriptions client, and wait for the final transcript.
+
+        :param transcriptions: coze.websockets.audio.transcriptions
+        :param timeout: max seconds to wait for the final transcript after the source is fed, None means no limit,
+        asyncio.TimeoutError is raised beyond it
+        :param kwargs: passed to the transcriptions client, the handlers of an on_event run before the ones of
+        the feeder
+        """
+        transcript, done = _Transcript(), asyncio.Event()
+
+        async def on_update(cli, event):
+            transcript.on_update(event)
+
+        async def on_completed(cli, event):
+            done.set()
+
+        async def on_error(cli, e):
+            transcript.on_error(e)
+            done.set()
+
+        async def on_closed(cli):
+            done.set()
+
+        kwargs.setdefault("send_queue_size", _SEND_QUEUE_SIZE)
+        client = transcriptions.create(on_event=kwargs.pop("on_event", None) or {}, **kwargs)
+        _add_async_handlers(
+            client,
+            {
+                WebsocketsEventType.TRANSCRIPTIONS_MESSAGE_UPDATE: on_update,
+                WebsocketsEventType.TRANSCRIPTIONS_MESSAGE_COMPLETED: on_completed,
+                WebsocketsEventType.ERROR: on_error,
+                WebsocketsEventType.CLOSED: on_closed,
+            },
+        )
+        reader = self._open()
+        try:
+            async with client():
+                await client.transcriptions_update(TranscriptionsUpdateEvent.Data(input_audio=reader.input_audio))
+                await self._feed(client, reader)
+                await asyncio.wait_for(done.wait(), timeout)
+        finally:
+            # closed by _feed, unless connecting or the update failed
+            reader.close(rewind=True)
+        return transcript.result()
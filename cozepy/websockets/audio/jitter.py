@@ -0,0 +1,144 @@
+import threading
+from typing import Union
+
+
+class AudioJitterBuffer(object):
+    """
+    Smooths the bursts of received audio deltas (conversation.audio.delta, speech.audio.update) for an audio
+    device, which pulls a fixed amount of pcm per callback. Pass its write as `audio_sink=jitter.write` to a
+    websockets client, and call read_into from the device callback:
+
+        jitter = AudioJitterBuffer(target_latency_ms=100)
+        client = coze.websockets.chat.create(bot_id=bot_id, on_event=handler, audio_sink=jitter.write)
+
+        def callback(in_data, frame_count, time_info, status):
+            jitter.read_into(out)  # out = bytearray(frame_count * 2), allocated once
+            return bytes(out), pyaudio.paContinue
+
+    The pcm is kept in a ring buffer allocated once. Playout starts when target_latency_ms of audio is
+    buffered, or at end(). On an underrun the missing audio is played as silence, and playout waits for
+    target_latency_ms again. On an overrun (more than capacity_ms buffered) the oldest audio is dropped.
+
+    :param target_latency_ms: audio buffered before the playout starts
+    :param capacity_ms: max audio buffered
+    :param sample_rate: of the pcm
+    :param channels: of the pcm
+    :param sample_width: bytes per sample of the pcm
+    """
+
+    def __init__(
+        self,
+        *,
+        target_latency_ms: float = 100,
+        capacity_ms: float = 5000,
+        sample_rate: int = 24000,
+        channels: int = 1,
+        sample_width: int = 2,
+    ):
+        if target_latency_ms < 0 or capacity_ms <= target_latency_ms:
+            raise ValueError("capacity_ms must be greater than target_latency_ms")
+        self._frame_bytes = channels * sample_width
+        self._bytes_per_ms = sample_rate * self._frame_bytes / 1000
+        self._target = self._align(target_latency_ms * self._bytes_per_ms)
+        self._capacity = max(self._align(capacity_ms * self._bytes_per_ms), self._frame_bytes)
+        self._ring = bytearray(self._capacity)
+        self._view = memoryview(self._ring)
+        # the padding of an underrun, grown to the largest read
+        self._silence = memoryview(b"")
+        self._start = 0
+        self._size = 0
+        self._playing = False
+        self._ended = False
+        self._lock = threading.Lock()
+
+        self.underruns = 0
+        self.overrun_bytes = 0
+
+    @property
+    def buffered_ms(self) -> float:
+        return self._size / self._bytes_per_ms
+
+    @property
+    def playing(self) -> bool:
+        return self._playing
+
+    def write(self, pcm: Union[bytes, bytearray, memoryview]) -> None:
+        """
+        Add received pcm at the end of the buffer.
+        """
+        data = memoryview(pcm).cast("B")
+        with self._lock:
+            if self._ended:
+                # a new answer after the end of the previous one
+                self._ended = False
+            if len(data) > self._capacity:
+                self.overrun_bytes += len(data) - self._capacity
+                data = data[len(data) - self._capacity :]
+            overflow = self._size + len(data) - self._capacity
+            if overflow > 0:
+                # the oldest audio is dropped, in whole samples
+                overflow = min(self._align(overflow + self._frame_bytes - 1), self._size)
+                self._start = (self._start + overflow) % self._capacity
+                self._size -= overflow
+                self.overrun_bytes += overflow
+            end = (self._start + self._size) % self._capacity
+            first = min(len(data), self._capacity - end)
+            self._view[end : end + first] = data[:first]
+            self._view[: len(data) - first] = data[first:]
+            self._size += len(data)
+            if not self._playing and self._size >= self._target:
+                self._playing = True
+
+    def read_into(self, out: Union[bytearray, memoryview]) -> int:
+        """
+        Fill out with the next pcm, padded with silence when there is not enough of it, returns the bytes of
+        pcm (not silence) written.
+        """
+        view = memoryview(out).cast("B")
+        with self._lock:
+            n = 0
+            if self._playing:
+                n = min(len(view), self._size)
+                first = min(n, self._capacity - self._start)
+                view[:first] = self._view[self._start : self._start + first]
+                view[first:n] = self._view[: n - first]
+                self._start = (self._start + n) % self._capacity
+                self._size -= n
+                if n < len(view) and not self._ended:
+                    self.underruns += 1
+                    self._playing = False
+                elif self._size == 0 and self._ended:
+                    self._playing = False
+            if n < len(view):
+                if len(self._silence) < len(view) - n:
+                    self._silence = memoryview(bytes(len(view)))
+                view[n:] = self._silence[: len(view) - n]
+        return n
+
+    def read(self, size: int) -> bytes:
+        """
+        The next size bytes of pcm, padded with silence, see read_into.
+        """
+        out = bytearray(size)
+        self.read_into(out)
+        return bytes(out)
+
+    def end(self) -> None:
+        """
+        The stream ended, the rest of the buffer is played without waiting for target_latency_ms.
+        """
+        with self._lock:
+            self._ended = True
+            if self._size:
+                self._playing = True
+
+    def clear(self) -> None:
+        """
+        Drop the buffered audio, e.g. when the answer is interrupted.
+        """
+        with self._lock:
+            self._start = self._size = 0
+            self._playing = self._ended = False
+
+    def _align(self, n: float) -> int:
+        return int(n) // self._frame_bytes * self._frame_bytes
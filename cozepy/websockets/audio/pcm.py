@@ -0,0 +1,167 @@
+from typing import Any, Optional, Union
+
+from cozepy.websockets.ws import InputAudio, OutputAudio
+
+_ENCODINGS = {"int16": "<i2", "float32": "<f4"}
+
+
+def _import_numpy() -> Any:
+    try:
+        import numpy  # type: ignore
+    except ImportError:
+        raise ImportError("PCMConverter requires numpy, install it with: pip install numpy") from None
+    return numpy
+
+
+class PCMFormat(object):
+    """
+    The layout of interleaved little-endian pcm.
+
+    :param sample_rate: samples per second of each channel
+    :param channels: interleaved channels
+    :param encoding: int16 or float32 (in [-1, 1])
+    """
+
+    def __init__(self, sample_rate: int = 24000, channels: int = 1, encoding: str = "int16"):
+        if sample_rate <= 0 or channels <= 0:
+            raise ValueError("sample_rate and channels must be greater than 0")
+        if encoding not in _ENCODINGS:
+            raise ValueError(f"unsupported pcm encoding: {encoding}, supported: {', '.join(_ENCODINGS)}")
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.encoding = encoding
+
+    @property
+    def sample_width(self) -> int:
+        return 2 if self.encoding == "int16" else 4
+
+    @staticmethod
+    def from_input_audio(input_audio: InputAudio) -> "PCMFormat":
+        return PCMFormat(
+            sample_rate=input_audio.sample_rate or 24000,
+            channels=input_audio.channel or 1,
+            encoding="float32" if input_audio.bit_depth == 32 else "int16",
+        )
+
+    @staticmethod
+    def from_output_audio(output_audio: OutputAudio) -> "PCMFormat":
+        # the output pcm is 16 bit mono
+        pcm_config = output_audio.pcm_config
+        return PCMFormat(sample_rate=(pcm_config.sample_rate if pcm_config else None) or 24000)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, PCMFormat) and (self.sample_rate, self.channels, self.encoding) == (
+            other.sample_rate,
+            other.channels,
+            other.encoding,
+        )
+
+    def __repr__(self) -> str:
+        return f"PCMFormat(sample_rate={self.sample_rate}, channels={self.channels}, encoding={self.encoding})"
+
+
+class PCMConverter(object):
+    """
+    Converts a stream of pcm frames between two formats with numpy: int16 / float32, channel down-mix (the
+    mean of the channels) or up-mix of mono, gain, and resampling by linear interpolation. Before downsampling
+    the samples are averaged over the decimation step, a coarse low-pass which removes most, not all, of the
+    aliasing. The resampler keeps the tail of each frame, so the frames of one stream join without clicks: use
+    one converter per stream.
+
+    A frame which only needs the gain is scaled in place when its buffer is writable (a bytearray); every other
+    conversion builds a new frame.
+
+        converter = PCMConverter(PCMFormat(sample_rate=48000, channels=2), PCMFormat(sample_rate=24000))
+        client = coze.websockets.chat.create(bot_id=bot_id, on_event=handler, uplink_converter=converter)
+
+    :param source: format of the frames passed to convert
+    :param target: format of the frames it returns, defaults to the 24kHz 16 bit mono of the websockets
+    :param gain: linear gain, the int16 output is clipped
+    """
+
+    def __init__(self, source: PCMFormat, target: Optional[PCMFormat] = None, gain: float = 1.0):
+        target = target or PCMFormat()
+        if source.channels != target.channels and 1 not in (source.channels, target.channels):
+            raise ValueError(f"can not convert {source.channels} channels to {target.channels}")
+        self.source = source
+        self.target = target
+        self.gain = gain
+        self._np = _import_numpy()
+        # of the resampler: the last sample of the previous frame, and the position of the next output sample
+        self._last: Any = None
+        self._position = 0.0
+        # of the low-pass: the samples averaged, and the last width - 1 samples of the previous frame
+        self._width = max(1, round(source.sample_rate / target.sample_rate))
+        self._history: Any = None
+
+    def convert(self, pcm: Union[bytes, bytearray, memoryview]) -> Union[bytes, bytearray, memoryview]:
+        """
+        The frame in the target format. A trailing partial sample is dropped.
+        """
+        np, source, target = self._np, self.source, self.target
+        frame_bytes = source.sample_width * source.channels
+        size = len(pcm) - len(pcm) % frame_bytes
+        if source == target:
+            if self.gain == 1.0:
+                return pcm if size == len(pcm) else pcm[:size]
+            if size == len(pcm) and not memoryview(pcm).readonly:
+                self._apply_gain(np.frombuffer(pcm, dtype=_ENCODINGS[source.encoding]))
+                return pcm
+
+        samples = np.frombuffer(pcm, dtype=_ENCODINGS[source.encoding], count=size // source.sample_width)
+        x = samples.astype(np.float32)
+        if source.encoding == "int16":
+            x /= 32768.0
+        x = x.reshape(-1, source.channels)
+        if source.channels != target.channels:
+            x = x.mean(axis=1, keepdims=True) if target.channels == 1 else np.repeat(x, target.channels, axis=1)
+        if source.sample_rate != target.sample_rate:
+            x = self._resample(x)
+        if self.gain != 1.0:
+            x *= self.gain
+        if target.encoding == "int16":
+            return np.clip(x * 32768.0, -32768, 32767).astype("<i2").tobytes()
+        return x.astype("<f4").tobytes()
+
+    def reset(self) -> None:
+        """
+        Start a new stream.
+        """
+        self._last = None
+        self._position = 0.0
+        self._history = None
+
+    def _apply_gain(self, samples: Any) -> None:
+        np = self._np
+        if samples.dtype.kind == "f":
+            np.multiply(samples, self.gain, out=samples)
+            return
+        scaled = samples * np.float32(self.gain)
+        np.clip(scaled, -32768, 32767, out=scaled)
+        samples[:] = scaled
+
+    def _resample(self, x: Any) -> Any:
+        np = self._np
+        if len(x) == 0:
+            return x
+        if self._width > 1:
+            x = self._low_pass(x)
+        buf = x if self._last is None else np.concatenate([self._last, x])
+        step = self.source.sample_rate / self.target.sample_rate
+        positions = np.arange(self._position, len(buf) - 1, step)
+        # positions are relative to buf, whose last frame is the first one of the next buf
+        self._position = (positions[-1] + step if len(positions) else self._position) - (len(buf) - 1)
+        self._last = buf[-1:]
+        index = positions.astype(np.int64)
+        frac = (positions - index).astype(np.float32)[:, None]
+        return buf[index] * (1 - frac) + buf[index + 1] * frac
+
+    def _low_pass(self, x: Any) -> Any:
+        np, width = self._np, self._width
+        # the first frame is padded with its first sample, so the stream does not fade in
+        history = np.repeat(x[:1], width - 1, axis=0) if self._history is None else self._history
+        buf = np.concatenate([history, x])
+        self._history = buf[len(buf) - width + 1 :]
+        # the moving average of width samples ending at each sample of x
+        total = np.concatenate([np.zeros((1, buf.shape[1])), np.cumsum(buf, axis=0, dtype=np.float64)])
+        return ((total[width:] - total[:-width]) / width).astype(np.float32)
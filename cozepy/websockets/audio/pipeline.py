@@ -0,0 +1,310 @@
+import asyncio
+import queue
+import re
+import threading
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Iterator, List, Optional, Union
+
+from cozepy.chat import ChatEvent, ChatEventType, MessageType
+from cozepy.websockets.audio.speech import (
+    AsyncWebsocketsAudioSpeechBuildClient,
+    AsyncWebsocketsAudioSpeechClient,
+    InputTextBufferAppendEvent,
+    SpeechUpdateEvent,
+    WebsocketsAudioSpeechBuildClient,
+    WebsocketsAudioSpeechClient,
+)
+from cozepy.websockets.ws import WebsocketsErrorEvent, WebsocketsEventType
+
+# the end of a sentence, with the closing quotes and brackets after it. a "." only ends a sentence before a
+# whitespace, so "3.14" or "cozepy.websockets" split across two deltas are kept together.
+_SENTENCE_END = re.compile(r"(?:[。！？；…!?;\n]+|\.+(?=[\"'”’)）\]]*\s))[\"'”’)）\]]*")
+
+# where a long text without a sentence end is split
+_CLAUSE_ENDS = "，、,：: "
+
+# the speech of the pipeline is done
+_DONE = object()
+
+
+class SpeechTextSplitter(object):
+    """
+    Splits streamed text into sentences, which are sent to the speech websocket as soon as they are complete.
+
+        splitter = SpeechTextSplitter()
+        splitter.feed("Hello world. How")  # ["Hello world."]
+        splitter.feed(" are you?")  # [" How are you?"]
+        splitter.flush()  # ""
+
+    :param min_chars: a shorter sentence is joined with the next one
+    :param max_chars: a longer text without a sentence end is split at its last comma or space
+    """
+
+    def __init__(self, min_chars: int = 4, max_chars: int = 120):
+        if min_chars <= 0 or max_chars < min_chars:
+            raise ValueError("min_chars must be greater than 0 and not greater than max_chars")
+        self._min_chars = min_chars
+        self._max_chars = max_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """
+        Add a delta of the text, returns the sentences it completed.
+        """
+        self._buffer += text
+        chunks = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self._buffer):
+            if match.end() - start >= self._min_chars:
+                chunks.append(self._buffer[start : match.end()])
+                start = match.end()
+        rest = self._buffer[start:]
+        while len(rest) > self._max_chars:
+            cut = max(rest.rfind(c, 0, self._max_chars) for c in _CLAUSE_ENDS) + 1
+            if cut <= 0:
+                cut = self._max_chars
+            chunks.append(rest[:cut])
+            rest = rest[cut:]
+        self._buffer = rest
+        # the whitespace is kept, the speech service joins the sentences of one input text buffer
+        return [chunk for chunk in chunks if chunk.strip()]
+
+    def flush(self) -> str:
+        """
+        The rest of the text, at its end.
+        """
+        rest, self._buffer = self._buffer, ""
+        return rest if rest.strip() else ""
+
+
+def _text_delta(item: Union[str, ChatEvent]) -> str:
+    # the answer deltas of a chat.stream, the other events carry no text to speak
+    if isinstance(item, str):
+        return item
+    if (
+        item.event == ChatEventType.CONVERSATION_MESSAGE_DELTA
+        and item.message
+        and item.message.type == MessageType.ANSWER
+    ):
+        return item.message.content
+    return ""
+
+
+def _error(e: Any) -> Exception:
+    return e.data if isinstance(e, WebsocketsErrorEvent) else e
+
+
+class WebsocketsSpeechPipeline(object):
+    """
+    Speaks a streamed text, e.g. the answer of coze.chat.stream, over one speech websocket. Each sentence is
+    sent as soon as it is complete, from a background thread, so the first audio is received while the text is
+    still generated, instead of after it.
+
+        pipeline = WebsocketsSpeechPipeline(coze.websockets.audio.speech)
+        for pcm in pipeline.stream(coze.chat.stream(bot_id=bot_id, user_id=user_id, additional_messages=[...])):
+            player.write(pcm)
+
+    :param speech: coze.websockets.audio.speech
+    :param speech_update: the speech.update sent after connect, e.g. the output_audio
+    :param min_chars: a shorter sentence is joined with the next one
+    :param max_chars: a longer text without a sentence end is split at its last comma or space
+    :param kwargs: passed to the speech client, e.g. reconnect=...
+    """
+
+    def __init__(
+        self,
+        speech: WebsocketsAudioSpeechBuildClient,
+        *,
+        speech_update: Optional[SpeechUpdateEvent.Data] = None,
+        min_chars: int = 4,
+        max_chars: int = 120,
+        **kwargs,
+    ):
+        self._speech = speech
+        self._speech_update = speech_update
+        self._min_chars = min_chars
+        self._max_chars = max_chars
+        self._kwargs = kwargs
+        # validate the sizes now, each stream has its own splitter
+        SpeechTextSplitter(min_chars, max_chars)
+
+    def stream(self, texts: Iterable[Union[str, ChatEvent]]) -> Iterator[bytes]:
+        """
+        Yields the audio chunks of the text, in order.
+
+        :param texts: the text deltas, or the events of a chat.stream
+        """
+        audio: queue.Queue = queue.Queue()
+        stop = threading.Event()
+        client = self._speech.create(
+            on_event={
+                WebsocketsEventType.SPEECH_AUDIO_COMPLETED: lambda cli, event: audio.put(_DONE),
+                WebsocketsEventType.ERROR: lambda cli, e: audio.put(_error(e)),
+                WebsocketsEventType.CLOSED: lambda cli: audio.put(_DONE),
+            },
+            audio_sink=audio.put,
+            **self._kwargs,
+        )
+        client.connect()
+        try:
+            if self._speech_update is not None:
+                client.speech_update(SpeechUpdateEvent.model_validate({"data": self._speech_update}))
+            threading.Thread(
+                target=self._feed, args=(client, texts, audio, stop), name="cozepy-speech-pipeline", daemon=True
+            ).start()
+            while True:
+                item = audio.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            client.close()
+
+    def _feed(
+        self,
+        client: WebsocketsAudioSpeechClient,
+        texts: Iterable[Union[str, ChatEvent]],
+        audio: queue.Queue,
+        stop: threading.Event,
+    ) -> None:
+        splitter = SpeechTextSplitter(self._min_chars, self._max_chars)
+        sent = False
+        try:
+            for item in texts:
+                if stop.is_set():
+                    return
+                for sentence in splitter.feed(_text_delta(item)):
+                    client.input_text_buffer_append(InputTextBufferAppendEvent.Data(delta=sentence))
+                    sent = True
+            rest = splitter.flush()
+            if rest:
+                client.input_text_buffer_append(InputTextBufferAppendEvent.Data(delta=rest))
+                sent = True
+        except Exception as e:
+            audio.put(e)
+            return
+        if sent:
+            client.input_text_buffer_complete()
+        else:
+            # nothing to speak
+            audio.put(_DONE)
+
+
+class AsyncWebsocketsSpeechPipeline(object):
+    """
+    Speaks a streamed text, e.g. the answer of coze.chat.stream, over one speech websocket. Each sentence is
+    sent as soon as it is complete, from a task running along the stream, so the first audio is received while
+    the text is still generated, instead of after it.
+
+        pipeline = AsyncWebsocketsSpeechPipeline(coze.websockets.audio.speech)
+        async for pcm in pipeline.stream(await coze.chat.stream(bot_id=bot_id, user_id=user_id, ...)):
+            player.write(pcm)
+
+    :param speech: coze.websockets.audio.speech
+    :param speech_update: the speech.update sent after connect, e.g. the output_audio
+    :param min_chars: a shorter sentence is joined with the next one
+    :param max_chars: a longer text without a sentence end is split at its last comma or space
+    :param kwargs: passed to the speech client, e.g. reconnect=...
+    """
+
+    def __init__(
+        self,
+        speech: AsyncWebsocketsAudioSpeechBuildClient,
+        *,
+        speech_update: Optional[SpeechUpdateEvent.Data] = None,
+        min_chars: int = 4,
+        max_chars: int = 120,
+        **kwargs,
+    ):
+        self._speech = speech
+        self._speech_update = speech_update
+        self._min_chars = min_chars
+        self._max_chars = max_chars
+        self._kwargs = kwargs
+        # validate the sizes now, each stream has its own splitter
+        SpeechTextSplitter(min_chars, max_chars)
+
+    async def stream(
+        self, texts: Union[AsyncIterable[Union[str, ChatEvent]], Iterable[Union[str, ChatEvent]]]
+    ) -> AsyncIterator[bytes]:
+        """
+        Yields the audio chunks of the text, in order.
+
+        :param texts: the text deltas, or the events of a chat.stream
+        """
+        audio: asyncio.Queue = asyncio.Queue()
+
+        async def on_completed(cli, event):
+            audio.put_nowait(_DONE)
+
+        async def on_error(cli, e):
+            audio.put_nowait(_error(e))
+
+        async def on_closed(cli):
+            audio.put_nowait(_DONE)
+
+        client = self._speech.create(
+            on_event={
+                WebsocketsEventType.SPEECH_AUDIO_COMPLETED: on_completed,
+                WebsocketsEventType.ERROR: on_error,
+                WebsocketsEventType.CLOSED: on_closed,
+            },
+            audio_sink=audio.put_nowait,
+            **self._kwargs,
+        )
+        await client.connect()
+        feeder = None
+        try:
+            if self._speech_update is not None:
+                await client.speech_update(self._speech_update)
+            feeder = asyncio.ensure_future(self._feed(client, texts, audio))
+            while True:
+                item = await audio.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            if feeder is not None:
+                feeder.cancel()
+            await client.close()
+
+    async def _feed(
+        self,
+        client: AsyncWebsocketsAudioSpeechClient,
+        texts: Union[AsyncIterable[Union[str, ChatEvent]], Iterable[Union[str, ChatEvent]]],
+        audio: asyncio.Queue,
+    ) -> None:
+        splitter = SpeechTextSplitter(self._min_chars, self._max_chars)
+        sent = False
+        try:
+            async for item in _aiter(texts):
+                for sentence in splitter.feed(_text_delta(item)):
+                    await client.input_text_buffer_append(InputTextBufferAppendEvent.Data(delta=sentence))
+                    sent = True
+            rest = splitter.flush()
+            if rest:
+                await client.input_text_buffer_append(InputTextBufferAppendEvent.Data(delta=rest))
+                sent = True
+        except Exception as e:
+            audio.put_nowait(e)
+            return
+        if sent:
+            await client.input_text_buffer_complete()
+        else:
+            # nothing to speak
+            audio.put_nowait(_DONE)
+
+
+async def _aiter(
+    texts: Union[AsyncIterable[Union[str, ChatEvent]], Iterable[Union[str, ChatEvent]]],
+) -> AsyncIterator[Union[str, ChatEvent]]:
+    if hasattr(texts, "__aiter__"):
+        async for item in texts:  # type: ignore
+            yield item
+    else:
+        for item in texts:  # type: ignore
+            yield item
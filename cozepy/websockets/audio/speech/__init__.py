@@ -1,11 +1,14 @@
 import base64
-from typing import Callable, Dict, Optional, Union
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Union
 
-from pydantic import BaseModel, field_serializer
+from pydantic import BaseModel, field_serializer, field_validator
 
-from cozepy.log import log_warning
 from cozepy.request import Requester
 from cozepy.util import remove_url_trailing_slash
+from cozepy.websockets.dispatch import AsyncWebsocketsEventDispatcher, WebsocketsEventDispatcher
+from cozepy.websockets.loop import WebsocketsEventLoopPool
+from cozepy.websockets.metrics import WebsocketsLatencyHistogram
+from cozepy.websockets.reconnect import WebsocketsReconnectPolicy
 from cozepy.websockets.ws import (
     AsyncWebsocketsBaseClient,
     AsyncWebsocketsBaseEventHandler,
@@ -14,8 +17,13 @@ from cozepy.websockets.ws import (
     WebsocketsBaseEventHandler,
     WebsocketsEvent,
     WebsocketsEventType,
+    WebsocketsSendOverflow,
+    _event_registry,
 )
 
+if TYPE_CHECKING:
+    from cozepy.websockets.audio.pcm import PCMConverter
+
 
 # req
 class InputTextBufferAppendEvent(WebsocketsEvent):
@@ -55,6 +63,12 @@ class SpeechAudioUpdateEvent(WebsocketsEvent):
     class Data(BaseModel):
         delta: bytes
 
+        @field_validator("delta", mode="before")
+        @classmethod
+        def validate_delta(cls, delta):
+            # the received delta is base64
+            return base64.b64decode(delta) if isinstance(delta, str) else delta
+
         @field_serializer("delta")
         def serialize_delta(self, delta: bytes, _info):
             return base64.b64encode(delta)
@@ -82,7 +96,17 @@ class WebsocketsAudioSpeechEventHandler(WebsocketsBaseEventHandler):
         pass
 
 
+_SPEECH_EVENTS = _event_registry(
+    SpeechCreatedEvent,
+    InputTextBufferCompletedEvent,
+    SpeechAudioUpdateEvent,
+    SpeechAudioCompletedEvent,
+)
+
+
 class WebsocketsAudioSpeechClient(WebsocketsBaseClient):
+    _event_types = _SPEECH_EVENTS
+
     def __init__(
         self,
         base_url: str,
@@ -117,46 +141,6 @@ class WebsocketsAudioSpeechClient(WebsocketsBaseClient):
     def speech_update(self, event: SpeechUpdateEvent) -> None:
         self._input_queue.put(event)
 
-    def _load_event(self, message: Dict) -> Optional[WebsocketsEvent]:
-        event_id = message.get("id") or ""
-        detail = WebsocketsEvent.Detail.model_validate(message.get("detail") or {})
-        event_type = message.get("event_type") or ""
-        data = message.get("data") or {}
-        if event_type == WebsocketsEventType.SPEECH_CREATED:
-            return SpeechCreatedEvent.model_validate({"id": event_id, "detail": detail})
-        elif event_type == WebsocketsEventType.INPUT_TEXT_BUFFER_COMPLETED:
-            return InputTextBufferCompletedEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                }
-            )
-        elif event_type == WebsocketsEventType.SPEECH_AUDIO_UPDATE.value:
-            delta_base64 = data.get("delta")
-            if delta_base64 is None:
-                raise ValueError("Missing 'delta' in event data")
-            return SpeechAudioUpdateEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                    "data": SpeechAudioUpdateEvent.Data.model_validate(
-                        {
-                            "delta": base64.b64decode(delta_base64),
-                        }
-                    ),
-                }
-            )
-        elif event_type == WebsocketsEventType.SPEECH_AUDIO_COMPLETED.value:
-            return SpeechAudioCompletedEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                }
-            )
-        else:
-            log_warning("[%s] unknown event, type=%s, logid=%s", self._path, event_type, detail.logid)
-        return None
-
 
 class WebsocketsAudioSpeechBuildClient(object):
     def __init__(self, base_url: str, requester: Requester):
@@ -164,13 +148,53 @@ class WebsocketsAudioSpeechBuildClient(object):
         self._requester = requester
 
     def create(
-        self, *, on_event: Union[WebsocketsAudioSpeechEventHandler, Dict[WebsocketsEventType, Callable]], **kwargs
+        self,
+        *,
+        on_event: Union[WebsocketsAudioSpeechEventHandler, Dict[WebsocketsEventType, Callable]],
+        send_queue_size: int = 0,
+        send_overflow: WebsocketsSendOverflow = WebsocketsSendOverflow.BLOCK,
+        reconnect: Optional[WebsocketsReconnectPolicy] = None,
+        latency_histogram: Optional[WebsocketsLatencyHistogram] = None,
+        loop_pool: Optional[WebsocketsEventLoopPool] = None,
+        dispatcher: Optional[WebsocketsEventDispatcher] = None,
+        dispatch_workers: int = 0,
+        dispatch_queue_size: int = 256,
+        audio_sink: Optional[Callable[[bytes], None]] = None,
+        downlink_converter: Optional["PCMConverter"] = None,
+        headers: Optional[Dict[str, str]] = None,
     ) -> WebsocketsAudioSpeechClient:
+        """
+        A speech client, connect() it, or use it in `with client():`.
+
+        :param on_event: the event handler, or the handlers by event type
+        :param send_queue_size: max events in the send queue, 0 keeps it unbounded
+        :param send_overflow: what a send does when the send queue is full
+        :param reconnect: reconnect a dropped connection, see WebsocketsReconnectPolicy
+        :param latency_histogram: also record the latencies of the session into it, see WebsocketsLatencyHistogram
+        :param loop_pool: run on a shared event loop instead of a send and a receive thread, requires Python >= 3.8
+        :param dispatcher: call the handlers on the workers of this dispatcher, which can be shared by clients
+        :param dispatch_workers: without a dispatcher, call the handlers on a dispatcher of this many workers of the
+        client's own, 0 calls them on the receiving thread
+        :param dispatch_queue_size: max queued events per worker of the client's own dispatcher
+        :param audio_sink: receive the audio deltas as decoded pcm, instead of the audio delta events
+        :param downlink_converter: convert the received pcm before audio_sink, see PCMConverter
+        :param headers: extra headers of the connect request
+        """
         return WebsocketsAudioSpeechClient(
             base_url=self._base_url,
             requester=self._requester,
             on_event=on_event,  # type: ignore
-            **kwargs,
+            send_queue_size=send_queue_size,
+            send_overflow=send_overflow,
+            reconnect=reconnect,
+            latency_histogram=latency_histogram,
+            loop_pool=loop_pool,
+            dispatcher=dispatcher,
+            dispatch_workers=dispatch_workers,
+            dispatch_queue_size=dispatch_queue_size,
+            audio_sink=audio_sink,
+            downlink_converter=downlink_converter,
+            headers=headers,
         )
 
 
@@ -193,6 +217,8 @@ class AsyncWebsocketsAudioSpeechEventHandler(AsyncWebsocketsBaseEventHandler):
 
 
 class AsyncWebsocketsAudioSpeechClient(AsyncWebsocketsBaseClient):
+    _event_types = _SPEECH_EVENTS
+
     def __init__(
         self,
         base_url: str,
@@ -227,41 +253,6 @@ class AsyncWebsocketsAudioSpeechClient(AsyncWebsocketsBaseClient):
     async def speech_update(self, data: SpeechUpdateEvent.Data) -> None:
         await self._input_queue.put(SpeechUpdateEvent.model_validate({"data": data}))
 
-    def _load_event(self, message: Dict) -> Optional[WebsocketsEvent]:
-        event_id = message.get("id") or ""
-        detail = WebsocketsEvent.Detail.model_validate(message.get("detail") or {})
-        event_type = message.get("event_type") or ""
-        data = message.get("data") or {}
-        if event_type == WebsocketsEventType.SPEECH_CREATED:
-            return SpeechCreatedEvent.model_validate({"id": event_id, "detail": detail})
-        elif event_type == WebsocketsEventType.INPUT_TEXT_BUFFER_COMPLETED:
-            return InputTextBufferCompletedEvent.model_validate({"id": event_id, "detail": detail})
-        elif event_type == WebsocketsEventType.SPEECH_AUDIO_UPDATE.value:
-            delta_base64 = data.get("delta")
-            if delta_base64 is None:
-                raise ValueError("Missing 'delta' in event data")
-            return SpeechAudioUpdateEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                    "data": SpeechAudioUpdateEvent.Data.model_validate(
-                        {
-                            "delta": base64.b64decode(delta_base64),
-                        }
-                    ),
-                }
-            )
-        elif event_type == WebsocketsEventType.SPEECH_AUDIO_COMPLETED.value:
-            return SpeechAudioCompletedEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                }
-            )
-        else:
-            log_warning("[%s] unknown event, type=%s, logid=%s", self._path, event_type, detail.logid)
-        return None
-
 
 class AsyncWebsocketsAudioSpeechBuildClient(object):
     def __init__(self, base_url: str, requester: Requester):
@@ -272,11 +263,45 @@ class AsyncWebsocketsAudioSpeechBuildClient(object):
         self,
         *,
         on_event: Union[AsyncWebsocketsAudioSpeechEventHandler, Dict[WebsocketsEventType, Callable]],
-        **kwargs,
+        send_queue_size: int = 0,
+        send_overflow: WebsocketsSendOverflow = WebsocketsSendOverflow.BLOCK,
+        reconnect: Optional[WebsocketsReconnectPolicy] = None,
+        latency_histogram: Optional[WebsocketsLatencyHistogram] = None,
+        dispatcher: Optional[AsyncWebsocketsEventDispatcher] = None,
+        dispatch_workers: int = 0,
+        dispatch_queue_size: int = 256,
+        audio_sink: Optional[Callable[[bytes], None]] = None,
+        downlink_converter: Optional["PCMConverter"] = None,
+        headers: Optional[Dict[str, str]] = None,
     ) -> AsyncWebsocketsAudioSpeechClient:
+        """
+        A speech client, connect() it, or use it in `async with client():`.
+
+        :param on_event: the event handler, or the handlers by event type
+        :param send_queue_size: max events in the send queue, 0 keeps it unbounded
+        :param send_overflow: what a send does when the send queue is full
+        :param reconnect: reconnect a dropped connection, see WebsocketsReconnectPolicy
+        :param latency_histogram: also record the latencies of the session into it, see WebsocketsLatencyHistogram
+        :param dispatcher: call the handlers on the workers of this dispatcher, which can be shared by clients
+        :param dispatch_workers: without a dispatcher, call the handlers on a dispatcher of this many workers of the
+        client's own, 0 calls them on the receiving task
+        :param dispatch_queue_size: max queued events per worker of the client's own dispatcher
+        :param audio_sink: receive the audio deltas as decoded pcm, instead of the audio delta events
+        :param downlink_converter: convert the received pcm before audio_sink, see PCMConverter
+        :param headers: extra headers of the connect request
+        """
         return AsyncWebsocketsAudioSpeechClient(
             base_url=self._base_url,
             requester=self._requester,
             on_event=on_event,  # type: ignore
-            **kwargs,
+            send_queue_size=send_queue_size,
+            send_overflow=send_overflow,
+            reconnect=reconnect,
+            latency_histogram=latency_histogram,
+            dispatcher=dispatcher,
+            dispatch_workers=dispatch_workers,
+            dispatch_queue_size=dispatch_queue_size,
+            audio_sink=audio_sink,
+            downlink_converter=downlink_converter,
+            headers=headers,
         )
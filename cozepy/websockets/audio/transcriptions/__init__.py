@@ -1,11 +1,14 @@
 import base64
-from typing import Callable, Dict, Optional, Union
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Union
 
 from pydantic import BaseModel, field_serializer
 
-from cozepy.log import log_warning
 from cozepy.request import Requester
 from cozepy.util import remove_url_trailing_slash
+from cozepy.websockets.dispatch import AsyncWebsocketsEventDispatcher, WebsocketsEventDispatcher
+from cozepy.websockets.loop import WebsocketsEventLoopPool
+from cozepy.websockets.metrics import WebsocketsLatencyHistogram
+from cozepy.websockets.reconnect import WebsocketsReconnectPolicy
 from cozepy.websockets.ws import (
     AsyncWebsocketsBaseClient,
     AsyncWebsocketsBaseEventHandler,
@@ -14,8 +17,14 @@ from cozepy.websockets.ws import (
     WebsocketsBaseEventHandler,
     WebsocketsEvent,
     WebsocketsEventType,
+    WebsocketsSendOverflow,
+    _event_registry,
 )
 
+if TYPE_CHECKING:
+    from cozepy.websockets.audio.pcm import PCMConverter
+    from cozepy.websockets.audio.vad import AudioVoiceActivityDetector
+
 
 # req
 class InputAudioBufferAppendEvent(WebsocketsEvent):
@@ -67,7 +76,7 @@ class InputAudioBufferCompletedEvent(WebsocketsEvent):
 # resp
 class TranscriptionsMessageUpdateEvent(WebsocketsEvent):
     class Data(BaseModel):
-        content: str
+        content: str = ""
 
     event_type: WebsocketsEventType = WebsocketsEventType.TRANSCRIPTIONS_MESSAGE_UPDATE
     data: Data
@@ -98,7 +107,17 @@ class WebsocketsAudioTranscriptionsEventHandler(WebsocketsBaseEventHandler):
         pass
 
 
+_TRANSCRIPTIONS_EVENTS = _event_registry(
+    TranscriptionsCreatedEvent,
+    InputAudioBufferCompletedEvent,
+    TranscriptionsMessageUpdateEvent,
+    TranscriptionsMessageCompletedEvent,
+)
+
+
 class WebsocketsAudioTranscriptionsClient(WebsocketsBaseClient):
+    _event_types = _TRANSCRIPTIONS_EVENTS
+
     def __init__(
         self,
         base_url: str,
@@ -128,53 +147,22 @@ class WebsocketsAudioTranscriptionsClient(WebsocketsBaseClient):
         self._input_queue.put(TranscriptionsUpdateEvent.model_validate({"data": data}))
 
     def input_audio_buffer_append(self, data: InputAudioBufferAppendEvent.Data) -> None:
+        if self._vad is not None or self._uplink_converter is not None:
+            if self._audio_append(data.delta):
+                self.input_audio_buffer_complete()
+            return
+        if self._uplink is not None:
+            self._uplink_append(data.delta)
+            return
         self._input_queue.put(InputAudioBufferAppendEvent.model_validate({"data": data}))
 
     def input_audio_buffer_complete(self) -> None:
+        if self._vad is not None:
+            self._vad._end_utterance()
+        if self._uplink is not None:
+            self._uplink.flush()
         self._input_queue.put(InputAudioBufferCompleteEvent.model_validate({}))
 
-    def _load_event(self, message: Dict) -> Optional[WebsocketsEvent]:
-        event_id = message.get("id") or ""
-        event_type = message.get("event_type") or ""
-        detail = WebsocketsEvent.Detail.model_validate(message.get("detail") or {})
-        data = message.get("data") or {}
-        if event_type == WebsocketsEventType.TRANSCRIPTIONS_CREATED.value:
-            return TranscriptionsCreatedEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                }
-            )
-        elif event_type == WebsocketsEventType.INPUT_AUDIO_BUFFER_COMPLETED.value:
-            return InputAudioBufferCompletedEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                }
-            )
-        elif event_type == WebsocketsEventType.TRANSCRIPTIONS_MESSAGE_UPDATE.value:
-            return TranscriptionsMessageUpdateEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                    "data": TranscriptionsMessageUpdateEvent.Data.model_validate(
-                        {
-                            "content": data.get("content") or "",
-                        }
-                    ),
-                }
-            )
-        elif event_type == WebsocketsEventType.TRANSCRIPTIONS_MESSAGE_COMPLETED.value:
-            return TranscriptionsMessageCompletedEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                }
-            )
-        else:
-            log_warning("[v1/audio/transcriptions] unknown event=%s, logid=%s", event_type, detail.logid)
-        return None
-
 
 class WebsocketsAudioTranscriptionsBuildClient(object):
     def __init__(self, base_url: str, requester: Requester):
@@ -185,13 +173,60 @@ class WebsocketsAudioTranscriptionsBuildClient(object):
         self,
         *,
         on_event: Union[WebsocketsAudioTranscriptionsEventHandler, Dict[WebsocketsEventType, Callable]],
-        **kwargs,
+        send_queue_size: int = 0,
+        send_overflow: WebsocketsSendOverflow = WebsocketsSendOverflow.BLOCK,
+        reconnect: Optional[WebsocketsReconnectPolicy] = None,
+        latency_histogram: Optional[WebsocketsLatencyHistogram] = None,
+        loop_pool: Optional[WebsocketsEventLoopPool] = None,
+        dispatcher: Optional[WebsocketsEventDispatcher] = None,
+        dispatch_workers: int = 0,
+        dispatch_queue_size: int = 256,
+        uplink_frame_ms: Optional[float] = None,
+        uplink_frame_bytes: Optional[int] = None,
+        uplink_max_delay_ms: Optional[float] = None,
+        vad: Optional["AudioVoiceActivityDetector"] = None,
+        uplink_converter: Optional["PCMConverter"] = None,
+        headers: Optional[Dict[str, str]] = None,
     ) -> WebsocketsAudioTranscriptionsClient:
+        """
+        A transcriptions client, connect() it, or use it in `with client():`.
+
+        :param on_event: the event handler, or the handlers by event type
+        :param send_queue_size: max events in the send queue, 0 keeps it unbounded
+        :param send_overflow: what a send does when the send queue is full
+        :param reconnect: reconnect a dropped connection, see WebsocketsReconnectPolicy
+        :param latency_histogram: also record the latencies of the session into it, see WebsocketsLatencyHistogram
+        :param loop_pool: run on a shared event loop instead of a send and a receive thread, requires Python >= 3.8
+        :param dispatcher: call the handlers on the workers of this dispatcher, which can be shared by clients
+        :param dispatch_workers: without a dispatcher, call the handlers on a dispatcher of this many workers of the
+        client's own, 0 calls them on the receiving thread
+        :param dispatch_queue_size: max queued events per worker of the client's own dispatcher
+        :param uplink_frame_ms: coalesce the appended audio into frames of this many ms before sending it, see
+        AudioUplinkBuffer
+        :param uplink_frame_bytes: coalesce the appended audio into frames of this many bytes instead
+        :param uplink_max_delay_ms: max ms a coalesced frame waits to fill up, defaults to uplink_frame_ms
+        :param vad: drop the silent appended audio, see AudioVoiceActivityDetector
+        :param uplink_converter: convert the appended pcm before sending it, see PCMConverter
+        :param headers: extra headers of the connect request
+        """
         return WebsocketsAudioTranscriptionsClient(
             base_url=self._base_url,
             requester=self._requester,
             on_event=on_event,  # type: ignore
-            **kwargs,
+            send_queue_size=send_queue_size,
+            send_overflow=send_overflow,
+            reconnect=reconnect,
+            latency_histogram=latency_histogram,
+            loop_pool=loop_pool,
+            dispatcher=dispatcher,
+            dispatch_workers=dispatch_workers,
+            dispatch_queue_size=dispatch_queue_size,
+            uplink_frame_ms=uplink_frame_ms,
+            uplink_frame_bytes=uplink_frame_bytes,
+            uplink_max_delay_ms=uplink_max_delay_ms,
+            vad=vad,
+            uplink_converter=uplink_converter,
+            headers=headers,
         )
 
 
@@ -218,6 +253,8 @@ class AsyncWebsocketsAudioTranscriptionsEventHandler(AsyncWebsocketsBaseEventHan
 
 
 class AsyncWebsocketsAudioTranscriptionsClient(AsyncWebsocketsBaseClient):
+    _event_types = _TRANSCRIPTIONS_EVENTS
+
     def __init__(
         self,
         base_url: str,
@@ -243,57 +280,26 @@ class AsyncWebsocketsAudioTranscriptionsClient(AsyncWebsocketsBaseClient):
             **kwargs,
         )
 
-    async def transcriptions_update(self, data: InputAudio) -> None:
+    async def transcriptions_update(self, data: TranscriptionsUpdateEvent.Data) -> None:
         await self._input_queue.put(TranscriptionsUpdateEvent.model_validate({"data": data}))
 
     async def input_audio_buffer_append(self, data: InputAudioBufferAppendEvent.Data) -> None:
+        if self._vad is not None or self._uplink_converter is not None:
+            if await self._audio_append(data.delta):
+                await self.input_audio_buffer_complete()
+            return
+        if self._uplink is not None:
+            await self._uplink_append(data.delta)
+            return
         await self._input_queue.put(InputAudioBufferAppendEvent.model_validate({"data": data}))
 
     async def input_audio_buffer_complete(self) -> None:
+        if self._vad is not None:
+            self._vad._end_utterance()
+        if self._uplink is not None:
+            await self._uplink.flush()
         await self._input_queue.put(InputAudioBufferCompleteEvent.model_validate({}))
 
-    def _load_event(self, message: Dict) -> Optional[WebsocketsEvent]:
-        event_id = message.get("id") or ""
-        event_type = message.get("event_type") or ""
-        detail = WebsocketsEvent.Detail.model_validate(message.get("detail") or {})
-        data = message.get("data") or {}
-        if event_type == WebsocketsEventType.TRANSCRIPTIONS_CREATED.value:
-            return TranscriptionsCreatedEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                }
-            )
-        elif event_type == WebsocketsEventType.INPUT_AUDIO_BUFFER_COMPLETED.value:
-            return InputAudioBufferCompletedEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                }
-            )
-        elif event_type == WebsocketsEventType.TRANSCRIPTIONS_MESSAGE_UPDATE.value:
-            return TranscriptionsMessageUpdateEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                    "data": TranscriptionsMessageUpdateEvent.Data.model_validate(
-                        {
-                            "content": data.get("content") or "",
-                        }
-                    ),
-                }
-            )
-        elif event_type == WebsocketsEventType.TRANSCRIPTIONS_MESSAGE_COMPLETED.value:
-            return TranscriptionsMessageCompletedEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                }
-            )
-        else:
-            log_warning("[v1/audio/transcriptions] unknown event=%s, logid=%s", event_type, detail.logid)
-        return None
-
 
 class AsyncWebsocketsAudioTranscriptionsBuildClient(object):
     def __init__(self, base_url: str, requester: Requester):
@@ -304,11 +310,55 @@ class AsyncWebsocketsAudioTranscriptionsBuildClient(object):
         self,
         *,
         on_event: Union[AsyncWebsocketsAudioTranscriptionsEventHandler, Dict[WebsocketsEventType, Callable]],
-        **kwargs,
+        send_queue_size: int = 0,
+        send_overflow: WebsocketsSendOverflow = WebsocketsSendOverflow.BLOCK,
+        reconnect: Optional[WebsocketsReconnectPolicy] = None,
+        latency_histogram: Optional[WebsocketsLatencyHistogram] = None,
+        dispatcher: Optional[AsyncWebsocketsEventDispatcher] = None,
+        dispatch_workers: int = 0,
+        dispatch_queue_size: int = 256,
+        uplink_frame_ms: Optional[float] = None,
+        uplink_frame_bytes: Optional[int] = None,
+        uplink_max_delay_ms: Optional[float] = None,
+        vad: Optional["AudioVoiceActivityDetector"] = None,
+        uplink_converter: Optional["PCMConverter"] = None,
+        headers: Optional[Dict[str, str]] = None,
     ) -> AsyncWebsocketsAudioTranscriptionsClient:
+        """
+        A transcriptions client, connect() it, or use it in `async with client():`.
+
+        :param on_event: the event handler, or the handlers by event type
+        :param send_queue_size: max events in the send queue, 0 keeps it unbounded
+        :param send_overflow: what a send does when the send queue is full
+        :param reconnect: reconnect a dropped connection, see WebsocketsReconnectPolicy
+        :param latency_histogram: also record the latencies of the session into it, see WebsocketsLatencyHistogram
+        :param dispatcher: call the handlers on the workers of this dispatcher, which can be shared by clients
+        :param dispatch_workers: without a dispatcher, call the handlers on a dispatcher of this many workers of the
+        client's own, 0 calls them on the receiving task
+        :param dispatch_queue_size: max queued events per worker of the client's own dispatcher
+        :param uplink_frame_ms: coalesce the appended audio into frames of this many ms before sending it, see
+        AudioUplinkBuffer
+        :param uplink_frame_bytes: coalesce the appended audio into frames of this many bytes instead
+        :param uplink_max_delay_ms: max ms a coalesced frame waits to fill up, defaults to uplink_frame_ms
+        :param vad: drop the silent appended audio, see AudioVoiceActivityDetector
+        :param uplink_converter: convert the appended pcm before sending it, see PCMConverter
+        :param headers: extra headers of the connect request
+        """
         return AsyncWebsocketsAudioTranscriptionsClient(
             base_url=self._base_url,
             requester=self._requester,
             on_event=on_event,  # type: ignore
-            **kwargs,
+            send_queue_size=send_queue_size,
+            send_overflow=send_overflow,
+            reconnect=reconnect,
+            latency_histogram=latency_histogram,
+            dispatcher=dispatcher,
+            dispatch_workers=dispatch_workers,
+            dispatch_queue_size=dispatch_queue_size,
+            uplink_frame_ms=uplink_frame_ms,
+            uplink_frame_bytes=uplink_frame_bytes,
+            uplink_max_delay_ms=uplink_max_delay_ms,
+            vad=vad,
+            uplink_converter=uplink_converter,
+            headers=headers,
         )
@@ -0,0 +1,297 @@
+import asyncio
+import collections
+import heapq
+import itertools
+import threading
+import time
+from typing import Awaitable, Callable, Deque, List, Optional
+
+from cozepy.fork import register_after_fork
+
+
+class _FlushTimer(object):
+    """
+    One daemon thread running the timed flushes of every sync uplink buffer, instead of a timer thread each.
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._heap: List[list] = []
+        self._seq = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+        register_after_fork(self)
+
+    def schedule(self, delay: float, callback: Callable[[], None]) -> list:
+        """
+        Run callback after delay seconds, returns a handle for cancel.
+        """
+        entry = [time.monotonic() + delay, next(self._seq), callback]
+        with self._cond:
+            heapq.heappush(self._heap, entry)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="cozepy-audio-uplink", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return entry
+
+    @staticmethod
+    def cancel(entry: list) -> None:
+        entry[2] = None
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    self._cond.wait(timeout=self._heap[0][0] - time.monotonic() if self._heap else None)
+                callback = heapq.heappop(self._heap)[2]
+            if callback is not None:
+                callback()
+
+    def _reset_after_fork(self) -> None:
+        # the flushes belong to the buffers of the parent, the thread is started again by the next schedule
+        self._cond = threading.Condition()
+        self._heap = []
+        self._thread = None
+
+
+_flush_timer = _FlushTimer()
+
+
+class _UplinkState(object):
+    """
+    The coalescing bookkeeping shared by the sync and async uplink buffers.
+    """
+
+    def __init__(self, frame_ms: Optional[float], frame_bytes: Optional[int], max_delay_ms: Optional[float]):
+        if frame_ms is None and frame_bytes is None:
+            frame_ms = 100
+        if (frame_ms is not None and frame_ms <= 0) or (frame_bytes is not None and frame_bytes <= 0):
+            raise ValueError("frame size must be greater than 0")
+        self.frame_ms = frame_ms
+        self.frame_bytes = frame_bytes
+        self.max_delay = (max_delay_ms if max_delay_ms is not None else frame_ms or 100) / 1000
+        # pcm, 24000 Hz, 1 channel, 16 bit
+        self.bytes_per_ms = 48.0
+        self.buffer = bytearray()
+        self.frames_in = 0
+        self.frames_out = 0
+
+    @property
+    def target_bytes(self) -> int:
+        if self.frame_bytes is not None:
+            return self.frame_bytes
+        return max(int(self.frame_ms * self.bytes_per_ms), 1)  # type: ignore
+
+    def take(self) -> bytes:
+        pcm = bytes(self.buffer)
+        self.buffer.clear()
+        if pcm:
+            self.frames_out += 1
+        return pcm
+
+
+class AudioUplinkBuffer(object):
+    """
+    Coalesces the small PCM frames of a microphone callback (10-20 ms each) into fewer, larger
+    input_audio_buffer.append events, so the base64 and JSON envelope cost is paid per frame_ms of audio
+    instead of per callback.
+
+    Buffered audio is sent once it reaches frame_ms (or frame_bytes), and at most max_delay_ms after the
+    first byte of it was appended, so coalescing never adds more than max_delay_ms of latency. The websockets
+    clients build one when created with uplink_frame_ms=... or uplink_frame_bytes=..., and flush it on
+    input_audio_buffer_complete.
+
+    The timed flushes of every buffer run on one shared thread, which never blocks: it hands the chunk to
+    send_nowait, and a chunk it can not hand off (the send queue is full) is sent by the next append or flush,
+    on the caller thread.
+
+    :param send: sends one coalesced chunk of PCM, it may block
+    :param frame_ms: milliseconds of audio per sent chunk, defaults to 100
+    :param frame_bytes: bytes per sent chunk, takes precedence over frame_ms
+    :param max_delay_ms: max time audio waits in the buffer, defaults to frame_ms
+    :param send_nowait: sends one chunk without blocking, returns False if it can not, defaults to send,
+    which must not block then
+    """
+
+    def __init__(
+        self,
+        send: Callable[[bytes], None],
+        *,
+        frame_ms: Optional[float] = None,
+        frame_bytes: Optional[int] = None,
+        max_delay_ms: Optional[float] = None,
+        send_nowait: Optional[Callable[[bytes], bool]] = None,
+    ):
+        self._send = send
+        self._send_nowait = send_nowait
+        self._state = _UplinkState(frame_ms, frame_bytes, max_delay_ms)
+        self._lock = threading.Lock()
+        self._timer: Optional[list] = None
+        # the chunks taken and not sent yet, oldest first
+        self._pending: Deque[bytes] = collections.deque()
+        # a caller thread is sending the pending chunks, the timer must not send ahead of them
+        self._sending = False
+
+    @property
+    def bytes_per_ms(self) -> float:
+        return self._state.bytes_per_ms
+
+    @bytes_per_ms.setter
+    def bytes_per_ms(self, value: float) -> None:
+        self._state.bytes_per_ms = value
+
+    @property
+    def frames_in(self) -> int:
+        return self._state.frames_in
+
+    @property
+    def frames_out(self) -> int:
+        return self._state.frames_out
+
+    def append(self, pcm: bytes) -> None:
+        with self._lock:
+            state = self._state
+            state.frames_in += 1
+            state.buffer += pcm
+            if len(state.buffer) >= state.target_bytes:
+                self._pending.append(self._take())
+            elif self._timer is None:
+                self._timer = _flush_timer.schedule(state.max_delay, self._on_timer)
+        self._drain()
+
+    def flush(self) -> None:
+        """
+        Send the buffered audio now.
+        """
+        with self._lock:
+            chunk = self._take()
+            if chunk:
+                self._pending.append(chunk)
+        self._drain()
+
+    def close(self) -> None:
+        """
+        Drop the buffered audio and stop the timer.
+        """
+        with self._lock:
+            self._take()
+            self._pending.clear()
+
+    def _drain(self) -> None:
+        # the chunks are sent in order, one caller at a time, and outside of the lock as send may block
+        with self._lock:
+            if self._sending:
+                return
+            self._sending = True
+        try:
+            while True:
+                with self._lock:
+                    if not self._pending:
+                        # cleared under the same lock, so a timed flush is not left pending
+                        self._sending = False
+                        return
+                    chunk = self._pending.popleft()
+                self._send(chunk)
+        except BaseException:
+            with self._lock:
+                self._sending = False
+            raise
+
+    def _on_timer(self) -> None:
+        with self._lock:
+            self._timer = None
+            chunk = self._state.take()
+            if not chunk:
+                return
+            self._pending.append(chunk)
+            if self._sending:
+                return
+            send_nowait = self._send_nowait
+            while self._pending:
+                if send_nowait is not None:
+                    if not send_nowait(self._pending[0]):
+                        # sent by the next append or flush
+                        return
+                else:
+                    self._send(self._pending[0])
+                self._pending.popleft()
+
+    def _take(self) -> bytes:
+        if self._timer is not None:
+            _flush_timer.cancel(self._timer)
+            self._timer = None
+        return self._state.take()
+
+
+class AsyncAudioUplinkBuffer(object):
+    """
+    Coalesces the small PCM frames of a microphone callback into fewer, larger input_audio_buffer.append
+    events, see AudioUplinkBuffer. The max_delay_ms timer runs on the event loop.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[bytes], Awaitable[None]],
+        *,
+        frame_ms: Optional[float] = None,
+        frame_bytes: Optional[int] = None,
+        max_delay_ms: Optional[float] = None,
+    ):
+        self._send = send
+        self._state = _UplinkState(frame_ms, frame_bytes, max_delay_ms)
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flush_tasks: List[asyncio.Future] = []
+
+    @property
+    def bytes_per_ms(self) -> float:
+        return self._state.bytes_per_ms
+
+    @bytes_per_ms.setter
+    def bytes_per_ms(self, value: float) -> None:
+        self._state.bytes_per_ms = value
+
+    @property
+    def frames_in(self) -> int:
+        return self._state.frames_in
+
+    @property
+    def frames_out(self) -> int:
+        return self._state.frames_out
+
+    async def append(self, pcm: bytes) -> None:
+        state = self._state
+        state.frames_in += 1
+        state.buffer += pcm
+        if len(state.buffer) < state.target_bytes:
+            if self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(state.max_delay, self._on_timer)
+            return
+        await self._send(self._take())
+
+    async def flush(self) -> None:
+        """
+        Send the buffered audio now.
+        """
+        chunk = self._take()
+        if chunk:
+            await self._send(chunk)
+
+    def close(self) -> None:
+        """
+        Drop the buffered audio and stop the timer.
+        """
+        self._take()
+        for task in self._flush_tasks:
+            task.cancel()
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        task = asyncio.ensure_future(self.flush())
+        self._flush_tasks.append(task)
+        task.add_done_callback(self._flush_tasks.remove)
+
+    def _take(self) -> bytes:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return self._state.take()
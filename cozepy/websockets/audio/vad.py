@@ -0,0 +1,198 @@
+import array
+import collections
+import math
+import sys
+from typing import Any, Deque, List, Optional, Tuple
+
+# numpy, imported on the first frame if it is installed, False if it is not
+_numpy: Any = None
+
+
+def _get_numpy() -> Any:
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy  # type: ignore
+
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy
+
+
+def _frame_stats(pcm: bytes, channels: int = 1, sample_width: int = 2) -> Tuple[float, float]:
+    """
+    The rms energy (int16 scale) and the zero-crossing rate (crossings per sample) of a little-endian 16 bit int
+    or 32 bit float pcm frame, of the mean of its channels, vectorized with numpy when it is installed.
+    """
+    frame_size = channels * sample_width
+    pcm = pcm[: len(pcm) - len(pcm) % frame_size]
+    if len(pcm) < 2 * frame_size:
+        return 0.0, 0.0
+    # float samples are in [-1, 1]
+    scale = 32767.0 if sample_width == 4 else 1.0
+    np = _get_numpy()
+    if np:
+        samples = np.frombuffer(pcm, dtype="<f4" if sample_width == 4 else "<i2").astype(np.float32) * scale
+        if channels > 1:
+            samples = samples.reshape(-1, channels).mean(axis=1)
+        rms = float(np.sqrt(np.mean(samples * samples)))
+        crossings = int(np.count_nonzero(np.signbit(samples[1:]) != np.signbit(samples[:-1])))
+        return rms, crossings / (len(samples) - 1)
+
+    values: Any = array.array("f" if sample_width == 4 else "h", pcm)
+    if sys.byteorder == "big":
+        values.byteswap()
+    if channels > 1 or scale != 1.0:
+        values = [sum(values[i : i + channels]) * scale / channels for i in range(0, len(values), channels)]
+    rms = math.sqrt(sum(v * v for v in values) / len(values))
+    crossings = sum(1 for a, b in zip(values, values[1:]) if (a < 0) != (b < 0))
+    return rms, crossings / (len(values) - 1)
+
+
+class AudioVoiceActivityDetector(object):
+    """
+    Energy and zero-crossing voice activity detection of the pcm sent with input_audio_buffer.append, pass it as
+    `vad=...` to a chat or transcriptions client, one detector per client. The client sets the format of the pcm
+    from its uplink_converter target, or else from the input_audio of its last chat.update or
+    transcriptions.update; 16 bit int and 32 bit float pcm of any channels are supported, other formats raise
+    ValueError.
+
+    Silent frames are dropped, except pre_roll_ms of them before the speech and hangover_ms after it, so the
+    word starts and ends are not clipped, and one frame every keepalive_ms if it is set. With auto_complete
+    the client sends input_audio_buffer.complete after end_of_speech_ms of silence, instead of waiting for
+    the server to detect the end of the speech. The frames are measured with numpy if it is installed, in
+    pure python otherwise.
+
+        client = coze.websockets.chat.create(bot_id=bot_id, on_event=handler, vad=AudioVoiceActivityDetector())
+
+    :param energy_threshold: rms energy (of 32767) from which a frame is speech
+    :param zcr_max: zero-crossing rate (per sample) above which a loud frame is noise, like hiss, not speech
+    :param pre_roll_ms: silence before the speech which is sent with its first frame
+    :param hangover_ms: silence after the speech which is still sent
+    :param keepalive_ms: send one silent frame per keepalive_ms of dropped silence, None to drop all of it
+    :param end_of_speech_ms: silence after the speech from which it ended
+    :param auto_complete: send input_audio_buffer.complete when the speech ended
+    :param sample_rate: of the pcm, until the client sets its format
+    :param channels: of the pcm, until the client sets its format
+    :param sample_width: bytes per sample of the pcm, 2 (int16) or 4 (float32), until the client sets its format
+    """
+
+    def __init__(
+        self,
+        *,
+        energy_threshold: float = 500,
+        zcr_max: float = 0.5,
+        pre_roll_ms: float = 200,
+        hangover_ms: float = 300,
+        keepalive_ms: Optional[float] = None,
+        end_of_speech_ms: float = 800,
+        auto_complete: bool = False,
+        sample_rate: int = 24000,
+        channels: int = 1,
+        sample_width: int = 2,
+    ):
+        if energy_threshold < 0 or pre_roll_ms < 0 or hangover_ms < 0:
+            raise ValueError("vad thresholds must not be negative")
+        if (keepalive_ms is not None and keepalive_ms <= 0) or end_of_speech_ms <= 0:
+            raise ValueError("vad durations must be greater than 0")
+        self.energy_threshold = energy_threshold
+        self.zcr_max = zcr_max
+        self.pre_roll_ms = pre_roll_ms
+        self.hangover_ms = hangover_ms
+        self.keepalive_ms = keepalive_ms
+        self.end_of_speech_ms = end_of_speech_ms
+        self.auto_complete = auto_complete
+        self._set_format(sample_rate, channels, sample_width)
+        # the input_audio the format was set from
+        self._input_audio: Any = None
+
+        self._pre_roll: Deque[bytes] = collections.deque()
+        self._pre_roll_bytes = 0
+        # in the speech or its hangover
+        self._talking = False
+        # speech since the last end of speech
+        self._utterance = False
+        self._silence_ms = 0.0
+        self._unsent_ms = 0.0
+
+        self.frames_in = 0
+        self.frames_sent = 0
+        self.bytes_in = 0
+        self.bytes_sent = 0
+
+    def is_speech(self, pcm: bytes) -> bool:
+        rms, zcr = _frame_stats(pcm, self.channels, self.sample_width)
+        return rms >= self.energy_threshold and zcr <= self.zcr_max
+
+    def process(self, pcm: bytes) -> Tuple[List[bytes], bool]:
+        """
+        The frames to send for the appended pcm, in order, and whether the speech ended with it.
+        """
+        duration = len(pcm) / self._bytes_per_ms
+        frames: List[bytes] = []
+        ended = False
+        if self.is_speech(pcm):
+            if not self._talking:
+                frames.extend(self._pre_roll)
+                self._clear_pre_roll()
+            self._talking = self._utterance = True
+            self._silence_ms = 0.0
+            frames.append(pcm)
+        else:
+            self._silence_ms += duration
+            if self._talking and self._silence_ms <= self.hangover_ms:
+                frames.append(pcm)
+            else:
+                self._talking = False
+                if self.keepalive_ms is not None and self._unsent_ms + duration >= self.keepalive_ms:
+                    # the pre-roll is older than this frame, it is not sent after it
+                    self._clear_pre_roll()
+                    frames.append(pcm)
+                else:
+                    self._add_pre_roll(pcm)
+            if self._utterance and self._silence_ms >= self.end_of_speech_ms:
+                self._utterance = False
+                ended = True
+
+        self._unsent_ms = 0.0 if frames else self._unsent_ms + duration
+        self.frames_in += 1
+        self.bytes_in += len(pcm)
+        self.frames_sent += len(frames)
+        self.bytes_sent += sum(len(frame) for frame in frames)
+        return frames, ended
+
+    def _set_format(self, sample_rate: int, channels: int, sample_width: int) -> None:
+        if sample_rate <= 0 or channels <= 0:
+            raise ValueError("vad sample_rate and channels must be greater than 0")
+        if sample_width not in (2, 4):
+            raise ValueError(f"vad supports 16 bit int and 32 bit float pcm, not {sample_width * 8} bit")
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self._bytes_per_ms = sample_rate * channels * sample_width / 1000
+
+    def _use_input_audio(self, input_audio: Any) -> None:
+        """
+        Take the format of the input_audio config sent by the client, if it changed.
+        """
+        if input_audio is None or input_audio is self._input_audio:
+            return
+        self._input_audio = input_audio
+        if (input_audio.format or "pcm") != "pcm" or (input_audio.codec or "pcm") != "pcm":
+            raise ValueError(f"vad requires pcm input audio, not {input_audio.format}/{input_audio.codec}")
+        self._set_format(input_audio.sample_rate or 24000, input_audio.channel or 1, (input_audio.bit_depth or 16) // 8)
+
+    def _end_utterance(self) -> None:
+        # input_audio_buffer.complete was sent, the next speech is a new turn
+        self._utterance = False
+
+    def _add_pre_roll(self, pcm: bytes) -> None:
+        self._pre_roll.append(pcm)
+        self._pre_roll_bytes += len(pcm)
+        while self._pre_roll and self._pre_roll_bytes > self.pre_roll_ms * self._bytes_per_ms:
+            self._pre_roll_bytes -= len(self._pre_roll.popleft())
+
+    def _clear_pre_roll(self) -> None:
+        self._pre_roll.clear()
+        self._pre_roll_bytes = 0
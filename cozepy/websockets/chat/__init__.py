@@ -1,9 +1,8 @@
-from typing import Any, Callable, Dict, List, Optional, Union
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Union
 
 from pydantic import BaseModel
 
 from cozepy import Chat, Message, ToolOutput
-from cozepy.log import log_warning
 from cozepy.request import Requester
 from cozepy.util import remove_none_values, remove_url_trailing_slash
 from cozepy.websockets.audio.transcriptions import (
@@ -11,6 +10,10 @@ from cozepy.websockets.audio.transcriptions import (
     InputAudioBufferCompletedEvent,
     InputAudioBufferCompleteEvent,
 )
+from cozepy.websockets.dispatch import AsyncWebsocketsEventDispatcher, WebsocketsEventDispatcher
+from cozepy.websockets.loop import WebsocketsEventLoopPool
+from cozepy.websockets.metrics import WebsocketsLatencyHistogram
+from cozepy.websockets.reconnect import WebsocketsReconnectPolicy
 from cozepy.websockets.ws import (
     AsyncWebsocketsBaseClient,
     AsyncWebsocketsBaseEventHandler,
@@ -20,8 +23,15 @@ from cozepy.websockets.ws import (
     WebsocketsBaseEventHandler,
     WebsocketsEvent,
     WebsocketsEventType,
+    WebsocketsSendOverflow,
+    _event_registry,
 )
 
+if TYPE_CHECKING:
+    from cozepy.websockets.audio.pcm import PCMConverter
+    from cozepy.websockets.audio.vad import AudioVoiceActivityDetector
+    from cozepy.websockets.pool import AsyncWebsocketsChatPool
+
 
 # req
 class ChatUpdateEvent(WebsocketsEvent):
@@ -173,7 +183,26 @@ class WebsocketsChatEventHandler(WebsocketsBaseEventHandler):
         pass
 
 
+_CHAT_EVENTS = _event_registry(
+    ChatCreatedEvent,
+    ChatUpdatedEvent,
+    InputAudioBufferCompletedEvent,
+    ConversationChatCreatedEvent,
+    ConversationChatInProgressEvent,
+    ConversationMessageDeltaEvent,
+    ConversationAudioTranscriptCompletedEvent,
+    ConversationChatRequiresActionEvent,
+    ConversationMessageCompletedEvent,
+    ConversationAudioDeltaEvent,
+    ConversationAudioCompletedEvent,
+    ConversationChatCompletedEvent,
+    ConversationChatCanceledEvent,
+)
+
+
 class WebsocketsChatClient(WebsocketsBaseClient):
+    _event_types = _CHAT_EVENTS
+
     def __init__(
         self,
         base_url: str,
@@ -226,118 +255,22 @@ class WebsocketsChatClient(WebsocketsBaseClient):
         self._input_queue.put(ConversationChatCancelEvent.model_validate({}))
 
     def input_audio_buffer_append(self, data: InputAudioBufferAppendEvent.Data) -> None:
+        if self._vad is not None or self._uplink_converter is not None:
+            if self._audio_append(data.delta):
+                self.input_audio_buffer_complete()
+            return
+        if self._uplink is not None:
+            self._uplink_append(data.delta)
+            return
         self._input_queue.put(InputAudioBufferAppendEvent.model_validate({"data": data}))
 
     def input_audio_buffer_complete(self) -> None:
+        if self._vad is not None:
+            self._vad._end_utterance()
+        if self._uplink is not None:
+            self._uplink.flush()
         self._input_queue.put(InputAudioBufferCompleteEvent.model_validate({}))
 
-    def _load_event(self, message: Dict) -> Optional[WebsocketsEvent]:
-        event_id = message.get("id") or ""
-        detail = WebsocketsEvent.Detail.model_validate(message.get("detail") or {})
-        event_type = message.get("event_type") or ""
-        data = message.get("data") or {}
-        if event_type == WebsocketsEventType.CHAT_CREATED.value:
-            return ChatCreatedEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                }
-            )
-        elif event_type == WebsocketsEventType.CHAT_UPDATED.value:
-            return ChatUpdatedEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                    "data": ChatUpdateEvent.Data.model_validate(data),
-                }
-            )
-        elif event_type == WebsocketsEventType.INPUT_AUDIO_BUFFER_COMPLETED.value:
-            return InputAudioBufferCompletedEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                }
-            )
-        elif event_type == WebsocketsEventType.CONVERSATION_CHAT_CREATED.value:
-            return ConversationChatCreatedEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                    "data": Chat.model_validate(data),
-                }
-            )
-        elif event_type == WebsocketsEventType.CONVERSATION_CHAT_IN_PROGRESS.value:
-            return ConversationChatInProgressEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                }
-            )
-        elif event_type == WebsocketsEventType.CONVERSATION_MESSAGE_DELTA.value:
-            return ConversationMessageDeltaEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                    "data": Message.model_validate(data),
-                }
-            )
-        elif event_type == WebsocketsEventType.CONVERSATION_AUDIO_TRANSCRIPT_COMPLETED.value:
-            return ConversationAudioTranscriptCompletedEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                    "data": ConversationAudioTranscriptCompletedEvent.Data.model_validate(data),
-                }
-            )
-        elif event_type == WebsocketsEventType.CONVERSATION_CHAT_REQUIRES_ACTION.value:
-            return ConversationChatRequiresActionEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                    "data": Chat.model_validate(data),
-                }
-            )
-        elif event_type == WebsocketsEventType.CONVERSATION_MESSAGE_COMPLETED.value:
-            return ConversationMessageCompletedEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                }
-            )
-        elif event_type == WebsocketsEventType.CONVERSATION_AUDIO_DELTA.value:
-            return ConversationAudioDeltaEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                    "data": Message.model_validate(data),
-                }
-            )
-        elif event_type == WebsocketsEventType.CONVERSATION_AUDIO_COMPLETED.value:
-            return ConversationAudioCompletedEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                }
-            )
-        elif event_type == WebsocketsEventType.CONVERSATION_CHAT_COMPLETED.value:
-            return ConversationChatCompletedEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                    "data": Chat.model_validate(data),
-                }
-            )
-        elif event_type == WebsocketsEventType.CONVERSATION_CHAT_CANCELED.value:
-            return ConversationChatCanceledEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                }
-            )
-        else:
-            log_warning("[%s] unknown event, type=%s, logid=%s", self._path, event_type, detail.logid)
-        return None
-
 
 class WebsocketsChatBuildClient(object):
     def __init__(self, base_url: str, requester: Requester):
@@ -350,15 +283,70 @@ class WebsocketsChatBuildClient(object):
         bot_id: str,
         on_event: Union[WebsocketsChatEventHandler, Dict[WebsocketsEventType, Callable]],
         workflow_id: Optional[str] = None,
-        **kwargs,
+        send_queue_size: int = 0,
+        send_overflow: WebsocketsSendOverflow = WebsocketsSendOverflow.BLOCK,
+        reconnect: Optional[WebsocketsReconnectPolicy] = None,
+        latency_histogram: Optional[WebsocketsLatencyHistogram] = None,
+        loop_pool: Optional[WebsocketsEventLoopPool] = None,
+        dispatcher: Optional[WebsocketsEventDispatcher] = None,
+        dispatch_workers: int = 0,
+        dispatch_queue_size: int = 256,
+        uplink_frame_ms: Optional[float] = None,
+        uplink_frame_bytes: Optional[int] = None,
+        uplink_max_delay_ms: Optional[float] = None,
+        audio_sink: Optional[Callable[[bytes], None]] = None,
+        vad: Optional["AudioVoiceActivityDetector"] = None,
+        uplink_converter: Optional["PCMConverter"] = None,
+        downlink_converter: Optional["PCMConverter"] = None,
+        headers: Optional[Dict[str, str]] = None,
     ) -> WebsocketsChatClient:
+        """
+        A chat client, connect() it, or use it in `with client():`.
+
+        :param bot_id: the bot to chat with
+        :param on_event: the event handler, or the handlers by event type
+        :param workflow_id: the workflow to run, if the bot is a chat flow
+        :param send_queue_size: max events in the send queue, 0 keeps it unbounded
+        :param send_overflow: what a send does when the send queue is full
+        :param reconnect: reconnect a dropped connection, see WebsocketsReconnectPolicy
+        :param latency_histogram: also record the latencies of the session into it, see WebsocketsLatencyHistogram
+        :param loop_pool: run on a shared event loop instead of a send and a receive thread, requires Python >= 3.8
+        :param dispatcher: call the handlers on the workers of this dispatcher, which can be shared by clients
+        :param dispatch_workers: without a dispatcher, call the handlers on a dispatcher of this many workers of the
+        client's own, 0 calls them on the receiving thread
+        :param dispatch_queue_size: max queued events per worker of the client's own dispatcher
+        :param uplink_frame_ms: coalesce the appended audio into frames of this many ms before sending it, see
+        AudioUplinkBuffer
+        :param uplink_frame_bytes: coalesce the appended audio into frames of this many bytes instead
+        :param uplink_max_delay_ms: max ms a coalesced frame waits to fill up, defaults to uplink_frame_ms
+        :param audio_sink: receive the audio deltas as decoded pcm, instead of the audio delta events
+        :param vad: drop the silent appended audio, see AudioVoiceActivityDetector
+        :param uplink_converter: convert the appended pcm before sending it, see PCMConverter
+        :param downlink_converter: convert the received pcm before audio_sink, see PCMConverter
+        :param headers: extra headers of the connect request
+        """
         return WebsocketsChatClient(
             base_url=self._base_url,
             requester=self._requester,
             bot_id=bot_id,
             on_event=on_event,  # type: ignore
             workflow_id=workflow_id,
-            **kwargs,
+            send_queue_size=send_queue_size,
+            send_overflow=send_overflow,
+            reconnect=reconnect,
+            latency_histogram=latency_histogram,
+            loop_pool=loop_pool,
+            dispatcher=dispatcher,
+            dispatch_workers=dispatch_workers,
+            dispatch_queue_size=dispatch_queue_size,
+            uplink_frame_ms=uplink_frame_ms,
+            uplink_frame_bytes=uplink_frame_bytes,
+            uplink_max_delay_ms=uplink_max_delay_ms,
+            audio_sink=audio_sink,
+            vad=vad,
+            uplink_converter=uplink_converter,
+            downlink_converter=downlink_converter,
+            headers=headers,
         )
 
 
@@ -422,6 +410,8 @@ class AsyncWebsocketsChatEventHandler(AsyncWebsocketsBaseEventHandler):
 
 
 class AsyncWebsocketsChatClient(AsyncWebsocketsBaseClient):
+    _event_types = _CHAT_EVENTS
+
     def __init__(
         self,
         base_url: str,
@@ -474,123 +464,28 @@ class AsyncWebsocketsChatClient(AsyncWebsocketsBaseClient):
         await self._input_queue.put(ConversationChatCancelEvent.model_validate({}))
 
     async def input_audio_buffer_append(self, data: InputAudioBufferAppendEvent.Data) -> None:
+        if self._vad is not None or self._uplink_converter is not None:
+            if await self._audio_append(data.delta):
+                await self.input_audio_buffer_complete()
+            return
+        if self._uplink is not None:
+            await self._uplink_append(data.delta)
+            return
         await self._input_queue.put(InputAudioBufferAppendEvent.model_validate({"data": data}))
 
     async def input_audio_buffer_complete(self) -> None:
+        if self._vad is not None:
+            self._vad._end_utterance()
+        if self._uplink is not None:
+            await self._uplink.flush()
         await self._input_queue.put(InputAudioBufferCompleteEvent.model_validate({}))
 
-    def _load_event(self, message: Dict) -> Optional[WebsocketsEvent]:
-        event_id = message.get("id") or ""
-        detail = WebsocketsEvent.Detail.model_validate(message.get("detail") or {})
-        event_type = message.get("event_type") or ""
-        data = message.get("data") or {}
-        if event_type == WebsocketsEventType.CHAT_CREATED.value:
-            return ChatCreatedEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                }
-            )
-        elif event_type == WebsocketsEventType.CHAT_UPDATED.value:
-            return ChatUpdatedEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                    "data": ChatUpdateEvent.Data.model_validate(data),
-                }
-            )
-        elif event_type == WebsocketsEventType.INPUT_AUDIO_BUFFER_COMPLETED.value:
-            return InputAudioBufferCompletedEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                }
-            )
-        elif event_type == WebsocketsEventType.CONVERSATION_CHAT_CREATED.value:
-            return ConversationChatCreatedEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                    "data": Chat.model_validate(data),
-                }
-            )
-        elif event_type == WebsocketsEventType.CONVERSATION_CHAT_IN_PROGRESS.value:
-            return ConversationChatInProgressEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                }
-            )
-        elif event_type == WebsocketsEventType.CONVERSATION_MESSAGE_DELTA.value:
-            return ConversationMessageDeltaEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                    "data": Message.model_validate(data),
-                }
-            )
-        elif event_type == WebsocketsEventType.CONVERSATION_AUDIO_TRANSCRIPT_COMPLETED.value:
-            return ConversationAudioTranscriptCompletedEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                    "data": ConversationAudioTranscriptCompletedEvent.Data.model_validate(data),
-                }
-            )
-        elif event_type == WebsocketsEventType.CONVERSATION_CHAT_REQUIRES_ACTION.value:
-            return ConversationChatRequiresActionEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                    "data": Chat.model_validate(data),
-                }
-            )
-        elif event_type == WebsocketsEventType.CONVERSATION_MESSAGE_COMPLETED.value:
-            return ConversationMessageCompletedEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                }
-            )
-        elif event_type == WebsocketsEventType.CONVERSATION_AUDIO_DELTA.value:
-            return ConversationAudioDeltaEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                    "data": Message.model_validate(data),
-                }
-            )
-        elif event_type == WebsocketsEventType.CONVERSATION_AUDIO_COMPLETED.value:
-            return ConversationAudioCompletedEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                }
-            )
-        elif event_type == WebsocketsEventType.CONVERSATION_CHAT_COMPLETED.value:
-            return ConversationChatCompletedEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                    "data": Chat.model_validate(data),
-                }
-            )
-        elif event_type == WebsocketsEventType.CONVERSATION_CHAT_CANCELED.value:
-            return ConversationChatCanceledEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                }
-            )
-        else:
-            log_warning("[%s] unknown event, type=%s, logid=%s", self._path, event_type, detail.logid)
-        return None
-
 
 class AsyncWebsocketsChatBuildClient(object):
-    def __init__(self, base_url: str, requester: Requester):
+    def __init__(self, base_url: str, requester: Requester, pool: Optional["AsyncWebsocketsChatPool"] = None):
         self._base_url = remove_url_trailing_slash(base_url)
         self._requester = requester
+        self._pool = pool
 
     def create(
         self,
@@ -598,13 +493,69 @@ class AsyncWebsocketsChatBuildClient(object):
         bot_id: str,
         on_event: Union[AsyncWebsocketsChatEventHandler, Dict[WebsocketsEventType, Callable]],
         workflow_id: Optional[str] = None,
-        **kwargs,
+        send_queue_size: int = 0,
+        send_overflow: WebsocketsSendOverflow = WebsocketsSendOverflow.BLOCK,
+        reconnect: Optional[WebsocketsReconnectPolicy] = None,
+        latency_histogram: Optional[WebsocketsLatencyHistogram] = None,
+        pool: Optional["AsyncWebsocketsChatPool"] = None,
+        dispatcher: Optional[AsyncWebsocketsEventDispatcher] = None,
+        dispatch_workers: int = 0,
+        dispatch_queue_size: int = 256,
+        uplink_frame_ms: Optional[float] = None,
+        uplink_frame_bytes: Optional[int] = None,
+        uplink_max_delay_ms: Optional[float] = None,
+        audio_sink: Optional[Callable[[bytes], None]] = None,
+        vad: Optional["AudioVoiceActivityDetector"] = None,
+        uplink_converter: Optional["PCMConverter"] = None,
+        downlink_converter: Optional["PCMConverter"] = None,
+        headers: Optional[Dict[str, str]] = None,
     ) -> AsyncWebsocketsChatClient:
+        """
+        A chat client, connect() it, or use it in `async with client():`.
+
+        :param bot_id: the bot to chat with
+        :param on_event: the event handler, or the handlers by event type
+        :param workflow_id: the workflow to run, if the bot is a chat flow
+        :param send_queue_size: max events in the send queue, 0 keeps it unbounded
+        :param send_overflow: what a send does when the send queue is full
+        :param reconnect: reconnect a dropped connection, see WebsocketsReconnectPolicy
+        :param latency_histogram: also record the latencies of the session into it, see WebsocketsLatencyHistogram
+        :param pool: lease a warm connection instead of connecting, see AsyncWebsocketsChatPool, defaults to the
+        pool of the builder
+        :param dispatcher: call the handlers on the workers of this dispatcher, which can be shared by clients
+        :param dispatch_workers: without a dispatcher, call the handlers on a dispatcher of this many workers of the
+        client's own, 0 calls them on the receiving task
+        :param dispatch_queue_size: max queued events per worker of the client's own dispatcher
+        :param uplink_frame_ms: coalesce the appended audio into frames of this many ms before sending it, see
+        AudioUplinkBuffer
+        :param uplink_frame_bytes: coalesce the appended audio into frames of this many bytes instead
+        :param uplink_max_delay_ms: max ms a coalesced frame waits to fill up, defaults to uplink_frame_ms
+        :param audio_sink: receive the audio deltas as decoded pcm, instead of the audio delta events
+        :param vad: drop the silent appended audio, see AudioVoiceActivityDetector
+        :param uplink_converter: convert the appended pcm before sending it, see PCMConverter
+        :param downlink_converter: convert the received pcm before audio_sink, see PCMConverter
+        :param headers: extra headers of the connect request
+        """
         return AsyncWebsocketsChatClient(
             base_url=self._base_url,
             requester=self._requester,
             bot_id=bot_id,
             on_event=on_event,  # type: ignore
             workflow_id=workflow_id,
-            **kwargs,
+            send_queue_size=send_queue_size,
+            send_overflow=send_overflow,
+            reconnect=reconnect,
+            latency_histogram=latency_histogram,
+            pool=pool if pool is not None else self._pool,
+            dispatcher=dispatcher,
+            dispatch_workers=dispatch_workers,
+            dispatch_queue_size=dispatch_queue_size,
+            uplink_frame_ms=uplink_frame_ms,
+            uplink_frame_bytes=uplink_frame_bytes,
+            uplink_max_delay_ms=uplink_max_delay_ms,
+            audio_sink=audio_sink,
+            vad=vad,
+            uplink_converter=uplink_converter,
+            downlink_converter=downlink_converter,
+            headers=headers,
         )
@@ -0,0 +1,212 @@
+import asyncio
+import collections
+import queue
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional, Tuple
+
+from cozepy.log import log_error
+from cozepy.util import percentile
+
+_Job = Optional[Tuple[Callable[..., Any], Tuple[Any, ...]]]
+
+
+class WebsocketsDispatchMetrics(object):
+    """
+    Counters of an event dispatcher, the handler latencies are kept for the most recent `window` events.
+    """
+
+    def __init__(self, window: int = 1024):
+        self.dispatched = 0
+        self.handled = 0
+        self.max_queue_depth = 0
+        self._latencies: Deque[float] = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Events waiting for, or running in a handler.
+        """
+        return self.dispatched - self.handled
+
+    def handler_latency(self, p: float) -> float:
+        """
+        Percentile of the handler latency in seconds.
+
+        :param p: percentile in the range [0, 100]
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+        return percentile(latencies, p)
+
+    def _on_dispatch(self) -> None:
+        with self._lock:
+            self.dispatched += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.dispatched - self.handled)
+
+    def _on_handled(self, latency: float) -> None:
+        with self._lock:
+            self.handled += 1
+            self._latencies.append(latency)
+
+
+class _WorkerSlots(object):
+    """
+    Maps a dispatch key to a worker. Each name (event type) gets its own slot, so the event types of a client
+    spread over different workers instead of colliding by hash, and the clients are spread by their hash.
+    """
+
+    def __init__(self, workers: int):
+        self._workers = workers
+        self._slots: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+
+    def index(self, key: Hashable) -> int:
+        owner, name = key if isinstance(key, tuple) and len(key) == 2 else (None, key)
+        slot = self._slots.get(name)
+        if slot is None:
+            with self._lock:
+                slot = self._slots.setdefault(name, len(self._slots))
+        return (slot + (hash(owner) if owner is not None else 0)) % self._workers
+
+
+class WebsocketsEventDispatcher(object):
+    """
+    Runs the event handlers of the sync websockets clients on worker threads, so a slow handler does not stall
+    the receiving of the connection.
+
+    Events with the same key (the event type) always go to the same worker, so they are handled in the order
+    they were received. Each worker has a bounded queue, when it is full the receiving waits for the handler.
+    One dispatcher can be shared by many clients, pass it as `dispatcher=...`, or pass `dispatch_workers=n`
+    to give a client its own.
+    """
+
+    def __init__(self, workers: int = 4, queue_size: int = 256):
+        if workers <= 0:
+            raise ValueError("workers must be greater than 0")
+        if queue_size <= 0:
+            raise ValueError("queue_size must be greater than 0")
+        self.metrics = WebsocketsDispatchMetrics()
+        self._slots = _WorkerSlots(workers)
+        self._queues: List["queue.Queue[_Job]"] = [queue.Queue(maxsize=queue_size) for _ in range(workers)]
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def dispatch(self, key: Hashable, func: Callable[..., Any], *args: Any) -> None:
+        """
+        Queue func(*args) on the worker of key, blocks while the queue of the worker is full.
+
+        :param key: the event type, or a (client, event type) pair
+        """
+        if self._closed:
+            raise ValueError("event dispatcher is closed")
+        self._start()
+        self.metrics._on_dispatch()
+        self._queues[self._slots.index(key)].put((func, args))
+
+    def close(self) -> None:
+        """
+        Wait for the queued events to be handled, and stop the workers.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            threads = self._threads
+        for q in self._queues:
+            q.put(None)
+        for thread in threads:
+            if thread is not threading.current_thread():
+                thread.join()
+
+    def _start(self) -> None:
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            self._threads = [
+                threading.Thread(target=self._work, args=(q,), name=f"cozepy-websockets-dispatch-{i}", daemon=True)
+                for i, q in enumerate(self._queues)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def _work(self, q: "queue.Queue[_Job]") -> None:
+        while True:
+            job = q.get()
+            if job is None:
+                return
+            func, args = job
+            start = time.monotonic()
+            try:
+                func(*args)
+            except Exception as e:
+                log_error("websockets event handler failed: %s", e)
+            self.metrics._on_handled(time.monotonic() - start)
+
+
+class AsyncWebsocketsEventDispatcher(object):
+    """
+    Runs the event handlers of the async websockets clients on worker tasks, so a slow handler does not stall
+    the receiving of the connection.
+
+    Events with the same key (the event type) always go to the same worker, so they are handled in the order
+    they were received. Each worker has a bounded queue, when it is full the receiving awaits the handler.
+    """
+
+    def __init__(self, workers: int = 4, queue_size: int = 256):
+        if workers <= 0:
+            raise ValueError("workers must be greater than 0")
+        if queue_size <= 0:
+            raise ValueError("queue_size must be greater than 0")
+        self.metrics = WebsocketsDispatchMetrics()
+        self._slots = _WorkerSlots(workers)
+        self._workers = workers
+        self._queue_size = queue_size
+        # created lazily, so the dispatcher can be built outside of the event loop
+        self._queues: List["asyncio.Queue[_Job]"] = []
+        self._tasks: List[asyncio.Task] = []
+        self._closed = False
+
+    async def dispatch(self, key: Hashable, func: Callable[..., Any], *args: Any) -> None:
+        """
+        Queue func(*args) on the worker of key, waits while the queue of the worker is full.
+
+        :param key: the event type, or a (client, event type) pair
+        """
+        if self._closed:
+            raise ValueError("event dispatcher is closed")
+        if not self._tasks:
+            self._queues = [asyncio.Queue(maxsize=self._queue_size) for _ in range(self._workers)]
+            self._tasks = [asyncio.ensure_future(self._work(q)) for q in self._queues]
+        self.metrics._on_dispatch()
+        await self._queues[self._slots.index(key)].put((func, args))
+
+    async def close(self) -> None:
+        """
+        Wait for the queued events to be handled, and stop the workers.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        for q in self._queues:
+            await q.put(None)
+        tasks = [task for task in self._tasks if task is not asyncio.current_task()]
+        if tasks:
+            await asyncio.wait(tasks)
+
+    async def _work(self, q: "asyncio.Queue[_Job]") -> None:
+        while True:
+            job = await q.get()
+            if job is None:
+                return
+            func, args = job
+            start = time.monotonic()
+            try:
+                await func(*args)
+            except Exception as e:
+                log_error("websockets event handler failed: %s", e)
+            self.metrics._on_handled(time.monotonic() - start)
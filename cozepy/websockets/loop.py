@@ -0,0 +1,145 @@
+import asyncio
+import concurrent.futures
+import os
+import threading
+from typing import Any, Callable, Coroutine, List, Optional
+
+from cozepy.fork import check_fork, register_after_fork
+
+
+class WebsocketsEventLoop(object):
+    """
+    An asyncio event loop running in a daemon thread, shared by the sync websockets clients bound to it.
+
+    The thread is started by the first client and stopped by close().
+    """
+
+    def __init__(self, name: str = "cozepy-websockets-loop"):
+        self._name = name
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        # number of connected clients bound to the loop
+        self.clients = 0
+        register_after_fork(self)
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        check_fork()
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                started = threading.Event()
+                thread = threading.Thread(target=self._run, args=(loop, started), name=self._name, daemon=True)
+                thread.start()
+                started.wait()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    def in_loop(self) -> bool:
+        """
+        Whether the caller is running on the loop thread.
+        """
+        return self._thread is not None and self._thread is threading.current_thread()
+
+    def submit(self, coro: Coroutine) -> concurrent.futures.Future:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """
+        Run the coroutine on the loop and block the calling thread until it is done.
+        """
+        if self.in_loop():
+            coro.close()
+            raise RuntimeError("cannot block the websockets event loop thread on itself")
+        return self.submit(coro).result(timeout)
+
+    def call_soon(self, callback: Callable[..., Any], *args: Any) -> None:
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def close(self) -> None:
+        """
+        Stop the loop thread, the clients bound to the loop should be closed first.
+        """
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop, self._thread = None, None
+        if loop is None or thread is None:
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not threading.current_thread():
+            thread.join()
+
+    def _reset_after_fork(self) -> None:
+        # the loop thread is not running in the child, a new one is started on next use
+        self._lock = threading.Lock()
+        self._loop, self._thread = None, None
+        self.clients = 0
+
+    @staticmethod
+    def _run(loop: asyncio.AbstractEventLoop, started: threading.Event) -> None:
+        asyncio.set_event_loop(loop)
+        loop.call_soon(started.set)
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+
+class WebsocketsEventLoopPool(object):
+    """
+    A fixed set of event loops the sync websockets clients run on, instead of a send and a receive thread
+    per client. So the number of threads scales with the pool size, not with the number of sessions.
+
+    Each client is bound to the loop with the fewest connected clients when it connects. Event handlers are
+    called on the loop thread, a slow handler delays every session of the loop.
+
+        pool = WebsocketsEventLoopPool(size=2)
+        client = WebsocketsChatClient(..., loop_pool=pool)
+    """
+
+    _shared: Optional["WebsocketsEventLoopPool"] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, size: Optional[int] = None):
+        if size is None:
+            size = min(4, os.cpu_count() or 1)
+        if size <= 0:
+            raise ValueError("size must be greater than 0")
+        self._loops: List[WebsocketsEventLoop] = [
+            WebsocketsEventLoop(name=f"cozepy-websockets-loop-{i}") for i in range(size)
+        ]
+        self._lock = threading.Lock()
+        register_after_fork(self)
+
+    @classmethod
+    def shared(cls) -> "WebsocketsEventLoopPool":
+        """
+        The process wide pool, created with the default size on first use.
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    @property
+    def size(self) -> int:
+        return len(self._loops)
+
+    def acquire(self) -> WebsocketsEventLoop:
+        with self._lock:
+            loop = min(self._loops, key=lambda x: x.clients)
+            loop.clients += 1
+            return loop
+
+    def release(self, loop: WebsocketsEventLoop) -> None:
+        with self._lock:
+            loop.clients = max(loop.clients - 1, 0)
+
+    def close(self) -> None:
+        for loop in self._loops:
+            loop.close()
+
+    def _reset_after_fork(self) -> None:
+        # a lock held by another thread of the parent is never released in the child
+        self._lock = threading.Lock()
@@ -0,0 +1,128 @@
+import collections
+import threading
+import time
+from typing import Deque, Dict, List, Optional, Set
+
+from cozepy.util import percentile
+
+# the events which end the user input of a turn, the turn latencies are measured from the last one sent
+_TURN_START_EVENTS = {"input_audio_buffer.complete", "input_text_buffer.complete"}
+
+# received event type -> turn latency, measured for the first one of the turn
+_TURN_LATENCIES = {
+    "conversation.chat.created": "chat_created",
+    "conversation.audio_transcript.completed": "transcript_completed",
+    "transcriptions.message.completed": "transcript_completed",
+    "conversation.message.delta": "first_text",
+    "conversation.audio.delta": "first_audio",
+    "speech.audio.update": "first_audio",
+}
+
+
+class WebsocketsLatencyHistogram(object):
+    """
+    Aggregates the latencies (milliseconds) of many websockets sessions, pass it as `latency_histogram=...` to
+    each client. The most recent `window` samples of each latency are kept.
+
+        histogram = WebsocketsLatencyHistogram()
+        client = coze.websockets.chat.create(..., latency_histogram=histogram)
+        ...
+        histogram.percentile("first_audio", 99)
+    """
+
+    def __init__(self, window: int = 1024):
+        self._window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, ms: float) -> None:
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = collections.deque(maxlen=self._window)
+            samples.append(ms)
+
+    def count(self, name: str) -> int:
+        with self._lock:
+            return len(self._samples.get(name) or ())
+
+    def percentile(self, name: str, p: float) -> float:
+        """
+        :param p: percentile in the range [0, 100]
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(name) or ())
+        return percentile(samples, p)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        count, avg, p50, p90 and p99 of each latency.
+        """
+        with self._lock:
+            samples = {name: sorted(values) for name, values in self._samples.items()}
+        return {
+            name: {
+                "count": len(values),
+                "avg": sum(values) / len(values) if values else 0,
+                "p50": percentile(values, 50),
+                "p90": percentile(values, 90),
+                "p99": percentile(values, 99),
+            }
+            for name, values in samples.items()
+        }
+
+
+class WebsocketsSessionMetrics(object):
+    """
+    Monotonic timestamps (time.monotonic) of the events sent and received by one websockets client, and the
+    latencies derived from them, in milliseconds:
+
+    - connect: the connect handshake
+    - chat_created, transcript_completed, first_text, first_audio: from the end of the user input of a turn
+      (input_audio_buffer.complete or input_text_buffer.complete sent) to the first such event of the turn
+    """
+
+    def __init__(self, histogram: Optional[WebsocketsLatencyHistogram] = None):
+        self.connected_at: Optional[float] = None
+        self.first_sent: Dict[str, float] = {}
+        self.last_sent: Dict[str, float] = {}
+        self.first_received: Dict[str, float] = {}
+        self.last_received: Dict[str, float] = {}
+        # every turn of the session, in order
+        self.latencies: Dict[str, List[float]] = {}
+        self._histogram = histogram
+        self._turn_start: Optional[float] = None
+        self._turn_done: Set[str] = set()
+
+    def latency(self, name: str) -> Optional[float]:
+        """
+        The latency of the last turn, None if it was not measured.
+        """
+        values = self.latencies.get(name)
+        return values[-1] if values else None
+
+    def _on_connect(self, start: float) -> None:
+        self.connected_at = time.monotonic()
+        self._observe("connect", (self.connected_at - start) * 1000)
+
+    def _on_sent(self, event_type: str) -> None:
+        now = time.monotonic()
+        self.first_sent.setdefault(event_type, now)
+        self.last_sent[event_type] = now
+        if event_type in _TURN_START_EVENTS:
+            self._turn_start = now
+            self._turn_done = set()
+
+    def _on_received(self, event_type: str) -> None:
+        now = time.monotonic()
+        self.first_received.setdefault(event_type, now)
+        self.last_received[event_type] = now
+        name = _TURN_LATENCIES.get(event_type)
+        if name is not None and self._turn_start is not None and name not in self._turn_done:
+            self._turn_done.add(name)
+            self._observe(name, (now - self._turn_start) * 1000)
+
+    def _observe(self, name: str, ms: float) -> None:
+        self.latencies.setdefault(name, []).append(ms)
+        if self._histogram is not None:
+            self._histogram.observe(name, ms)
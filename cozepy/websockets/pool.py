@@ -0,0 +1,187 @@
+import asyncio
+import collections
+import time
+from typing import Any, Coroutine, Deque, Dict, List, Optional, Set
+
+from websockets.protocol import State
+
+from cozepy.log import log_warning
+from cozepy.request import Requester
+from cozepy.util import remove_none_values, remove_url_trailing_slash
+from cozepy.version import coze_client_user_agent, user_agent
+from cozepy.websockets.ws import AsyncWebsocketClientConnection, _build_ws_url, asyncio_connect
+
+
+class _IdleConnection(object):
+    def __init__(self, ws: AsyncWebsocketClientConnection):
+        self.ws = ws
+        self.opened_at = time.monotonic()
+
+
+class AsyncWebsocketsChatPool(object):
+    """
+    Keeps authenticated v1/chat connections open ahead of the sessions, per bot_id (and workflow_id), so a new
+    session skips the TCP, TLS and websocket handshakes and the auth header.
+
+    A connection is leased to one session and closed with it, it is never put back: the chat.update config and
+    the conversation of a session live on its connection. After each lease the pool opens a replacement in the
+    background. Idle connections are pinged every ping_interval seconds and closed after idle_timeout seconds.
+
+        await coze.websockets.pool.warm(bot_id=bot_id, size=2)
+        client = coze.websockets.chat.create(bot_id=bot_id, on_event=handler)  # leases a warm connection
+
+    :param size: idle connections kept per bot, unless warm() is given another size
+    :param idle_timeout: seconds an idle connection is kept before it is closed
+    :param ping_interval: seconds between the health checks of the idle connections
+    :param ping_timeout: seconds to wait for the pong of a health check
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        requester: Requester,
+        *,
+        size: int = 1,
+        idle_timeout: float = 60,
+        ping_interval: float = 10,
+        ping_timeout: float = 5,
+    ):
+        if size <= 0:
+            raise ValueError("size must be greater than 0")
+        if idle_timeout <= 0 or ping_interval <= 0 or ping_timeout <= 0:
+            raise ValueError("timeouts must be greater than 0")
+        self._base_url = remove_url_trailing_slash(base_url)
+        self._requester = requester
+        self._size = size
+        self._idle_timeout = idle_timeout
+        self._ping_interval = ping_interval
+        self._ping_timeout = ping_timeout
+
+        # by the connection url, which holds the bot_id and workflow_id
+        self._idle: Dict[str, Deque[_IdleConnection]] = {}
+        self._sizes: Dict[str, int] = {}
+        self._opening: Dict[str, int] = {}
+        self._tasks: Set[asyncio.Future] = set()
+        self._health_task: Optional[asyncio.Future] = None
+        self._closed = False
+
+        self.hits = 0
+        self.misses = 0
+
+    async def warm(self, bot_id: str, workflow_id: Optional[str] = None, size: Optional[int] = None) -> None:
+        """
+        Keep idle connections for the bot, and wait until they are open.
+
+        :param size: idle connections to keep, defaults to the size of the pool
+        """
+        if self._closed:
+            raise ValueError("websockets pool is closed")
+        url = self._url(bot_id, workflow_id)
+        self._sizes[url] = size if size is not None else self._size
+        if self._health_task is None:
+            self._health_task = asyncio.ensure_future(self._health_check())
+        await self._fill(url, raise_error=True)
+
+    def idle(self, bot_id: str, workflow_id: Optional[str] = None) -> int:
+        """
+        Number of idle connections of the bot.
+        """
+        return len(self._idle.get(self._url(bot_id, workflow_id)) or ())
+
+    async def close(self) -> None:
+        """
+        Stop the health checks and close the idle connections.
+        """
+        self._closed = True
+        tasks = list(self._tasks) + ([self._health_task] if self._health_task else [])
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks)
+        idle = [conn for conns in self._idle.values() for conn in conns]
+        self._idle.clear()
+        if idle:
+            await asyncio.gather(*[conn.ws.close() for conn in idle], return_exceptions=True)
+
+    async def _lease(self, url: str) -> Optional[AsyncWebsocketClientConnection]:
+        """
+        Take an open idle connection to url, None if there is none.
+        """
+        idle = self._idle.get(url)
+        while idle:
+            conn = idle.popleft()
+            if self._usable(conn):
+                self.hits += 1
+                self._spawn(self._fill(url))
+                return conn.ws
+            self._spawn(conn.ws.close())
+        if url in self._sizes:
+            self.misses += 1
+            self._spawn(self._fill(url))
+        return None
+
+    def _url(self, bot_id: str, workflow_id: Optional[str]) -> str:
+        return _build_ws_url(
+            self._base_url, "v1/chat", remove_none_values({"bot_id": bot_id, "workflow_id": workflow_id})
+        )
+
+    def _usable(self, conn: _IdleConnection) -> bool:
+        return conn.ws.state is State.OPEN and time.monotonic() - conn.opened_at < self._idle_timeout
+
+    def _spawn(self, coro: Coroutine) -> None:
+        if self._closed:
+            coro.close()
+            return
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _open(self, url: str) -> AsyncWebsocketClientConnection:
+        headers = {"X-Coze-Client-User-Agent": coze_client_user_agent()}
+        await self._requester.async_auth_header(headers)
+        return await asyncio_connect(url, user_agent_header=user_agent(), additional_headers=headers)
+
+    async def _fill(self, url: str, raise_error: bool = False) -> None:
+        idle = self._idle.setdefault(url, collections.deque())
+        missing = self._sizes.get(url, 0) - len(idle) - self._opening.get(url, 0)
+        if missing <= 0:
+            return
+        self._opening[url] = self._opening.get(url, 0) + missing
+        try:
+            results: List[Any] = await asyncio.gather(
+                *[self._open(url) for _ in range(missing)], return_exceptions=True
+            )
+        finally:
+            self._opening[url] -= missing
+        errors = [res for res in results if isinstance(res, BaseException)]
+        for ws in results:
+            if isinstance(ws, BaseException):
+                continue
+            if self._closed:
+                await ws.close()
+            else:
+                idle.append(_IdleConnection(ws))
+        if errors:
+            if raise_error:
+                raise errors[0]
+            log_warning("[v1/chat] open pooled connection failed: %s", errors[0])
+
+    async def _health_check(self) -> None:
+        while True:
+            await asyncio.sleep(self._ping_interval)
+            for url, idle in list(self._idle.items()):
+                await asyncio.gather(*[self._check(idle, conn) for conn in list(idle)])
+                await self._fill(url)
+
+    async def _check(self, idle: Deque[_IdleConnection], conn: _IdleConnection) -> None:
+        healthy = self._usable(conn)
+        if healthy:
+            try:
+                pong = await conn.ws.ping()
+                await asyncio.wait_for(pong, self._ping_timeout)
+            except Exception:
+                healthy = False
+        # a connection leased meanwhile belongs to its session
+        if not healthy and conn in idle:
+            idle.remove(conn)
+            await conn.ws.close()
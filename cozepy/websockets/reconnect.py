@@ -0,0 +1,84 @@
+import collections
+import random
+import threading
+from typing import Deque
+
+from cozepy.util import percentile
+
+
+class WebsocketsReconnectPolicy(object):
+    """
+    Opt-in reconnect of a websockets client whose connection dropped, pass it as `reconnect=...`.
+
+    After a dropped connection the client reconnects with exponential backoff, re-sends the last
+    chat.update / speech.update / transcriptions.update, then sends the events still in the send queue.
+    Events already written to the dropped connection are not sent again.
+
+    :param max_attempts: connect attempts before the drop is reported to the error handler
+    :param initial_delay: seconds before the first attempt
+    :param max_delay: max seconds between two attempts
+    :param multiplier: growth of the delay per attempt
+    :param jitter: random +/- fraction of each delay, so clients dropped together do not reconnect together
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 5,
+        initial_delay: float = 0.2,
+        max_delay: float = 5.0,
+        multiplier: float = 2.0,
+        jitter: float = 0.2,
+    ):
+        if max_attempts <= 0:
+            raise ValueError("max_attempts must be greater than 0")
+        if initial_delay < 0 or max_delay < 0:
+            raise ValueError("delay must not be negative")
+        self.max_attempts = max_attempts
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+
+    def delay(self, attempt: int) -> float:
+        """
+        Seconds to wait before the attempt, counted from 0.
+        """
+        delay = min(self.initial_delay * self.multiplier**attempt, self.max_delay)
+        return delay * (1 + random.uniform(-self.jitter, self.jitter))
+
+
+class WebsocketsReconnectMetrics(object):
+    """
+    Counters of the reconnects of a client, the latencies (from the drop to the new connection) are kept for
+    the most recent `window` reconnects.
+    """
+
+    def __init__(self, window: int = 1024):
+        self.drops = 0
+        self.reconnects = 0
+        self.failed_attempts = 0
+        self._latencies: Deque[float] = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def latency(self, p: float) -> float:
+        """
+        Percentile of the reconnect latency in seconds.
+
+        :param p: percentile in the range [0, 100]
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+        return percentile(latencies, p)
+
+    def _on_drop(self) -> None:
+        with self._lock:
+            self.drops += 1
+
+    def _on_failed_attempt(self) -> None:
+        with self._lock:
+            self.failed_attempts += 1
+
+    def _on_reconnect(self, latency: float) -> None:
+        with self._lock:
+            self.reconnects += 1
+            self._latencies.append(latency)
@@ -1,14 +1,17 @@
 import abc
 import asyncio
+import binascii
+import collections
 import json
 import queue
 import sys
 import threading
+import time
 import traceback
 from abc import ABC
 from contextlib import asynccontextmanager, contextmanager
 from enum import Enum
-from typing import Callable, Dict, List, Optional, Set
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Deque, Dict, List, Optional, Set, Type, Union
 
 if sys.version_info >= (3, 8):
     # note: >=3.7,<3.8 not support asyncio
@@ -39,15 +42,32 @@ else:
         pass
 
 
+import websockets
 import websockets.sync.client
 from pydantic import BaseModel
+from websockets.exceptions import ConnectionClosed, ConnectionClosedError
 
 from cozepy import CozeAPIError
-from cozepy.log import log_debug, log_error, log_info
+from cozepy.exception import CozeEventBufferOverflowError
+from cozepy.log import log_debug, log_error, log_info, log_warning
 from cozepy.model import CozeModel
 from cozepy.request import Requester
 from cozepy.util import remove_url_trailing_slash
 from cozepy.version import coze_client_user_agent, user_agent
+from cozepy.websockets.dispatch import (
+    AsyncWebsocketsEventDispatcher,
+    WebsocketsDispatchMetrics,
+    WebsocketsEventDispatcher,
+)
+from cozepy.websockets.loop import WebsocketsEventLoop, WebsocketsEventLoopPool
+from cozepy.websockets.metrics import WebsocketsLatencyHistogram, WebsocketsSessionMetrics
+from cozepy.websockets.reconnect import WebsocketsReconnectMetrics, WebsocketsReconnectPolicy
+
+if TYPE_CHECKING:
+    from cozepy.websockets.audio.pcm import PCMConverter
+    from cozepy.websockets.audio.uplink import AsyncAudioUplinkBuffer, AudioUplinkBuffer
+    from cozepy.websockets.audio.vad import AudioVoiceActivityDetector
+    from cozepy.websockets.pool import AsyncWebsocketsChatPool
 
 
 class WebsocketsEventType(str, Enum):
@@ -122,6 +142,85 @@ class WebsocketsErrorEvent(WebsocketsEvent):
     data: CozeAPIError
 
 
+# websockets >= 14 can send utf-8 bytes as a text frame, so an encoded audio frame is never decoded to str
+_SEND_BYTES_AS_TEXT = int(websockets.__version__.split(".")[0]) >= 14
+_SEND_KWARGS: Dict[str, bool] = {"text": True} if _SEND_BYTES_AS_TEXT else {}
+
+# input_audio_buffer.append frame, the same json as model_dump_json
+_AUDIO_APPEND_PREFIX = b'{"event_type":"input_audio_buffer.append","id":'
+_AUDIO_APPEND_DELTA = b',"detail":null,"data":{"delta":"'
+_AUDIO_APPEND_SUFFIX = b'"}}'
+
+
+def _encode_audio_append(pcm: Union[bytes, bytearray, memoryview], event_id: Optional[str] = None) -> bytes:
+    """
+    Build the input_audio_buffer.append frame from a template, base64 encoding the pcm without a copy of it.
+    """
+    return b"".join(
+        (
+            _AUDIO_APPEND_PREFIX,
+            b"null" if event_id is None else json.dumps(event_id).encode("utf-8"),
+            _AUDIO_APPEND_DELTA,
+            binascii.b2a_base64(memoryview(pcm), newline=False),
+            _AUDIO_APPEND_SUFFIX,
+        )
+    )
+
+
+def _dump_event(event: "WebsocketsEvent") -> Union[str, bytes]:
+    if event.event_type == WebsocketsEventType.INPUT_AUDIO_BUFFER_APPEND and event.detail is None:
+        frame = _encode_audio_append(event.data.delta, event.id)  # type: ignore
+        return frame if _SEND_BYTES_AS_TEXT else frame.decode("utf-8")
+    return event.model_dump_json()
+
+
+def _audio_append_event(event_class: Type["WebsocketsEvent"], pcm: bytes) -> "WebsocketsEvent":
+    # the pcm is sent as is, so the event is built without validation
+    return event_class.model_construct(data=event_class.model_fields["data"].annotation.model_construct(delta=pcm))  # type: ignore
+
+
+def _decode_audio_delta(message: Dict) -> bytes:
+    """
+    The pcm of a speech.audio.update or conversation.audio.delta frame, without building the event model.
+    """
+    data = message.get("data") or {}
+    return binascii.a2b_base64(data.get("delta") or data.get("content") or "")
+
+
+def _build_ws_url(base_url: str, path: str, query: Optional[Dict[str, str]] = None) -> str:
+    url = base_url + "/" + path
+    if query:
+        url += "?" + "&".join([f"{k}={v}" for k, v in query.items()])
+    return url
+
+
+def _event_registry(*event_classes: Type[WebsocketsEvent]) -> Dict[str, Type[WebsocketsEvent]]:
+    """
+    Map the event_type of the received events to their class, the type is the default of the event_type field.
+    """
+    return {
+        event_class.model_fields["event_type"].default.value: event_class  # type: ignore
+        for event_class in event_classes
+    }
+
+
+def _load_event(path: str, event_types: Dict[str, Type[WebsocketsEvent]], message: Dict) -> Optional[WebsocketsEvent]:
+    event_type = message.get("event_type") or ""
+    detail = message.get("detail") or {}
+    data = message.get("data") or {}
+    if event_type == WebsocketsEventType.ERROR.value:
+        code, msg = data.get("code") or 0, data.get("msg") or ""
+        return WebsocketsErrorEvent.model_validate(
+            {"id": message.get("id") or "", "detail": detail, "data": CozeAPIError(code, msg, detail.get("logid"))}
+        )
+    event_class = event_types.get(event_type)
+    if event_class is None:
+        log_warning("[%s] unknown event, type=%s, logid=%s", path, event_type, detail.get("logid"))
+        return None
+    # the whole frame is validated in one pass, the nested models are built by the validator of the event
+    return event_class.model_validate({"id": message.get("id") or "", "detail": detail, "data": data})
+
+
 class InputAudio(BaseModel):
     format: Optional[str]
     codec: Optional[str]
@@ -148,6 +247,25 @@ class OutputAudio(BaseModel):
     voice_id: Optional[str] = None
 
 
+class WebsocketsEventsOverflow(str, Enum):
+    """
+    What AsyncWebsocketsBaseClient.events() does when its buffer is full.
+    """
+
+    BLOCK = "block"  # stop receiving until the consumer catches up
+    DROP_OLDEST_AUDIO = "drop_oldest_audio"  # drop the oldest buffered audio delta
+    ERROR = "error"  # fail the iteration
+
+
+class WebsocketsSendOverflow(str, Enum):
+    """
+    What the websockets clients do when their bounded send queue is full.
+    """
+
+    BLOCK = "block"  # block the sync caller, or make the async caller await
+    DROP_OLDEST_AUDIO = "drop_oldest_audio"  # drop the oldest queued audio append, block if there is none
+
+
 class WebsocketsBaseClient(abc.ABC):
     class State(str, Enum):
         """
@@ -160,6 +278,9 @@ class WebsocketsBaseClient(abc.ABC):
         CLOSING = "closing"
         CLOSED = "closed"
 
+    # the received events of the client by event_type, see _event_registry
+    _event_types: Dict[str, Type[WebsocketsEvent]] = {}
+
     def __init__(
         self,
         base_url: str,
@@ -168,26 +289,131 @@ class WebsocketsBaseClient(abc.ABC):
         query: Optional[Dict[str, str]] = None,
         on_event: Optional[Dict[WebsocketsEventType, Callable]] = None,
         wait_events: Optional[List[WebsocketsEventType]] = None,
-        **kwargs,
+        *,
+        send_queue_size: int = 0,
+        send_overflow: WebsocketsSendOverflow = WebsocketsSendOverflow.BLOCK,
+        reconnect: Optional[WebsocketsReconnectPolicy] = None,
+        latency_histogram: Optional[WebsocketsLatencyHistogram] = None,
+        loop_pool: Optional[WebsocketsEventLoopPool] = None,
+        dispatcher: Optional[WebsocketsEventDispatcher] = None,
+        dispatch_workers: int = 0,
+        dispatch_queue_size: int = 256,
+        uplink_frame_ms: Optional[float] = None,
+        uplink_frame_bytes: Optional[int] = None,
+        uplink_max_delay_ms: Optional[float] = None,
+        audio_sink: Optional[Callable[[bytes], None]] = None,
+        vad: Optional["AudioVoiceActivityDetector"] = None,
+        uplink_converter: Optional["PCMConverter"] = None,
+        downlink_converter: Optional["PCMConverter"] = None,
+        headers: Optional[Dict[str, str]] = None,
     ):
+        """
+        The options of the connection, pass them to the create() of a client.
+
+        :param send_queue_size: max events in the send queue, 0 keeps it unbounded
+        :param send_overflow: what a send does when the send queue is full
+        :param reconnect: reconnect a dropped connection, see WebsocketsReconnectPolicy
+        :param latency_histogram: also record the latencies of the session into it, see WebsocketsLatencyHistogram
+        :param loop_pool: run on a shared event loop instead of a send and a receive thread, requires Python >= 3.8
+        :param dispatcher: call the handlers on the workers of this dispatcher, which can be shared by clients
+        :param dispatch_workers: without a dispatcher, call the handlers on a dispatcher of this many workers of the
+        client's own, 0 calls them on the receiving thread
+        :param dispatch_queue_size: max queued events per worker of the client's own dispatcher
+        :param uplink_frame_ms: coalesce the appended audio into frames of this many ms before sending it, see
+        AudioUplinkBuffer
+        :param uplink_frame_bytes: coalesce the appended audio into frames of this many bytes instead
+        :param uplink_max_delay_ms: max ms a coalesced frame waits to fill up, defaults to uplink_frame_ms
+        :param audio_sink: receive the audio deltas as decoded pcm, instead of the audio delta events
+        :param vad: drop the silent appended audio, see AudioVoiceActivityDetector
+        :param uplink_converter: convert the appended pcm before sending it, see PCMConverter
+        :param downlink_converter: convert the received pcm before audio_sink, see PCMConverter
+        :param headers: extra headers of the connect request
+        """
         self._state = self.State.INITIALIZED
         self._base_url = remove_url_trailing_slash(base_url)
         self._requester = requester
         self._path = path
-        self._ws_url = self._base_url + "/" + path
-        if query:
-            self._ws_url += "?" + "&".join([f"{k}={v}" for k, v in query.items()])
+        self._ws_url = _build_ws_url(self._base_url, path, query)
         self._on_event = on_event.copy() if on_event else {}
-        self._headers = kwargs.get("headers")
+        self._headers = headers
         self._wait_events = wait_events.copy() if wait_events else []
 
-        self._input_queue: queue.Queue[Optional[WebsocketsEvent]] = queue.Queue()
+        # send_queue_size=0 keeps the send queue unbounded
+        self._input_queue: _InputQueue = _InputQueue(send_queue_size, send_overflow)
         self._ws: Optional[websockets.sync.client.ClientConnection] = None
         self._send_thread: Optional[threading.Thread] = None
         self._receive_thread: Optional[threading.Thread] = None
         self._completed_events: Set[WebsocketsEventType] = set()
         self._completed_event = threading.Event()
 
+        # reconnect a dropped connection, see WebsocketsReconnectPolicy
+        self._reconnect: Optional[WebsocketsReconnectPolicy] = reconnect
+        self._reconnect_metrics = WebsocketsReconnectMetrics() if self._reconnect else None
+        # the last chat.update, speech.update or transcriptions.update sent, re-sent after a reconnect
+        self._session_update: Optional[WebsocketsEvent] = None
+        # event timestamps and latencies, also fed into latency_histogram if given
+        self._session_metrics = WebsocketsSessionMetrics(latency_histogram)
+        self._connected = threading.Event()
+        self._closing = threading.Event()
+        self._ws_lock = threading.Lock()
+
+        # run on a shared event loop instead of a send and a receive thread per client
+        self._loop_pool: Optional[WebsocketsEventLoopPool] = loop_pool
+        if self._loop_pool is not None and sys.version_info < (3, 8):
+            raise ValueError("loop_pool requires Python >= 3.8")
+        self._loop: Optional[WebsocketsEventLoop] = None
+        self._async_ws: Optional[AsyncWebsocketClientConnection] = None
+        self._send_task: Optional[asyncio.Task] = None
+        self._receive_task: Optional[asyncio.Task] = None
+
+        # coalesce small input_audio_buffer.append frames before sending them
+        self._uplink: Optional["AudioUplinkBuffer"] = self._build_uplink(
+            uplink_frame_ms, uplink_frame_bytes, uplink_max_delay_ms
+        )
+        # receive audio deltas as decoded pcm, skipping the event models and handlers
+        self._audio_sink: Optional[Callable[[bytes], None]] = audio_sink
+        # drop the silent input audio, see AudioVoiceActivityDetector
+        self._vad: Optional["AudioVoiceActivityDetector"] = vad
+        # convert the appended pcm before sending it, and the received pcm before audio_sink, see PCMConverter
+        self._uplink_converter: Optional["PCMConverter"] = uplink_converter
+        self._downlink_converter: Optional["PCMConverter"] = downlink_converter
+        if self._vad is not None and self._uplink_converter is not None:
+            target = self._uplink_converter.target
+            self._vad._set_format(target.sample_rate, target.channels, target.sample_width)
+
+        # hand events to worker threads instead of calling the handlers on the receiving thread
+        self._dispatcher: Optional[WebsocketsEventDispatcher] = dispatcher
+        self._own_dispatcher = False
+        if self._dispatcher is None and dispatch_workers > 0:
+            self._dispatcher = WebsocketsEventDispatcher(workers=dispatch_workers, queue_size=dispatch_queue_size)
+            self._own_dispatcher = True
+
+    @property
+    def dispatch_metrics(self) -> Optional[WebsocketsDispatchMetrics]:
+        return self._dispatcher.metrics if self._dispatcher else None
+
+    @property
+    def send_lag_ms(self) -> float:
+        """
+        Milliseconds of audio queued but not sent yet.
+        """
+        return self._input_queue.stats.lag_ms
+
+    @property
+    def send_dropped(self) -> int:
+        """
+        Number of audio appends dropped because the send queue was full.
+        """
+        return self._input_queue.stats.dropped
+
+    @property
+    def reconnect_metrics(self) -> Optional[WebsocketsReconnectMetrics]:
+        return self._reconnect_metrics
+
+    @property
+    def session_metrics(self) -> WebsocketsSessionMetrics:
+        return self._session_metrics
+
     @contextmanager
     def __call__(self):
         try:
@@ -200,20 +426,23 @@ class WebsocketsBaseClient(abc.ABC):
         if self._state != self.State.INITIALIZED:
             raise ValueError(f"Cannot connect in {self._state.value} state")
         self._state = self.State.CONNECTING
-        headers = {
-            "X-Coze-Client-User-Agent": coze_client_user_agent(),
-            **(self._headers or {}),
-        }
-
-        self._requester.auth_header(headers)
+        start = time.monotonic()
+        headers = self._connect_headers()
 
         try:
+            if self._loop_pool is not None:
+                self._connect_on_loop(headers)
+                self._session_metrics._on_connect(start)
+                return
+
             self._ws = websockets.sync.client.connect(
                 self._ws_url,
                 user_agent_header=user_agent(),
                 additional_headers=headers,
             )
             self._state = self.State.CONNECTED
+            self._connected.set()
+            self._session_metrics._on_connect(start)
             log_info("[%s] connected to websocket", self._path)
 
             self._send_thread = threading.Thread(target=self._send_loop)
@@ -238,15 +467,45 @@ class WebsocketsBaseClient(abc.ABC):
         self._close()
         self._state = self.State.CLOSED
 
+    def _connect_headers(self) -> Dict[str, str]:
+        headers = {
+            "X-Coze-Client-User-Agent": coze_client_user_agent(),
+            **(self._headers or {}),
+        }
+        self._requester.auth_header(headers)
+        return headers
+
     def _send_loop(self) -> None:
         try:
             while True:
                 event = self._input_queue.get()
-                self._send_event(event)
                 self._input_queue.task_done()
+                if event is None:
+                    break
+                if not self._send_event_retry(event):
+                    break
         except Exception as e:
             self._handle_error(e)
 
+    def _send_event_retry(self, event: WebsocketsEvent) -> bool:
+        """
+        Send the event, and again once reconnected if the connection dropped. False if closed meanwhile.
+        """
+        while True:
+            ws = self._ws
+            try:
+                self._send_event(event)
+                return True
+            except ConnectionClosedError:
+                if self._reconnect is None:
+                    raise
+                with self._ws_lock:
+                    if self._ws is ws:
+                        self._connected.clear()
+                self._connected.wait()
+                if self._state != self.State.CONNECTED:
+                    return False
+
     def _receive_loop(self) -> None:
         try:
             while True:
@@ -254,45 +513,65 @@ class WebsocketsBaseClient(abc.ABC):
                     log_debug("[%s] empty websocket conn, close", self._path)
                     break
 
-                data = self._ws.recv()
-                message = json.loads(data)
-                event_type = message.get("event_type")
-                log_debug("[%s] receive event, type=%s, event=%s", self._path, event_type, data)
+                try:
+                    data = self._ws.recv()
+                except ConnectionClosedError:
+                    if not self._reconnect_ws():
+                        raise
+                    continue
+                self._handle_message(data)
+        except ConnectionClosed as e:
+            # closed by close() is not an error
+            if self._state == self.State.CONNECTED:
+                self._handle_error(e)
+        except Exception as e:
+            self._handle_error(e)
 
-                event = self._load_all_event(message)
-                if event:
-                    handler = self._on_event.get(event_type)
-                    if handler:
-                        handler(self, event)
-                    self._completed_events.add(event_type)
-                    self._completed_event.set()
+    def _handle_message(self, data: Union[str, bytes]) -> None:
+        message = json.loads(data)
+        event_type = message.get("event_type")
+        self._session_metrics._on_received(event_type)
+        log_debug("[%s] receive event, type=%s, event=%s", self._path, event_type, data)
+
+        if self._audio_sink is not None and event_type in _AUDIO_DELTA_EVENTS:
+            self._audio_sink(self._decode_audio(message))
+            return
+
+        event = self._load_all_event(message)
+        if not event:
+            return
+        if self._dispatcher is not None:
+            self._dispatcher.dispatch((self, event_type), self._handle_dispatched_event, event_type, event)
+        else:
+            self._handle_event(event_type, event)
+
+    def _handle_event(self, event_type: str, event: WebsocketsEvent) -> None:
+        handler = self._on_event.get(event_type)  # type: ignore
+        if handler:
+            handler(self, event)
+        self._completed_events.add(event_type)  # type: ignore
+        self._completed_event.set()
+
+    def _handle_dispatched_event(self, event_type: str, event: WebsocketsEvent) -> None:
+        try:
+            self._handle_event(event_type, event)
         except Exception as e:
             self._handle_error(e)
 
-    def _load_all_event(self, message: Dict) -> Optional[WebsocketsEvent]:
-        event_id = message.get("id") or ""
-        event_type = message.get("event_type") or ""
-        detail = WebsocketsEvent.Detail.model_validate(message.get("detail") or {})
-        data = message.get("data") or {}
-        if event_type == WebsocketsEventType.ERROR.value:
-            code, msg = data.get("code") or 0, data.get("msg") or ""
-            return WebsocketsErrorEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                    "data": CozeAPIError(code, msg, WebsocketsEvent.Detail.model_validate(detail).logid),
-                }
-            )
-        return self._load_event(message)
+    def _decode_audio(self, message: Dict) -> bytes:
+        pcm = _decode_audio_delta(message)
+        if self._downlink_converter is not None:
+            return self._downlink_converter.convert(pcm)  # type: ignore
+        return pcm
 
-    @abc.abstractmethod
-    def _load_event(self, message: Dict) -> Optional[WebsocketsEvent]: ...
+    def _load_all_event(self, message: Dict) -> Optional[WebsocketsEvent]:
+        return _load_event(self._path, self._event_types, message)
 
     def _wait_completed(self, events: List[WebsocketsEventType], wait_all: bool) -> None:
         while True:
             if wait_all:
                 # 所有事件都需要完成
-                if self._completed_events == set(events):
+                if all(event in self._completed_events for event in events):
                     break
             else:
                 # 任意一个事件完成即可
@@ -310,14 +589,37 @@ class WebsocketsBaseClient(abc.ABC):
 
     def _close(self) -> None:
         log_info("[%s] connect closed", self._path)
+        if self._uplink is not None:
+            self._uplink.flush()
+        if self._loop is not None:
+            if self._loop.in_loop():
+                # closed by an event handler, the loop can not wait for itself
+                self._loop.submit(self._aclose()).add_done_callback(lambda _: self._finish_close())
+                return
+            self._loop.run(self._aclose())
+            self._finish_close()
+            return
+
+        # the sentinel stops the send thread after the pending events are sent
+        self._input_queue.put_close()
+        # stop a reconnect in progress, and the send thread waiting for it
+        self._closing.set()
+        self._connected.set()
         if self._send_thread:
             self._send_thread.join()
+
+        with self._ws_lock:
+            ws = self._ws
+        if ws:
+            ws.close()
         if self._receive_thread:
             self._receive_thread.join()
+        self._ws = None
+        self._finish_close()
 
-        if self._ws:
-            self._ws.close()
-            self._ws = None
+    def _finish_close(self) -> None:
+        if self._dispatcher is not None and self._own_dispatcher:
+            self._dispatcher.close()
 
         while not self._input_queue.empty():
             self._input_queue.get()
@@ -330,7 +632,366 @@ class WebsocketsBaseClient(abc.ABC):
         if not event or not self._ws:
             return
         log_debug("[%s] send event, type=%s", self._path, event.event_type.value)
-        self._ws.send(event.model_dump_json())
+        self._ws.send(_dump_event(event), **_SEND_KWARGS)
+        self._on_sent(event)
+
+    def _on_sent(self, event: WebsocketsEvent) -> None:
+        self._session_metrics._on_sent(event.event_type.value)
+        if event.event_type in _SESSION_UPDATE_EVENTS:
+            self._session_update = event
+
+    def _reconnect_ws(self) -> bool:
+        """
+        Reconnect after the connection dropped, on the receive thread. False if not enabled, closed or failed.
+        """
+        if self._reconnect is None or self._state != self.State.CONNECTED:
+            return False
+        with self._ws_lock:
+            self._connected.clear()
+        metrics: WebsocketsReconnectMetrics = self._reconnect_metrics  # type: ignore
+        metrics._on_drop()
+        start = time.monotonic()
+        for attempt in range(self._reconnect.max_attempts):
+            if self._closing.wait(self._reconnect.delay(attempt)):
+                return False
+            try:
+                ws = websockets.sync.client.connect(
+                    self._ws_url,
+                    user_agent_header=user_agent(),
+                    additional_headers=self._connect_headers(),
+                )
+                if self._session_update is not None:
+                    ws.send(_dump_event(self._session_update), **_SEND_KWARGS)
+            except Exception as e:
+                log_warning("[%s] reconnect attempt %s failed: %s", self._path, attempt + 1, e)
+                metrics._on_failed_attempt()
+                continue
+            with self._ws_lock:
+                if self._closing.is_set():
+                    ws.close()
+                    return False
+                self._ws = ws
+                self._connected.set()
+            metrics._on_reconnect(time.monotonic() - start)
+            log_info("[%s] reconnected to websocket, attempts=%s", self._path, attempt + 1)
+            return True
+        return False
+
+    def _build_uplink(
+        self, frame_ms: Optional[float], frame_bytes: Optional[int], max_delay_ms: Optional[float]
+    ) -> Optional["AudioUplinkBuffer"]:
+        if not frame_ms and not frame_bytes:
+            return None
+        from cozepy.websockets.audio.transcriptions import InputAudioBufferAppendEvent
+        from cozepy.websockets.audio.uplink import AudioUplinkBuffer
+
+        def send(pcm: bytes) -> None:
+            self._input_queue.put(_audio_append_event(InputAudioBufferAppendEvent, pcm))
+
+        def send_nowait(pcm: bytes) -> bool:
+            # the shared flush timer thread must not block on a full send queue
+            try:
+                self._input_queue.put(_audio_append_event(InputAudioBufferAppendEvent, pcm), block=False)
+            except queue.Full:
+                return False
+            return True
+
+        return AudioUplinkBuffer(
+            send,
+            frame_ms=frame_ms,
+            frame_bytes=frame_bytes,
+            max_delay_ms=max_delay_ms,
+            send_nowait=send_nowait,
+        )
+
+    def _uplink_append(self, pcm: bytes) -> None:
+        uplink: AudioUplinkBuffer = self._uplink  # type: ignore
+        uplink.bytes_per_ms = self._input_queue.stats.audio_bytes_per_ms
+        uplink.append(pcm)
+
+    def _audio_append(self, pcm: bytes) -> bool:
+        """
+        Send pcm through the uplink converter, the vad and the uplink buffer which are set, returns whether
+        input_audio_buffer.complete is due.
+        """
+        from cozepy.websockets.audio.transcriptions import InputAudioBufferAppendEvent
+
+        if self._uplink_converter is not None:
+            pcm = self._uplink_converter.convert(pcm)  # type: ignore
+        elif self._vad is not None:
+            # the pcm is in the format of the last input_audio config sent
+            self._vad._use_input_audio(self._input_queue.stats.input_audio)
+        frames, ended = self._vad.process(pcm) if self._vad is not None else ([pcm], False)
+        for frame in frames:
+            if self._uplink is not None:
+                self._uplink_append(frame)
+            else:
+                self._input_queue.put(_audio_append_event(InputAudioBufferAppendEvent, frame))
+        return ended and self._vad is not None and self._vad.auto_complete
+
+    def _connect_on_loop(self, headers: Dict[str, str]) -> None:
+        loop = self._loop_pool.acquire()  # type: ignore
+        try:
+            loop.run(self._aconnect(loop, headers))
+        except BaseException:
+            self._loop_pool.release(loop)  # type: ignore
+            raise
+        self._loop = loop
+
+    async def _aconnect(self, loop: WebsocketsEventLoop, headers: Dict[str, str]) -> None:
+        self._async_ws = await asyncio_connect(
+            self._ws_url,
+            user_agent_header=user_agent(),
+            additional_headers=headers,
+        )
+        self._state = self.State.CONNECTED
+        log_info("[%s] connected to websocket on shared event loop", self._path)
+        self._aconnected = asyncio.Event()
+        self._aconnected.set()
+        self._aclosing = asyncio.Event()
+
+        input_ready = asyncio.Event()
+        self._input_queue.on_put = lambda: loop.call_soon(input_ready.set)
+        self._input_queue.in_sender = loop.in_loop
+        self._send_task = asyncio.create_task(self._asend_loop(input_ready))
+        self._receive_task = asyncio.create_task(self._areceive_loop())
+
+    async def _asend_loop(self, input_ready: asyncio.Event) -> None:
+        try:
+            while True:
+                try:
+                    event = self._input_queue.get_nowait()
+                except queue.Empty:
+                    # wakeups scheduled by put run after this clear, so none is lost
+                    input_ready.clear()
+                    await input_ready.wait()
+                    continue
+                self._input_queue.task_done()
+                if event is None:
+                    break
+                if not await self._asend_event_retry(event):
+                    break
+        except Exception as e:
+            self._handle_loop_error(e)
+
+    async def _asend_event_retry(self, event: WebsocketsEvent) -> bool:
+        while True:
+            ws = self._async_ws
+            try:
+                if ws:
+                    log_debug("[%s] send event, type=%s", self._path, event.event_type.value)
+                    await ws.send(_dump_event(event), **_SEND_KWARGS)
+                    self._on_sent(event)
+                return True
+            except ConnectionClosedError:
+                if self._reconnect is None:
+                    raise
+                if self._async_ws is ws:
+                    self._aconnected.clear()
+                await self._aconnected.wait()
+                if self._state != self.State.CONNECTED:
+                    return False
+
+    async def _areceive_loop(self) -> None:
+        try:
+            while self._async_ws:
+                try:
+                    data = await self._async_ws.recv()
+                except ConnectionClosedError:
+                    if not await self._areconnect_ws():
+                        raise
+                    continue
+                self._handle_message(data)
+        except ConnectionClosed as e:
+            # closed by close() is not an error
+            if self._state == self.State.CONNECTED:
+                self._handle_loop_error(e)
+        except Exception as e:
+            self._handle_loop_error(e)
+
+    def _handle_loop_error(self, error: Exception) -> None:
+        # there is no thread to raise the error to
+        try:
+            self._handle_error(error)
+        except Exception as e:
+            log_error("[%s] unhandled websocket error: %s", self._path, e)
+
+    async def _areconnect_ws(self) -> bool:
+        if self._reconnect is None or self._state != self.State.CONNECTED:
+            return False
+        self._aconnected.clear()
+        metrics: WebsocketsReconnectMetrics = self._reconnect_metrics  # type: ignore
+        metrics._on_drop()
+        start = time.monotonic()
+        for attempt in range(self._reconnect.max_attempts):
+            try:
+                await asyncio.wait_for(self._aclosing.wait(), self._reconnect.delay(attempt))
+                return False
+            except asyncio.TimeoutError:
+                pass
+            try:
+                # the auth header may refresh a token over http, which must not block the shared loop
+                headers = await asyncio.get_event_loop().run_in_executor(None, self._connect_headers)
+                ws = await asyncio_connect(self._ws_url, user_agent_header=user_agent(), additional_headers=headers)
+                if self._session_update is not None:
+                    await ws.send(_dump_event(self._session_update), **_SEND_KWARGS)
+            except Exception as e:
+                log_warning("[%s] reconnect attempt %s failed: %s", self._path, attempt + 1, e)
+                metrics._on_failed_attempt()
+                continue
+            if self._aclosing.is_set():
+                await ws.close()
+                return False
+            self._async_ws = ws
+            self._aconnected.set()
+            metrics._on_reconnect(time.monotonic() - start)
+            log_info("[%s] reconnected to websocket, attempts=%s", self._path, attempt + 1)
+            return True
+        return False
+
+    async def _aclose(self) -> None:
+        self._input_queue.put_close()
+        self._aclosing.set()
+        self._aconnected.set()
+        if self._send_task:
+            await asyncio.wait([self._send_task])
+        if self._async_ws:
+            await self._async_ws.close()
+        if self._receive_task and self._receive_task is not asyncio.current_task():
+            await asyncio.wait([self._receive_task])
+        self._async_ws = None
+        self._input_queue.on_put = None
+        self._input_queue.in_sender = None
+        self._loop_pool.release(self._loop)  # type: ignore
+        self._loop = None
+
+
+class _AudioSendStats(object):
+    """
+    Tracks the audio waiting in a send queue, to report the send lag in milliseconds of audio.
+    """
+
+    def __init__(self, overflow: WebsocketsSendOverflow):
+        self.overflow = overflow
+        self.audio_bytes = 0
+        self.dropped = 0
+        # pcm, 24000 Hz, 1 channel, 16 bit, until an input_audio config says otherwise
+        self.audio_bytes_per_ms = 48.0
+        # the last input_audio config queued
+        self.input_audio: Optional[InputAudio] = None
+
+    @property
+    def lag_ms(self) -> float:
+        return self.audio_bytes / self.audio_bytes_per_ms
+
+    def on_put(self, item: Optional[WebsocketsEvent]) -> None:
+        self.audio_bytes += _audio_size(item)
+        input_audio = getattr(getattr(item, "data", None), "input_audio", None)
+        if input_audio is not None:
+            self.input_audio = input_audio
+        if input_audio is not None and input_audio.sample_rate:
+            self.audio_bytes_per_ms = (
+                input_audio.sample_rate * (input_audio.channel or 1) * (input_audio.bit_depth or 16) / 8 / 1000
+            )
+
+    def on_get(self, item: Optional[WebsocketsEvent]) -> None:
+        self.audio_bytes -= _audio_size(item)
+
+    def drop_oldest_audio(self, items: Deque[Optional[WebsocketsEvent]]) -> bool:
+        for i, item in enumerate(items):
+            if _audio_size(item):
+                del items[i]
+                self.on_get(item)
+                self.dropped += 1
+                return True
+        return False
+
+
+def _audio_size(item: Optional[WebsocketsEvent]) -> int:
+    if item is None or item.event_type != WebsocketsEventType.INPUT_AUDIO_BUFFER_APPEND:
+        return 0
+    return len(item.data.delta or b"")  # type: ignore
+
+
+class _InputQueue(queue.Queue):
+    """
+    The send queue of the sync clients, it can wake up a sender running on an event loop.
+    """
+
+    def __init__(self, maxsize: int = 0, overflow: WebsocketsSendOverflow = WebsocketsSendOverflow.BLOCK):
+        super().__init__(maxsize)
+        self.stats = _AudioSendStats(overflow)
+        self.on_put: Optional[Callable[[], None]] = None
+        # whether the caller runs on the event loop which sends the queued events
+        self.in_sender: Optional[Callable[[], bool]] = None
+
+    def put(self, item, block=True, timeout=None) -> None:
+        if self.stats.overflow == WebsocketsSendOverflow.DROP_OLDEST_AUDIO and item is not None:
+            with self.not_full:
+                if 0 < self.maxsize <= self._qsize() and self.stats.drop_oldest_audio(self.queue):
+                    self._put(item)
+                    self.not_empty.notify()
+                    return
+        if block and self.in_sender is not None and self.in_sender():
+            # an event handler on the loop which drains the queue would wait for itself, the queue goes over
+            # its size until the handler returns
+            self._put_over(item)
+            return
+        super().put(item, block, timeout)
+
+    def put_close(self) -> None:
+        """
+        Queue the sentinel which stops the sender, even if the queue is full.
+        """
+        self._put_over(None)
+
+    def _put_over(self, item) -> None:
+        with self.not_full:
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def _put(self, item) -> None:
+        super()._put(item)
+        self.stats.on_put(item)
+        if self.on_put is not None:
+            self.on_put()
+
+    def _get(self):
+        item = super()._get()
+        self.stats.on_get(item)
+        return item
+
+
+class _AsyncInputQueue(asyncio.Queue):
+    """
+    The send queue of the async clients.
+    """
+
+    def __init__(self, maxsize: int = 0, overflow: WebsocketsSendOverflow = WebsocketsSendOverflow.BLOCK):
+        super().__init__(maxsize)
+        self.stats = _AudioSendStats(overflow)
+
+    async def put(self, item) -> None:
+        if (
+            self.stats.overflow == WebsocketsSendOverflow.DROP_OLDEST_AUDIO
+            and self.full()
+            and self.stats.drop_oldest_audio(self._queue)  # type: ignore
+        ):
+            # the dropped item was never taken, so task_done is not called for it
+            self._unfinished_tasks -= 1  # type: ignore
+            self.put_nowait(item)
+            return
+        await super().put(item)
+
+    def _put(self, item) -> None:
+        super()._put(item)  # type: ignore
+        self.stats.on_put(item)
+
+    def _get(self):
+        item = super()._get()  # type: ignore
+        self.stats.on_get(item)
+        return item
 
 
 class WebsocketsBaseEventHandler(object):
@@ -367,6 +1028,9 @@ class AsyncWebsocketsBaseClient(abc.ABC):
         CLOSING = "closing"
         CLOSED = "closed"
 
+    # the received events of the client by event_type, see _event_registry
+    _event_types: Dict[str, Type[WebsocketsEvent]] = {}
+
     def __init__(
         self,
         base_url: str,
@@ -375,24 +1039,124 @@ class AsyncWebsocketsBaseClient(abc.ABC):
         query: Optional[Dict[str, str]] = None,
         on_event: Optional[Dict[WebsocketsEventType, Callable]] = None,
         wait_events: Optional[List[WebsocketsEventType]] = None,
-        **kwargs,
+        *,
+        send_queue_size: int = 0,
+        send_overflow: WebsocketsSendOverflow = WebsocketsSendOverflow.BLOCK,
+        reconnect: Optional[WebsocketsReconnectPolicy] = None,
+        latency_histogram: Optional[WebsocketsLatencyHistogram] = None,
+        pool: Optional["AsyncWebsocketsChatPool"] = None,
+        dispatcher: Optional[AsyncWebsocketsEventDispatcher] = None,
+        dispatch_workers: int = 0,
+        dispatch_queue_size: int = 256,
+        uplink_frame_ms: Optional[float] = None,
+        uplink_frame_bytes: Optional[int] = None,
+        uplink_max_delay_ms: Optional[float] = None,
+        audio_sink: Optional[Callable[[bytes], None]] = None,
+        vad: Optional["AudioVoiceActivityDetector"] = None,
+        uplink_converter: Optional["PCMConverter"] = None,
+        downlink_converter: Optional["PCMConverter"] = None,
+        headers: Optional[Dict[str, str]] = None,
     ):
+        """
+        The options of the connection, pass them to the create() of a client.
+
+        :param send_queue_size: max events in the send queue, 0 keeps it unbounded
+        :param send_overflow: what a send does when the send queue is full
+        :param reconnect: reconnect a dropped connection, see WebsocketsReconnectPolicy
+        :param latency_histogram: also record the latencies of the session into it, see WebsocketsLatencyHistogram
+        :param pool: lease a warm connection instead of connecting, see AsyncWebsocketsChatPool
+        :param dispatcher: call the handlers on the workers of this dispatcher, which can be shared by clients
+        :param dispatch_workers: without a dispatcher, call the handlers on a dispatcher of this many workers of the
+        client's own, 0 calls them on the receiving task
+        :param dispatch_queue_size: max queued events per worker of the client's own dispatcher
+        :param uplink_frame_ms: coalesce the appended audio into frames of this many ms before sending it, see
+        AudioUplinkBuffer
+        :param uplink_frame_bytes: coalesce the appended audio into frames of this many bytes instead
+        :param uplink_max_delay_ms: max ms a coalesced frame waits to fill up, defaults to uplink_frame_ms
+        :param audio_sink: receive the audio deltas as decoded pcm, instead of the audio delta events
+        :param vad: drop the silent appended audio, see AudioVoiceActivityDetector
+        :param uplink_converter: convert the appended pcm before sending it, see PCMConverter
+        :param downlink_converter: convert the received pcm before audio_sink, see PCMConverter
+        :param headers: extra headers of the connect request
+        """
         self._state = self.State.INITIALIZED
         self._base_url = remove_url_trailing_slash(base_url)
         self._requester = requester
         self._path = path
-        self._ws_url = self._base_url + "/" + path
-        if query:
-            self._ws_url += "?" + "&".join([f"{k}={v}" for k, v in query.items()])
+        self._ws_url = _build_ws_url(self._base_url, path, query)
         self._on_event = on_event.copy() if on_event else {}
-        self._headers = kwargs.get("headers")
+        self._headers = headers
         self._wait_events = wait_events.copy() if wait_events else []
 
-        self._input_queue: asyncio.Queue[Optional[WebsocketsEvent]] = asyncio.Queue()
+        # send_queue_size=0 keeps the send queue unbounded
+        self._input_queue: _AsyncInputQueue = _AsyncInputQueue(send_queue_size, send_overflow)
         self._ws: Optional[AsyncWebsocketClientConnection] = None
         self._send_task: Optional[asyncio.Task] = None
         self._receive_task: Optional[asyncio.Task] = None
 
+        self._waiters: List[_AsyncEventWaiter] = []
+        self._event_buffers: List[_AsyncEventBuffer] = []
+
+        # reconnect a dropped connection, see WebsocketsReconnectPolicy
+        self._reconnect: Optional[WebsocketsReconnectPolicy] = reconnect
+        self._reconnect_metrics = WebsocketsReconnectMetrics() if self._reconnect else None
+        # the last chat.update, speech.update or transcriptions.update sent, re-sent after a reconnect
+        self._session_update: Optional[WebsocketsEvent] = None
+        # event timestamps and latencies, also fed into latency_histogram if given
+        self._session_metrics = WebsocketsSessionMetrics(latency_histogram)
+        # created on connect, an asyncio.Event is bound to the running loop before Python 3.10
+        self._connected: Optional[asyncio.Event] = None
+        # lease a warm connection instead of connecting, see AsyncWebsocketsChatPool
+        self._pool: Optional["AsyncWebsocketsChatPool"] = pool
+
+        # coalesce small input_audio_buffer.append frames before sending them
+        self._uplink: Optional["AsyncAudioUplinkBuffer"] = self._build_uplink(
+            uplink_frame_ms, uplink_frame_bytes, uplink_max_delay_ms
+        )
+        # receive audio deltas as decoded pcm, skipping the event models and handlers
+        self._audio_sink: Optional[Callable[[bytes], None]] = audio_sink
+        # drop the silent input audio, see AudioVoiceActivityDetector
+        self._vad: Optional["AudioVoiceActivityDetector"] = vad
+        # convert the appended pcm before sending it, and the received pcm before audio_sink, see PCMConverter
+        self._uplink_converter: Optional["PCMConverter"] = uplink_converter
+        self._downlink_converter: Optional["PCMConverter"] = downlink_converter
+        if self._vad is not None and self._uplink_converter is not None:
+            target = self._uplink_converter.target
+            self._vad._set_format(target.sample_rate, target.channels, target.sample_width)
+
+        # hand events to worker tasks instead of awaiting the handlers in the receiving task
+        self._dispatcher: Optional[AsyncWebsocketsEventDispatcher] = dispatcher
+        self._own_dispatcher = False
+        if self._dispatcher is None and dispatch_workers > 0:
+            self._dispatcher = AsyncWebsocketsEventDispatcher(workers=dispatch_workers, queue_size=dispatch_queue_size)
+            self._own_dispatcher = True
+
+    @property
+    def dispatch_metrics(self) -> Optional[WebsocketsDispatchMetrics]:
+        return self._dispatcher.metrics if self._dispatcher else None
+
+    @property
+    def send_lag_ms(self) -> float:
+        """
+        Milliseconds of audio queued but not sent yet.
+        """
+        return self._input_queue.stats.lag_ms
+
+    @property
+    def send_dropped(self) -> int:
+        """
+        Number of audio appends dropped because the send queue was full.
+        """
+        return self._input_queue.stats.dropped
+
+    @property
+    def reconnect_metrics(self) -> Optional[WebsocketsReconnectMetrics]:
+        return self._reconnect_metrics
+
+    @property
+    def session_metrics(self) -> WebsocketsSessionMetrics:
+        return self._session_metrics
+
     @asynccontextmanager
     async def __call__(self):
         try:
@@ -405,20 +1169,22 @@ class AsyncWebsocketsBaseClient(abc.ABC):
         if self._state != self.State.INITIALIZED:
             raise ValueError(f"Cannot connect in {self._state.value} state")
         self._state = self.State.CONNECTING
-        headers = {
-            "X-Coze-Client-User-Agent": coze_client_user_agent(),
-            **(self._headers or {}),
-        }
-
-        await self._requester.async_auth_header(headers)
+        start = time.monotonic()
 
         try:
-            self._ws = await asyncio_connect(
-                self._ws_url,
-                user_agent_header=user_agent(),
-                additional_headers=headers,
-            )
+            # custom headers need a connection of their own
+            if self._pool is not None and not self._headers:
+                self._ws = await self._pool._lease(self._ws_url)
+            if self._ws is None:
+                self._ws = await asyncio_connect(
+                    self._ws_url,
+                    user_agent_header=user_agent(),
+                    additional_headers=await self._connect_headers(),
+                )
             self._state = self.State.CONNECTED
+            self._connected = asyncio.Event()
+            self._connected.set()
+            self._session_metrics._on_connect(start)
             log_info("[%s] connected to websocket", self._path)
 
             self._send_task = asyncio.create_task(self._send_loop())
@@ -441,15 +1207,73 @@ class AsyncWebsocketsBaseClient(abc.ABC):
         await self._close()
         self._state = self.State.CLOSED
 
+    async def _connect_headers(self) -> Dict[str, str]:
+        headers = {
+            "X-Coze-Client-User-Agent": coze_client_user_agent(),
+            **(self._headers or {}),
+        }
+        await self._requester.async_auth_header(headers)
+        return headers
+
     async def _send_loop(self) -> None:
         try:
             while True:
                 event = await self._input_queue.get()
-                await self._send_event(event)
+                await self._send_event_retry(event)
                 self._input_queue.task_done()
         except Exception as e:
             await self._handle_error(e)
 
+    async def _send_event_retry(self, event: WebsocketsEvent) -> None:
+        """
+        Send the event, and again once reconnected if the connection dropped.
+        """
+        while True:
+            ws = self._ws
+            try:
+                await self._send_event(event)
+                return
+            except ConnectionClosedError:
+                if self._reconnect is None:
+                    raise
+                connected: asyncio.Event = self._connected  # type: ignore
+                if self._ws is ws:
+                    connected.clear()
+                await connected.wait()
+
+    async def _reconnect_ws(self) -> bool:
+        """
+        Reconnect after the connection dropped, on the receive task. False if not enabled, closed or failed.
+        """
+        if self._reconnect is None or self._state != self.State.CONNECTED:
+            return False
+        connected: asyncio.Event = self._connected  # type: ignore
+        connected.clear()
+        metrics: WebsocketsReconnectMetrics = self._reconnect_metrics  # type: ignore
+        metrics._on_drop()
+        start = time.monotonic()
+        for attempt in range(self._reconnect.max_attempts):
+            # close() cancels the receive task, which stops the reconnect
+            await asyncio.sleep(self._reconnect.delay(attempt))
+            try:
+                ws = await asyncio_connect(
+                    self._ws_url,
+                    user_agent_header=user_agent(),
+                    additional_headers=await self._connect_headers(),
+                )
+                if self._session_update is not None:
+                    await ws.send(_dump_event(self._session_update), **_SEND_KWARGS)
+            except Exception as e:
+                log_warning("[%s] reconnect attempt %s failed: %s", self._path, attempt + 1, e)
+                metrics._on_failed_attempt()
+                continue
+            self._ws = ws
+            connected.set()
+            metrics._on_reconnect(time.monotonic() - start)
+            log_info("[%s] reconnected to websocket, attempts=%s", self._path, attempt + 1)
+            return True
+        return False
+
     async def _receive_loop(self) -> None:
         try:
             while True:
@@ -457,77 +1281,161 @@ class AsyncWebsocketsBaseClient(abc.ABC):
                     log_debug("[%s] empty websocket conn, close", self._path)
                     break
 
-                data = await self._ws.recv()
+                try:
+                    data = await self._ws.recv()
+                except ConnectionClosedError:
+                    if not await self._reconnect_ws():
+                        raise
+                    continue
                 message = json.loads(data)
                 event_type = message.get("event_type")
+                self._session_metrics._on_received(event_type)
                 log_debug("[%s] receive event, type=%s, event=%s", self._path, event_type, data)
 
-                handler = self._on_event.get(event_type)
+                if self._audio_sink is not None and event_type in _AUDIO_DELTA_EVENTS:
+                    self._audio_sink(self._decode_audio(message))
+                    continue
+
                 event = self._load_all_event(message)
-                if handler and event:
-                    await handler(self, event)
+                if not event:
+                    continue
+                for buffer in self._event_buffers:
+                    await buffer.put(event)
+                if self._dispatcher is not None:
+                    await self._dispatcher.dispatch(
+                        (self, event_type), self._handle_dispatched_event, event_type, event
+                    )
+                else:
+                    await self._handle_event(event_type, event)
         except Exception as e:
             await self._handle_error(e)
+        finally:
+            self._close_event_buffers()
 
-    def _load_all_event(self, message: Dict) -> Optional[WebsocketsEvent]:
-        event_id = message.get("id") or ""
-        event_type = message.get("event_type") or ""
-        detail = WebsocketsEvent.Detail.model_validate(message.get("detail") or {})
-        data = message.get("data") or {}
-        if event_type == WebsocketsEventType.ERROR.value:
-            code, msg = data.get("code") or 0, data.get("msg") or ""
-            return WebsocketsErrorEvent.model_validate(
-                {
-                    "id": event_id,
-                    "detail": detail,
-                    "data": CozeAPIError(code, msg, WebsocketsEvent.Detail.model_validate(detail).logid),
-                }
-            )
-        return self._load_event(message)
+    async def _handle_event(self, event_type: str, event: WebsocketsEvent) -> None:
+        handler = self._on_event.get(event_type)  # type: ignore
+        if handler:
+            await handler(self, event)
+        for waiter in self._waiters:
+            waiter.on_event(event_type)
+
+    def _build_uplink(
+        self, frame_ms: Optional[float], frame_bytes: Optional[int], max_delay_ms: Optional[float]
+    ) -> Optional["AsyncAudioUplinkBuffer"]:
+        if not frame_ms and not frame_bytes:
+            return None
+        from cozepy.websockets.audio.transcriptions import InputAudioBufferAppendEvent
+        from cozepy.websockets.audio.uplink import AsyncAudioUplinkBuffer
+
+        async def send(pcm: bytes) -> None:
+            await self._input_queue.put(_audio_append_event(InputAudioBufferAppendEvent, pcm))
+
+        return AsyncAudioUplinkBuffer(
+            send,
+            frame_ms=frame_ms,
+            frame_bytes=frame_bytes,
+            max_delay_ms=max_delay_ms,
+        )
+
+    async def _uplink_append(self, pcm: bytes) -> None:
+        uplink: AsyncAudioUplinkBuffer = self._uplink  # type: ignore
+        uplink.bytes_per_ms = self._input_queue.stats.audio_bytes_per_ms
+        await uplink.append(pcm)
+
+    async def _audio_append(self, pcm: bytes) -> bool:
+        """
+        Send pcm through the uplink converter, the vad and the uplink buffer which are set, returns whether
+        input_audio_buffer.complete is due.
+        """
+        from cozepy.websockets.audio.transcriptions import InputAudioBufferAppendEvent
+
+        if self._uplink_converter is not None:
+            pcm = self._uplink_converter.convert(pcm)  # type: ignore
+        elif self._vad is not None:
+            # the pcm is in the format of the last input_audio config sent
+            self._vad._use_input_audio(self._input_queue.stats.input_audio)
+        frames, ended = self._vad.process(pcm) if self._vad is not None else ([pcm], False)
+        for frame in frames:
+            if self._uplink is not None:
+                await self._uplink_append(frame)
+            else:
+                await self._input_queue.put(_audio_append_event(InputAudioBufferAppendEvent, frame))
+        return ended and self._vad is not None and self._vad.auto_complete
 
-    @abc.abstractmethod
-    def _load_event(self, message: Dict) -> Optional[WebsocketsEvent]: ...
+    async def _handle_dispatched_event(self, event_type: str, event: WebsocketsEvent) -> None:
+        try:
+            await self._handle_event(event_type, event)
+        except Exception as e:
+            await self._handle_error(e)
 
-    async def _wait_completed(self, wait_events: List[WebsocketsEventType], wait_all: bool) -> None:
-        future: asyncio.Future[None] = asyncio.Future()
-        completed_events = set()
-
-        def _wrap_handler(event_type: WebsocketsEventType, original_handler):
-            async def wrapped(client, event):
-                # 先执行原始处理函数
-                if original_handler:
-                    await original_handler(client, event)
-
-                # 再检查完成条件
-                completed_events.add(event_type)
-                if wait_all:
-                    # 所有事件都需要完成
-                    if completed_events == set(wait_events):
-                        if not future.done():
-                            future.set_result(None)
-                else:
-                    # 任意一个事件完成即可
-                    if not future.done():
-                        future.set_result(None)
+    def events(
+        self, buffer_size: int = 256, overflow: WebsocketsEventsOverflow = WebsocketsEventsOverflow.BLOCK
+    ) -> AsyncIterator[WebsocketsEvent]:
+        """
+        Iterate over the received events, until the connection is closed. Handlers registered with on_event
+        are still called.
+
+        Events are buffered from the moment events() is called. When the consumer falls behind and the buffer
+        is full, the overflow policy decides: BLOCK stops receiving until there is room, DROP_OLDEST_AUDIO
+        drops the oldest buffered audio delta (and blocks if there is none), ERROR fails the iteration with
+        CozeEventBufferOverflowError.
+
+            async for event in client.events():
+                if event.event_type == WebsocketsEventType.CONVERSATION_CHAT_COMPLETED:
+                    break
+
+        :param buffer_size: max number of buffered events
+        :param overflow: what to do when the buffer is full
+        """
+        buffer = _AsyncEventBuffer(buffer_size, overflow)
+        if self._state not in (self.State.INITIALIZED, self.State.CONNECTING, self.State.CONNECTED):
+            buffer.close()
+        self._event_buffers.append(buffer)
+        return self._iter_events(buffer)
+
+    async def _iter_events(self, buffer: "_AsyncEventBuffer") -> AsyncIterator[WebsocketsEvent]:
+        try:
+            while True:
+                event = await buffer.get()
+                if event is None:
+                    return
+                yield event
+        finally:
+            if buffer in self._event_buffers:
+                self._event_buffers.remove(buffer)
+
+    def _close_event_buffers(self) -> None:
+        for buffer in self._event_buffers:
+            buffer.close()
 
-            return wrapped
+    async def _drain_input_queue(self) -> None:
+        # until the send task sent the queued events, or stopped on an error
+        send_task = self._send_task
+        if send_task is None or send_task.done() or send_task is asyncio.current_task():
+            return
+        drained = asyncio.ensure_future(self._input_queue.join())
+        try:
+            await asyncio.wait([drained, send_task], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            drained.cancel()
 
-        # 为每个指定的事件类型包装处理函数
-        origin_handlers = {}
-        for event_type in wait_events:
-            original_handler = self._on_event.get(event_type)
-            origin_handlers[event_type] = original_handler
-            self._on_event[event_type] = _wrap_handler(event_type, original_handler)
+    def _decode_audio(self, message: Dict) -> bytes:
+        pcm = _decode_audio_delta(message)
+        if self._downlink_converter is not None:
+            return self._downlink_converter.convert(pcm)  # type: ignore
+        return pcm
 
+    def _load_all_event(self, message: Dict) -> Optional[WebsocketsEvent]:
+        return _load_event(self._path, self._event_types, message)
+
+    async def _wait_completed(self, wait_events: List[WebsocketsEventType], wait_all: bool) -> None:
+        # 只统计 wait 调用之后处理完成的事件
+        waiter = _AsyncEventWaiter(wait_events, wait_all)
+        self._waiters.append(waiter)
         try:
-            # 等待直到满足完成条件
-            await future
+            await waiter.done.wait()
         finally:
-            # 恢复所有原来的处理函数
-            for event_type in wait_events:
-                original_handler = origin_handlers.get(event_type)
-                if original_handler:
-                    self._on_event[event_type] = original_handler
+            self._waiters.remove(waiter)
 
     async def _handle_error(self, error: Exception) -> None:
         handler = self._on_event.get(WebsocketsEventType.ERROR)
@@ -538,6 +1446,11 @@ class AsyncWebsocketsBaseClient(abc.ABC):
 
     async def _close(self) -> None:
         log_info("[%s] connect closed", self._path)
+        if self._uplink is not None:
+            # like the sync client, the buffered audio is sent before the connection closes
+            await self._uplink.flush()
+            self._uplink.close()
+            await self._drain_input_queue()
         if self._send_task:
             self._send_task.cancel()
         if self._receive_task:
@@ -547,6 +1460,10 @@ class AsyncWebsocketsBaseClient(abc.ABC):
             await self._ws.close()
             self._ws = None
 
+        if self._dispatcher is not None and self._own_dispatcher:
+            await self._dispatcher.close()
+        self._close_event_buffers()
+
         while not self._input_queue.empty():
             await self._input_queue.get()
 
@@ -557,16 +1474,99 @@ class AsyncWebsocketsBaseClient(abc.ABC):
     async def _send_event(self, event: Optional[WebsocketsEvent] = None) -> None:
         if not event or not self._ws:
             return
+        payload = _dump_event(event)
         if event.event_type == WebsocketsEventType.INPUT_AUDIO_BUFFER_APPEND:
             log_debug(
                 "[%s] send event, type=%s, event=%s",
                 self._path,
                 event.event_type.value,
-                json.dumps(event._dump_without_delta()),  # type: ignore
+                event._dump_without_delta(),  # type: ignore
             )
         else:
-            log_debug("[%s] send event, type=%s, event=%s", self._path, event.event_type.value, event.model_dump_json())
-        await self._ws.send(event.model_dump_json())
+            log_debug("[%s] send event, type=%s, event=%s", self._path, event.event_type.value, payload)
+        await self._ws.send(payload, **_SEND_KWARGS)
+        self._session_metrics._on_sent(event.event_type.value)
+        if event.event_type in _SESSION_UPDATE_EVENTS:
+            self._session_update = event
+
+
+# audio chunks, which can be dropped without breaking the session
+_AUDIO_DELTA_EVENTS = {WebsocketsEventType.CONVERSATION_AUDIO_DELTA, WebsocketsEventType.SPEECH_AUDIO_UPDATE}
+
+# the session config, re-sent after a reconnect
+_SESSION_UPDATE_EVENTS = {
+    WebsocketsEventType.CHAT_UPDATE,
+    WebsocketsEventType.SPEECH_UPDATE,
+    WebsocketsEventType.TRANSCRIPTIONS_UPDATE,
+}
+
+
+class _AsyncEventBuffer(object):
+    def __init__(self, size: int, overflow: WebsocketsEventsOverflow):
+        if size <= 0:
+            raise ValueError("buffer_size must be greater than 0")
+        self._size = size
+        self._overflow = overflow
+        self._events: Deque[WebsocketsEvent] = collections.deque()
+        self._readable = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._error: Optional[Exception] = None
+        self._closed = False
+
+    async def put(self, event: WebsocketsEvent) -> None:
+        while len(self._events) >= self._size and not self._closed:
+            if self._overflow == WebsocketsEventsOverflow.ERROR:
+                self._error = CozeEventBufferOverflowError(self._size)
+                self.close()
+                return
+            if self._overflow == WebsocketsEventsOverflow.DROP_OLDEST_AUDIO and self._drop_oldest_audio():
+                break
+            self._writable.clear()
+            await self._writable.wait()
+        if self._closed:
+            return
+        self._events.append(event)
+        self._readable.set()
+
+    async def get(self) -> Optional[WebsocketsEvent]:
+        if self._error is not None:
+            raise self._error
+        while not self._events:
+            if self._closed:
+                return None
+            self._readable.clear()
+            await self._readable.wait()
+        event = self._events.popleft()
+        self._writable.set()
+        return event
+
+    def close(self) -> None:
+        self._closed = True
+        self._readable.set()
+        self._writable.set()
+
+    def _drop_oldest_audio(self) -> bool:
+        for i, event in enumerate(self._events):
+            if event.event_type in _AUDIO_DELTA_EVENTS:
+                del self._events[i]
+                log_debug("drop buffered audio event, type=%s", event.event_type.value)
+                return True
+        return False
+
+
+class _AsyncEventWaiter(object):
+    def __init__(self, events: List[WebsocketsEventType], wait_all: bool):
+        self._events = set(events)
+        self._wait_all = wait_all
+        self._completed: Set[str] = set()
+        self.done = asyncio.Event()
+
+    def on_event(self, event_type: str) -> None:
+        if event_type not in self._events:
+            return
+        self._completed.add(event_type)
+        if not self._wait_all or self._completed == self._events:
+            self.done.set()
 
 
 class AsyncWebsocketsBaseEventHandler(object):
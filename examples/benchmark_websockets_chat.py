@@ -3,7 +3,7 @@ import json
 import logging
 import os
 import time
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 from cozepy import (
     COZE_CN_BASE_URL,
@@ -11,14 +11,13 @@ from cozepy import (
     AsyncWebsocketsChatClient,
     AsyncWebsocketsChatEventHandler,
     AudioFormat,
-    ConversationAudioDeltaEvent,
-    ConversationAudioTranscriptCompletedEvent,
     ConversationChatCreatedEvent,
-    ConversationMessageDeltaEvent,
     DeviceOAuthApp,
     InputAudioBufferAppendEvent,
     TokenAuth,
     WebsocketsEventType,
+    WebsocketsLatencyHistogram,
+    WebsocketsSessionMetrics,
     setup_logging,
 )
 from cozepy.log import log_info
@@ -69,11 +68,6 @@ class AsyncWebsocketsChatEventHandlerSub(AsyncWebsocketsChatEventHandler):
     """
 
     logid = ""
-    input_audio_buffer_completed_at = 0
-    conversation_chat_created_at = 0
-    conversation_audio_transcript_completed = 0
-    text_first_token = 0
-    audio_first_token = 0
 
     async def on_error(self, cli: AsyncWebsocketsChatClient, e: Exception):
         import traceback
@@ -83,20 +77,6 @@ class AsyncWebsocketsChatEventHandlerSub(AsyncWebsocketsChatEventHandler):
 
     async def on_conversation_chat_created(self, cli: AsyncWebsocketsChatClient, event: ConversationChatCreatedEvent):
         self.logid = event.detail.logid
-        self.conversation_chat_created_at = get_current_time_ms()
-
-    async def on_conversation_audio_transcript_completed(
-        self, cli: AsyncWebsocketsChatClient, event: ConversationAudioTranscriptCompletedEvent
-    ):
-        self.conversation_audio_transcript_completed = get_current_time_ms()
-
-    async def on_conversation_message_delta(self, cli: AsyncWebsocketsChatClient, event: ConversationMessageDeltaEvent):
-        if self.text_first_token == 0:
-            self.text_first_token = get_current_time_ms()
-
-    async def on_conversation_audio_delta(self, cli: AsyncWebsocketsChatClient, event: ConversationAudioDeltaEvent):
-        if self.audio_first_token == 0:
-            self.audio_first_token = get_current_time_ms()
 
 
 async def generate_audio(coze: AsyncCoze, text: str) -> List[bytes]:
@@ -112,42 +92,24 @@ async def generate_audio(coze: AsyncCoze, text: str) -> List[bytes]:
     return [data for data in content._raw_response.iter_bytes(chunk_size=1024)]
 
 
-def cal_latency(current: int, latency_list: List[int]) -> str:
-    if latency_list is None or len(latency_list) == 0:
+def cal_latency(current: Optional[float], histogram: WebsocketsLatencyHistogram, name: str) -> str:
+    summary = histogram.summary().get(name)
+    if current is None or not summary:
         return "No latency data"
-    if len(latency_list) == 1:
-        return f"P99={latency_list[0]}ms, P90={latency_list[0]}ms, AVG={latency_list[0]}ms"
-
-    # 对延迟数据进行排序
-    sorted_latency = sorted(latency_list)
-    length = len(sorted_latency)
-
-    def fix_index(index):
-        if index < 0:
-            return 0
-        if index >= length:
-            return length - 1
-        return index
-
-    # 计算 P99
-    p99_index = fix_index(round(length * 0.99) - 1)
-    p99 = sorted_latency[p99_index]
-
-    # 计算 P90
-    p90_index = fix_index(round(length * 0.90) - 1)
-    p90 = sorted_latency[p90_index]
-
-    # 计算平均值
-    avg = sum(sorted_latency) / length
-
-    return f"P99={p99}ms, P90={p90}ms, AVG={avg:.2f}ms, CURRENT={current}ms"
+    return (
+        f"P99={summary['p99']:.0f}ms, P90={summary['p90']:.0f}ms, AVG={summary['avg']:.2f}ms, CURRENT={current:.0f}ms"
+    )
 
 
-async def test_latency(coze: AsyncCoze, bot_id: str, audios: List[bytes]) -> AsyncWebsocketsChatEventHandlerSub:
+async def test_latency(
+    coze: AsyncCoze, bot_id: str, audios: List[bytes], histogram: WebsocketsLatencyHistogram
+) -> Tuple[AsyncWebsocketsChatEventHandlerSub, WebsocketsSessionMetrics]:
     handler = AsyncWebsocketsChatEventHandlerSub()
+    # the client times every sent and received event, and feeds the turn latencies into the histogram
     chat = coze.websockets.chat.create(
         bot_id=bot_id,
         on_event=handler,
+        latency_histogram=histogram,
         **kwargs,
     )
 
@@ -165,12 +127,11 @@ async def test_latency(coze: AsyncCoze, bot_id: str, audios: List[bytes]) -> Asy
             await asyncio.sleep(len(delta) * 1.0 / 24000 / 2)
 
         await client.input_audio_buffer_complete()
-        handler.input_audio_buffer_completed_at = int(time.time() * 1000)
         await client.wait(
             events=[WebsocketsEventType.CONVERSATION_MESSAGE_DELTA, WebsocketsEventType.CONVERSATION_AUDIO_DELTA]
         )
 
-    return handler
+    return handler, client.session_metrics
 
 
 async def main():
@@ -188,21 +149,13 @@ async def main():
     audios = await generate_audio(coze, text)
 
     times = 50
-    text_latency = []
-    audio_latency = []
-    asr_latency = []
+    histogram = WebsocketsLatencyHistogram()
     for i in range(times):
-        handler = await test_latency(coze, bot_id, audios)
-        asr = handler.conversation_audio_transcript_completed - handler.input_audio_buffer_completed_at
-        text = handler.text_first_token - handler.input_audio_buffer_completed_at
-        audio = handler.audio_first_token - handler.input_audio_buffer_completed_at
-
-        asr_latency.append(asr)
-        text_latency.append(text)
-        audio_latency.append(audio)
-        print(
-            f"[latency.ws] {i}, asr: {cal_latency(asr, asr_latency)}, text: {cal_latency(text, text_latency)}, audio: {cal_latency(audio, audio_latency)}, log: {handler.logid}"
-        )
+        handler, metrics = await test_latency(coze, bot_id, audios, histogram)
+        asr = cal_latency(metrics.latency("transcript_completed"), histogram, "transcript_completed")
+        text = cal_latency(metrics.latency("first_text"), histogram, "first_text")
+        audio = cal_latency(metrics.latency("first_audio"), histogram, "first_audio")
+        print(f"[latency.ws] {i}, asr: {asr}, text: {text}, audio: {audio}, log: {handler.logid}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,75 @@
+"""
+Micro-benchmark of the websockets event decoding: the received frames of a chat session are replayed through
+the client's decoder, without a connection.
+
+COZE_SESSION_FILE can point to a recorded session, one received frame (json) per line, e.g. collected from the
+`receive event` debug log. Without it, a synthetic session of a spoken turn is used.
+"""
+
+import base64
+import json
+import os
+import time
+from typing import List
+
+from cozepy import TokenAuth, WebsocketsChatClient
+from cozepy.request import Requester
+
+
+def synthetic_session() -> List[str]:
+    chat = {"id": "chat", "conversation_id": "conv", "bot_id": "bot", "status": "in_progress"}
+    frames = [
+        {"event_type": "chat.created"},
+        {"event_type": "chat.updated", "data": {"chat_config": {"user_id": "user"}}},
+        {"event_type": "input_audio_buffer.completed"},
+        {"event_type": "conversation.chat.created", "data": chat},
+        {"event_type": "conversation.audio_transcript.completed", "data": {"content": "tell me a joke"}},
+    ]
+    for i in range(40):
+        frames.append(
+            {
+                "event_type": "conversation.message.delta",
+                "data": {"id": "msg", "role": "assistant", "type": "answer", "content": str(i), "content_type": "text"},
+            }
+        )
+        frames.append(
+            {
+                "event_type": "conversation.audio.delta",
+                "data": {
+                    "id": "msg",
+                    "role": "assistant",
+                    "type": "answer",
+                    "content": base64.b64encode(b"\x00" * 4800).decode(),
+                    "content_type": "audio",
+                },
+            }
+        )
+    frames.append({"event_type": "conversation.message.completed"})
+    frames.append({"event_type": "conversation.chat.completed", "data": dict(chat, status="completed")})
+    return [json.dumps(dict(frame, id=str(i), detail={"logid": "logid"})) for i, frame in enumerate(frames)]
+
+
+def main():
+    session_file = os.getenv("COZE_SESSION_FILE")
+    if session_file:
+        with open(session_file) as f:
+            frames = [line for line in f.read().splitlines() if line.strip()]
+    else:
+        frames = synthetic_session()
+    rounds = int(os.getenv("COZE_ROUNDS") or "200")
+
+    client = WebsocketsChatClient(
+        base_url="ws://127.0.0.1", requester=Requester(auth=TokenAuth("token")), bot_id="bot", on_event={}
+    )
+    messages = [json.loads(frame) for frame in frames]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for message in messages:
+            client._load_all_event(message)
+    cost = time.perf_counter() - start
+    total = rounds * len(messages)
+    print(f"[decode.ws] frames: {total}, cost: {cost:.3f}s, frames/sec: {total / cost:.0f}")
+
+
+if __name__ == "__main__":
+    main()
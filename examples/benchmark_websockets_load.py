@@ -0,0 +1,207 @@
+"""
+Load test of the websockets clients against a local stand-in of the service (websockets_stand_in_server.py,
+started in a subprocess so its cpu is not counted), to catch regressions in cozepy/websockets before deploying.
+
+It runs COZE_SESSIONS AsyncWebsocketsChatClient sessions and COZE_SPEECH_SESSIONS WebsocketsAudioSpeechClient
+sessions, COZE_CONCURRENCY of each at a time, and reports sessions/sec, frames/sec, cpu per session, peak
+memory per concurrent session, and the p50/p99 of the event latencies. Each suite runs in a process of its own,
+so its peak memory is not hidden by the peak of the other one.
+
+    python examples/benchmark_websockets_load.py
+
+Set COZE_WS_BASE_URL to run against a stand-in server started elsewhere.
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from cozepy import (
+    AsyncTokenAuth,
+    AsyncWebsocketsChatClient,
+    InputAudioBufferAppendEvent,
+    InputTextBufferAppendEvent,
+    TokenAuth,
+    WebsocketsAudioSpeechClient,
+    WebsocketsEventType,
+    WebsocketsLatencyHistogram,
+)
+from cozepy.request import Requester
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None  # type: ignore
+
+SESSIONS = int(os.getenv("COZE_SESSIONS") or "200")
+SPEECH_SESSIONS = int(os.getenv("COZE_SPEECH_SESSIONS") or "100")
+CONCURRENCY = int(os.getenv("COZE_CONCURRENCY") or "50")
+# seconds of 24kHz 16bit mono audio sent per chat session, in 20ms frames
+AUDIO_SECONDS = float(os.getenv("COZE_AUDIO_SECONDS") or "1")
+TEXT = os.getenv("COZE_TEXT") or "The quick brown fox jumps over the lazy dog, " * 4
+
+AUDIO_FRAME = b"\x00" * 960
+
+
+class Counter(object):
+    """
+    Frames sent and received by all the sessions of a run.
+    """
+
+    def __init__(self):
+        self.frames = 0
+        self._lock = threading.Lock()
+
+    def add(self, n: int = 1) -> None:
+        with self._lock:
+            self.frames += n
+
+    def handlers(self, event_types: List[WebsocketsEventType]) -> Dict[WebsocketsEventType, Callable]:
+        return {event_type: lambda cli, event: self.add() for event_type in event_types}
+
+    def async_handlers(self, event_types: List[WebsocketsEventType]) -> Dict[WebsocketsEventType, Callable]:
+        async def on_event(cli, event):
+            self.add()
+
+        return {event_type: on_event for event_type in event_types}
+
+
+CHAT_EVENTS = [
+    WebsocketsEventType.CHAT_CREATED,
+    WebsocketsEventType.INPUT_AUDIO_BUFFER_COMPLETED,
+    WebsocketsEventType.CONVERSATION_CHAT_CREATED,
+    WebsocketsEventType.CONVERSATION_AUDIO_TRANSCRIPT_COMPLETED,
+    WebsocketsEventType.CONVERSATION_MESSAGE_DELTA,
+    WebsocketsEventType.CONVERSATION_AUDIO_DELTA,
+    WebsocketsEventType.CONVERSATION_MESSAGE_COMPLETED,
+    WebsocketsEventType.CONVERSATION_AUDIO_COMPLETED,
+    WebsocketsEventType.CONVERSATION_CHAT_COMPLETED,
+]
+
+SPEECH_EVENTS = [
+    WebsocketsEventType.SPEECH_CREATED,
+    WebsocketsEventType.INPUT_TEXT_BUFFER_COMPLETED,
+    WebsocketsEventType.SPEECH_AUDIO_UPDATE,
+    WebsocketsEventType.SPEECH_AUDIO_COMPLETED,
+]
+
+
+async def chat_session(base_url: str, counter: Counter, histogram: WebsocketsLatencyHistogram) -> None:
+    client = AsyncWebsocketsChatClient(
+        base_url=base_url,
+        requester=Requester(auth=AsyncTokenAuth("token")),
+        bot_id="bot",
+        on_event=counter.async_handlers(CHAT_EVENTS),
+        latency_histogram=histogram,
+    )
+    async with client():
+        for _ in range(int(AUDIO_SECONDS * 50)):
+            await client.input_audio_buffer_append(InputAudioBufferAppendEvent.Data(delta=AUDIO_FRAME))
+            counter.add()
+        await client.input_audio_buffer_complete()
+        counter.add()
+        await client.wait()
+
+
+def speech_session(base_url: str, counter: Counter, histogram: WebsocketsLatencyHistogram) -> None:
+    client = WebsocketsAudioSpeechClient(
+        base_url=base_url,
+        requester=Requester(auth=TokenAuth("token")),
+        on_event=counter.handlers(SPEECH_EVENTS),
+        latency_histogram=histogram,
+    )
+    with client():
+        client.input_text_buffer_append(InputTextBufferAppendEvent.Data(delta=TEXT))
+        client.input_text_buffer_complete()
+        counter.add(2)
+        client.wait()
+
+
+def max_rss_kb() -> Optional[int]:
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macos, kilobytes on linux
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def report(name: str, sessions: int, counter: Counter, histogram: WebsocketsLatencyHistogram, run: Callable) -> None:
+    # the peak rss of the process before the run, the suite runs in a fresh process so it is the baseline
+    rss = max_rss_kb()
+    cpu, wall = time.process_time(), time.perf_counter()
+    run()
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    peak_rss = max_rss_kb()
+
+    print(f"[load.ws] {name}: sessions={sessions}, concurrency={CONCURRENCY}, wall={wall:.2f}s")
+    print(f"[load.ws] {name}: sessions/sec={sessions / wall:.1f}, frames/sec={counter.frames / wall:.0f}")
+    # the growth of the peak is held by the sessions open at once, not by all the sessions of the run
+    concurrent = min(sessions, CONCURRENCY)
+    memory = f"{(peak_rss - rss) / concurrent:.0f}KB" if rss is not None and peak_rss is not None else "n/a"
+    print(f"[load.ws] {name}: cpu/session={cpu / sessions * 1000:.2f}ms")
+    print(f"[load.ws] {name}: peak memory/concurrent session={memory} ({concurrent} concurrent sessions)")
+    for latency, summary in sorted(histogram.summary().items()):
+        print(f"[load.ws] {name}: {latency}: p50={summary['p50']:.1f}ms, p99={summary['p99']:.1f}ms")
+
+
+def run_chat(base_url: str) -> None:
+    counter, histogram = Counter(), WebsocketsLatencyHistogram(window=SESSIONS)
+
+    async def run():
+        semaphore = asyncio.Semaphore(CONCURRENCY)
+
+        async def session():
+            async with semaphore:
+                await chat_session(base_url, counter, histogram)
+
+        await asyncio.gather(*[session() for _ in range(SESSIONS)])
+
+    report("chat", SESSIONS, counter, histogram, lambda: asyncio.run(run()))
+
+
+def run_speech(base_url: str) -> None:
+    counter, histogram = Counter(), WebsocketsLatencyHistogram(window=SPEECH_SESSIONS)
+
+    def run():
+        with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
+            for future in [
+                executor.submit(speech_session, base_url, counter, histogram) for _ in range(SPEECH_SESSIONS)
+            ]:
+                future.result()
+
+    report("speech", SPEECH_SESSIONS, counter, histogram, run)
+
+
+SUITES = {"chat": (run_chat, SESSIONS), "speech": (run_speech, SPEECH_SESSIONS)}
+
+
+def main():
+    if len(sys.argv) > 1:
+        # one suite, in the process started below
+        SUITES[sys.argv[1]][0](os.environ["COZE_WS_BASE_URL"])
+        return
+
+    base_url = os.getenv("COZE_WS_BASE_URL")
+    server = None
+    if not base_url:
+        server_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "websockets_stand_in_server.py")
+        server = subprocess.Popen([sys.executable, server_file], stdout=subprocess.PIPE, text=True)
+        base_url = server.stdout.readline().strip()  # type: ignore
+    try:
+        env = dict(os.environ, COZE_WS_BASE_URL=base_url)
+        for name, (_, sessions) in SUITES.items():
+            if sessions:
+                subprocess.run([sys.executable, os.path.abspath(__file__), name], env=env, check=True)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -18,7 +18,7 @@ from cozepy import (
     setup_logging,
 )
 from cozepy.log import log_info
-from cozepy.util import write_pcm_to_wav_file
+from cozepy.util import AsyncWavFileWriter
 
 
 def get_coze_api_base() -> str:
@@ -61,7 +61,9 @@ class AsyncWebsocketsAudioSpeechEventHandlerSub(AsyncWebsocketsAudioSpeechEventH
     Class is not required, you can also use Dict to set callback
     """
 
-    delta = []
+    def __init__(self):
+        # the audio is written to disk as it arrives
+        self.wav = AsyncWavFileWriter("output.wav")
 
     async def on_input_text_buffer_completed(
         self, cli: "AsyncWebsocketsAudioSpeechClient", event: InputTextBufferCompletedEvent
@@ -69,7 +71,7 @@ class AsyncWebsocketsAudioSpeechEventHandlerSub(AsyncWebsocketsAudioSpeechEventH
         log_info("[examples] Input text buffer completed")
 
     async def on_speech_audio_update(self, cli: AsyncWebsocketsAudioSpeechClient, event: SpeechAudioUpdateEvent):
-        self.delta.append(event.data.delta)
+        await self.wav.write(event.data.delta)
 
     async def on_error(self, cli: AsyncWebsocketsAudioSpeechClient, e: Exception):
         log_info("[examples] Error occurred: %s", e)
@@ -78,8 +80,7 @@ class AsyncWebsocketsAudioSpeechEventHandlerSub(AsyncWebsocketsAudioSpeechEventH
         self, cli: "AsyncWebsocketsAudioSpeechClient", event: SpeechAudioCompletedEvent
     ):
         log_info("[examples] Saving audio data to output.wav")
-        write_pcm_to_wav_file(b"".join(self.delta), "output.wav")
-        self.delta = []
+        await self.wav.close()
 
 
 async def main():
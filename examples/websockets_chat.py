@@ -25,7 +25,7 @@ from cozepy import (
     setup_logging,
 )
 from cozepy.log import log_info
-from cozepy.util import write_pcm_to_wav_file
+from cozepy.util import AsyncWavFileWriter
 
 
 def get_coze_api_base() -> str:
@@ -68,7 +68,9 @@ class AsyncWebsocketsChatEventHandlerSub(AsyncWebsocketsChatEventHandler):
     Class is not required, you can also use Dict to set callback
     """
 
-    delta = []
+    def __init__(self):
+        # the audio is written to disk as it arrives
+        self.wav = AsyncWavFileWriter("output.wav")
 
     async def on_error(self, cli: AsyncWebsocketsChatClient, e: Exception):
         import traceback
@@ -107,13 +109,13 @@ class AsyncWebsocketsChatEventHandlerSub(AsyncWebsocketsChatEventHandler):
         )
 
     async def on_conversation_audio_delta(self, cli: AsyncWebsocketsChatClient, event: ConversationAudioDeltaEvent):
-        self.delta.append(event.data.get_audio())
+        await self.wav.write(event.data.get_audio())
 
     async def on_conversation_chat_completed(
         self, cli: "AsyncWebsocketsChatClient", event: ConversationChatCompletedEvent
     ):
         log_info("[examples] Saving audio data to output.wav")
-        write_pcm_to_wav_file(b"".join(self.delta), "output.wav")
+        await self.wav.close()
 
     async def on_conversation_chat_canceled(
         self, cli: "AsyncWebsocketsChatClient", event: ConversationChatCanceledEvent
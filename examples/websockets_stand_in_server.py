@@ -0,0 +1,105 @@
+"""
+A local stand-in for the coze websocket service, which emulates the event timing of `v1/chat` and
+`v1/audio/speech`. Used by benchmark_websockets_load.py, it can also be started on its own:
+
+    python examples/websockets_stand_in_server.py 8765
+
+The delays (seconds) and sizes can be tuned with COZE_STAND_IN_ASR_DELAY, COZE_STAND_IN_FIRST_TOKEN_DELAY,
+COZE_STAND_IN_DELTA_INTERVAL and COZE_STAND_IN_DELTAS.
+"""
+
+import asyncio
+import base64
+import json
+import os
+import sys
+import uuid
+
+from websockets.asyncio.server import ServerConnection, serve
+
+# time from input_audio_buffer.complete to the transcript
+ASR_DELAY = float(os.getenv("COZE_STAND_IN_ASR_DELAY") or "0.05")
+# time from the transcript to the first text and audio delta
+FIRST_TOKEN_DELAY = float(os.getenv("COZE_STAND_IN_FIRST_TOKEN_DELAY") or "0.1")
+# time between two deltas
+DELTA_INTERVAL = float(os.getenv("COZE_STAND_IN_DELTA_INTERVAL") or "0.02")
+# text and audio deltas per answer
+DELTAS = int(os.getenv("COZE_STAND_IN_DELTAS") or "20")
+# 100ms of 24kHz 16bit mono pcm per audio delta
+AUDIO_DELTA = base64.b64encode(b"\x00" * 4800).decode()
+
+
+async def send(ws: ServerConnection, event_type: str, data=None) -> None:
+    event = {"id": str(uuid.uuid4()), "event_type": event_type, "detail": {"logid": "stand-in"}}
+    if data is not None:
+        event["data"] = data
+    await ws.send(json.dumps(event))
+
+
+async def chat(ws: ServerConnection) -> None:
+    await send(ws, "chat.created")
+    chat = {"id": "chat", "conversation_id": "conversation", "bot_id": "bot", "status": "in_progress"}
+    message = {"id": "message", "role": "assistant", "type": "answer"}
+    audio_bytes = 0
+    async for raw in ws:
+        event = json.loads(raw)
+        event_type = event["event_type"]
+        if event_type == "chat.update":
+            await send(ws, "chat.updated", event.get("data") or {})
+        elif event_type == "input_audio_buffer.append":
+            audio_bytes += len(event["data"]["delta"])
+        elif event_type == "input_audio_buffer.complete":
+            await send(ws, "input_audio_buffer.completed")
+            await asyncio.sleep(ASR_DELAY)
+            await send(ws, "conversation.chat.created", chat)
+            await send(ws, "conversation.audio_transcript.completed", {"content": f"{audio_bytes} bytes of audio"})
+            await asyncio.sleep(FIRST_TOKEN_DELAY)
+            for i in range(DELTAS):
+                await send(ws, "conversation.message.delta", dict(message, content=str(i), content_type="text"))
+                await send(ws, "conversation.audio.delta", dict(message, content=AUDIO_DELTA, content_type="audio"))
+                await asyncio.sleep(DELTA_INTERVAL)
+            await send(ws, "conversation.message.completed")
+            await send(ws, "conversation.audio.completed")
+            await send(ws, "conversation.chat.completed", dict(chat, status="completed"))
+            audio_bytes = 0
+
+
+async def speech(ws: ServerConnection) -> None:
+    await send(ws, "speech.created")
+    text = ""
+    async for raw in ws:
+        event = json.loads(raw)
+        event_type = event["event_type"]
+        if event_type == "input_text_buffer.append":
+            text += event["data"]["delta"]
+        elif event_type == "input_text_buffer.complete":
+            await send(ws, "input_text_buffer.completed")
+            await asyncio.sleep(FIRST_TOKEN_DELAY)
+            # about one audio delta per 5 characters
+            for _ in range(max(len(text) // 5, 1)):
+                await send(ws, "speech.audio.update", {"delta": AUDIO_DELTA})
+                await asyncio.sleep(DELTA_INTERVAL)
+            await send(ws, "speech.audio.completed")
+            text = ""
+
+
+async def handler(ws: ServerConnection) -> None:
+    path = ws.request.path if ws.request else ""
+    if path.startswith("/v1/chat"):
+        await chat(ws)
+    elif path.startswith("/v1/audio/speech"):
+        await speech(ws)
+    else:
+        await ws.close(code=4004, reason=f"unknown path: {path}")
+
+
+async def main(port: int) -> None:
+    async with serve(handler, "127.0.0.1", port, max_size=None) as server:
+        port = list(server.sockets)[0].getsockname()[1]
+        # the load benchmark reads the port from the first line
+        print(f"ws://127.0.0.1:{port}", flush=True)
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 0))
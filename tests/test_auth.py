@@ -1,4 +1,7 @@
+import asyncio
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import httpx
 import pytest
@@ -6,6 +9,7 @@ import pytest
 from cozepy import (
     COZE_COM_BASE_URL,
     AsyncDeviceOAuthApp,
+    AsyncJWTAuth,
     AsyncJWTOAuthApp,
     AsyncPKCEOAuthApp,
     AsyncWebOAuthApp,
@@ -221,6 +225,139 @@ class TestAsyncJWTOAuthApp:
         assert token.access_token == mock_token
 
 
+def mock_jwt_tokens(respx_mock, expires_in, delay: float = 0, fail: bool = False):
+    """
+    Mock the token endpoint, the nth token expires expires_in[n] seconds from now.
+    """
+    tokens = []
+
+    def handler(request: httpx.Request):
+        if delay:
+            time.sleep(delay)
+        if fail and tokens:
+            return httpx.Response(500, json={"error_code": "internal_error"})
+        token = OAuthToken(access_token=random_hex(20), expires_in=int(time.time()) + expires_in[len(tokens)])
+        tokens.append(token.access_token)
+        return httpx.Response(200, content=token.model_dump_json())
+
+    return respx_mock.post("/api/permission/oauth2/token").mock(side_effect=handler), tokens
+
+
+@pytest.mark.respx(base_url="https://api.coze.com")
+class TestJWTAuth:
+    def test_single_flight(self, respx_mock):
+        route, tokens = mock_jwt_tokens(respx_mock, [3600], delay=0.1)
+        auth = JWTAuth("client id", read_file("testdata/private_key.pem"), "public key id")
+        barrier = threading.Barrier(8)
+
+        def get_token(_):
+            barrier.wait()
+            return auth.token
+
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(get_token, range(8)))
+
+        assert route.call_count == 1
+        assert results == tokens * 8
+
+    def test_refresh_ahead(self, respx_mock):
+        route, tokens = mock_jwt_tokens(respx_mock, [30, 3600])
+        auth = JWTAuth("client id", read_file("testdata/private_key.pem"), "public key id", refresh_ahead=60)
+
+        assert auth.token == tokens[0]
+        # expires in 30 seconds, within the refresh window
+        assert auth.token == tokens[1]
+        assert auth.token == tokens[1]
+        assert route.call_count == 2
+
+    def test_refresh_ahead_failed(self, respx_mock):
+        route, tokens = mock_jwt_tokens(respx_mock, [30], fail=True)
+        auth = JWTAuth("client id", read_file("testdata/private_key.pem"), "public key id", refresh_ahead=60)
+
+        assert auth.token == tokens[0]
+        # the token is still valid
+        assert auth.token == tokens[0]
+        assert route.call_count == 2
+
+    def test_refresh_ahead_at_most_half_ttl(self, respx_mock):
+        route, tokens = mock_jwt_tokens(respx_mock, [100])
+        auth = JWTAuth("client id", read_file("testdata/private_key.pem"), "public key id", ttl=100)
+
+        assert auth.token == tokens[0]
+        assert auth.token == tokens[0]
+        assert route.call_count == 1
+
+    def test_background_refresh(self, respx_mock):
+        route, tokens = mock_jwt_tokens(respx_mock, [61, 3600])
+        auth = JWTAuth(
+            "client id",
+            read_file("testdata/private_key.pem"),
+            "public key id",
+            refresh_ahead=60,
+            background_refresh=True,
+        )
+        try:
+            assert auth.token == tokens[0]
+            deadline = time.monotonic() + 3
+            while route.call_count < 2 and time.monotonic() < deadline:
+                time.sleep(0.05)
+
+            assert route.call_count == 2
+            assert auth._token.access_token == tokens[1]
+        finally:
+            auth.close()
+
+
+@pytest.mark.respx(base_url="https://api.coze.com")
+@pytest.mark.asyncio
+class TestAsyncJWTAuth:
+    async def test_single_flight(self, respx_mock):
+        route, tokens = mock_jwt_tokens(respx_mock, [3600])
+        auth = AsyncJWTAuth("client id", read_file("testdata/private_key.pem"), "public key id")
+
+        results = await asyncio.gather(*[auth.atoken for _ in range(8)])
+
+        assert route.call_count == 1
+        assert results == tokens * 8
+
+    async def test_refresh_ahead(self, respx_mock):
+        route, tokens = mock_jwt_tokens(respx_mock, [30, 3600])
+        auth = AsyncJWTAuth("client id", read_file("testdata/private_key.pem"), "public key id", refresh_ahead=60)
+
+        assert await auth.atoken == tokens[0]
+        assert await auth.atoken == tokens[1]
+        assert await auth.atoken == tokens[1]
+        assert route.call_count == 2
+
+    async def test_refresh_ahead_failed(self, respx_mock):
+        route, tokens = mock_jwt_tokens(respx_mock, [30], fail=True)
+        auth = AsyncJWTAuth("client id", read_file("testdata/private_key.pem"), "public key id", refresh_ahead=60)
+
+        assert await auth.atoken == tokens[0]
+        assert await auth.atoken == tokens[0]
+        assert route.call_count == 2
+
+    async def test_background_refresh(self, respx_mock):
+        route, tokens = mock_jwt_tokens(respx_mock, [61, 3600])
+        auth = AsyncJWTAuth(
+            "client id",
+            read_file("testdata/private_key.pem"),
+            "public key id",
+            refresh_ahead=60,
+            background_refresh=True,
+        )
+        try:
+            assert await auth.atoken == tokens[0]
+            deadline = time.monotonic() + 3
+            while route.call_count < 2 and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+
+            assert route.call_count == 2
+            assert await auth.atoken == tokens[1]
+        finally:
+            auth.close()
+
+
 @pytest.mark.respx(base_url="https://api.coze.com")
 class TestPKCEOAuthApp:
     def test_get_oauth_url(self, respx_mock):
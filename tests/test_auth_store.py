@@ -0,0 +1,219 @@
+import asyncio
+import os
+import stat
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from cozepy import (
+    AsyncJWTAuth,
+    FileTokenStore,
+    JWTAuth,
+    JWTOAuthApp,
+    MemoryTokenStore,
+    OAuthToken,
+    SharedMemoryTokenStore,
+)
+from cozepy.auth.store import _HEADER, _AsyncTokenLock
+
+from .test_auth import mock_jwt_tokens
+from .test_util import read_file
+
+
+def new_jwt_auth(token_store, **kwargs) -> JWTAuth:
+    return JWTAuth(
+        "client id", read_file("testdata/private_key.pem"), "public key id", token_store=token_store, **kwargs
+    )
+
+
+def new_async_jwt_auth(token_store, **kwargs) -> AsyncJWTAuth:
+    return AsyncJWTAuth(
+        "client id", read_file("testdata/private_key.pem"), "public key id", token_store=token_store, **kwargs
+    )
+
+
+@pytest.mark.respx(base_url="https://api.coze.com")
+class TestTokenStore:
+    def test_memory_store(self, respx_mock):
+        route, tokens = mock_jwt_tokens(respx_mock, [3600])
+        store = MemoryTokenStore()
+
+        assert new_jwt_auth(store).token == tokens[0]
+        assert new_jwt_auth(store).token == tokens[0]
+        assert route.call_count == 1
+
+    def test_file_store(self, respx_mock, tmp_path):
+        route, tokens = mock_jwt_tokens(respx_mock, [3600])
+        path = str(tmp_path / "tokens.json")
+
+        assert new_jwt_auth(FileTokenStore(path)).token == tokens[0]
+        # another process
+        assert new_jwt_auth(FileTokenStore(path)).token == tokens[0]
+        assert route.call_count == 1
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+    def test_file_store_single_flight(self, respx_mock, tmp_path):
+        route, tokens = mock_jwt_tokens(respx_mock, [3600], delay=0.1)
+        path = str(tmp_path / "tokens.json")
+        # each with its own file descriptors, like the workers of a server
+        auths = [new_jwt_auth(FileTokenStore(path)) for _ in range(8)]
+        barrier = threading.Barrier(8)
+
+        def get_token(auth):
+            barrier.wait()
+            return auth.token
+
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(get_token, auths))
+
+        assert route.call_count == 1
+        assert results == tokens * 8
+
+    def test_file_store_refresh_ahead(self, respx_mock, tmp_path):
+        route, tokens = mock_jwt_tokens(respx_mock, [30, 3600])
+        path = str(tmp_path / "tokens.json")
+
+        assert new_jwt_auth(FileTokenStore(path), refresh_ahead=60).token == tokens[0]
+        # the stored token is about to expire
+        assert new_jwt_auth(FileTokenStore(path), refresh_ahead=60).token == tokens[1]
+        assert route.call_count == 2
+
+    def test_file_store_default_path(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+        store = FileTokenStore()
+
+        store.set("key", OAuthToken(access_token="token", expires_in=1))
+
+        assert store.get("key") == OAuthToken(access_token="token", expires_in=1)
+        assert os.path.exists(tmp_path / "cozepy" / "tokens.json")
+        assert stat.S_IMODE(os.stat(tmp_path / "cozepy").st_mode) == 0o700
+
+    def test_file_store_default_path_insecure(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+        os.mkdir(tmp_path / "cozepy", 0o777)
+        os.chmod(tmp_path / "cozepy", 0o777)
+
+        with pytest.raises(PermissionError):
+            FileTokenStore()
+
+    def test_file_store_invalid(self, tmp_path):
+        path = tmp_path / "tokens.json"
+        path.write_text("{")
+        store = FileTokenStore(str(path))
+
+        assert store.get("key") is None
+        store.set("key", OAuthToken(access_token="token", expires_in=1))
+        assert store.get("key") == OAuthToken(access_token="token", expires_in=1)
+
+    def test_shared_memory_store(self, respx_mock):
+        route, tokens = mock_jwt_tokens(respx_mock, [3600])
+        store = SharedMemoryTokenStore()
+
+        assert store.get("key") is None
+        assert new_jwt_auth(store).token == tokens[0]
+        assert new_jwt_auth(store).token == tokens[0]
+        assert route.call_count == 1
+
+    def test_shared_memory_store_writing(self):
+        store = SharedMemoryTokenStore(lock_timeout=0.1)
+        store.set("key", OAuthToken(access_token="token", expires_in=1))
+        seq, size = _HEADER.unpack_from(store._memory, 0)
+        # a writer died in the middle
+        _HEADER.pack_into(store._memory, 0, seq + 1, size)
+
+        assert store.get("key") is None
+        # the store was emptied, the next reads do not wait for the dead writer
+        assert _HEADER.unpack_from(store._memory, 0) == (seq + 2, 0)
+        store.set("key", OAuthToken(access_token="new", expires_in=1))
+        assert store.get("key") == OAuthToken(access_token="new", expires_in=1)
+
+    def test_shared_memory_store_too_small(self):
+        store = SharedMemoryTokenStore(size=64)
+
+        with pytest.raises(ValueError):
+            store.set("key", OAuthToken(access_token="x" * 64, expires_in=1))
+
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+    def test_shared_memory_store_fork(self):
+        store = SharedMemoryTokenStore()
+        token = OAuthToken(access_token="token", expires_in=int(time.time()) + 3600)
+        pid = os.fork()
+        if pid == 0:
+            try:
+                with store.lock("key"):
+                    store.set("key", token)
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+
+        assert store.get("key") == token
+
+    def test_oauth_app_store(self, respx_mock):
+        route, tokens = mock_jwt_tokens(respx_mock, [3600, 3600])
+        store = MemoryTokenStore()
+        app = JWTOAuthApp("client id", read_file("testdata/private_key.pem"), "public key id", token_store=store)
+
+        assert app.get_access_token(3600).access_token == tokens[0]
+        assert app.get_access_token(3600).access_token == tokens[0]
+        assert app.get_access_token(3600, session_name="session").access_token != tokens[0]
+        assert route.call_count == 2
+
+    def test_oauth_app_store_refresh_ahead(self, respx_mock, monkeypatch):
+        route, tokens = mock_jwt_tokens(respx_mock, [40, 100])
+        store = MemoryTokenStore()
+        app = JWTOAuthApp(
+            "client id", read_file("testdata/private_key.pem"), "public key id", token_store=store, refresh_ahead=10
+        )
+        assert app.get_access_token(100).access_token == tokens[0]
+        reads = []
+        get = store.get
+        monkeypatch.setattr(store, "get", lambda key: reads.append(key) or get(key))
+        # a ttl shorter than twice refresh_ahead: the token is refreshed 50s before it expires, in the store too
+        auth = JWTAuth(oauth_app=app, ttl=100, refresh_ahead=60)
+
+        assert auth.token == tokens[1]
+        assert auth.token == tokens[1]
+        assert route.call_count == 2
+        assert len(reads) == 2
+
+    def test_oauth_app_and_store(self):
+        app = JWTOAuthApp("client id", read_file("testdata/private_key.pem"), "public key id")
+
+        with pytest.raises(ValueError):
+            JWTAuth(oauth_app=app, token_store=MemoryTokenStore())
+
+
+@pytest.mark.respx(base_url="https://api.coze.com")
+@pytest.mark.asyncio
+class TestAsyncTokenStore:
+    async def test_file_store(self, respx_mock, tmp_path):
+        route, tokens = mock_jwt_tokens(respx_mock, [3600])
+        path = str(tmp_path / "tokens.json")
+        auths = [new_async_jwt_auth(FileTokenStore(path)) for _ in range(4)]
+
+        results = await asyncio.gather(*[auth.atoken for auth in auths])
+
+        assert route.call_count == 1
+        assert results == tokens * 4
+
+    async def test_lock_cancelled(self):
+        store = MemoryTokenStore()
+        store.lock("key").acquire()
+
+        async def hold():
+            async with _AsyncTokenLock(store, "key"):
+                pass
+
+        task = asyncio.ensure_future(hold())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        store.lock("key").release()
+
+        # acquired by the executor after the cancel, and released
+        await asyncio.sleep(0.05)
+        assert store.lock("key").acquire(timeout=1)
+        store.lock("key").release()
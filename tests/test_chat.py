@@ -519,3 +519,20 @@ class TestAsyncChatConversationMessage:
         assert res.response.logid is not None
         assert res.response.logid == mock_logid
         assert res.conversation_id == conversation_id
+
+    async def test_async_chat_poll(self, respx_mock):
+        coze = AsyncCoze(auth=AsyncTokenAuth(token="token"))
+
+        conversation_id = "conversation_id"
+        mock_chat, mock_list_message_logid = mock_chat_poll(
+            respx_mock,
+            conversation_id,
+        )
+
+        res = await coze.chat.create_and_poll(bot_id="bot", user_id="user")
+
+        assert res
+        assert res.chat.response.logid == mock_chat.response.logid
+        assert res.chat.conversation_id == conversation_id
+        assert res.messages
+        assert res.messages[0].content == "hi"
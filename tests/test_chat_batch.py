@@ -0,0 +1,253 @@
+import asyncio
+import io
+import json
+import os
+import tempfile
+
+import httpx
+import pytest
+
+from cozepy import AsyncCoze, AsyncTokenAuth, ChatBatchRequest, ChatStatus, Coze, Message, TokenAuth
+from cozepy.util import random_hex
+from tests.test_chat import make_chat
+from tests.test_util import logid_key
+
+
+def mock_chat_batch_failed(respx_mock, status_code: int = 500):
+    return respx_mock.post("/v3/chat").mock(
+        httpx.Response(status_code, json={"code": 4000, "msg": "invalid"}, headers={logid_key(): random_hex(10)})
+    )
+
+
+def mock_chat_batch(respx_mock, fail_times: int = 0, status: ChatStatus = ChatStatus.COMPLETED):
+    chat = make_chat("conversation_id", status)
+    responses = [
+        httpx.Response(503, json={"code": 5000, "msg": "unavailable"}, headers={logid_key(): random_hex(10)})
+        for _ in range(fail_times)
+    ]
+    responses.append(httpx.Response(200, json={"data": chat.model_dump()}, headers={logid_key(): random_hex(10)}))
+    route = respx_mock.post("/v3/chat")
+    if fail_times:
+        route.side_effect = responses
+    else:
+        route.mock(responses[0])
+
+    msg = Message.build_assistant_answer("hi")
+    respx_mock.get("/v3/chat/message/list").mock(
+        httpx.Response(200, json={"data": [msg.model_dump()]}, headers={logid_key(): random_hex(10)})
+    )
+    return route
+
+
+def make_requests(n: int):
+    return [
+        {
+            "bot_id": "bot",
+            "user_id": "user_{}".format(i),
+            "additional_messages": [Message.build_user_question_text("hi")],
+        }
+        for i in range(n)
+    ]
+
+
+@pytest.mark.respx(base_url="https://api.coze.com")
+class TestSyncChatBatch:
+    def test_sync_chat_batch_ordered(self, respx_mock):
+        coze = Coze(auth=TokenAuth(token="token"))
+        mock_chat_batch(respx_mock)
+
+        results = list(coze.chat.batch(make_requests(5), concurrency=2))
+
+        assert [r.index for r in results] == [0, 1, 2, 3, 4]
+        assert all(r.succeeded for r in results)
+        assert results[3].request.user_id == "user_3"
+        assert results[0].chat.status == ChatStatus.COMPLETED
+        assert results[0].messages[0].content == "hi"
+
+    def test_sync_chat_batch_unordered_run(self, respx_mock):
+        coze = Coze(auth=TokenAuth(token="token"))
+        mock_chat_batch(respx_mock)
+        seen = []
+        output = io.StringIO()
+
+        batch = coze.chat.batch(make_requests(6), concurrency=3, ordered=False, on_result=seen.append, output=output)
+        report = batch.run()
+
+        assert sorted(r.index for r in seen) == list(range(6))
+        assert report.total == 6
+        assert report.succeeded == 6
+        assert report.failed == 0
+        assert batch.report == report
+        lines = output.getvalue().splitlines()
+        assert len(lines) == 6
+        assert json.loads(lines[0])["chat"]["status"] == "completed"
+
+    def test_sync_chat_batch_retry(self, respx_mock):
+        coze = Coze(auth=TokenAuth(token="token"))
+        route = mock_chat_batch(respx_mock, fail_times=1)
+
+        results = list(coze.chat.batch([ChatBatchRequest(bot_id="bot", user_id="user")], retry_interval=0))
+
+        assert route.call_count == 2
+        assert results[0].succeeded
+        assert results[0].attempts == 2
+
+    def test_sync_chat_batch_failed(self, respx_mock):
+        coze = Coze(auth=TokenAuth(token="token"))
+        route = mock_chat_batch_failed(respx_mock)
+
+        with tempfile.TemporaryDirectory() as d:
+            output = os.path.join(d, "results.jsonl")
+            batch = coze.chat.batch(make_requests(1), max_retries=1, retry_interval=0, output=output)
+            report = batch.run()
+            with open(output) as f:
+                line = json.loads(f.readline())
+
+        assert route.call_count == 2
+        assert report.failed == 1
+        assert line["attempts"] == 2
+        assert "invalid" in line["error"]
+
+    def test_sync_chat_batch_not_retryable(self, respx_mock):
+        coze = Coze(auth=TokenAuth(token="token"))
+        route = mock_chat_batch_failed(respx_mock, status_code=200)
+
+        results = list(coze.chat.batch(make_requests(1), max_retries=2, retry_interval=0))
+
+        assert route.call_count == 1
+        assert results[0].attempts == 1
+        assert "invalid" in results[0].error
+
+    def test_sync_chat_batch_chat_failed(self, respx_mock):
+        coze = Coze(auth=TokenAuth(token="token"))
+        route = mock_chat_batch(respx_mock, status=ChatStatus.FAILED)
+
+        results = list(coze.chat.batch(make_requests(1), max_retries=1, retry_interval=0))
+
+        assert route.call_count == 2
+        assert not results[0].succeeded
+        assert results[0].attempts == 2
+        assert results[0].chat.status == ChatStatus.FAILED
+        assert "failed" in results[0].error
+
+    def test_sync_chat_batch_requires_action(self, respx_mock):
+        coze = Coze(auth=TokenAuth(token="token"))
+        route = mock_chat_batch(respx_mock, status=ChatStatus.REQUIRES_ACTION)
+
+        report = coze.chat.batch(make_requests(1), max_retries=1, retry_interval=0).run()
+
+        assert route.call_count == 1
+        assert report.failed == 1
+
+    def test_sync_chat_batch_report_latencies(self, respx_mock, monkeypatch):
+        import cozepy.chat.batch
+
+        coze = Coze(auth=TokenAuth(token="token"))
+        mock_chat_batch(respx_mock)
+        monkeypatch.setattr(cozepy.chat.batch, "_LATENCY_SAMPLES", 2)
+        batch = coze.chat.batch(make_requests(5), concurrency=2)
+
+        report = batch.run()
+
+        assert report.succeeded == 5
+        assert len(batch._collector._latencies) == 2
+
+    def test_sync_chat_batch_invalid_request(self, respx_mock):
+        coze = Coze(auth=TokenAuth(token="token"))
+        route = mock_chat_batch(respx_mock)
+        requests = make_requests(3)
+        del requests[1]["user_id"]
+
+        results = list(coze.chat.batch(requests, concurrency=2))
+
+        assert route.call_count == 2
+        assert [r.succeeded for r in results] == [True, False, True]
+        assert results[1].request is None
+        assert results[1].attempts == 0
+        assert "user_id" in results[1].error
+
+    def test_sync_chat_batch_iterate_once(self, respx_mock):
+        coze = Coze(auth=TokenAuth(token="token"))
+        mock_chat_batch(respx_mock)
+
+        batch = coze.chat.batch(make_requests(1))
+        batch.run()
+        with pytest.raises(ValueError):
+            batch.run()
+
+    def test_sync_chat_batch_invalid_concurrency(self):
+        coze = Coze(auth=TokenAuth(token="token"))
+
+        with pytest.raises(ValueError):
+            coze.chat.batch(make_requests(1), concurrency=0)
+
+
+@pytest.mark.respx(base_url="https://api.coze.com")
+@pytest.mark.asyncio
+class TestAsyncChatBatch:
+    async def test_async_chat_batch_ordered(self, respx_mock):
+        coze = AsyncCoze(auth=AsyncTokenAuth(token="token"))
+        mock_chat_batch(respx_mock)
+
+        results = [r async for r in coze.chat.batch(make_requests(5), concurrency=2)]
+
+        assert [r.index for r in results] == [0, 1, 2, 3, 4]
+        assert all(r.succeeded for r in results)
+        assert results[0].messages[0].content == "hi"
+
+    async def test_async_chat_batch_unordered_run(self, respx_mock):
+        coze = AsyncCoze(auth=AsyncTokenAuth(token="token"))
+        mock_chat_batch(respx_mock)
+        seen = []
+
+        async def on_result(result):
+            seen.append(result)
+
+        async def requests():
+            for request in make_requests(4):
+                yield request
+
+        report = await coze.chat.batch(requests(), concurrency=3, ordered=False, on_result=on_result).run()
+
+        assert sorted(r.index for r in seen) == list(range(4))
+        assert report.total == 4
+        assert report.succeeded == 4
+
+    async def test_async_chat_batch_retry(self, respx_mock):
+        coze = AsyncCoze(auth=AsyncTokenAuth(token="token"))
+        route = mock_chat_batch_failed(respx_mock)
+
+        report = await coze.chat.batch(make_requests(1), max_retries=1, retry_interval=0).run()
+
+        assert route.call_count == 2
+        assert report.failed == 1
+
+    async def test_async_chat_batch_invalid_request(self, respx_mock):
+        coze = AsyncCoze(auth=AsyncTokenAuth(token="token"))
+        mock_chat_batch(respx_mock)
+        requests = make_requests(2)
+        requests[0]["bot_id"] = None
+
+        report = await coze.chat.batch(requests).run()
+
+        assert report.failed == 1
+        assert report.succeeded == 1
+
+    async def test_async_chat_batch_close_early(self, respx_mock, monkeypatch):
+        coze = AsyncCoze(auth=AsyncTokenAuth(token="token"))
+        mock_chat_batch(respx_mock)
+        create_and_poll = coze.chat.create_and_poll
+
+        async def slow_create_and_poll(**kwargs):
+            if kwargs["user_id"] != "user_0":
+                await asyncio.sleep(10)
+            return await create_and_poll(**kwargs)
+
+        monkeypatch.setattr(coze.chat, "create_and_poll", slow_create_and_poll)
+
+        results = coze.chat.batch(make_requests(5), concurrency=3).__aiter__()
+        assert (await results.__anext__()).index == 0
+        await results.aclose()
+
+        # the cancelled requests are awaited before the batch closes
+        assert asyncio.all_tasks() == {asyncio.current_task()}
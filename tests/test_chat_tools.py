@@ -0,0 +1,221 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from cozepy import (
+    AsyncCoze,
+    AsyncTokenAuth,
+    ChatEventType,
+    ChatToolCall,
+    ChatToolCallFunction,
+    ChatToolCallType,
+    ChatToolRegistry,
+    Coze,
+    CozeError,
+    TokenAuth,
+)
+from tests.test_chat import mock_chat_stream, mock_chat_submit_tool_outputs_stream
+from tests.test_util import read_file
+
+
+def make_tool_call(id: str, name: str, arguments: str = "{}") -> ChatToolCall:
+    return ChatToolCall(
+        id=id, type=ChatToolCallType.FUNCTION, function=ChatToolCallFunction(name=name, arguments=arguments)
+    )
+
+
+def make_registry(barrier=None) -> ChatToolRegistry:
+    tools = ChatToolRegistry()
+
+    @tools.register
+    def get_weather(city: str):
+        if barrier:
+            barrier.wait()
+        return {"city": city, "weather": "sunny"}
+
+    @tools.register(name="get_time")
+    def now():
+        if barrier:
+            barrier.wait()
+        return "12:00"
+
+    return tools
+
+
+def two_requires_action(chat_id: str = "7382159487131697202") -> str:
+    content = read_file("testdata/chat_requires_action_stream_resp.txt")
+    created, requires_action, done = content.strip().split("\n\n")
+    # the second event repeats call_1, and adds call_4
+    second = requires_action.replace('"id":"7382159487131697202"', '"id":"{}"'.format(chat_id), 1).replace(
+        '"call_2"', '"call_4"'
+    )
+    return "\n\n".join([created, requires_action, second, done]) + "\n"
+
+
+def submitted_outputs(route) -> dict:
+    body = json.loads(route.calls[-1].request.content)
+    return {i["tool_call_id"]: i["output"] for i in body["tool_outputs"]}
+
+
+class TestChatToolRegistry:
+    def test_register(self):
+        tools = make_registry()
+
+        assert "get_weather" in tools
+        assert "get_time" in tools
+        assert "now" not in tools
+        assert len(tools) == 2
+
+    def test_run(self):
+        tools = make_registry(threading.Barrier(2, timeout=5))
+
+        outputs = tools.run(
+            [
+                make_tool_call("1", "get_weather", '{"city": "Beijing"}'),
+                make_tool_call("2", "get_time"),
+                make_tool_call("3", "unknown"),
+                make_tool_call("4", "get_weather", "not json"),
+                make_tool_call("5", "get_weather", '{"town": "Beijing"}'),
+            ]
+        )
+
+        assert [i.tool_call_id for i in outputs] == ["1", "2", "3", "4", "5"]
+        assert json.loads(outputs[0].output) == {"city": "Beijing", "weather": "sunny"}
+        assert outputs[1].output == "12:00"
+        assert json.loads(outputs[2].output) == {"error": "unknown tool: unknown"}
+        assert "invalid arguments" in json.loads(outputs[3].output)["error"]
+        assert "error" in json.loads(outputs[4].output)
+
+    def test_run_timeout(self):
+        tools = ChatToolRegistry({"slow": lambda: time.sleep(1), "fast": lambda: "ok"})
+
+        start = time.monotonic()
+        outputs = tools.run([make_tool_call("1", "slow"), make_tool_call("2", "fast")], timeout=0.1)
+
+        assert time.monotonic() - start < 0.9
+        assert json.loads(outputs[0].output) == {"error": "timeout"}
+        assert outputs[1].output == "ok"
+
+    def test_run_async_tool(self):
+        tools = ChatToolRegistry()
+
+        @tools.register
+        async def get_time():
+            await asyncio.sleep(0)
+            return "12:00"
+
+        tools.register(lambda: object(), name="invalid")
+
+        outputs = tools.run([make_tool_call("1", "get_time"), make_tool_call("2", "invalid")])
+
+        assert outputs[0].output == "12:00"
+        assert "error" in json.loads(outputs[1].output)
+
+    @pytest.mark.asyncio
+    async def test_arun(self):
+        tools = make_registry()
+
+        @tools.register
+        async def slow():
+            await asyncio.sleep(1)
+
+        outputs = await tools.arun(
+            [make_tool_call("1", "get_weather", '{"city": "Beijing"}'), make_tool_call("2", "slow")], timeout=0.1
+        )
+
+        assert json.loads(outputs[0].output)["weather"] == "sunny"
+        assert json.loads(outputs[1].output) == {"error": "timeout"}
+
+
+@pytest.mark.respx(base_url="https://api.coze.com")
+class TestSyncChatStreamWithTools:
+    def test_sync_chat_stream_with_tools(self, respx_mock):
+        coze = Coze(auth=TokenAuth(token="token"))
+        mock_chat_stream(respx_mock, read_file("testdata/chat_requires_action_stream_resp.txt"))
+        mock_chat_submit_tool_outputs_stream(respx_mock, read_file("testdata/chat_text_stream_resp.txt"))
+        route = respx_mock.routes[-1]
+
+        events = list(
+            coze.chat.stream_with_tools(
+                bot_id="bot", user_id="user", tools=make_registry(threading.Barrier(2, timeout=5))
+            )
+        )
+
+        assert events[1].event == ChatEventType.CONVERSATION_CHAT_REQUIRES_ACTION
+        assert events[-1].event == ChatEventType.CONVERSATION_CHAT_COMPLETED
+        assert route.call_count == 1
+        assert route.calls[-1].request.url.params["chat_id"] == "7382159487131697202"
+        outputs = submitted_outputs(route)
+        assert json.loads(outputs["call_1"])["city"] == "Beijing"
+        assert outputs["call_2"] == "12:00"
+        assert "unknown tool" in outputs["call_3"]
+
+    def test_sync_chat_stream_with_tools_requires_action_twice(self, respx_mock):
+        coze = Coze(auth=TokenAuth(token="token"))
+        mock_chat_stream(respx_mock, two_requires_action())
+        mock_chat_submit_tool_outputs_stream(respx_mock, read_file("testdata/chat_text_stream_resp.txt"))
+        route = respx_mock.routes[-1]
+
+        events = list(coze.chat.stream_with_tools(bot_id="bot", user_id="user", tools=make_registry(), max_rounds=1))
+
+        assert events[-1].event == ChatEventType.CONVERSATION_CHAT_COMPLETED
+        assert route.call_count == 1
+        assert sorted(submitted_outputs(route)) == ["call_1", "call_2", "call_3", "call_4"]
+
+    def test_sync_chat_stream_with_tools_requires_action_chats(self, respx_mock):
+        coze = Coze(auth=TokenAuth(token="token"))
+        mock_chat_stream(respx_mock, two_requires_action("other"))
+
+        with pytest.raises(CozeError, match="require action in one stream"):
+            list(coze.chat.stream_with_tools(bot_id="bot", user_id="user", tools=make_registry()))
+
+    def test_sync_chat_stream_with_tools_max_rounds(self, respx_mock):
+        coze = Coze(auth=TokenAuth(token="token"))
+        mock_chat_stream(respx_mock, read_file("testdata/chat_requires_action_stream_resp.txt"))
+
+        with pytest.raises(CozeError, match="max tool rounds"):
+            list(coze.chat.stream_with_tools(bot_id="bot", user_id="user", tools=make_registry(), max_rounds=0))
+
+
+@pytest.mark.respx(base_url="https://api.coze.com")
+@pytest.mark.asyncio
+class TestAsyncChatStreamWithTools:
+    async def test_async_chat_stream_with_tools(self, respx_mock):
+        coze = AsyncCoze(auth=AsyncTokenAuth(token="token"))
+        mock_chat_stream(respx_mock, read_file("testdata/chat_requires_action_stream_resp.txt"))
+        mock_chat_submit_tool_outputs_stream(respx_mock, read_file("testdata/chat_text_stream_resp.txt"))
+        route = respx_mock.routes[-1]
+
+        events = [
+            event
+            async for event in coze.chat.stream_with_tools(
+                bot_id="bot", user_id="user", tools=make_registry(threading.Barrier(2, timeout=5))
+            )
+        ]
+
+        assert events[1].event == ChatEventType.CONVERSATION_CHAT_REQUIRES_ACTION
+        assert events[-1].event == ChatEventType.CONVERSATION_CHAT_COMPLETED
+        outputs = submitted_outputs(route)
+        assert json.loads(outputs["call_1"])["weather"] == "sunny"
+        assert outputs["call_2"] == "12:00"
+        assert "unknown tool" in outputs["call_3"]
+
+    async def test_async_chat_stream_with_tools_requires_action_twice(self, respx_mock):
+        coze = AsyncCoze(auth=AsyncTokenAuth(token="token"))
+        mock_chat_stream(respx_mock, two_requires_action())
+        mock_chat_submit_tool_outputs_stream(respx_mock, read_file("testdata/chat_text_stream_resp.txt"))
+        route = respx_mock.routes[-1]
+
+        events = [
+            event
+            async for event in coze.chat.stream_with_tools(
+                bot_id="bot", user_id="user", tools=make_registry(), max_rounds=1
+            )
+        ]
+
+        assert events[-1].event == ChatEventType.CONVERSATION_CHAT_COMPLETED
+        assert route.call_count == 1
+        assert sorted(submitted_outputs(route)) == ["call_1", "call_2", "call_3", "call_4"]
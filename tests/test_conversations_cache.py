@@ -0,0 +1,249 @@
+import json
+
+import httpx
+import pytest
+
+from cozepy import (
+    AsyncCoze,
+    AsyncTokenAuth,
+    ChatStatus,
+    ConversationCache,
+    Coze,
+    Message,
+    MessageContentType,
+    MessageRole,
+    MessageType,
+    TokenAuth,
+)
+from cozepy.chat import InsertedMessage
+from cozepy.util import random_hex
+from tests.test_chat import make_chat, mock_chat_stream
+from tests.test_util import logid_key, read_file
+
+
+def make_message(id: str, conversation_id: str = "conversation_id", content: str = "hi") -> Message:
+    msg = Message.build_assistant_answer(content)
+    msg.id = id
+    msg.conversation_id = conversation_id
+    return msg
+
+
+def mock_list_messages(respx_mock, ids):
+    def handler(request: httpx.Request):
+        body = json.loads(request.content)
+        items = list(ids) if body["order"] == "asc" else list(reversed(ids))
+        if body["after_id"]:
+            items = items[items.index(body["after_id"]) + 1 :]
+        return httpx.Response(
+            200,
+            json={
+                "first_id": items[0] if items else "",
+                "last_id": items[-1] if items else "",
+                "has_more": False,
+                "data": [make_message(i).model_dump() for i in items],
+            },
+            headers={logid_key(): random_hex(10)},
+        )
+
+    return respx_mock.post("/v1/conversation/message/list").mock(side_effect=handler)
+
+
+def mock_chat_completed(respx_mock):
+    chat = make_chat("conversation_id", ChatStatus.COMPLETED)
+    respx_mock.post("/v3/chat").mock(httpx.Response(200, json={"data": chat.model_dump()}))
+    answer = make_message("answer")
+    answer.chat_id = chat.id
+    verbose = make_message("verbose")
+    verbose.chat_id, verbose.type = chat.id, MessageType.VERBOSE
+    return respx_mock.get("/v3/chat/message/list").mock(
+        httpx.Response(200, json={"data": [answer.model_dump(), verbose.model_dump()]})
+    )
+
+
+class TestConversationCache:
+    def test_add_get(self):
+        cache = ConversationCache()
+
+        cache.add(make_message("1"))
+        cache.add(make_message("2"))
+        cache.add(make_message("1", content="updated"))
+
+        messages = cache.get("conversation_id")
+        assert [i.id for i in messages] == ["1", "2"]
+        assert messages[0].content == "updated"
+        assert cache.last_id("conversation_id") == "2"
+        assert not cache.is_loaded("conversation_id")
+        assert cache.get("unknown") is None
+
+    def test_remove_clear(self):
+        cache = ConversationCache()
+        cache.put("conversation_id", [make_message("1"), make_message("2")])
+
+        cache.remove("conversation_id", "2")
+        assert cache.last_id("conversation_id") == "1"
+        assert cache.is_loaded("conversation_id")
+
+        cache.clear("conversation_id")
+        assert "conversation_id" not in cache
+
+    def test_bounded(self):
+        cache = ConversationCache(max_conversations=2, max_messages=2)
+
+        cache.extend("a", [make_message("1", "a"), make_message("2", "a"), make_message("3", "a")])
+        cache.extend("b", [make_message("4", "b")])
+        cache.get("a")
+        cache.extend("c", [make_message("5", "c")])
+
+        assert [i.id for i in cache.get("a")] == ["2", "3"]
+        assert "b" not in cache
+        assert len(cache) == 2
+
+    def test_on_chat(self):
+        cache = ConversationCache()
+        chat = make_chat("conversation_id", ChatStatus.IN_PROGRESS)
+        chat.inserted_additional_messages = [InsertedMessage(id="q1")]
+
+        cache._on_chat(chat, [Message.build_user_question_text("hi")], new_conversation=True)
+
+        messages = cache.get("conversation_id")
+        assert messages[0].id == "q1"
+        assert messages[0].role == MessageRole.USER
+        assert cache.is_loaded("conversation_id")
+
+
+@pytest.mark.respx(base_url="https://api.coze.com")
+class TestSyncConversationCache:
+    def test_sync_history(self, respx_mock):
+        cache = ConversationCache()
+        coze = Coze(auth=TokenAuth(token="token"), conversation_cache=cache)
+        ids = ["1", "2"]
+        route = mock_list_messages(respx_mock, ids)
+
+        assert [i.id for i in coze.conversations.messages.history(conversation_id="conversation_id")] == ["1", "2"]
+        assert json.loads(route.calls[-1].request.content)["order"] == "desc"
+
+        ids.append("3")
+        assert [i.id for i in coze.conversations.messages.history(conversation_id="conversation_id")] == ["1", "2", "3"]
+        body = json.loads(route.calls[-1].request.content)
+        assert body["order"] == "asc"
+        assert body["after_id"] == "2"
+
+        ids.append("4")
+        history = coze.conversations.messages.history(conversation_id="conversation_id", refresh=False)
+        assert [i.id for i in history] == ["1", "2", "3"]
+        assert route.call_count == 2
+
+    def test_sync_history_without_cache(self, respx_mock):
+        coze = Coze(auth=TokenAuth(token="token"))
+        route = mock_list_messages(respx_mock, ["1", "2"])
+
+        coze.conversations.messages.history(conversation_id="conversation_id")
+        history = coze.conversations.messages.history(conversation_id="conversation_id")
+
+        assert [i.id for i in history] == ["1", "2"]
+        assert route.call_count == 2
+
+    def test_sync_messages_write_through(self, respx_mock):
+        cache = ConversationCache()
+        coze = Coze(auth=TokenAuth(token="token"), conversation_cache=cache)
+        for path, msg in [("create", make_message("1")), ("modify", make_message("1", content="updated"))]:
+            respx_mock.post(f"/v1/conversation/message/{path}").mock(
+                httpx.Response(200, json={"data": msg.model_dump(), "message": msg.model_dump()})
+            )
+        respx_mock.post("/v1/conversation/message/delete").mock(
+            httpx.Response(200, json={"data": make_message("1").model_dump()})
+        )
+
+        coze.conversations.messages.create(
+            conversation_id="conversation_id", role=MessageRole.USER, content="hi", content_type=MessageContentType.TEXT
+        )
+        assert cache.last_id("conversation_id") == "1"
+        coze.conversations.messages.update(conversation_id="conversation_id", message_id="1", content="updated")
+        assert cache.get("conversation_id")[0].content == "updated"
+        coze.conversations.messages.delete(conversation_id="conversation_id", message_id="1")
+        assert cache.get("conversation_id") == []
+
+    def test_sync_chat_stream_write_through(self, respx_mock):
+        cache = ConversationCache()
+        coze = Coze(auth=TokenAuth(token="token"), conversation_cache=cache)
+        mock_chat_stream(respx_mock, read_file("testdata/chat_text_stream_resp.txt"))
+
+        list(coze.chat.stream(bot_id="bot", user_id="user", conversation_id="7381473525342978089"))
+
+        assert cache.last_id("7381473525342978089") == "7382159494123470858"
+        assert not cache.is_loaded("7381473525342978089")
+
+    def test_sync_create_and_poll(self, respx_mock):
+        cache = ConversationCache()
+        coze = Coze(auth=TokenAuth(token="token"), conversation_cache=cache)
+        route = mock_chat_completed(respx_mock)
+        cache.put("conversation_id", [])
+
+        poll = coze.chat.create_and_poll(bot_id="bot", user_id="user", conversation_id="conversation_id")
+        assert [i.id for i in poll.messages] == ["answer", "verbose"]
+        # the verbose messages are not cached, like on the stream
+        assert [i.id for i in cache.get("conversation_id")] == ["answer"]
+
+        poll = coze.chat.create_and_poll(bot_id="bot", user_id="user", conversation_id="conversation_id")
+        assert [i.id for i in poll.messages] == ["answer"]
+        assert route.call_count == 1
+
+    def test_sync_create_and_poll_not_loaded(self, respx_mock):
+        cache = ConversationCache()
+        coze = Coze(auth=TokenAuth(token="token"), conversation_cache=cache)
+        route = mock_chat_completed(respx_mock)
+
+        coze.chat.create_and_poll(bot_id="bot", user_id="user", conversation_id="conversation_id")
+        coze.chat.create_and_poll(bot_id="bot", user_id="user", conversation_id="conversation_id")
+
+        assert route.call_count == 2
+
+    def test_sync_chat_no_history_not_cached(self, respx_mock):
+        cache = ConversationCache()
+        coze = Coze(auth=TokenAuth(token="token"), conversation_cache=cache)
+        mock_chat_stream(respx_mock, read_file("testdata/chat_text_stream_resp.txt"))
+
+        list(coze.chat.stream(bot_id="bot", user_id="user", auto_save_history=False))
+
+        assert len(cache) == 0
+
+
+@pytest.mark.respx(base_url="https://api.coze.com")
+@pytest.mark.asyncio
+class TestAsyncConversationCache:
+    async def test_async_history(self, respx_mock):
+        cache = ConversationCache()
+        coze = AsyncCoze(auth=AsyncTokenAuth(token="token"), conversation_cache=cache)
+        ids = ["1", "2"]
+        route = mock_list_messages(respx_mock, ids)
+
+        history = await coze.conversations.messages.history(conversation_id="conversation_id")
+        assert [i.id for i in history] == ["1", "2"]
+
+        ids.append("3")
+        history = await coze.conversations.messages.history(conversation_id="conversation_id")
+        assert [i.id for i in history] == ["1", "2", "3"]
+        assert json.loads(route.calls[-1].request.content)["after_id"] == "2"
+
+    async def test_async_create_and_poll(self, respx_mock):
+        cache = ConversationCache()
+        coze = AsyncCoze(auth=AsyncTokenAuth(token="token"), conversation_cache=cache)
+        route = mock_chat_completed(respx_mock)
+        cache.put("conversation_id", [])
+
+        await coze.chat.create_and_poll(bot_id="bot", user_id="user", conversation_id="conversation_id")
+        poll = await coze.chat.create_and_poll(bot_id="bot", user_id="user", conversation_id="conversation_id")
+
+        assert [i.id for i in poll.messages] == ["answer"]
+        assert [i.id for i in cache.get("conversation_id")] == ["answer"]
+        assert route.call_count == 1
+
+    async def test_async_chat_stream_write_through(self, respx_mock):
+        cache = ConversationCache()
+        coze = AsyncCoze(auth=AsyncTokenAuth(token="token"), conversation_cache=cache)
+        mock_chat_stream(respx_mock, read_file("testdata/chat_text_stream_resp.txt"))
+
+        [event async for event in coze.chat.stream(bot_id="bot", user_id="user")]
+
+        assert cache.last_id("7381473525342978089") == "7382159494123470858"
+        assert cache.is_loaded("7381473525342978089")
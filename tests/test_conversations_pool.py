@@ -0,0 +1,115 @@
+import asyncio
+import itertools
+import json
+import time
+
+import httpx
+import pytest
+
+from cozepy import AsyncCoze, AsyncTokenAuth, Conversation, Coze, TokenAuth
+from cozepy.util import random_hex
+from tests.test_util import logid_key
+
+
+def mock_create_conversations(respx_mock, fail_times: int = 0):
+    counter = itertools.count()
+    failed = itertools.count()
+
+    def handler(request: httpx.Request):
+        if next(failed) < fail_times:
+            return httpx.Response(200, json={"code": 4000, "msg": "invalid"}, headers={logid_key(): random_hex(10)})
+        conversation = Conversation(
+            id=f"conversation_{next(counter)}",
+            created_at=1,
+            meta_data=json.loads(request.content)["meta_data"] or {},
+            last_section_id="section_id",
+        )
+        return httpx.Response(200, json={"data": conversation.model_dump()}, headers={logid_key(): random_hex(10)})
+
+    return respx_mock.post("/v1/conversation/create").mock(side_effect=handler)
+
+
+def wait_until(cond, timeout: float = 2):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline, "timeout"
+        time.sleep(0.01)
+
+
+async def async_wait_until(cond, timeout: float = 2):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline, "timeout"
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.respx(base_url="https://api.coze.com")
+class TestSyncConversationPool:
+    def test_sync_pool_acquire(self, respx_mock):
+        coze = Coze(auth=TokenAuth(token="token"))
+        route = mock_create_conversations(respx_mock)
+
+        with coze.conversations.pool(size=2, meta_data={"k": "v"}) as pool:
+            pool.warm(["bot"])
+            wait_until(lambda: pool.idle_count("bot") == 2)
+
+            conversation = pool.acquire("bot")
+            assert conversation.id == "conversation_0"
+            assert conversation.meta_data == {"k": "v"}
+            wait_until(lambda: route.call_count == 3 and pool.idle_count("bot") == 2)
+            assert json.loads(route.calls[-1].request.content)["bot_id"] == "bot"
+
+        with pytest.raises(ValueError):
+            pool.acquire("bot")
+
+    def test_sync_pool_acquire_empty(self, respx_mock):
+        coze = Coze(auth=TokenAuth(token="token"))
+        mock_create_conversations(respx_mock)
+
+        with coze.conversations.pool(size=1) as pool:
+            assert pool.acquire("bot").id.startswith("conversation_")
+            wait_until(lambda: pool.idle_count("bot") == 1)
+
+    def test_sync_pool_ttl(self, respx_mock):
+        coze = Coze(auth=TokenAuth(token="token"))
+        route = mock_create_conversations(respx_mock)
+
+        with coze.conversations.pool(size=1, ttl=0.05) as pool:
+            pool.warm(["bot"])
+            wait_until(lambda: route.call_count >= 3)
+            assert pool.acquire("bot").id != "conversation_0"
+
+    def test_sync_pool_retry(self, respx_mock):
+        coze = Coze(auth=TokenAuth(token="token"))
+        mock_create_conversations(respx_mock, fail_times=1)
+
+        with coze.conversations.pool(size=1, retry_interval=0.01) as pool:
+            pool.warm(["bot"])
+            wait_until(lambda: pool.idle_count("bot") == 1)
+
+
+@pytest.mark.respx(base_url="https://api.coze.com")
+@pytest.mark.asyncio
+class TestAsyncConversationPool:
+    async def test_async_pool_acquire(self, respx_mock):
+        coze = AsyncCoze(auth=AsyncTokenAuth(token="token"))
+        route = mock_create_conversations(respx_mock)
+
+        async with coze.conversations.pool(size=2) as pool:
+            await pool.warm(["bot"])
+            await async_wait_until(lambda: pool.idle_count("bot") == 2)
+
+            conversation = await pool.acquire("bot")
+            assert conversation.id == "conversation_0"
+            await async_wait_until(lambda: route.call_count == 3 and pool.idle_count("bot") == 2)
+
+        with pytest.raises(ValueError):
+            await pool.acquire("bot")
+
+    async def test_async_pool_ttl(self, respx_mock):
+        coze = AsyncCoze(auth=AsyncTokenAuth(token="token"))
+        route = mock_create_conversations(respx_mock)
+
+        async with coze.conversations.pool(size=1, ttl=0.05) as pool:
+            assert (await pool.acquire("bot")).id == "conversation_0"
+            await async_wait_until(lambda: route.call_count >= 3)
@@ -0,0 +1,239 @@
+import json
+import time
+
+import httpx
+import pytest
+
+from cozepy import (
+    AsyncCoze,
+    AsyncDeviceOAuthApp,
+    AsyncTokenAuth,
+    ChatStatus,
+    Coze,
+    CozeDeadlineExceededError,
+    CozePKCEAuthErrorType,
+    Deadline,
+    DeviceOAuthApp,
+    TokenAuth,
+)
+from cozepy.deadline import remaining_timeout
+from tests.test_chat import make_chat, mock_chat_cancel, mock_chat_create
+from tests.test_util import read_file
+
+
+class TrickleStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """
+    A response body which sends its lines one by one, each within the read timeout.
+    """
+
+    def __init__(self, content: str, interval: float = 0.02):
+        self._lines = content.encode("utf-8").splitlines(keepends=True)
+        self._interval = interval
+
+    def __iter__(self):
+        for line in self._lines:
+            time.sleep(self._interval)
+            yield line
+
+    async def __aiter__(self):
+        for line in self._lines:
+            time.sleep(self._interval)
+            yield line
+
+
+def chat_stream_content() -> str:
+    return read_file("testdata/chat_text_stream_resp.txt")
+
+
+class TestDeadline:
+    def test_current(self):
+        assert Deadline.current() is None
+        with Deadline(10) as deadline:
+            assert Deadline.current() is deadline
+            assert 9 < deadline.remaining <= 10
+            assert not deadline.expired
+        assert Deadline.current() is None
+
+    def test_nested(self):
+        with Deadline(1):
+            with Deadline(10) as inner:
+                assert inner.remaining <= 1
+            with Deadline(0.5) as inner:
+                assert inner.remaining <= 0.5
+
+    def test_starts_on_enter(self):
+        deadline = Deadline(0.1)
+        time.sleep(0.1)
+        with deadline:
+            assert not deadline.expired
+
+    def test_expired(self):
+        with Deadline(0) as deadline:
+            assert deadline.expired
+            with pytest.raises(CozeDeadlineExceededError):
+                deadline.check()
+
+    def test_shrink(self):
+        with Deadline(2) as deadline:
+            timeout = deadline.shrink(httpx.Timeout(600, connect=5))
+        assert timeout.connect <= 2
+        assert timeout.read <= 2
+        assert timeout.pool <= 2
+
+    def test_remaining_timeout(self):
+        assert remaining_timeout(None) is None
+        assert remaining_timeout(3) == 3
+        with Deadline(1):
+            assert remaining_timeout(None) <= 1
+            assert remaining_timeout(3) <= 1
+            assert remaining_timeout(0.1) == 0.1
+
+
+@pytest.mark.respx(base_url="https://api.coze.com")
+class TestSyncDeadline:
+    def test_sync_request_timeout(self, respx_mock):
+        coze = Coze(auth=TokenAuth(token="token"))
+        timeouts = []
+
+        def handler(request: httpx.Request):
+            timeouts.append(request.extensions.get("timeout"))
+            return httpx.Response(200, json={"data": make_chat().model_dump()})
+
+        respx_mock.post("/v3/chat/retrieve").mock(side_effect=handler)
+
+        coze.chat.retrieve(conversation_id="conversation_id", chat_id="chat_id")
+        with Deadline(2):
+            coze.chat.retrieve(conversation_id="conversation_id", chat_id="chat_id")
+
+        assert timeouts[0]["read"] == 600
+        assert 0 < timeouts[1]["read"] <= 2
+        assert 0 < timeouts[1]["connect"] <= 2
+
+    def test_sync_request_expired(self, respx_mock):
+        coze = Coze(auth=TokenAuth(token="token"))
+        route = respx_mock.post("/v3/chat/retrieve")
+
+        with Deadline(0):
+            with pytest.raises(CozeDeadlineExceededError):
+                coze.chat.retrieve(conversation_id="conversation_id", chat_id="chat_id")
+        assert route.call_count == 0
+        route.mock(httpx.Response(200, json={"data": make_chat().model_dump()}))
+        coze.chat.retrieve(conversation_id="conversation_id", chat_id="chat_id")
+
+    def test_sync_request_timeout_exceeded(self, respx_mock):
+        coze = Coze(auth=TokenAuth(token="token"))
+
+        def handler(request: httpx.Request):
+            time.sleep(0.06)
+            raise httpx.ReadTimeout("timeout", request=request)
+
+        respx_mock.post("/v3/chat/retrieve").mock(side_effect=handler)
+
+        with Deadline(0.05):
+            with pytest.raises(CozeDeadlineExceededError):
+                coze.chat.retrieve(conversation_id="conversation_id", chat_id="chat_id")
+
+    def test_sync_response_trickle(self, respx_mock):
+        coze = Coze(auth=TokenAuth(token="token"))
+        body = json.dumps({"data": make_chat().model_dump()}, indent=1)
+        respx_mock.post("/v3/chat/retrieve").mock(
+            side_effect=lambda request: httpx.Response(200, stream=TrickleStream(body))
+        )
+
+        with Deadline(0.1):
+            with pytest.raises(CozeDeadlineExceededError):
+                coze.chat.retrieve(conversation_id="conversation_id", chat_id="chat_id")
+
+    def test_sync_stream_trickle(self, respx_mock):
+        coze = Coze(auth=TokenAuth(token="token"))
+        respx_mock.post("/v3/chat").mock(
+            side_effect=lambda request: httpx.Response(
+                200, headers={"content-type": "text/event-stream"}, stream=TrickleStream(chat_stream_content())
+            )
+        )
+
+        with Deadline(0.1):
+            stream = coze.chat.stream(bot_id="bot", user_id="user")
+            with pytest.raises(CozeDeadlineExceededError):
+                list(stream)
+
+    def test_sync_create_and_poll(self, respx_mock):
+        coze = Coze(auth=TokenAuth(token="token"))
+        mock_chat_create(respx_mock, "conversation_id", ChatStatus.IN_PROGRESS)
+        mock_chat_cancel(respx_mock, "conversation_id", ChatStatus.CANCELED)
+        cancel = respx_mock.routes[-1]
+
+        with Deadline(0.5):
+            with pytest.raises(CozeDeadlineExceededError):
+                coze.chat.create_and_poll(bot_id="bot", user_id="user")
+        assert cancel.call_count == 1
+
+    def test_sync_chat_batch(self, respx_mock):
+        coze = Coze(auth=TokenAuth(token="token"))
+        mock_chat_create(respx_mock, "conversation_id", ChatStatus.IN_PROGRESS)
+        mock_chat_cancel(respx_mock, "conversation_id", ChatStatus.CANCELED)
+
+        with Deadline(0.5):
+            results = list(coze.chat.batch([{"bot_id": "bot", "user_id": "user"}], retry_interval=0))
+
+        assert results[0].attempts == 1
+        assert "deadline exceeded" in results[0].error
+
+    def test_sync_device_poll(self, respx_mock):
+        app = DeviceOAuthApp("client id")
+        route = respx_mock.post("/api/permission/oauth2/token").mock(
+            httpx.Response(200, json={"error_code": CozePKCEAuthErrorType.AUTHORIZATION_PENDING})
+        )
+
+        with Deadline(1):
+            with pytest.raises(CozeDeadlineExceededError):
+                app.get_access_token("device_code", True)
+        assert route.call_count == 1
+
+
+@pytest.mark.respx(base_url="https://api.coze.com")
+@pytest.mark.asyncio
+class TestAsyncDeadline:
+    async def test_async_request_expired(self, respx_mock):
+        coze = AsyncCoze(auth=AsyncTokenAuth(token="token"))
+        route = respx_mock.post("/v3/chat/retrieve").mock(httpx.Response(200, json={"data": make_chat().model_dump()}))
+
+        async with Deadline(0):
+            with pytest.raises(CozeDeadlineExceededError):
+                await coze.chat.retrieve(conversation_id="conversation_id", chat_id="chat_id")
+        assert route.call_count == 0
+        await coze.chat.retrieve(conversation_id="conversation_id", chat_id="chat_id")
+
+    async def test_async_stream_trickle(self, respx_mock):
+        coze = AsyncCoze(auth=AsyncTokenAuth(token="token"))
+        respx_mock.post("/v3/chat").mock(
+            side_effect=lambda request: httpx.Response(
+                200, headers={"content-type": "text/event-stream"}, stream=TrickleStream(chat_stream_content())
+            )
+        )
+
+        async with Deadline(0.1):
+            with pytest.raises(CozeDeadlineExceededError):
+                async for _ in coze.chat.stream(bot_id="bot", user_id="user"):
+                    pass
+
+    async def test_async_create_and_poll(self, respx_mock):
+        coze = AsyncCoze(auth=AsyncTokenAuth(token="token"))
+        mock_chat_create(respx_mock, "conversation_id", ChatStatus.IN_PROGRESS)
+        mock_chat_cancel(respx_mock, "conversation_id", ChatStatus.CANCELED)
+        cancel = respx_mock.routes[-1]
+
+        async with Deadline(0.5):
+            with pytest.raises(CozeDeadlineExceededError):
+                await coze.chat.create_and_poll(bot_id="bot", user_id="user")
+        assert cancel.call_count == 1
+
+    async def test_async_device_poll(self, respx_mock):
+        app = AsyncDeviceOAuthApp("client id")
+        respx_mock.post("/api/permission/oauth2/token").mock(
+            httpx.Response(200, json={"error_code": CozePKCEAuthErrorType.AUTHORIZATION_PENDING})
+        )
+
+        with Deadline(1):
+            with pytest.raises(CozeDeadlineExceededError):
+                await app.get_access_token("device_code", True)
@@ -0,0 +1,145 @@
+import os
+import time
+
+import httpx
+import pytest
+
+from cozepy import Coze, CozeError, JWTAuth, OAuthToken, TokenAuth, reset_after_fork
+from cozepy.conversations import Conversation
+from cozepy.conversations.pool import ConversationPool
+from cozepy.request import AsyncHTTPClient, Requester, SyncHTTPClient
+from cozepy.util import random_hex
+from cozepy.websockets.loop import WebsocketsEventLoop
+
+from .test_util import read_file
+
+
+class TestResetAfterFork:
+    def test_requester_sync_client(self):
+        client = SyncHTTPClient(timeout=3)
+        requester = Requester(sync_client=client)
+        assert requester.sync_client is client
+
+        reset_after_fork()
+
+        rebuilt = requester.sync_client
+        assert rebuilt is not client
+        assert isinstance(rebuilt, SyncHTTPClient)
+        assert rebuilt.timeout == httpx.Timeout(3)
+        assert rebuilt.follow_redirects
+        # the connections are still used by the parent
+        assert not client.is_closed
+        assert requester.sync_client is rebuilt
+
+    def test_requester_async_client(self):
+        client = AsyncHTTPClient(timeout=5)
+        requester = Requester(async_client=client)
+        assert requester.async_client is client
+
+        reset_after_fork()
+
+        assert requester.async_client is not client
+        assert requester.async_client.timeout == httpx.Timeout(5)
+
+    def test_requester_unknown_client(self):
+        client = httpx.Client(timeout=1)
+        requester = Requester(sync_client=client)  # type: ignore
+
+        reset_after_fork()
+
+        # its proxies, limits and headers are not known
+        with pytest.raises(CozeError):
+            requester.sync_client
+
+    def test_requester_transport(self):
+        client = AsyncHTTPClient(transport=httpx.AsyncHTTPTransport(retries=1))
+        requester = Requester(async_client=client)
+
+        reset_after_fork()
+
+        # the transport holds the connections of the parent
+        with pytest.raises(CozeError):
+            requester.async_client
+
+    def test_requester_lazy(self):
+        requester = Requester()
+
+        reset_after_fork()
+
+        assert requester._sync_client is None
+        assert isinstance(requester.sync_client, SyncHTTPClient)
+
+    def test_pid_check(self, monkeypatch):
+        import cozepy.fork
+
+        requester = Requester()
+        client = requester.sync_client
+        # forked without the os.register_at_fork hooks
+        monkeypatch.setattr(cozepy.fork, "_pid", -1)
+
+        assert requester.sync_client is not client
+        assert cozepy.fork._pid == os.getpid()
+
+    @pytest.mark.respx(base_url="https://api.coze.com")
+    def test_jwt_auth_token(self, respx_mock):
+        tokens = iter([random_hex(20), random_hex(20)])
+        route = respx_mock.post("/api/permission/oauth2/token").mock(
+            side_effect=lambda request: httpx.Response(
+                200,
+                content=OAuthToken(access_token=next(tokens), expires_in=int(time.time()) + 100).model_dump_json(),
+            )
+        )
+        auth = JWTAuth("client id", read_file("testdata/private_key.pem"), "public key id")
+        token = auth.token
+        assert auth.token == token
+
+        reset_after_fork()
+
+        assert auth.token != token
+        assert route.call_count == 2
+
+    def test_websockets_event_loop(self):
+        loop = WebsocketsEventLoop()
+        parent_loop, parent_thread = loop.loop, loop._thread
+        loop.clients = 2
+
+        reset_after_fork()
+
+        assert loop._thread is None
+        assert loop.clients == 0
+        try:
+            assert loop.loop is not parent_loop
+            assert loop._thread is not parent_thread
+        finally:
+            loop.close()
+            parent_loop.call_soon_threadsafe(parent_loop.stop)
+            parent_thread.join()  # type: ignore
+
+    def test_conversation_pool(self):
+        pool = ConversationPool(Coze(auth=TokenAuth("token")).conversations)
+        pool._state.push("bot", Conversation(id="1", created_at=1, meta_data={}, last_section_id="1"))
+
+        reset_after_fork()
+
+        assert pool.idle_count("bot") == 0
+        assert pool._thread is None
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+def test_fork():
+    coze = Coze(auth=TokenAuth("token"))
+    client = coze._requester.sync_client
+    r, w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.write(w, b"1" if coze._requester.sync_client is not client else b"0")
+        finally:
+            os._exit(0)
+    os.close(w)
+    try:
+        assert os.read(r, 1) == b"1"
+    finally:
+        os.close(r)
+        os.waitpid(pid, 0)
+    assert coze._requester.sync_client is client
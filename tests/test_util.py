@@ -1,12 +1,22 @@
+import asyncio
 import os
+import wave
 from typing import Any, AsyncIterator, List, Optional
 
 import httpx
 import pytest
 
-from cozepy import COZE_COM_BASE_URL
+from cozepy import COZE_COM_BASE_URL, PCMConverter, PCMFormat
 from cozepy.model import HTTPResponse
-from cozepy.util import anext, base64_encode_string, random_hex, remove_url_trailing_slash
+from cozepy.util import (
+    AsyncWavFileWriter,
+    WavFileWriter,
+    anext,
+    base64_encode_string,
+    random_hex,
+    remove_url_trailing_slash,
+    write_pcm_to_wav_file,
+)
 
 
 class ListAsyncIterator:
@@ -50,6 +60,55 @@ def test_remove_url_trailing_slash():
     assert remove_url_trailing_slash(COZE_COM_BASE_URL + "///") == COZE_COM_BASE_URL
 
 
+def test_write_pcm_to_wav_file_converter(tmp_path):
+    np = pytest.importorskip("numpy")
+    path = str(tmp_path / "out.wav")
+    stereo = np.full(4800 * 2, 0.5, dtype="<f4").tobytes()
+    converter = PCMConverter(PCMFormat(sample_rate=48000, channels=2, encoding="float32"), PCMFormat(16000))
+    write_pcm_to_wav_file(stereo, path, converter=converter)
+    with wave.open(path, "rb") as f:
+        assert (f.getframerate(), f.getnchannels(), f.getsampwidth(), f.getnframes()) == (16000, 1, 2, 1600)
+        assert set(np.frombuffer(f.readframes(1600), dtype="<i2")) == {16384}
+
+
+def test_wav_file_writer(tmp_path):
+    path = str(tmp_path / "out.wav")
+    with WavFileWriter(path, frame_rate=16000) as wav:
+        for i in range(3):
+            wav.write(bytes([i]) * 320)
+        wav.write(memoryview(b"\x03" * 4))
+    assert wav.bytes_written == 964
+    with wave.open(path, "rb") as f:
+        assert (f.getframerate(), f.getnframes()) == (16000, 482)
+        assert f.readframes(482) == b"\x00" * 320 + b"\x01" * 320 + b"\x02" * 320 + b"\x03" * 4
+    wav.close()
+    with pytest.raises(ValueError, match="closed"):
+        wav.write(b"\x00" * 2)
+    with pytest.raises(ValueError):
+        WavFileWriter(path, converter=PCMConverter(PCMFormat(), PCMFormat(encoding="float32")))
+
+
+@pytest.mark.asyncio
+async def test_async_wav_file_writer(tmp_path):
+    path = str(tmp_path / "out.wav")
+    async with AsyncWavFileWriter(path) as wav:
+        for i in range(100):
+            await wav.write(bytes([i]) * 2)
+    assert wav.bytes_written == 200
+    with wave.open(path, "rb") as f:
+        assert f.readframes(100) == b"".join(bytes([i]) * 2 for i in range(100))
+    # closed again, e.g. on every chat.completed
+    await asyncio.gather(wav.close(), wav.close())
+    with pytest.raises(ValueError, match="closed"):
+        await wav.write(b"\x00" * 2)
+
+    # an empty file is still a valid wav
+    empty = str(tmp_path / "empty.wav")
+    await AsyncWavFileWriter(empty).close()
+    with wave.open(empty, "rb") as f:
+        assert f.getnframes() == 0
+
+
 def logid_key():
     return "x-tt-logid"
 
@@ -0,0 +1,1450 @@
+import asyncio
+import base64
+import io
+import json
+import math
+import random
+import socket
+import struct
+import threading
+import time
+import wave
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import pytest
+from websockets.sync.server import serve
+
+from cozepy import (
+    AsyncAudioUplinkBuffer,
+    AsyncTokenAuth,
+    AsyncWebsocketsAudioFeeder,
+    AsyncWebsocketsChatClient,
+    AsyncWebsocketsChatPool,
+    AsyncWebsocketsEventDispatcher,
+    AsyncWebsocketsSpeechPipeline,
+    AudioFeedMode,
+    AudioJitterBuffer,
+    AudioUplinkBuffer,
+    AudioVoiceActivityDetector,
+    ChatEvent,
+    ChatEventType,
+    ConversationMessageDeltaEvent,
+    CozeAPIError,
+    CozeEventBufferOverflowError,
+    Message,
+    PCMConverter,
+    PCMFormat,
+    SpeechAudioUpdateEvent,
+    SpeechTextSplitter,
+    TokenAuth,
+    TranscriptionsMessageUpdateEvent,
+    WebsocketsAudioFeeder,
+    WebsocketsAudioSpeechClient,
+    WebsocketsAudioTranscriptionsClient,
+    WebsocketsChatClient,
+    WebsocketsErrorEvent,
+    WebsocketsEventDispatcher,
+    WebsocketsEventLoopPool,
+    WebsocketsEventsOverflow,
+    WebsocketsEventType,
+    WebsocketsLatencyHistogram,
+    WebsocketsReconnectPolicy,
+    WebsocketsSendOverflow,
+    WebsocketsSpeechPipeline,
+)
+from cozepy.request import Requester
+from cozepy.websockets import AsyncWebsocketsClient
+from cozepy.websockets.audio.speech import AsyncWebsocketsAudioSpeechBuildClient, WebsocketsAudioSpeechBuildClient
+from cozepy.websockets.audio.transcriptions import (
+    AsyncWebsocketsAudioTranscriptionsBuildClient,
+    InputAudioBufferAppendEvent,
+    WebsocketsAudioTranscriptionsBuildClient,
+)
+from cozepy.websockets.chat import ChatUpdateEvent, ConversationChatInProgressEvent
+from cozepy.websockets.loop import WebsocketsEventLoop
+from cozepy.websockets.ws import InputAudio, _dump_event, _encode_audio_append
+
+CHAT_REPLIES: Dict[str, List[Dict]] = {
+    "chat.update": [{"id": "1", "event_type": "chat.updated", "data": {}}],
+    "input_audio_buffer.complete": [
+        {"id": "2", "event_type": "input_audio_buffer.completed"},
+        {"id": "3", "event_type": "conversation.chat.created", "data": {"id": "chat", "conversation_id": "conv"}},
+        {
+            "id": "4",
+            "event_type": "conversation.message.delta",
+            "data": {"role": "assistant", "type": "answer", "content": "hi", "content_type": "text"},
+        },
+        {"id": "5", "event_type": "conversation.chat.completed", "data": {"id": "chat", "conversation_id": "conv"}},
+    ],
+}
+
+DELTA_REPLIES: Dict[str, List[Dict]] = {
+    "input_audio_buffer.complete": [
+        {
+            "id": str(i),
+            "event_type": "conversation.message.delta",
+            "data": {"role": "assistant", "type": "answer", "content": str(i), "content_type": "text"},
+        }
+        for i in range(3)
+    ]
+    + [{"id": "3", "event_type": "conversation.chat.completed", "data": {"id": "chat", "conversation_id": "conv"}}],
+}
+
+
+@contextmanager
+def mock_websockets_server(replies: Dict[str, List[Dict]], drop_on: Optional[str] = None):
+    """
+    A local websocket server, which replies to every received event type with the configured events.
+
+    With drop_on, the first connection is dropped without a close frame when it receives that event type.
+    """
+    received: List[Dict] = []
+    dropped = threading.Event()
+
+    def handler(ws):
+        for raw in ws:
+            message = json.loads(raw)
+            received.append(message)
+            if message["event_type"] == drop_on and not dropped.is_set():
+                dropped.set()
+                ws.socket.shutdown(socket.SHUT_RDWR)
+                return
+            for reply in replies.get(message["event_type"], []):
+                ws.send(json.dumps(reply))
+
+    server = serve(handler, "127.0.0.1", 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"ws://127.0.0.1:{server.socket.getsockname()[1]}", received
+    finally:
+        server.shutdown()
+        thread.join()
+
+
+def build_chat_client(base_url: str, events: List, **kwargs) -> WebsocketsChatClient:
+    def on_event(cli, event):
+        events.append(event.event_type)
+
+    return WebsocketsChatClient(
+        base_url=base_url,
+        requester=Requester(auth=TokenAuth("token")),
+        bot_id="bot",
+        on_event={
+            WebsocketsEventType.CHAT_UPDATED: on_event,
+            WebsocketsEventType.CONVERSATION_MESSAGE_DELTA: on_event,
+            WebsocketsEventType.CONVERSATION_CHAT_COMPLETED: on_event,
+        },
+        **kwargs,
+    )
+
+
+class TestSyncWebsocketsClient:
+    def test_sync_chat_threads(self):
+        with mock_websockets_server(CHAT_REPLIES) as (base_url, received):
+            events: List = []
+            client = build_chat_client(base_url, events)
+            with client():
+                client.chat_update(ChatUpdateEvent.Data())
+                client.input_audio_buffer_complete()
+                client.wait()
+            assert client._state == client.State.CLOSED
+            assert [i["event_type"] for i in received] == ["chat.update", "input_audio_buffer.complete"]
+            assert events == [
+                WebsocketsEventType.CHAT_UPDATED,
+                WebsocketsEventType.CONVERSATION_MESSAGE_DELTA,
+                WebsocketsEventType.CONVERSATION_CHAT_COMPLETED,
+            ]
+
+    def test_sync_chat_unknown_option(self):
+        with pytest.raises(TypeError):
+            build_chat_client("ws://127.0.0.1:1", [], send_queue=1)
+
+    def test_sync_chat_shared_loop(self):
+        pool = WebsocketsEventLoopPool(size=1)
+        closed = []
+        with mock_websockets_server(CHAT_REPLIES) as (base_url, received):
+            results = [[] for _ in range(5)]  # type: List[List]
+            clients = [build_chat_client(base_url, events, loop_pool=pool) for events in results]
+            for client in clients:
+                client.on(WebsocketsEventType.CLOSED, lambda cli: closed.append(cli))
+                client.connect()
+                client.chat_update(ChatUpdateEvent.Data())
+                client.input_audio_buffer_complete()
+            # one loop thread, instead of two threads per client
+            assert all(client._send_thread is None and client._receive_thread is None for client in clients)
+            assert len([i for i in threading.enumerate() if i.name.startswith("cozepy-websockets-loop")]) == 1
+            for client in clients:
+                client.wait()
+                client.close()
+            for events in results:
+                assert events == [
+                    WebsocketsEventType.CHAT_UPDATED,
+                    WebsocketsEventType.CONVERSATION_MESSAGE_DELTA,
+                    WebsocketsEventType.CONVERSATION_CHAT_COMPLETED,
+                ]
+            assert len(received) == 10
+            assert closed == clients
+            assert pool._loops[0].clients == 0
+        pool.close()
+
+    def test_sync_chat_shared_loop_close_in_handler(self):
+        pool = WebsocketsEventLoopPool(size=1)
+        closed = threading.Event()
+        with mock_websockets_server(CHAT_REPLIES) as (base_url, _):
+            client = build_chat_client(base_url, [], loop_pool=pool)
+            client.on(WebsocketsEventType.CONVERSATION_CHAT_COMPLETED, lambda cli, event: cli.close())
+            client.on(WebsocketsEventType.CLOSED, lambda cli: closed.set())
+            client.on(WebsocketsEventType.ERROR, lambda cli, e: pytest.fail(str(e)))
+            client.connect()
+            client.input_audio_buffer_complete()
+            assert closed.wait(5)
+            assert client._state == client.State.CLOSED
+        pool.close()
+
+    def test_sync_chat_shared_loop_connect_failed(self):
+        pool = WebsocketsEventLoopPool(size=1)
+        client = build_chat_client("ws://127.0.0.1:1", [], loop_pool=pool)
+        with pytest.raises(OSError):
+            client.connect()
+        assert pool._loops[0].clients == 0
+        pool.close()
+
+
+class TestWebsocketsEventLoopPool:
+    def test_acquire_least_loaded(self):
+        pool = WebsocketsEventLoopPool(size=2)
+        first, second, third = pool.acquire(), pool.acquire(), pool.acquire()
+        assert first is not second
+        assert third is first
+        pool.release(first)
+        pool.release(third)
+        assert pool.acquire() is first
+        assert pool.size == 2
+
+    def test_invalid_size(self):
+        with pytest.raises(ValueError):
+            WebsocketsEventLoopPool(size=0)
+
+    def test_shared(self):
+        assert WebsocketsEventLoopPool.shared() is WebsocketsEventLoopPool.shared()
+
+    def test_loop_run(self):
+        loop = WebsocketsEventLoop()
+
+        async def add(a, b):
+            return a + b
+
+        async def nested():
+            # blocking the loop on itself is refused
+            with pytest.raises(RuntimeError):
+                loop.run(add(1, 2))
+
+        assert loop.run(add(1, 2)) == 3
+        loop.run(nested())
+        loop.close()
+        assert loop._thread is None
+
+
+class TestWebsocketsEventDispatcher:
+    def test_sync_dispatch_slow_handler(self):
+        with mock_websockets_server(DELTA_REPLIES) as (base_url, _):
+            deltas: List[str] = []
+            completed: List[float] = []
+
+            def on_delta(cli, event):
+                time.sleep(0.1)
+                deltas.append(event.data.content)
+
+            client = build_chat_client(base_url, [], dispatch_workers=2)
+            client.on(WebsocketsEventType.CONVERSATION_MESSAGE_DELTA, on_delta)
+            client.on(
+                WebsocketsEventType.CONVERSATION_CHAT_COMPLETED, lambda cli, e: completed.append(time.monotonic())
+            )
+            start = time.monotonic()
+            with client():
+                client.input_audio_buffer_complete()
+                client.wait()
+                # the completed event is not held back by the slow delta handler
+                assert completed[0] - start < 0.2
+            assert deltas == ["0", "1", "2"]
+            metrics = client.dispatch_metrics
+            assert metrics is not None
+            assert metrics.dispatched == metrics.handled == 4
+            assert metrics.queue_depth == 0
+            assert metrics.max_queue_depth >= 2
+            assert metrics.handler_latency(99) >= 0.1
+
+    def test_sync_dispatch_handler_error(self):
+        with mock_websockets_server(CHAT_REPLIES) as (base_url, _):
+            errors = []
+
+            def on_delta(cli, event):
+                raise ValueError("handler failed")
+
+            client = build_chat_client(base_url, [], dispatch_workers=1)
+            client.on(WebsocketsEventType.CONVERSATION_MESSAGE_DELTA, on_delta)
+            client.on(WebsocketsEventType.ERROR, lambda cli, e: errors.append(e))
+            with client():
+                client.input_audio_buffer_complete()
+                client.wait()
+            assert [str(e) for e in errors] == ["handler failed"]
+
+    def test_sync_dispatcher_order(self):
+        dispatcher = WebsocketsEventDispatcher(workers=4, queue_size=1)
+        res: Dict[str, List[int]] = {"a": [], "b": []}
+        for i in range(20):
+            dispatcher.dispatch("a", res["a"].append, i)
+            dispatcher.dispatch("b", res["b"].append, i)
+        dispatcher.close()
+        assert res == {"a": list(range(20)), "b": list(range(20))}
+        with pytest.raises(ValueError):
+            dispatcher.dispatch("a", res["a"].append, 0)
+        with pytest.raises(ValueError):
+            WebsocketsEventDispatcher(workers=0)
+
+    @pytest.mark.asyncio
+    async def test_async_dispatch_slow_handler(self):
+        with mock_websockets_server(DELTA_REPLIES) as (base_url, _):
+            deltas: List[str] = []
+            completed = asyncio.Event()
+
+            async def on_delta(cli, event):
+                await asyncio.sleep(0.1)
+                deltas.append(event.data.content)
+
+            async def on_completed(cli, event):
+                completed.set()
+
+            client = AsyncWebsocketsChatClient(
+                base_url=base_url,
+                requester=Requester(auth=AsyncTokenAuth("token")),
+                bot_id="bot",
+                on_event={
+                    WebsocketsEventType.CONVERSATION_MESSAGE_DELTA: on_delta,
+                    WebsocketsEventType.CONVERSATION_CHAT_COMPLETED: on_completed,
+                },
+                dispatch_workers=2,
+            )
+            async with client():
+                await client.input_audio_buffer_complete()
+                await asyncio.wait_for(completed.wait(), 0.2)
+                assert deltas == []
+            assert deltas == ["0", "1", "2"]
+            metrics = client.dispatch_metrics
+            assert metrics is not None
+            assert metrics.dispatched == metrics.handled == 4
+
+    @pytest.mark.asyncio
+    async def test_async_dispatcher_order(self):
+        dispatcher = AsyncWebsocketsEventDispatcher(workers=3, queue_size=1)
+        res: List[int] = []
+
+        async def append(i):
+            await asyncio.sleep(0)
+            res.append(i)
+
+        for i in range(10):
+            await dispatcher.dispatch("a", append, i)
+        await dispatcher.close()
+        assert res == list(range(10))
+        assert dispatcher.metrics.handled == 10
+
+
+AUDIO_REPLIES: Dict[str, List[Dict]] = {
+    "input_audio_buffer.complete": [
+        {
+            "id": str(i),
+            "event_type": "conversation.audio.delta",
+            "data": {"role": "assistant", "type": "answer", "content": str(i), "content_type": "audio"},
+        }
+        for i in range(5)
+    ]
+    + [{"id": "5", "event_type": "conversation.chat.completed", "data": {"id": "chat", "conversation_id": "conv"}}],
+}
+
+
+def build_async_chat_client(base_url: str, **kwargs) -> AsyncWebsocketsChatClient:
+    return AsyncWebsocketsChatClient(
+        base_url=base_url,
+        requester=Requester(auth=AsyncTokenAuth("token")),
+        bot_id="bot",
+        on_event={},
+        **kwargs,
+    )
+
+
+class TestAsyncWebsocketsEvents:
+    @pytest.mark.asyncio
+    async def test_async_events(self):
+        with mock_websockets_server(CHAT_REPLIES) as (base_url, _):
+            client = build_async_chat_client(base_url)
+            async with client():
+                events = client.events(buffer_size=1)
+                await client.chat_update(ChatUpdateEvent.Data())
+                await client.input_audio_buffer_complete()
+                types = []
+                async for event in events:
+                    types.append(event.event_type)
+                    if event.event_type == WebsocketsEventType.CONVERSATION_CHAT_COMPLETED:
+                        break
+                assert types == [
+                    WebsocketsEventType.CHAT_UPDATED,
+                    WebsocketsEventType.INPUT_AUDIO_BUFFER_COMPLETED,
+                    WebsocketsEventType.CONVERSATION_CHAT_CREATED,
+                    WebsocketsEventType.CONVERSATION_MESSAGE_DELTA,
+                    WebsocketsEventType.CONVERSATION_CHAT_COMPLETED,
+                ]
+                await events.aclose()  # type: ignore
+                assert client._event_buffers == []
+
+    @pytest.mark.asyncio
+    async def test_async_events_end_on_close(self):
+        with mock_websockets_server(CHAT_REPLIES) as (base_url, _):
+            client = build_async_chat_client(base_url)
+            async with client():
+                events = client.events()
+                await client.input_audio_buffer_complete()
+                await client.wait()
+            assert len([event async for event in events]) == 4
+
+    @pytest.mark.asyncio
+    async def test_async_events_drop_oldest_audio(self):
+        with mock_websockets_server(AUDIO_REPLIES) as (base_url, _):
+            client = build_async_chat_client(base_url)
+            async with client():
+                events = client.events(buffer_size=2, overflow=WebsocketsEventsOverflow.DROP_OLDEST_AUDIO)
+                await client.input_audio_buffer_complete()
+                await client.wait()
+            assert [event.id async for event in events] == ["4", "5"]
+
+    @pytest.mark.asyncio
+    async def test_async_events_overflow_error(self):
+        with mock_websockets_server(AUDIO_REPLIES) as (base_url, _):
+            client = build_async_chat_client(base_url)
+            async with client():
+                events = client.events(buffer_size=2, overflow=WebsocketsEventsOverflow.ERROR)
+                await client.input_audio_buffer_complete()
+                await client.wait()
+            with pytest.raises(CozeEventBufferOverflowError):
+                async for _ in events:
+                    pass
+
+    @pytest.mark.asyncio
+    async def test_async_wait_any(self):
+        with mock_websockets_server(CHAT_REPLIES) as (base_url, _):
+            handled = []
+
+            async def on_created(cli, event):
+                handled.append(event.event_type)
+
+            client = build_async_chat_client(base_url)
+            client.on(WebsocketsEventType.CONVERSATION_CHAT_CREATED, on_created)
+            async with client():
+                await client.input_audio_buffer_complete()
+                await client.wait(
+                    [WebsocketsEventType.CONVERSATION_CHAT_CREATED, WebsocketsEventType.CONVERSATION_CHAT_COMPLETED],
+                    wait_all=False,
+                )
+                assert handled == [WebsocketsEventType.CONVERSATION_CHAT_CREATED]
+                assert client._waiters == []
+
+
+def audio(size: int) -> InputAudioBufferAppendEvent.Data:
+    return InputAudioBufferAppendEvent.Data(delta=b"\x00" * size)
+
+
+class TestWebsocketsSendQueue:
+    def test_sync_send_queue_drop_oldest_audio(self):
+        client = build_chat_client(
+            "ws://127.0.0.1:1", [], send_queue_size=2, send_overflow=WebsocketsSendOverflow.DROP_OLDEST_AUDIO
+        )
+        client.chat_update(ChatUpdateEvent.Data())
+        client.input_audio_buffer_append(audio(480))
+        client.input_audio_buffer_append(audio(960))
+        assert client.send_dropped == 1
+        assert client.send_lag_ms == 20
+        # the config event is never dropped
+        assert client._input_queue.get().event_type == WebsocketsEventType.CHAT_UPDATE
+        assert client.send_lag_ms == 20
+        client._input_queue.get()
+        assert client.send_lag_ms == 0
+
+    def test_sync_send_queue_lag_follows_input_audio(self):
+        client = build_chat_client("ws://127.0.0.1:1", [])
+        client.chat_update(
+            ChatUpdateEvent.Data(
+                input_audio=InputAudio(format="pcm", codec="pcm", sample_rate=16000, channel=1, bit_depth=16)
+            )
+        )
+        client.input_audio_buffer_append(audio(3200))
+        assert client.send_lag_ms == 100
+
+    def test_sync_send_queue_block(self):
+        client = build_chat_client("ws://127.0.0.1:1", [], send_queue_size=1)
+        client.input_audio_buffer_append(audio(480))
+        thread = threading.Thread(target=client.input_audio_buffer_append, args=(audio(480),))
+        thread.start()
+        thread.join(0.1)
+        assert thread.is_alive()
+        client._input_queue.get()
+        thread.join(1)
+        assert not thread.is_alive()
+        assert client.send_dropped == 0
+
+    def test_sync_send_queue_close(self):
+        pool = WebsocketsEventLoopPool(size=1)
+        with mock_websockets_server(CHAT_REPLIES) as (base_url, received):
+            client = build_chat_client(base_url, [], send_queue_size=1, loop_pool=pool)
+            with client():
+                for _ in range(5):
+                    client.input_audio_buffer_append(audio(480))
+            assert len(received) == 5
+            assert client.send_lag_ms == 0
+        pool.close()
+
+    def test_sync_send_queue_handler_on_loop(self):
+        pool = WebsocketsEventLoopPool(size=1)
+        with mock_websockets_server(CHAT_REPLIES) as (base_url, received):
+            events: List = []
+
+            def on_chat_updated(cli, event):
+                # on the loop thread which drains the full queue
+                for _ in range(3):
+                    cli.input_audio_buffer_append(audio(480))
+                cli.input_audio_buffer_complete()
+
+            client = build_chat_client(base_url, events, send_queue_size=1, loop_pool=pool)
+            client._on_event[WebsocketsEventType.CHAT_UPDATED] = on_chat_updated
+            with client():
+                client.chat_update(ChatUpdateEvent.Data())
+                client.wait()
+            assert [e["event_type"] for e in received] == [
+                "chat.update",
+                "input_audio_buffer.append",
+                "input_audio_buffer.append",
+                "input_audio_buffer.append",
+                "input_audio_buffer.complete",
+            ]
+        pool.close()
+
+    @pytest.mark.asyncio
+    async def test_async_send_queue(self):
+        client = build_async_chat_client(
+            "ws://127.0.0.1:1", send_queue_size=2, send_overflow=WebsocketsSendOverflow.DROP_OLDEST_AUDIO
+        )
+        for size in (480, 480, 960):
+            await client.input_audio_buffer_append(audio(size))
+        assert client.send_dropped == 1
+        assert client.send_lag_ms == 30
+
+        client = build_async_chat_client("ws://127.0.0.1:1", send_queue_size=1)
+        await client.input_audio_buffer_append(audio(480))
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(client.input_audio_buffer_append(audio(480)), 0.1)
+        assert client.send_lag_ms == 10
+
+
+class TestAudioUplinkBuffer:
+    def test_sync_uplink_coalesce(self):
+        sent: List[bytes] = []
+        uplink = AudioUplinkBuffer(sent.append, frame_bytes=960)
+        for i in range(5):
+            uplink.append(bytes([i]) * 480)
+        assert [len(i) for i in sent] == [960, 960]
+        assert sent[0] == b"\x00" * 480 + b"\x01" * 480
+        uplink.flush()
+        assert [len(i) for i in sent] == [960, 960, 480]
+        assert (uplink.frames_in, uplink.frames_out) == (5, 3)
+        uplink.flush()
+        assert len(sent) == 3
+
+    def test_sync_uplink_timer(self):
+        sent: List[bytes] = []
+        flushed = threading.Event()
+
+        def send(pcm: bytes):
+            sent.append(pcm)
+            flushed.set()
+
+        uplink = AudioUplinkBuffer(send, frame_ms=100, max_delay_ms=20)
+        uplink.append(b"\x00" * 480)
+        assert flushed.wait(1)
+        assert sent == [b"\x00" * 480]
+
+        uplink.append(b"\x00" * 480)
+        uplink.close()
+        time.sleep(0.05)
+        assert len(sent) == 1
+
+    def test_sync_uplink_timer_full_queue(self):
+        # the send queue of the first buffer is full, the timer hands its chunk off instead of blocking
+        blocked: List[bytes] = []
+        uplink = AudioUplinkBuffer(blocked.append, frame_ms=100, max_delay_ms=10, send_nowait=lambda pcm: False)
+        flushed = threading.Event()
+        other = AudioUplinkBuffer(lambda pcm: flushed.set(), frame_ms=100, max_delay_ms=10)
+
+        uplink.append(b"\x00" * 480)
+        time.sleep(0.05)
+        start = time.monotonic()
+        other.append(b"\x00" * 480)
+        assert flushed.wait(1)
+        assert time.monotonic() - start < 0.5
+        assert blocked == []
+
+        # sent in order by the caller
+        uplink.append(b"\x01" * 480)
+        uplink.flush()
+        assert blocked == [b"\x00" * 480, b"\x01" * 480]
+
+    def test_sync_uplink_invalid(self):
+        with pytest.raises(ValueError):
+            AudioUplinkBuffer(lambda pcm: None, frame_ms=0)
+
+    def test_sync_chat_uplink(self):
+        with mock_websockets_server(CHAT_REPLIES) as (base_url, received):
+            client = build_chat_client(base_url, [], uplink_frame_ms=100)
+            with client():
+                for _ in range(12):
+                    client.input_audio_buffer_append(audio(960))  # 20ms
+                client.input_audio_buffer_complete()
+                client.wait()
+            assert [i["event_type"] for i in received] == [
+                "input_audio_buffer.append",
+                "input_audio_buffer.append",
+                "input_audio_buffer.append",
+                "input_audio_buffer.complete",
+            ]
+            assert [len(base64.b64decode(i["data"]["delta"])) for i in received[:3]] == [4800, 4800, 1920]
+
+    @pytest.mark.asyncio
+    async def test_async_uplink_timer(self):
+        sent: List[bytes] = []
+
+        async def send(pcm: bytes):
+            sent.append(pcm)
+
+        uplink = AsyncAudioUplinkBuffer(send, frame_bytes=960, max_delay_ms=20)
+        await uplink.append(b"\x00" * 480)
+        assert sent == []
+        await asyncio.sleep(0.1)
+        assert sent == [b"\x00" * 480]
+        await uplink.append(b"\x00" * 960)
+        assert len(sent) == 2
+
+    @pytest.mark.asyncio
+    async def test_async_chat_uplink_close(self):
+        with mock_websockets_server(CHAT_REPLIES) as (base_url, received):
+            client = build_async_chat_client(base_url, uplink_frame_ms=100)
+            async with client():
+                await client.input_audio_buffer_append(audio(960))
+            # flushed on close
+            assert [i["event_type"] for i in received] == ["input_audio_buffer.append"]
+            assert len(base64.b64decode(received[0]["data"]["delta"])) == 960
+
+    @pytest.mark.asyncio
+    async def test_async_chat_uplink(self):
+        with mock_websockets_server(CHAT_REPLIES) as (base_url, received):
+            client = build_async_chat_client(base_url, uplink_frame_ms=100)
+            async with client():
+                for _ in range(6):
+                    await client.input_audio_buffer_append(audio(960))
+                await client.input_audio_buffer_complete()
+                await client.wait()
+            assert [i["event_type"] for i in received] == [
+                "input_audio_buffer.append",
+                "input_audio_buffer.append",
+                "input_audio_buffer.complete",
+            ]
+
+
+PCM_REPLIES: Dict[str, List[Dict]] = {
+    "input_audio_buffer.complete": [
+        {
+            "id": str(i),
+            "event_type": "conversation.audio.delta",
+            "data": {"role": "assistant", "type": "answer", "content": base64.b64encode(bytes([i]) * 4).decode()},
+        }
+        for i in range(3)
+    ]
+    + [{"id": "3", "event_type": "conversation.chat.completed", "data": {"id": "chat", "conversation_id": "conv"}}],
+}
+
+
+class TestWebsocketsAudioCodec:
+    def test_encode_audio_append(self):
+        for event in [
+            InputAudioBufferAppendEvent.model_validate({"data": {"delta": b"abc"}}),
+            InputAudioBufferAppendEvent.model_validate({"id": 'a"b', "data": {"delta": bytes(range(256))}}),
+            InputAudioBufferAppendEvent.model_validate({"data": {"delta": b""}}),
+        ]:
+            frame = _dump_event(event)
+            assert (frame if isinstance(frame, str) else frame.decode()) == event.model_dump_json()
+        assert _encode_audio_append(memoryview(bytearray(b"abc"))) == _encode_audio_append(b"abc")
+
+    def test_sync_audio_sink(self):
+        with mock_websockets_server(PCM_REPLIES) as (base_url, received):
+            events: List = []
+            sink: List[bytes] = []
+            client = build_chat_client(base_url, events, audio_sink=sink.append)
+            with client():
+                client.input_audio_buffer_append(audio(960))
+                client.input_audio_buffer_complete()
+                client.wait()
+            assert sink == [b"\x00" * 4, b"\x01" * 4, b"\x02" * 4]
+            assert events == [WebsocketsEventType.CONVERSATION_CHAT_COMPLETED]
+            assert base64.b64decode(received[0]["data"]["delta"]) == b"\x00" * 960
+
+    @pytest.mark.asyncio
+    async def test_async_audio_sink(self):
+        with mock_websockets_server(PCM_REPLIES) as (base_url, received):
+            sink: List[bytes] = []
+            client = build_async_chat_client(base_url, audio_sink=sink.append)
+            async with client():
+                await client.input_audio_buffer_append(audio(960))
+                await client.input_audio_buffer_complete()
+                await client.wait()
+            assert sink == [b"\x00" * 4, b"\x01" * 4, b"\x02" * 4]
+            assert base64.b64decode(received[0]["data"]["delta"]) == b"\x00" * 960
+
+
+class TestWebsocketsEventRegistry:
+    def test_chat_events(self):
+        client = build_chat_client("ws://127.0.0.1:1", [])
+        assert set(client._event_types) == {
+            "chat.created",
+            "chat.updated",
+            "input_audio_buffer.completed",
+            "conversation.chat.created",
+            "conversation.chat.in_progress",
+            "conversation.message.delta",
+            "conversation.audio_transcript.completed",
+            "conversation.chat.requires_action",
+            "conversation.message.completed",
+            "conversation.audio.delta",
+            "conversation.audio.completed",
+            "conversation.chat.completed",
+            "conversation.chat.canceled",
+        }
+        event = client._load_all_event(
+            {
+                "id": "1",
+                "event_type": "conversation.message.delta",
+                "detail": {"logid": "logid"},
+                "data": {"role": "assistant", "type": "answer", "content": "hi", "content_type": "text"},
+            }
+        )
+        assert isinstance(event, ConversationMessageDeltaEvent)
+        assert (event.id, event.detail.logid, event.data.content) == ("1", "logid", "hi")
+        event = client._load_all_event({"event_type": "conversation.chat.in_progress"})
+        assert isinstance(event, ConversationChatInProgressEvent)
+        assert (event.id, event.detail.logid) == ("", None)
+        assert client._load_all_event({"event_type": "unknown"}) is None
+
+    def test_error_event(self):
+        client = build_chat_client("ws://127.0.0.1:1", [])
+        event = client._load_all_event(
+            {"event_type": "error", "detail": {"logid": "logid"}, "data": {"code": 4000, "msg": "invalid"}}
+        )
+        assert isinstance(event, WebsocketsErrorEvent)
+        assert (event.data.code, event.data.msg, event.data.logid) == (4000, "invalid", "logid")
+
+    def test_speech_and_transcriptions_events(self):
+        requester = Requester(auth=TokenAuth("token"))
+        speech = WebsocketsAudioSpeechClient(base_url="ws://127.0.0.1:1", requester=requester, on_event={})
+        event = speech._load_all_event(
+            {"event_type": "speech.audio.update", "data": {"delta": base64.b64encode(b"pcm").decode()}}
+        )
+        assert isinstance(event, SpeechAudioUpdateEvent)
+        assert event.data.delta == b"pcm"
+        with pytest.raises(ValueError):
+            speech._load_all_event({"event_type": "speech.audio.update", "data": {}})
+
+        transcriptions = WebsocketsAudioTranscriptionsClient(
+            base_url="ws://127.0.0.1:1", requester=requester, on_event={}
+        )
+        event = transcriptions._load_all_event({"event_type": "transcriptions.message.update", "data": {}})
+        assert isinstance(event, TranscriptionsMessageUpdateEvent)
+        assert event.data.content == ""
+
+
+RECONNECT = WebsocketsReconnectPolicy(initial_delay=0.01, max_delay=0.05)
+
+
+class TestWebsocketsReconnect:
+    def test_policy_delay(self):
+        policy = WebsocketsReconnectPolicy(initial_delay=0.1, max_delay=1, multiplier=2, jitter=0)
+        assert [policy.delay(i) for i in range(5)] == [0.1, 0.2, 0.4, 0.8, 1]
+        with pytest.raises(ValueError):
+            WebsocketsReconnectPolicy(max_attempts=0)
+
+    @pytest.mark.parametrize("loop_pool", [False, True])
+    def test_sync_reconnect(self, loop_pool):
+        pool = WebsocketsEventLoopPool(size=1) if loop_pool else None
+        with mock_websockets_server(CHAT_REPLIES, drop_on="input_audio_buffer.append") as (base_url, received):
+            events: List = []
+            client = build_chat_client(base_url, events, reconnect=RECONNECT, loop_pool=pool)
+            with client():
+                client.chat_update(ChatUpdateEvent.Data())
+                client.wait([WebsocketsEventType.CHAT_UPDATED])
+                client.input_audio_buffer_append(audio(960))
+                assert wait_for(lambda: client.reconnect_metrics.reconnects == 1)
+                client.input_audio_buffer_complete()
+                client.wait()
+            types = [i["event_type"] for i in received]
+            # the config is re-sent first on the new connection
+            assert types[:3] == ["chat.update", "input_audio_buffer.append", "chat.update"]
+            assert types[-1] == "input_audio_buffer.complete"
+            assert events[-1] == WebsocketsEventType.CONVERSATION_CHAT_COMPLETED
+            assert client.reconnect_metrics.drops == 1
+            assert client.reconnect_metrics.latency(50) > 0
+        if pool:
+            pool.close()
+
+    def test_sync_reconnect_disabled(self):
+        errors: List[Exception] = []
+        with mock_websockets_server(CHAT_REPLIES, drop_on="input_audio_buffer.append") as (base_url, _):
+            client = build_chat_client(base_url, [])
+            client.on(WebsocketsEventType.ERROR, lambda cli, e: errors.append(e))
+            with client():
+                client.input_audio_buffer_append(audio(960))
+                assert wait_for(lambda: len(errors) == 1)
+            assert client.reconnect_metrics is None
+
+    @pytest.mark.asyncio
+    async def test_async_reconnect(self):
+        with mock_websockets_server(CHAT_REPLIES, drop_on="input_audio_buffer.append") as (base_url, received):
+            client = build_async_chat_client(base_url, reconnect=RECONNECT)
+            async with client():
+                await client.chat_update(ChatUpdateEvent.Data())
+                await client.wait([WebsocketsEventType.CHAT_UPDATED])
+                await client.input_audio_buffer_append(audio(960))
+                for _ in range(100):
+                    if client.reconnect_metrics.reconnects:
+                        break
+                    await asyncio.sleep(0.01)
+                await client.input_audio_buffer_complete()
+                await client.wait()
+            types = [i["event_type"] for i in received]
+            assert types[:3] == ["chat.update", "input_audio_buffer.append", "chat.update"]
+            assert types[-1] == "input_audio_buffer.complete"
+            assert client.reconnect_metrics.reconnects == 1
+
+
+class TestAsyncWebsocketsChatPool:
+    @pytest.mark.asyncio
+    async def test_lease(self):
+        with mock_websockets_server(CHAT_REPLIES) as (base_url, received):
+            pool = AsyncWebsocketsChatPool(base_url, Requester(auth=AsyncTokenAuth("token")))
+            await pool.warm(bot_id="bot", size=2)
+            assert pool.idle("bot") == 2
+            client = build_async_chat_client(base_url, pool=pool)
+            async with client():
+                await client.chat_update(ChatUpdateEvent.Data())
+                await client.wait([WebsocketsEventType.CHAT_UPDATED])
+            assert (pool.hits, pool.misses) == (1, 0)
+            # the leased connection is replaced in the background
+            for _ in range(100):
+                if pool.idle("bot") == 2:
+                    break
+                await asyncio.sleep(0.01)
+            assert pool.idle("bot") == 2
+            await pool.close()
+            assert pool.idle("bot") == 0
+
+    @pytest.mark.asyncio
+    async def test_idle_timeout(self):
+        with mock_websockets_server(CHAT_REPLIES) as (base_url, _):
+            pool = AsyncWebsocketsChatPool(
+                base_url, Requester(auth=AsyncTokenAuth("token")), idle_timeout=0.05, ping_interval=0.02
+            )
+            await pool.warm(bot_id="bot")
+            opened_at = pool._idle[pool._url("bot", None)][0].opened_at
+            await asyncio.sleep(0.15)
+            # expired connections are closed and replaced by the health check
+            idle = pool._idle[pool._url("bot", None)]
+            assert len(idle) == 1
+            assert idle[0].opened_at > opened_at
+            await pool.close()
+
+    @pytest.mark.asyncio
+    async def test_not_warmed(self):
+        with mock_websockets_server(CHAT_REPLIES) as (base_url, _):
+            pool = AsyncWebsocketsChatPool(base_url, Requester(auth=AsyncTokenAuth("token")))
+            client = build_async_chat_client(base_url, pool=pool)
+            async with client():
+                pass
+            assert (pool.hits, pool.misses) == (0, 0)
+            await pool.close()
+
+    def test_websockets_client_pool(self):
+        ws = AsyncWebsocketsClient("https://api.coze.cn", Requester(auth=AsyncTokenAuth("token")))
+        assert ws.chat.create(bot_id="bot", on_event={})._pool is None
+        pool = ws.pool
+        assert ws.pool is pool
+        assert ws.chat.create(bot_id="bot", on_event={})._pool is pool
+
+
+class TestWebsocketsSessionMetrics:
+    def test_histogram(self):
+        histogram = WebsocketsLatencyHistogram(window=3)
+        for ms in [100, 1, 2, 3]:
+            histogram.observe("first_audio", ms)
+        assert histogram.count("first_audio") == 3
+        assert histogram.percentile("first_audio", 99) == 3
+        assert histogram.summary() == {"first_audio": {"count": 3, "avg": 2, "p50": 2, "p90": 3, "p99": 3}}
+        assert histogram.percentile("first_text", 50) == 0
+
+    def test_sync_session_metrics(self):
+        histogram = WebsocketsLatencyHistogram()
+        with mock_websockets_server(DELTA_REPLIES) as (base_url, _):
+            for _ in range(2):
+                client = build_chat_client(base_url, [], latency_histogram=histogram)
+                with client():
+                    client.input_audio_buffer_complete()
+                    client.wait()
+                metrics = client.session_metrics
+                # one turn, the first of the three deltas is measured
+                assert len(metrics.latencies["first_text"]) == 1
+                assert metrics.latency("first_audio") is None
+                assert (
+                    metrics.first_received["conversation.message.delta"]
+                    <= metrics.last_received["conversation.message.delta"]
+                )
+                assert metrics.first_sent["input_audio_buffer.complete"] >= metrics.connected_at
+        assert histogram.count("first_text") == 2
+        assert histogram.count("connect") == 2
+
+    @pytest.mark.asyncio
+    async def test_async_session_metrics(self):
+        with mock_websockets_server(CHAT_REPLIES) as (base_url, _):
+            client = build_async_chat_client(base_url)
+            async with client():
+                await client.input_audio_buffer_complete()
+                await client.wait()
+            metrics = client.session_metrics
+            assert metrics.latency("chat_created") <= metrics.latency("first_text")
+            assert metrics.latency("connect") > 0
+
+
+SPEECH_REPLIES: Dict[str, List[Dict]] = {
+    "input_text_buffer.append": [
+        {"id": "1", "event_type": "speech.audio.update", "data": {"delta": base64.b64encode(b"\x01" * 4).decode()}}
+    ],
+    "input_text_buffer.complete": [
+        {"id": "2", "event_type": "input_text_buffer.completed"},
+        {"id": "3", "event_type": "speech.audio.completed"},
+    ],
+}
+
+
+class TestWebsocketsSpeechPipeline:
+    def test_splitter(self):
+        splitter = SpeechTextSplitter()
+        assert splitter.feed("Hello world. How") == ["Hello world."]
+        assert splitter.feed(" are you?") == [" How are you?"]
+        # no sentence end before a "." which is not followed by a whitespace
+        assert splitter.feed("Pi is 3.") == []
+        # a sentence shorter than min_chars is joined with the next one
+        assert splitter.feed("14. 你好。好！") == ["Pi is 3.14.", " 你好。"]
+        assert splitter.feed("OK") == []
+        assert splitter.flush() == "好！OK"
+        assert splitter.flush() == ""
+
+    def test_splitter_long_text(self):
+        splitter = SpeechTextSplitter(min_chars=1, max_chars=10)
+        assert splitter.feed("one two three four") == ["one two "]
+        assert splitter.feed("x" * 12) == ["three ", "four" + "x" * 6]
+        assert splitter.flush() == "x" * 6
+        with pytest.raises(ValueError):
+            SpeechTextSplitter(min_chars=10, max_chars=5)
+
+    def test_sync_pipeline(self):
+        first_audio = threading.Event()
+
+        def texts():
+            yield "Hello world. Second"
+            # the audio of the first sentence is received while the text is still streamed
+            assert first_audio.wait(2)
+            yield " sentence."
+            yield ChatEvent(
+                event=ChatEventType.CONVERSATION_MESSAGE_DELTA, message=Message.build_assistant_answer(" Bye")
+            )
+            yield ChatEvent(
+                event=ChatEventType.CONVERSATION_MESSAGE_COMPLETED, message=Message.build_assistant_answer("x")
+            )
+
+        with mock_websockets_server(SPEECH_REPLIES) as (base_url, received):
+            pipeline = WebsocketsSpeechPipeline(
+                WebsocketsAudioSpeechBuildClient(base_url, Requester(auth=TokenAuth("token")))
+            )
+            chunks = []
+            for pcm in pipeline.stream(texts()):
+                chunks.append(pcm)
+                first_audio.set()
+            assert chunks == [b"\x01" * 4] * 3
+            assert [event["event_type"] for event in received] == ["input_text_buffer.append"] * 3 + [
+                "input_text_buffer.complete"
+            ]
+            assert "".join(event["data"]["delta"] for event in received[:3]) == "Hello world. Second sentence. Bye"
+
+    def test_sync_pipeline_empty_text(self):
+        with mock_websockets_server(SPEECH_REPLIES) as (base_url, received):
+            pipeline = WebsocketsSpeechPipeline(
+                WebsocketsAudioSpeechBuildClient(base_url, Requester(auth=TokenAuth("token")))
+            )
+            assert list(pipeline.stream(iter([" ", ""]))) == []
+            assert received == []
+
+    @pytest.mark.asyncio
+    async def test_async_pipeline(self):
+        first_audio = asyncio.Event()
+
+        async def texts():
+            yield "Hello world. Second"
+            await asyncio.wait_for(first_audio.wait(), 2)
+            yield " sentence."
+
+        with mock_websockets_server(SPEECH_REPLIES) as (base_url, received):
+            pipeline = AsyncWebsocketsSpeechPipeline(
+                AsyncWebsocketsAudioSpeechBuildClient(base_url, Requester(auth=AsyncTokenAuth("token")))
+            )
+            chunks = []
+            async for pcm in pipeline.stream(texts()):
+                chunks.append(pcm)
+                first_audio.set()
+            assert chunks == [b"\x01" * 4] * 2
+            assert [event["data"]["delta"] for event in received[:2]] == ["Hello world.", " Second sentence."]
+
+    @pytest.mark.asyncio
+    async def test_async_pipeline_text_error(self):
+        def texts():
+            yield "Hello world. "
+            raise ValueError("chat failed")
+
+        with mock_websockets_server(SPEECH_REPLIES) as (base_url, _):
+            pipeline = AsyncWebsocketsSpeechPipeline(
+                AsyncWebsocketsAudioSpeechBuildClient(base_url, Requester(auth=AsyncTokenAuth("token")))
+            )
+            with pytest.raises(ValueError, match="chat failed"):
+                async for _ in pipeline.stream(texts()):
+                    pass
+
+
+TRANSCRIPTIONS_REPLIES: Dict[str, List[Dict]] = {
+    "input_audio_buffer.complete": [
+        {"id": "1", "event_type": "input_audio_buffer.completed"},
+        {"id": "2", "event_type": "transcriptions.message.update", "data": {"content": "hello"}},
+        {"id": "3", "event_type": "transcriptions.message.update", "data": {"content": "hello world"}},
+        {"id": "4", "event_type": "transcriptions.message.completed"},
+    ],
+}
+
+
+def write_wav(path, pcm: bytes, sample_rate: int = 16000) -> None:
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(pcm)
+
+
+class TestWebsocketsAudioFeeder:
+    def test_sync_transcribe_wav(self, tmp_path):
+        path = tmp_path / "call.wav"
+        # 250ms of 16kHz audio, in 100ms frames
+        write_wav(path, bytes(range(256)) * 31 + b"\x00" * 64)
+        with mock_websockets_server(TRANSCRIPTIONS_REPLIES) as (base_url, received):
+            feeder = WebsocketsAudioFeeder(path, mode=AudioFeedMode.MAX_THROUGHPUT)
+            transcriptions = WebsocketsAudioTranscriptionsBuildClient(base_url, Requester(auth=TokenAuth("token")))
+            assert feeder.transcribe(transcriptions) == "hello world"
+            assert feeder.frames == 3
+            assert received[0]["event_type"] == "transcriptions.update"
+            assert received[0]["data"]["input_audio"]["sample_rate"] == 16000
+            frames = [base64.b64decode(event["data"]["delta"]) for event in received[1:4]]
+            assert [len(frame) for frame in frames] == [3200, 3200, 1600]
+            assert b"".join(frames) == bytes(range(256)) * 31 + b"\x00" * 64
+            assert received[4]["event_type"] == "input_audio_buffer.complete"
+
+    def test_sync_transcribe_pcm_realtime(self, tmp_path):
+        path = tmp_path / "call.pcm"
+        # 300ms of 24kHz audio
+        path.write_bytes(b"\x01" * 14400)
+        with mock_websockets_server(TRANSCRIPTIONS_REPLIES) as (base_url, received):
+            feeder = WebsocketsAudioFeeder(str(path), frame_ms=100)
+            assert feeder.input_audio.sample_rate == 24000
+            transcriptions = WebsocketsAudioTranscriptionsBuildClient(base_url, Requester(auth=TokenAuth("token")))
+            start = time.monotonic()
+            assert feeder.transcribe(transcriptions, send_queue_size=1) == "hello world"
+            # the third frame is sent 200ms after the first one
+            assert time.monotonic() - start >= 0.2
+            assert [len(base64.b64decode(event["data"]["delta"])) for event in received[1:4]] == [4800] * 3
+
+    def test_sync_transcribe_error(self):
+        replies = {"input_audio_buffer.complete": [{"id": "1", "event_type": "error", "data": {"code": 4000}}]}
+        with mock_websockets_server(replies) as (base_url, _):
+            feeder = WebsocketsAudioFeeder(io.BytesIO(b"\x00" * 960), mode=AudioFeedMode.MAX_THROUGHPUT)
+            transcriptions = WebsocketsAudioTranscriptionsBuildClient(base_url, Requester(auth=TokenAuth("token")))
+            with pytest.raises(CozeAPIError):
+                feeder.transcribe(transcriptions)
+
+    def test_sync_transcribe_on_event(self):
+        updates = []
+        with mock_websockets_server(TRANSCRIPTIONS_REPLIES) as (base_url, _):
+            feeder = WebsocketsAudioFeeder(io.BytesIO(b"\x00" * 960), mode=AudioFeedMode.MAX_THROUGHPUT)
+            transcriptions = WebsocketsAudioTranscriptionsBuildClient(base_url, Requester(auth=TokenAuth("token")))
+            text = feeder.transcribe(
+                transcriptions,
+                on_event={
+                    WebsocketsEventType.TRANSCRIPTIONS_MESSAGE_UPDATE: lambda cli, e: updates.append(e.data.content)
+                },
+            )
+            # the handlers of the caller and of the feeder both run
+            assert text == updates[-1] == "hello world"
+
+    def test_sync_transcribe_connect_failed(self, tmp_path, monkeypatch):
+        path = tmp_path / "call.wav"
+        write_wav(path, b"\x00" * 640)
+        feeder = WebsocketsAudioFeeder(path)
+        readers = []
+        open_reader = feeder._open
+        monkeypatch.setattr(feeder, "_open", lambda: readers.append(open_reader()) or readers[-1])
+        transcriptions = WebsocketsAudioTranscriptionsBuildClient(
+            "ws://127.0.0.1:1", Requester(auth=TokenAuth("token"))
+        )
+        with pytest.raises(ConnectionRefusedError):
+            feeder.transcribe(transcriptions)
+        assert readers[0]._file.closed
+
+    def test_sync_transcribe_timeout(self):
+        with mock_websockets_server({}) as (base_url, _):
+            feeder = WebsocketsAudioFeeder(io.BytesIO(b"\x00" * 960), mode=AudioFeedMode.MAX_THROUGHPUT)
+            transcriptions = WebsocketsAudioTranscriptionsBuildClient(base_url, Requester(auth=TokenAuth("token")))
+            with pytest.raises(TimeoutError):
+                feeder.transcribe(transcriptions, timeout=0.1)
+
+    @pytest.mark.asyncio
+    async def test_async_transcribe_timeout(self):
+        with mock_websockets_server({}) as (base_url, _):
+            feeder = AsyncWebsocketsAudioFeeder(io.BytesIO(b"\x00" * 960), mode=AudioFeedMode.MAX_THROUGHPUT)
+            transcriptions = AsyncWebsocketsAudioTranscriptionsBuildClient(
+                base_url, Requester(auth=AsyncTokenAuth("token"))
+            )
+            with pytest.raises(asyncio.TimeoutError):
+                await feeder.transcribe(transcriptions, timeout=0.1)
+
+    @pytest.mark.asyncio
+    async def test_async_transcribe_on_event(self):
+        updates = []
+
+        async def on_update(cli, event):
+            updates.append(event.data.content)
+
+        with mock_websockets_server(TRANSCRIPTIONS_REPLIES) as (base_url, _):
+            feeder = AsyncWebsocketsAudioFeeder(io.BytesIO(b"\x00" * 960), mode=AudioFeedMode.MAX_THROUGHPUT)
+            transcriptions = AsyncWebsocketsAudioTranscriptionsBuildClient(
+                base_url, Requester(auth=AsyncTokenAuth("token"))
+            )
+            text = await feeder.transcribe(
+                transcriptions, on_event={WebsocketsEventType.TRANSCRIPTIONS_MESSAGE_UPDATE: on_update}
+            )
+            assert text == updates[-1] == "hello world"
+
+    @pytest.mark.asyncio
+    async def test_async_transcribe_file_object(self, tmp_path):
+        path = tmp_path / "call.wav"
+        write_wav(path, b"\x02" * 6400)
+        with mock_websockets_server(TRANSCRIPTIONS_REPLIES) as (base_url, received), open(path, "rb") as f:
+            feeder = AsyncWebsocketsAudioFeeder(f, mode=AudioFeedMode.MAX_THROUGHPUT, frame_ms=50)
+            assert feeder.input_audio.sample_rate == 16000
+            transcriptions = AsyncWebsocketsAudioTranscriptionsBuildClient(
+                base_url, Requester(auth=AsyncTokenAuth("token"))
+            )
+            assert await feeder.transcribe(transcriptions) == "hello world"
+            assert feeder.frames == 4
+            assert received[0]["data"]["input_audio"]["bit_depth"] == 16
+
+
+def tone(ms: int, amplitude: int = 8000, hz: int = 200) -> bytes:
+    # 24kHz 16 bit mono
+    n = 24 * ms
+    return struct.pack(f"<{n}h", *[int(amplitude * math.sin(2 * math.pi * hz * i / 24000)) for i in range(n)])
+
+
+SILENCE = b"\x00" * 4800
+SPEECH = tone(100)
+
+
+def float_stereo(pcm: bytes) -> bytes:
+    # 16 bit mono to 32 bit float stereo, the same sample in both channels
+    samples = struct.unpack(f"<{len(pcm) // 2}h", pcm)
+    return struct.pack(f"<{len(samples) * 2}f", *[v / 32767 for v in samples for _ in range(2)])
+
+
+class TestAudioVoiceActivityDetector:
+    def test_is_speech(self):
+        vad = AudioVoiceActivityDetector()
+        assert vad.is_speech(SPEECH)
+        assert not vad.is_speech(SILENCE)
+        assert not vad.is_speech(tone(100, amplitude=100))
+        # loud, but crossing zero at every sample
+        assert not vad.is_speech(struct.pack("<4h", 3000, -3000, 3000, -3000) * 600)
+        assert not vad.is_speech(b"\x01")
+
+    def test_numpy_stats(self):
+        pytest.importorskip("numpy")
+        from cozepy.websockets.audio import vad
+
+        for pcm, channels, sample_width in [
+            (SPEECH, 1, 2),
+            (SILENCE, 1, 2),
+            (tone(100, amplitude=100), 1, 2),
+            (float_stereo(SPEECH), 2, 4),
+        ]:
+            stats = vad._frame_stats(pcm, channels, sample_width)
+            vad._numpy = False
+            try:
+                assert vad._frame_stats(pcm, channels, sample_width) == pytest.approx(stats, rel=1e-4)
+            finally:
+                vad._numpy = None
+
+    def test_numpy_decisions(self):
+        pytest.importorskip("numpy")
+        from cozepy.websockets.audio import vad
+
+        rand = random.Random(7)
+        noise = struct.pack("<2400h", *[rand.randint(-3000, 3000) for _ in range(2400)])
+        # loud and quiet tones around the energy threshold, hiss, and silence
+        frames = [SILENCE, tone(100, amplitude=650), SPEECH, noise, tone(100, amplitude=750), SILENCE] * 3
+        frames += [tone(100, amplitude=amplitude, hz=hz) for amplitude in (400, 720, 5000) for hz in (100, 3000, 9000)]
+
+        def decisions():
+            detector = AudioVoiceActivityDetector(pre_roll_ms=100, hangover_ms=100, end_of_speech_ms=200)
+            return [(detector.is_speech(pcm), detector.process(pcm)) for pcm in frames]
+
+        expected = decisions()
+        vad._numpy = False
+        try:
+            assert decisions() == expected
+        finally:
+            vad._numpy = None
+        assert {speech for speech, _ in expected} == {True, False}
+
+    def test_formats(self):
+        vad = AudioVoiceActivityDetector(channels=2, sample_width=4)
+        assert vad.is_speech(float_stereo(SPEECH))
+        assert not vad.is_speech(float_stereo(SILENCE))
+        # 100ms of 24kHz float stereo
+        assert vad.process(float_stereo(SILENCE)) == ([], False)
+        assert vad._bytes_per_ms * 100 == len(float_stereo(SILENCE))
+        with pytest.raises(ValueError):
+            AudioVoiceActivityDetector(sample_width=3)
+
+    def test_client_format(self):
+        vad = AudioVoiceActivityDetector()
+        client = build_chat_client("ws://127.0.0.1:1", [], vad=vad)
+        client.chat_update(
+            ChatUpdateEvent.Data(
+                input_audio=InputAudio(format="pcm", codec="pcm", sample_rate=16000, channel=2, bit_depth=32)
+            )
+        )
+        client.input_audio_buffer_append(InputAudioBufferAppendEvent.Data(delta=float_stereo(SPEECH)))
+        assert (vad.sample_rate, vad.channels, vad.sample_width) == (16000, 2, 4)
+        assert vad.frames_sent == 1
+
+        client.chat_update(
+            ChatUpdateEvent.Data(
+                input_audio=InputAudio(format="ogg", codec="opus", sample_rate=16000, channel=1, bit_depth=16)
+            )
+        )
+        with pytest.raises(ValueError, match="pcm"):
+            client.input_audio_buffer_append(InputAudioBufferAppendEvent.Data(delta=SPEECH))
+
+    def test_client_converter_format(self):
+        pytest.importorskip("numpy")
+        vad = AudioVoiceActivityDetector()
+        converter = PCMConverter(PCMFormat(48000, 2), PCMFormat(16000, encoding="float32"))
+        build_chat_client("ws://127.0.0.1:1", [], vad=vad, uplink_converter=converter)
+        assert (vad.sample_rate, vad.channels, vad.sample_width) == (16000, 1, 4)
+
+    def test_process(self):
+        vad = AudioVoiceActivityDetector(pre_roll_ms=100, hangover_ms=200, end_of_speech_ms=400)
+        silence = [bytes([i]) + SILENCE[1:] for i in range(2)]
+        assert vad.process(silence[0]) == ([], False)
+        assert vad.process(silence[1]) == ([], False)
+        # the last 100ms of silence are sent before the speech
+        assert vad.process(SPEECH) == ([silence[1], SPEECH], False)
+        assert vad.process(SILENCE) == ([SILENCE], False)
+        assert vad.process(SILENCE) == ([SILENCE], False)
+        assert vad.process(SILENCE) == ([], False)
+        assert vad.process(SILENCE) == ([], True)
+        assert vad.process(SILENCE) == ([], False)
+        assert (vad.frames_in, vad.frames_sent) == (8, 4)
+        assert vad.bytes_sent == 4 * 4800
+
+    def test_keepalive(self):
+        vad = AudioVoiceActivityDetector(keepalive_ms=300)
+        assert [len(vad.process(SILENCE)[0]) for _ in range(6)] == [0, 0, 1, 0, 0, 1]
+
+    def test_sync_auto_complete(self):
+        vad = AudioVoiceActivityDetector(hangover_ms=100, end_of_speech_ms=300, auto_complete=True)
+        with mock_websockets_server(CHAT_REPLIES) as (base_url, received):
+            client = build_chat_client(base_url, [], vad=vad)
+            with client():
+                for pcm in [SILENCE] * 5 + [SPEECH] * 2 + [SILENCE] * 3:
+                    client.input_audio_buffer_append(InputAudioBufferAppendEvent.Data(delta=pcm))
+                client.wait()
+            assert [event["event_type"] for event in received] == ["input_audio_buffer.append"] * 5 + [
+                "input_audio_buffer.complete"
+            ]
+
+    @pytest.mark.asyncio
+    async def test_async_vad_uplink(self):
+        vad = AudioVoiceActivityDetector(pre_roll_ms=0, hangover_ms=0)
+        with mock_websockets_server(CHAT_REPLIES) as (base_url, received):
+            client = build_async_chat_client(base_url, vad=vad, uplink_frame_ms=200)
+            async with client():
+                for pcm in [SILENCE, SPEECH, SPEECH, SILENCE]:
+                    await client.input_audio_buffer_append(InputAudioBufferAppendEvent.Data(delta=pcm))
+                await client.input_audio_buffer_complete()
+                await client.wait()
+            assert [event["event_type"] for event in received] == [
+                "input_audio_buffer.append",
+                "input_audio_buffer.complete",
+            ]
+            assert base64.b64decode(received[0]["data"]["delta"]) == SPEECH * 2
+
+
+class TestPCMConverter:
+    def test_format(self):
+        assert PCMFormat.from_input_audio(
+            InputAudio(format="pcm", codec="pcm", sample_rate=16000, channel=2, bit_depth=16)
+        ) == PCMFormat(16000, 2)
+        with pytest.raises(ValueError):
+            PCMFormat(encoding="int24")
+        with pytest.raises(ValueError):
+            PCMConverter(PCMFormat(channels=2), PCMFormat(channels=3))
+
+    def test_convert(self):
+        np = pytest.importorskip("numpy")
+        stereo = np.array([[1000, 3000], [-1000, -3000]] * 4800, dtype="<i2").tobytes()
+        converter = PCMConverter(PCMFormat(48000, 2), PCMFormat(24000, encoding="float32"))
+        mono = np.frombuffer(converter.convert(stereo), dtype="<f4")
+        assert len(mono) == 4800
+        assert mono[0] == pytest.approx(2000 / 32768)
+        # int16 -> float32 -> int16 is lossless
+        back = PCMConverter(PCMFormat(encoding="float32")).convert(np.array([0.5, -1.0], dtype="<f4").tobytes())
+        assert np.frombuffer(back, dtype="<i2").tolist() == [16384, -32768]
+        assert converter.convert(b"\x01") == b""
+
+    def test_resample_stream(self):
+        np = pytest.importorskip("numpy")
+        ramp = np.arange(0, 4800, dtype="<i2")
+        converter = PCMConverter(PCMFormat(16000), PCMFormat(24000))
+        # the frames of a stream are resampled as one
+        chunks = [converter.convert(ramp[i : i + 160].tobytes()) for i in range(0, 4800, 160)]
+        out = np.frombuffer(b"".join(chunks), dtype="<i2")
+        expected = np.interp(np.arange(len(out)) * 16000 / 24000, np.arange(4800), ramp)
+        assert np.abs(out - expected).max() <= 1
+        assert len(out) == 7199
+
+    def test_downsample_low_pass(self):
+        np = pytest.importorskip("numpy")
+        # 24kHz at 48kHz is above the 12kHz nyquist of the target, it must not alias into the output
+        nyquist = np.array([8000, -8000] * 4800, dtype="<i2")
+        converter = PCMConverter(PCMFormat(48000), PCMFormat(24000))
+        out = np.frombuffer(converter.convert(nyquist.tobytes()), dtype="<i2")
+        assert len(out) == 4800
+        assert np.abs(out[1:]).max() == 0
+        # the frames of a stream are filtered as one
+        tone = (np.sin(np.arange(9600) * 0.05) * 10000).astype("<i2")
+        whole = PCMConverter(PCMFormat(48000), PCMFormat(16000)).convert(tone.tobytes())
+        converter = PCMConverter(PCMFormat(48000), PCMFormat(16000))
+        chunks = b"".join(converter.convert(tone[i : i + 480].tobytes()) for i in range(0, 9600, 480))
+        assert chunks == whole
+
+    def test_gain_in_place(self):
+        np = pytest.importorskip("numpy")
+        frame = bytearray(np.array([100, 20000, -20000], dtype="<i2").tobytes())
+        converter = PCMConverter(PCMFormat(), gain=2.0)
+        assert converter.convert(frame) is frame
+        assert np.frombuffer(frame, dtype="<i2").tolist() == [200, 32767, -32768]
+        assert PCMConverter(PCMFormat()).convert(b"\x01\x00") == b"\x01\x00"
+
+    @pytest.mark.asyncio
+    async def test_async_client_converters(self):
+        np = pytest.importorskip("numpy")
+        sink: List[bytes] = []
+        with mock_websockets_server(PCM_REPLIES) as (base_url, received):
+            client = build_async_chat_client(
+                base_url,
+                audio_sink=sink.append,
+                uplink_converter=PCMConverter(PCMFormat(48000)),
+                downlink_converter=PCMConverter(PCMFormat(), gain=0.5),
+            )
+            async with client():
+                await client.input_audio_buffer_append(audio(1920))
+                await client.input_audio_buffer_complete()
+                await client.wait()
+            assert len(base64.b64decode(received[0]["data"]["delta"])) == 960
+            assert [np.frombuffer(pcm, dtype="<i2").tolist() for pcm in sink] == [[0, 0], [128, 128], [257, 257]]
+
+
+class TestAudioJitterBuffer:
+    def test_prebuffer_and_underrun(self):
+        # 1ms is 2 bytes at 1kHz
+        jitter = AudioJitterBuffer(target_latency_ms=4, capacity_ms=8, sample_rate=1000)
+        out = bytearray(4)
+        jitter.write(b"\x01\x01\x02\x02")
+        assert jitter.read_into(out) == 0 and out == b"\x00" * 4
+        assert not jitter.playing
+        jitter.write(b"\x03\x03\x04\x04")
+        assert jitter.playing and jitter.buffered_ms == 4
+        assert jitter.read_into(out) == 4 and out == b"\x01\x01\x02\x02"
+        jitter.write(b"\x05\x05")
+        # 3ms buffered, the last 1ms of the read is silence
+        assert jitter.read(8) == b"\x03\x03\x04\x04\x05\x05\x00\x00"
+        assert jitter.underruns == 1 and not jitter.playing
+
+    def test_overrun_and_wrap(self):
+        jitter = AudioJitterBuffer(target_latency_ms=1, capacity_ms=3, sample_rate=1000)
+        jitter.write(b"aabb")
+        assert jitter.read(2) == b"aa"
+        # wraps around the end of the ring
+        jitter.write(b"ccdd")
+        assert jitter.buffered_ms == 3
+        jitter.write(b"ee")
+        assert jitter.overrun_bytes == 2
+        assert jitter.read(6) == b"ccddee"
+        jitter.write(b"0123456789")
+        assert jitter.read(6) == b"456789"
+        assert jitter.overrun_bytes == 6
+
+    def test_end_and_clear(self):
+        jitter = AudioJitterBuffer(target_latency_ms=100, sample_rate=1000)
+        jitter.write(b"aa")
+        jitter.end()
+        assert jitter.read(4) == b"aa\x00\x00"
+        assert jitter.underruns == 0 and not jitter.playing
+        jitter.write(b"bb" * 200)
+        jitter.clear()
+        assert jitter.buffered_ms == 0 and jitter.read(2) == b"\x00\x00"
+
+    def test_audio_sink(self):
+        jitter = AudioJitterBuffer(target_latency_ms=0)
+        with mock_websockets_server(PCM_REPLIES) as (base_url, _):
+            client = build_chat_client(base_url, [], audio_sink=jitter.write)
+            with client():
+                client.input_audio_buffer_complete()
+                client.wait()
+        assert jitter.read(12) == b"\x00" * 4 + b"\x01" * 4 + b"\x02" * 4
+
+
+def wait_for(predicate, timeout: float = 2) -> bool:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True